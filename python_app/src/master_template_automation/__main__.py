@@ -0,0 +1,51 @@
+import argparse
+import sys
+from . import normalize
+
+
+def build_parser():
+    """
+    Builds the command line parser of `python -m master_template_automation`.
+
+    :return: argparse.ArgumentParser with the available subcommands.
+    """
+    parser = argparse.ArgumentParser(
+        prog="master_template_automation",
+        description="Headless tools for exported playbooks (the Master Template GUI is launched by main.py)."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    normalize_parser = subparsers.add_parser(
+        "normalize",
+        help="Normalize the names and contents of every exported playbook in a directory."
+    )
+    normalize_parser.add_argument("directory", help="Directory with the exported JSON files.")
+    normalize_parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Show the renames and content changes without touching the disk."
+    )
+    normalize_parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=None,
+        help="Worker processes used to normalize the contents (default: number of CPUs)."
+    )
+    return parser
+
+
+def main(argv=None):
+    """
+    Entry point of `python -m master_template_automation`.
+
+    :param argv: Command line arguments (default: sys.argv[1:]).
+    :return: Exit code.
+    """
+    args = build_parser().parse_args(argv)
+    if args.command == "normalize":
+        return normalize.normalize_directory(args.directory, dry_run=args.dry_run, jobs=args.jobs)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
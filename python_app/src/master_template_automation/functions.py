@@ -1,22 +1,20 @@
 import re
 from pathlib import Path
 
-def normalize_file_names(file_path):
+def normalized_file_name(file_name):
     """
-    Normalizes the name of a playbook JSON file and renames it on disk.
+    Computes the normalized name of a playbook JSON file without touching the disk.
 
     Features:
     - Replaces the word 'automation' with 'OrchestatorPart' in the filename.
     - Removes unnecessary prefixes before 'OrchestatorPart', 'Action', or 'Enrich'.
     - Ensures the filename ends with "_Playbook.json".
-    - Renames the file at its original location.
 
-    :param file_path: Path to the file to normalize (str or Path).
-    :return: The new normalized file path (Path).
+    :param file_name: Current file name (without directory).
+    :return: The normalized file name (str).
     """
-    file_name = Path(file_path).name.strip()
-    path = Path(file_path)
-    
+    file_name = file_name.strip()
+
     # Replace "automation" with "OrchestatorPart" (case-insensitive)
     file_name = re.sub(r"automation", "OrchestatorPart", file_name, flags=re.IGNORECASE)
     
@@ -28,6 +26,22 @@ def normalize_file_names(file_path):
     # Ensure the correct suffix
     if not file_name.endswith("_Playbook.json"):
         file_name = file_name.replace(".json", "_Playbook.json")
+
+    return file_name
+
+
+def normalize_file_names(file_path):
+    """
+    Normalizes the name of a playbook JSON file and renames it on disk.
+
+    The new name is computed by `normalized_file_name`; the file is renamed
+    at its original location.
+
+    :param file_path: Path to the file to normalize (str or Path).
+    :return: The new normalized file path (Path).
+    """
+    path = Path(file_path)
+    file_name = normalized_file_name(path.name)
     
     # Rename the file on disk
     new_path = path.with_name(file_name)
@@ -36,22 +50,20 @@ def normalize_file_names(file_path):
     return new_path
 
 
-def remove_prefixes(file_path):
+def normalize_content(lines):
     """
-    Cleans and normalizes workflow references inside a playbook JSON file.
+    Cleans and normalizes workflow references in the lines of a playbook JSON file.
 
     Features:
     - Replaces the word 'Automation' with 'OrchestatorPart' in the file content.
     - Adjusts playbook names to remove unnecessary prefixes.
     - Ensures names end with "_Playbook".
 
-    :param file_path: Path to the JSON file to process (str or Path).
-    :return: None. Modifies the file directly on disk.
+    :param lines: List of strings representing the lines of a JSON file.
+    :return: New list with the normalized lines.
     """
-    # Read all lines from the file
-    with open(file_path, "r", encoding="utf-8") as input_file:
-        lines = input_file.readlines()
-    
+    lines = list(lines)
+
     # Search patterns
     workflow_pattern = r"\"workflows_(.*)_(name|externalid)\": {"
     azure_pattern = r"\[azuresentinel-\d+\]"
@@ -84,6 +96,22 @@ def remove_prefixes(file_path):
             for index, _ in enumerate(lines):
                 lines[index] = re.sub(match.group(1), playbook_name, lines[index])
 
+    return lines
+
+
+def remove_prefixes(file_path):
+    """
+    Cleans and normalizes workflow references inside a playbook JSON file (see `normalize_content`).
+
+    :param file_path: Path to the JSON file to process (str or Path).
+    :return: None. Modifies the file directly on disk.
+    """
+    # Read all lines from the file
+    with open(file_path, "r", encoding="utf-8") as input_file:
+        lines = input_file.readlines()
+
+    lines = normalize_content(lines)
+
     # Write changes back to the file
     with open(file_path, "w", encoding="utf-8") as output_file:
         output_file.writelines(lines)
@@ -1,9 +1,136 @@
 from tkinter import Tk, ttk, messagebox, filedialog
 import tkinter as tk
-from . import parametrize
 from . import functions
 from . import generate
+from .selection import FileSelection
+import contextlib
 import os
+import queue
+import sys
+import threading
+
+# Interval (ms) at which the main thread drains the worker's event queue
+POLL_INTERVAL_MS = 100
+
+
+class QueueWriter:
+    """
+    File-like object that streams every printed line to the GUI event queue.
+
+    The lines are still echoed to the original console so the terminal output
+    is the same as before.
+    """
+
+    def __init__(self, events, echo=None):
+        """
+        :param events: Queue that receives `("log", line)` events.
+        :param echo: Stream that also receives the text (e.g. `sys.__stdout__`).
+        """
+        self.events = events
+        self.echo = echo
+        self.buffer = ""
+
+    def write(self, text):
+        if self.echo is not None:
+            self.echo.write(text)
+        self.buffer += text
+        while "\n" in self.buffer:
+            line, self.buffer = self.buffer.split("\n", 1)
+            if line.strip():
+                self.events.put(("log", line))
+        return len(text)
+
+    def flush(self):
+        if self.echo is not None:
+            self.echo.flush()
+
+
+def run_in_background(events, task, *args):
+    """
+    Runs `task(*args)` in a daemon thread and reports the outcome through `events`.
+
+    Everything the task prints is streamed as `("log", line)` events; the task
+    ends with `("done", result)` or `("error", message)`.
+
+    :param events: Queue polled by the GUI.
+    :param task: Function to run.
+    :return: The started thread.
+    """
+    def worker():
+        try:
+            with contextlib.redirect_stdout(QueueWriter(events, sys.__stdout__)):
+                result = task(*args)
+        except Exception as exc:  # the GUI shows any failure instead of dying silently
+            events.put(("error", f"{type(exc).__name__}: {exc}"))
+        else:
+            events.put(("done", result))
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    return thread
+
+
+def process_selection(new_files, known_files, selection, events, cancel):
+    """
+    Normalizes the newly selected files and parses them into the selection cache (worker thread).
+
+    The selection is then refreshed with the whole list: files already parsed
+    keep their cached parameters and dependencies, and files left unparsed by a
+    cancelled selection (or changed on disk) are parsed now. Works file by file
+    so progress can be reported and the work can be cancelled between files.
+    Files already renamed on disk when the work is cancelled are still returned
+    so the list matches the disk; they are parsed by the next refresh.
+
+    :param new_files: Paths chosen in the file dialog.
+    :param known_files: Files already in the list (not modified).
+    :param selection: `FileSelection` cache of the parsed files.
+    :param events: Queue that receives `("progress", done, total)` events.
+    :param cancel: `threading.Event` set by the Cancel button.
+    :return: Dictionary with the keys `added` (normalized new files) and `cancelled`.
+    """
+    result = {"added": [], "cancelled": False}
+    total = 2 * len(new_files) + len(known_files)
+    done = 0
+
+    for file in new_files:
+        if cancel.is_set():
+            result["cancelled"] = True
+            return result
+        print(f"Selected file {file}")
+        file = functions.normalize_file_names(file)
+        if file not in known_files and file not in result["added"]:  # Avoid duplicates
+            functions.remove_prefixes(file)
+            result["added"].append(file)
+            print(f"File {file} successfully added")
+        else:
+            total -= 1
+        done += 1
+        events.put(("progress", done, total))
+
+    def file_checked(file):
+        nonlocal done
+        done += 1
+        events.put(("progress", done, total))
+
+    # Parametrize and search for dependencies of the files not parsed yet
+    print("Parametrizing added files")
+    selection.refresh(list(known_files) + result["added"], cancel=cancel, on_file=file_checked)
+    result["cancelled"] = done < total
+    return result
+
+
+def check_dependencies(selection):
+    """
+    Looks for workflows referenced by a selected file that are not selected.
+
+    :param selection: `FileSelection` cache of the parsed files.
+    :return: Error message for the first missing workflow, or None.
+    """
+    print("Removing repeated dependencies")
+    for dependency, file_names in selection.missing_dependencies().items():
+        return f"Workflow {dependency} in file {file_names[0]} not found in other selected files. Check if it was selected or renamed."
+    return None
+
 
 def render_gui():
     """
@@ -16,18 +143,25 @@ def render_gui():
     - Validation of dependencies between workflows.
     - Generation of the Master Template by calling the `generate_master` function.
 
+    Normalization, parametrization and generation run in a background thread;
+    the window shows their progress and log lines and stays responsive.
+
     :return: Returns the output directory path of the processed files.
     """
-    params_for_file = {}
-    dependencies = {}
+    # Parsed parameters and dependencies of the selected files
+    selection = FileSelection()
     file_list = []
     input_dir = ""
 
+    events = queue.Queue()
+    cancel = threading.Event()
+    handlers = {}
+
     # ========================= MAIN WINDOW CONFIGURATION =========================
     print("Rendering main window")
     root = Tk()
     root.title("Master Template Creator")
-    root.geometry("650x380")
+    root.geometry("650x560")
     root.resizable(False, False)
     root.configure(bg="#f5f5f5")  # Light gray background
 
@@ -60,12 +194,12 @@ def render_gui():
                     background="white",
                     borderwidth=1,
                     relief="ridge")
-    
+
     # General label style
     style.configure("TLabel",
                     background="white",
                     font=("Arial", 11))
-    
+
     # Normal buttons
     style.configure("TButton",
                     font=("Arial", 11),
@@ -75,7 +209,7 @@ def render_gui():
                     foreground="white",
                     background="#4C7AAF")  # Modern blue
     style.map("TButton",
-              background=[("active", "#204E99")])
+              background=[("active", "#204E99"), ("disabled", "#A9B9CF")])
 
     # Large "Generate" button style
     style.configure("Big.TButton",
@@ -86,7 +220,7 @@ def render_gui():
                     foreground="white",
                     background="#4C7AAF")
     style.map("Big.TButton",
-              background=[("active", "#204E99")])
+              background=[("active", "#204E99"), ("disabled", "#A9B9CF")])
 
     # ========================= FRAMES =========================
     print("Rendering frames inside main window")
@@ -109,76 +243,208 @@ def render_gui():
 
     ttk.Label(base_frame, text="Output directory").grid(row=2, column=0, columnspan=2, sticky="w", pady=(10, 0))
 
+    # Progress of the background work and its log lines
+    progress = ttk.Progressbar(base_frame, orient="horizontal", mode="determinate", length=600)
+    progress.grid(row=6, column=0, columnspan=2, pady=(5, 5), sticky="we")
+
+    log_text = tk.Text(
+        base_frame,
+        width=80,
+        height=7,
+        bg="#f9f9f9",
+        relief="flat",
+        highlightthickness=1,
+        highlightbackground="#ddd",
+        font=("Consolas", 9),
+        state="disabled"
+    )
+    log_text.grid(row=7, column=0, columnspan=2, sticky="we")
+
+    def append_log(line):
+        """
+        Appends a line to the log pane and keeps the last line visible.
+
+        :param line: Text printed by the background work.
+        """
+        log_text.configure(state="normal")
+        log_text.insert(tk.END, line + "\n")
+        log_text.see(tk.END)
+        log_text.configure(state="disabled")
+
+    # ========================= BACKGROUND WORK =========================
+    def set_busy(busy, cancellable=False):
+        """
+        Enables or disables the buttons while the background work runs.
+
+        :param busy: Whether a task is running.
+        :param cancellable: Whether the Cancel button applies to the task.
+        """
+        state = ["disabled"] if busy else ["!disabled"]
+        for button in (add_button, remove_button, generate_button):
+            button.state(state)
+        cancel_button.state(["!disabled"] if busy and cancellable else ["disabled"])
+
+    def start_task(task, args, on_done, cancellable=False):
+        """
+        Starts a background task; `on_done(result)` runs in the main thread when it ends.
+
+        :param task: Function to run in the worker thread.
+        :param args: Arguments of the task.
+        :param on_done: Callback that receives the task result.
+        :param cancellable: Whether the Cancel button applies to the task.
+        """
+        cancel.clear()
+        handlers["done"] = on_done
+        progress.configure(value=0, maximum=1)
+        set_busy(True, cancellable)
+        run_in_background(events, task, *args)
+
+    def poll_events():
+        """
+        Drains the worker's event queue (log lines, progress, result) on the Tk main thread.
+        """
+        try:
+            while True:
+                event = events.get_nowait()
+                kind = event[0]
+                if kind == "log":
+                    append_log(event[1])
+                elif kind == "progress":
+                    progress.configure(mode="determinate", maximum=max(event[2], 1), value=event[1])
+                elif kind == "done":
+                    progress.stop()
+                    progress.configure(mode="determinate")
+                    set_busy(False)
+                    handlers.pop("done")(event[1])
+                elif kind == "error":
+                    progress.stop()
+                    progress.configure(mode="determinate", value=0)
+                    set_busy(False)
+                    handlers.pop("done", None)
+                    append_log(f"ERROR: {event[1]}")
+                    messagebox.showerror("Error", event[1])
+        except queue.Empty:
+            pass
+        root.after(POLL_INTERVAL_MS, poll_events)
+
     # ========================= INTERNAL FUNCTIONS =========================
     def select_files():
         """
         Allows selecting JSON files via a file dialog.
         Prevents duplicates and normalizes filenames.
-        Updates parameters and dependencies of selected files.
+        Updates parameters and dependencies of selected files in the background.
         """
-        nonlocal params_for_file
-        nonlocal dependencies
-
         new_files = list(filedialog.askopenfilenames(
             filetypes=[("JSON files", "*.json")],
             title="Select JSON files"
         ))
-        if new_files:
-            for index, file in enumerate(new_files):
-                print(f"Selected file {file}")
-                new_files[index] = functions.normalize_file_names(file)
-
-            for file in new_files:
-                if file not in file_list:  # Avoid duplicates
-                    functions.remove_prefixes(file)
-                    file_list.append(file)
-                    listbox_files.insert(tk.END, file)
-                    print(f"File {file} successfully added")
-        
-        # Parametrize and search for dependencies
-        params_for_file = parametrize.parametrize_files(file_list)
-        dependencies = parametrize.parametrize_dependencies(file_list)
+        start_task(
+            process_selection,
+            (new_files, list(file_list), selection, events, cancel),
+            selection_done,
+            cancellable=True
+        )
+
+    def selection_done(result):
+        """
+        Adds the processed files to the list and validates their dependencies (main thread).
+
+        :param result: Value returned by `process_selection`.
+        """
+        for file in result["added"]:
+            file_list.append(file)
+            listbox_files.insert(tk.END, file)
+
+        if result["cancelled"]:
+            # Renamed files stay in the list; they are parsed before generating
+            append_log("Selection cancelled")
+            return
 
         # Dependency validation
-        print("Removing repeated dependencies")
-        for file_name in dependencies:
-            for dependency in dependencies[file_name]:
-                if dependency not in params_for_file.keys():
-                    show_error(f"Workflow {dependency} in file {file_name} not found in other selected files. Check if it was selected or renamed.")
+        error = check_dependencies(selection)
+        if error:
+            show_error(error)
 
     def remove_selected():
         """
-        Removes the selected files from the list and updates the internal list.
+        Removes the selected files from the list and drops their cached parameters and dependencies.
+        Warns about the workflows that the remaining files still need.
         """
         print("Removing selected file")
-        selection = listbox_files.curselection()
-        if not selection:
+        selected = listbox_files.curselection()
+        if not selected:
             messagebox.showinfo("Info", "Select a file to remove.")
             return
-        
-        for i in reversed(selection):
-            file_list.pop(i)
+
+        missing = set(selection.missing_dependencies())
+        for i in reversed(selected):
+            selection.remove(file_list.pop(i))
             listbox_files.delete(i)
 
+        for dependency, file_names in selection.missing_dependencies().items():
+            if dependency not in missing:
+                append_log(f"Warning: workflow {dependency} required by {', '.join(file_names)} is no longer selected")
+
+    def cancel_task():
+        """
+        Asks the running task to stop after the current file.
+        """
+        print("Cancelling current task")
+        cancel.set()
+
     # ========================= BUTTONS =========================
     print("Rendering buttons to add / remove JSON files")
-    ttk.Button(base_frame, text="Add JSON", command=select_files).grid(row=4, column=0, pady=10, sticky="w")
-    ttk.Button(base_frame, text="Remove selected", command=remove_selected).grid(row=4, column=1, pady=10, sticky="e")
+    add_button = ttk.Button(base_frame, text="Add JSON", command=select_files)
+    add_button.grid(row=4, column=0, pady=10, sticky="w")
+    remove_button = ttk.Button(base_frame, text="Remove selected", command=remove_selected)
+    remove_button.grid(row=4, column=1, pady=10, sticky="e")
+
+    def build_master(files, directory):
+        """
+        Generates the Master Template (worker thread).
+
+        The selection is refreshed first: only files not parsed yet (cancelled
+        selection) or changed on disk since they were added are parsed again.
+
+        :return: Error message of the dependency validation, or None.
+        """
+        selection.refresh(files)
+        error = check_dependencies(selection)
+        if error:
+            return error
+        generate.generate_master(selection.params_for_file(), selection.dependencies(), directory)
+        return None
 
     def exit_gui():
         """
-        Closes the GUI and calls `generate_master` to create the Master Template.
+        Generates the Master Template in the background and closes the GUI when it is written.
         """
         nonlocal input_dir
         if file_list:
             input_dir = os.path.dirname(file_list[0])
 
-        print("Exiting GUI")
-        root.destroy()
-        generate.generate_master(params_for_file, dependencies, input_dir)
+        def generated(error):
+            if error:
+                show_error(error)
+            print("Exiting GUI")
+            root.destroy()
+
+        start_task(
+            build_master,
+            (list(file_list), input_dir),
+            generated
+        )
+        # generate_master cannot report progress: indeterminate bar until it ends
+        progress.configure(mode="indeterminate")
+        progress.start(10)
 
     print("Rendering generate button")
-    ttk.Button(base_frame, text="Generate", command=exit_gui, style="Big.TButton").grid(row=5, column=0, pady=15, sticky="w")
+    generate_button = ttk.Button(base_frame, text="Generate", command=exit_gui, style="Big.TButton")
+    generate_button.grid(row=5, column=0, pady=15, sticky="w")
+    cancel_button = ttk.Button(base_frame, text="Cancel", command=cancel_task)
+    cancel_button.grid(row=5, column=1, pady=15, sticky="e")
+    cancel_button.state(["disabled"])
 
+    root.after(POLL_INTERVAL_MS, poll_events)
     root.mainloop()
     return input_dir
@@ -0,0 +1,151 @@
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from . import functions
+
+
+class RenamePlan:
+    """
+    Renames and content normalization planned for a directory of exported playbooks.
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory: Directory that contains the exported JSON files.
+        """
+        self.directory = Path(directory)
+        self.renames = {}       # source path -> target path (only files whose name changes)
+        self.unchanged = []     # files whose name is already normalized
+        self.collisions = {}    # target path -> [reasons]
+        self.errors = {}        # source path -> error computing its name
+
+    @property
+    def files(self):
+        """
+        :return: Every file of the plan (renamed or not), with its current path.
+        """
+        return sorted(list(self.renames) + self.unchanged)
+
+
+def plan_renames(directory):
+    """
+    Computes the normalized name of every JSON file in a directory without touching the disk.
+
+    A collision is reported when two files would get the same name, or when a
+    file would take the name of an existing file that is not renamed itself.
+
+    :param directory: Directory that contains the exported JSON files.
+    :return: RenamePlan with the renames, unchanged files, collisions and errors.
+    """
+    plan = RenamePlan(directory)
+    targets = {}
+
+    for path in sorted(plan.directory.glob("*.json")):
+        try:
+            target = path.with_name(functions.normalized_file_name(path.name))
+        except IndexError:
+            # The name has no "_" to split on: it does not follow the export naming
+            plan.errors[path] = "name does not follow the <prefix>_<playbook>.json export naming"
+            continue
+        targets.setdefault(target, []).append(path)
+        if target == path:
+            plan.unchanged.append(path)
+        else:
+            plan.renames[path] = target
+
+    for target, sources in targets.items():
+        if len(sources) > 1:
+            plan.collisions[target] = [f"{source.name} -> {target.name}" for source in sources]
+        elif target.exists() and target not in plan.renames and target != sources[0]:
+            # Existing file that keeps its name (or could not be planned)
+            plan.collisions[target] = [f"{sources[0].name} -> {target.name} (file already exists)"]
+
+    return plan
+
+
+def normalize_file_content(file_path, write=True):
+    """
+    Normalizes the contents of one playbook file (process pool worker).
+
+    :param file_path: Path to the JSON file.
+    :param write: Whether to write the normalized contents back to the file.
+    :return: True if the contents change.
+    """
+    with open(file_path, "r", encoding="utf-8") as input_file:
+        lines = input_file.readlines()
+
+    normalized = functions.normalize_content(lines)
+    changed = normalized != lines
+    if changed and write:
+        with open(file_path, "w", encoding="utf-8") as output_file:
+            output_file.writelines(normalized)
+    return changed
+
+
+def apply_renames(renames):
+    """
+    Applies a set of renames in one batch.
+
+    Files are first moved to temporary names and then to their targets, so a
+    target may be the current name of another file of the batch.
+
+    :param renames: Dictionary {source path: target path}.
+    :return: None. Renames the files on disk.
+    """
+    temporary = {}
+    for source, target in renames.items():
+        temp = source.with_name(f".{source.name}.{uuid.uuid4().hex}.tmp")
+        source.rename(temp)
+        temporary[temp] = target
+
+    for temp, target in temporary.items():
+        temp.rename(target)
+
+
+def normalize_directory(directory, dry_run=False, jobs=None):
+    """
+    Normalizes the names and contents of every exported playbook in a directory.
+
+    1. Plans every rename up front and stops if there are collisions.
+    2. Normalizes the file contents in parallel across a process pool.
+    3. Applies the renames in one batch at the end.
+
+    With `dry_run` the plan and the files whose contents would change are
+    printed, and nothing is written.
+
+    :param directory: Directory that contains the exported JSON files.
+    :param dry_run: Show the plan without touching the disk.
+    :param jobs: Number of worker processes (default: number of CPUs).
+    :return: Exit code: 0 on success, 1 if there are collisions or errors.
+    """
+    plan = plan_renames(directory)
+
+    print(f"Normalization plan for {plan.directory} ({len(plan.files)} files)")
+    for source, target in plan.renames.items():
+        print(f"  rename  {source.name} -> {target.name}")
+    for path in plan.unchanged:
+        print(f"  keep    {path.name}")
+    for path, error in plan.errors.items():
+        print(f"  ERROR   {path.name}: {error}")
+    for target, reasons in plan.collisions.items():
+        print(f"  COLLISION {target.name}: {'; '.join(reasons)}")
+
+    if plan.collisions or plan.errors:
+        print("Nothing was changed: fix the collisions/errors above and run again.")
+        return 1
+
+    files = plan.files
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        changed = list(executor.map(normalize_file_content, files, [not dry_run] * len(files)))
+
+    content_changes = [path for path, file_changed in zip(files, changed) if file_changed]
+    for path in content_changes:
+        print(f"  content {path.name}")
+
+    if dry_run:
+        print(f"Dry run: {len(plan.renames)} renames and {len(content_changes)} content changes planned, nothing written.")
+        return 0
+
+    apply_renames(plan.renames)
+    print(f"Normalized {len(files)} files: {len(plan.renames)} renamed, {len(content_changes)} contents updated.")
+    return 0
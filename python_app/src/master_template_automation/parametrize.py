@@ -135,3 +135,42 @@ def parametrize_dependencies(file_paths):
             dependencies[filename] = search_dependencies(lines)
 
     return dependencies
+
+
+# ----------------------------------------- SINGLE FILE -----------------------------------------
+
+def parametrize_file(file_path):
+    """
+    Reads a single JSON playbook file once and extracts its parameters and dependencies.
+
+    Produces the same entries as `parametrize_files([file_path])` and
+    `parametrize_dependencies([file_path])` for that file.
+
+    :param file_path: Path to the JSON playbook file.
+    :return: Tuple (parameters, keyvault_params, dependencies):
+        - parameters: Dictionary of parameters, including the KeyVault ones with placeholder values.
+        - keyvault_params: List of KeyVault parameter names ("keyvault_" prefixed).
+        - dependencies: List of workflow names the file depends on.
+    """
+    print(f"\n\nParameters for file {os.path.basename(file_path)}:")
+
+    with open(file_path, "r", encoding="utf-8") as read_file:
+        lines = read_file.readlines()
+
+    keyvault_params = search_keyvault_params(lines)
+    dependencies = search_dependencies(lines)
+    data = json.loads("".join(lines))
+
+    params = {}
+    for param in data['parameters']:
+        params[param] = data['parameters'][param]
+        print(data['parameters'][param]['defaultValue'])
+
+        # Same order as parametrize_files: KeyVault parameters follow the first parameter
+        for item in keyvault_params:
+            params[item] = {
+                "defaultValue": f"Fill_{item}",
+                "type": "string"
+            }
+
+    return params, keyvault_params, dependencies
@@ -0,0 +1,161 @@
+import os
+from . import parametrize
+
+
+def file_key(file_path):
+    """
+    Returns the key that tells whether a file changed since it was parsed.
+
+    :param file_path: Path to the file.
+    :return: Tuple (modification time in ns, size in bytes).
+    """
+    stat = os.stat(file_path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class CachedFile:
+    """
+    Parsed data of one selected playbook file.
+    """
+
+    def __init__(self, path, key, name, params, keyvault_params, dependencies):
+        """
+        :param path: Absolute path of the file.
+        :param key: Value of `file_key` when the file was parsed.
+        :param name: Playbook name (file name without extension).
+        :param params: Parameters of the playbook, KeyVault ones included.
+        :param keyvault_params: KeyVault parameter names.
+        :param dependencies: Workflows the playbook depends on.
+        """
+        self.path = path
+        self.key = key
+        self.name = name
+        self.params = params
+        self.keyvault_params = keyvault_params
+        self.dependencies = dependencies
+
+
+class FileSelection:
+    """
+    Selected playbook files with their parsed parameters and dependencies.
+
+    Each file is parsed once and cached by path plus modification time and
+    size: adding, removing or refreshing files only parses the files that are
+    new or changed on disk. The workflows required by the selection are
+    indexed so the missing dependencies are known without scanning every file.
+    """
+
+    def __init__(self):
+        self.files = {}          # path -> CachedFile, in selection order
+        self.required_by = {}    # workflow -> set of playbooks that depend on it
+        self.names = {}          # playbook name -> number of selected files with that name
+
+    def __contains__(self, file_path):
+        return os.path.abspath(file_path) in self.files
+
+    def __len__(self):
+        return len(self.files)
+
+    # ----------------------------------------- INDEX -----------------------------------------
+
+    def _index(self, cached):
+        self.names[cached.name] = self.names.get(cached.name, 0) + 1
+        for dependency in cached.dependencies:
+            self.required_by.setdefault(dependency, set()).add(cached.name)
+
+    def _unindex(self, cached):
+        self.names[cached.name] -= 1
+        if not self.names[cached.name]:
+            del self.names[cached.name]
+        for dependency in cached.dependencies:
+            playbooks = self.required_by.get(dependency, set())
+            playbooks.discard(cached.name)
+            if not playbooks:
+                self.required_by.pop(dependency, None)
+
+    # ----------------------------------------- CHANGES -----------------------------------------
+
+    def add(self, file_path):
+        """
+        Adds a file to the selection, parsing it only if it is new or changed on disk.
+
+        :param file_path: Path to the JSON playbook file.
+        :return: True if the file was parsed, False if the cached entry was still valid.
+        """
+        path = os.path.abspath(file_path)
+        key = file_key(path)
+        cached = self.files.get(path)
+        if cached is not None and cached.key == key:
+            return False
+
+        params, keyvault_params, dependencies = parametrize.parametrize_file(path)
+        name = os.path.splitext(os.path.basename(path))[0]
+        if cached is not None:
+            self._unindex(cached)
+        cached = CachedFile(path, key, name, params, keyvault_params, dependencies)
+        self.files[path] = cached
+        self._index(cached)
+        return True
+
+    def remove(self, file_path):
+        """
+        Removes a file and its cached entry from the selection.
+
+        :param file_path: Path to the JSON playbook file.
+        :return: True if the file was selected.
+        """
+        cached = self.files.pop(os.path.abspath(file_path), None)
+        if cached is None:
+            return False
+        self._unindex(cached)
+        return True
+
+    def refresh(self, file_paths, cancel=None, on_file=None):
+        """
+        Syncs the selection with a list of files: drops the ones not listed and
+        re-parses the ones that are new or changed on disk.
+
+        :param file_paths: Paths that make up the selection.
+        :param cancel: Optional `threading.Event`; when set, the files not checked yet are left as they are.
+        :param on_file: Optional function called with each path once it is checked.
+        :return: List of paths that were parsed.
+        """
+        wanted = [os.path.abspath(file_path) for file_path in file_paths]
+        for path in set(self.files) - set(wanted):
+            self.remove(path)
+
+        parsed = []
+        for path in wanted:
+            if cancel is not None and cancel.is_set():
+                break
+            if self.add(path):
+                parsed.append(path)
+            if on_file is not None:
+                on_file(path)
+        return parsed
+
+    # ----------------------------------------- RESULTS -----------------------------------------
+
+    def params_for_file(self):
+        """
+        :return: Dictionary {playbook_name: parameters}, as `parametrize.parametrize_files`.
+        """
+        return {cached.name: cached.params for cached in self.files.values()}
+
+    def dependencies(self):
+        """
+        :return: Dictionary {playbook_name: [dependencies]}, as `parametrize.parametrize_dependencies`.
+        """
+        return {cached.name: cached.dependencies for cached in self.files.values()}
+
+    def missing_dependencies(self):
+        """
+        Workflows required by a selected playbook that are not selected.
+
+        :return: Dictionary {workflow: sorted list of playbooks that depend on it}.
+        """
+        return {
+            dependency: sorted(playbooks)
+            for dependency, playbooks in self.required_by.items()
+            if dependency not in self.names
+        }
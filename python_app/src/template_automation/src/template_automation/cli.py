@@ -5,15 +5,62 @@ Responsibilities:
 - Parse command-line arguments.
 - Configure logging.
 - Invoke the main processing pipeline.
+
+Usage:
+- `template_automation -m MASTER -i DIR_IN -o DIR_OUT` runs a single master.
+- `template_automation <command> ...` runs one of the subcommands in `COMMANDS`
+  (listed by `template_automation -h`).
 """
 
 from __future__ import annotations
 
 import argparse
+import json
+import logging
+import sys
+import textwrap
 from pathlib import Path
+from typing import Callable, Dict, List, Tuple
 
+from .config import (
+    DEFAULT_ACTION_SECONDS,
+    DEFAULT_AUTH_CACHE_TTL,
+    DEFAULT_BRANCH_PROBABILITY,
+    DEFAULT_BUILTIN_ACTION_PRICE,
+    DEFAULT_CONNECTOR_ACTION_PRICE,
+    DEFAULT_FOREACH_CONCURRENCY,
+    DEFAULT_HOIST_THRESHOLD,
+    DEFAULT_LATENCY_SLA,
+    DEFAULT_REQUEST_TIMEOUT,
+    DEFAULT_RETRY_COUNT,
+    DEFAULT_RETRY_INTERVAL,
+    DEFAULT_RETRY_MAX_INTERVAL,
+    DEFAULT_STATS_WARN_RATIO,
+    DEFAULT_UNTIL_ITERATIONS,
+)
 from .utils.logging_utils import setup_logging
+from .utils.repo_index import open_repo_index
+from .core.batch import run_batch
+from .core.billing import Cardinalities, PackCost, Range, output_cost
+from .core.branches import BranchReport, parallelize_independent_actions
+from .core.callgraph import CallGraph, output_call_graph
+from .core.concurrency import ForeachFinding, analyze_document
+from .core.diff import diff_outputs, find_master, linked_playbooks
+from .core.document import PlaybookDocument
+from .core.evaluator import evaluate_pack, load_parameter_values
+from .core.fanout import run_fanout
+from .core.integrity import check_pack
+from .core.latency import PlaybookLatency, format_seconds, output_latency
+from .core.master_loader import load_master_template
+from .core.playbook_loader import load_playbook
+from .core.retry import RetryProfile
+from .core.parameter_files import generate_parameter_files
+from .core.stats import DocumentStats, EXCEEDED, OK, output_stats, pack_stats, stats_to_json
 from .core.transformer import run_automation
+from .core.writer import serialize_playbook, write_serialized
+from .utils.validation import coerce_parameter_value
+
+logger = logging.getLogger(__name__)
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -35,6 +82,8 @@ def build_parser() -> argparse.ArgumentParser:
         description=(
             "Tool to apply a master template over a set of JSON playbooks."
         ),
+        epilog=_commands_epilog(),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
     )
 
     parser.add_argument(
@@ -64,6 +113,153 @@ def build_parser() -> argparse.ArgumentParser:
         help="Output directory to write the transformed playbooks.",
     )
 
+    parser.add_argument(
+        "--hoist-expressions",
+        dest="hoist_threshold",
+        type=int,
+        nargs="?",
+        const=DEFAULT_HOIST_THRESHOLD,
+        default=None,
+        metavar="THRESHOLD",
+        help=(
+            "Move repeated ARM expressions into generated variables when "
+            f"length x occurrences >= THRESHOLD (default: {DEFAULT_HOIST_THRESHOLD})."
+        ),
+    )
+
+    parser.add_argument(
+        "--shared-connections",
+        dest="shared_connections",
+        action="store_true",
+        help=(
+            "Deploy one Azure Sentinel and one Key Vault connection per pack from the "
+            "master and pass their ids to the playbooks."
+        ),
+    )
+
+    parser.add_argument(
+        "--foreach-concurrency",
+        dest="foreach_concurrency",
+        type=int,
+        nargs="?",
+        const=DEFAULT_FOREACH_CONCURRENCY,
+        default=None,
+        metavar="N",
+        help=(
+            "Run the Foreach loops that are safe to parallelize with N concurrent "
+            f"iterations, exposed as the pack parameter foreach_Concurrency_Pack "
+            f"(default: {DEFAULT_FOREACH_CONCURRENCY}). String appends are collected in "
+            "input order and unsafe loops running in parallel are made sequential."
+        ),
+    )
+
+    parser.add_argument(
+        "--foreach-allow-reorder",
+        dest="foreach_allow_reorder",
+        action="store_true",
+        help=(
+            "With --foreach-concurrency, also parallelize the Foreach loops that are "
+            "explicitly sequential, and the ones whose string appends cannot be "
+            "collected (their text follows completion order instead of input order)."
+        ),
+    )
+
+    parser.add_argument(
+        "--cache-auth-tokens",
+        dest="auth_cache_ttl",
+        type=int,
+        nargs="?",
+        const=DEFAULT_AUTH_CACHE_TTL,
+        default=None,
+        metavar="TTL",
+        help=(
+            "Make the callers of the OrchestatorPart_*_Auth_Playbook workflows reuse the "
+            "Auth response cached in Key Vault for TTL seconds, exposed as the pack "
+            f"parameter authCache_TTL_Pack (default: {DEFAULT_AUTH_CACHE_TTL})."
+        ),
+    )
+
+    parser.add_argument(
+        "--normalize-retries",
+        dest="normalize_retries",
+        action="store_true",
+        help=(
+            "Give the Http/ApiConnection actions without retryPolicy or limit.timeout an "
+            "exponential retry policy and a timeout, exposed as the pack parameters "
+            f"retryPolicy_Count_Pack ({DEFAULT_RETRY_COUNT}), retryPolicy_Interval_Pack "
+            f"({DEFAULT_RETRY_INTERVAL}), retryPolicy_MaximumInterval_Pack ({DEFAULT_RETRY_MAX_INTERVAL}) "
+            f"and request_Timeout_Pack ({DEFAULT_REQUEST_TIMEOUT})."
+        ),
+    )
+
+    parser.add_argument(
+        "--parallel-branches",
+        dest="parallel_branches",
+        action="store_true",
+        help=(
+            "Run the actions chained by runAfter that share no data as parallel "
+            "branches (see `branches`)."
+        ),
+    )
+
+    parser.add_argument(
+        "--call-graph",
+        dest="call_graph",
+        action="store_true",
+        help="Report the child workflow calls of the built pack (see `calls`).",
+    )
+
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        help="Remove default-valued and no-op fields from the workflow definitions.",
+    )
+
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Write dense JSON (no indentation) instead of 2-space indented files.",
+    )
+
+    parser.add_argument(
+        "--repo-index",
+        dest="repo_index",
+        action="store_true",
+        help=(
+            "Locate the playbooks through the persisted repository index "
+            "(.repo_index.json at the git root, shared with `batch` and tools/) "
+            "and update it with the written files."
+        ),
+    )
+
+    parser.add_argument(
+        "--stats-json",
+        dest="stats_json",
+        type=Path,
+        default=None,
+        metavar="PATH",
+        help="Write the size/limit report of the built pack (see `stats`) as JSON.",
+    )
+
+    _add_verbose_argument(parser)
+
+    return parser
+
+
+def _commands_epilog() -> str:
+    """
+    List the subcommands of `COMMANDS` (first sentence of their description)
+    for the help of the top-level parser.
+    """
+    lines = ["subcommands (template_automation <command> -h for their options):"]
+    for name, (build_command_parser, _) in COMMANDS.items():
+        description = build_command_parser().description or ""
+        summary = description.split(". ")[0].rstrip(".")
+        lines.append(textwrap.fill(summary, width=79, initial_indent=f"  {name:<10} ", subsequent_indent=" " * 13))
+    return "\n".join(lines)
+
+
+def _add_verbose_argument(parser: argparse.ArgumentParser) -> None:
     parser.add_argument(
         "-v",
         "--verbose",
@@ -72,9 +268,1006 @@ def build_parser() -> argparse.ArgumentParser:
         help="Increase verbosity level (use -v, -vv, etc.).",
     )
 
+
+def _setup_verbosity(verbose: int) -> None:
+    # Configure logging based on -v level
+    if verbose >= 2:
+        level = "DEBUG"
+    elif verbose == 1:
+        level = "INFO"
+    else:
+        level = "WARNING"
+
+    setup_logging(level)
+
+
+# ---------------------------------------------------------------------------
+# batch
+# ---------------------------------------------------------------------------
+def build_batch_parser() -> argparse.ArgumentParser:
+    """
+    Build the parser for `template_automation batch`.
+
+    Returns:
+        argparse.ArgumentParser: Parser with `--root`, `--since` and `-v`.
+    """
+    parser = argparse.ArgumentParser(
+        prog="template_automation batch",
+        description=(
+            "Apply each integration's output/deploy*.json master over its playbooks. "
+            "With --since, only the playbooks affected by the changes since that git "
+            "ref (and the ones depending on them) are processed."
+        ),
+    )
+
+    parser.add_argument(
+        "--root",
+        dest="root",
+        type=Path,
+        default=Path.cwd(),
+        help="Any path inside the repository (default: current directory).",
+    )
+
+    parser.add_argument(
+        "--since",
+        dest="since",
+        default=None,
+        metavar="REF",
+        help="Git revision to diff against (e.g. origin/main, HEAD~1).",
+    )
+
+    _add_verbose_argument(parser)
+
     return parser
 
 
+def _run_batch_command(args: argparse.Namespace) -> int:
+    try:
+        processed = run_batch(args.root, since=args.since)
+    except (NotADirectoryError, RuntimeError) as exc:
+        logger.error("%s", exc)
+        return 1
+
+    for name, deployments in processed.items():
+        detail = "all" if deployments is None else f"{len(deployments)} deployments"
+        print(f"{name}: {detail}")
+
+    return 0
+
+
+# ---------------------------------------------------------------------------
+# fanout
+# ---------------------------------------------------------------------------
+def build_fanout_parser() -> argparse.ArgumentParser:
+    """
+    Build the parser for `template_automation fanout`.
+
+    Returns:
+        argparse.ArgumentParser: Parser with master, input/output directories,
+        `--clients`, `--workers` and `-v`.
+    """
+    parser = argparse.ArgumentParser(
+        prog="template_automation fanout",
+        description=(
+            "Transform a pack once and write one output tree per client, "
+            "overriding the master parameter defaults with the values in a CSV."
+        ),
+    )
+
+    parser.add_argument(
+        "-master",
+        "-m",
+        dest="master_path",
+        type=Path,
+        required=True,
+        help="Path to the master template JSON file (e.g., deploy.json).",
+    )
+
+    parser.add_argument(
+        "-dirin",
+        "-i",
+        dest="dir_in",
+        type=Path,
+        required=True,
+        help="Input directory containing the playbooks to process.",
+    )
+
+    parser.add_argument(
+        "-dirout",
+        "-o",
+        dest="dir_out",
+        type=Path,
+        required=True,
+        help="Output directory; one <client_Name>/ folder is created per client.",
+    )
+
+    parser.add_argument(
+        "--clients",
+        dest="clients_csv",
+        type=Path,
+        required=True,
+        help="CSV with a client_Name column plus one column per master parameter to override.",
+    )
+
+    parser.add_argument(
+        "--workers",
+        dest="workers",
+        type=int,
+        default=None,
+        help="Number of parallel writer threads (default: automatic).",
+    )
+
+    _add_verbose_argument(parser)
+
+    return parser
+
+
+def _run_fanout_command(args: argparse.Namespace) -> int:
+    try:
+        client_dirs = run_fanout(
+            master_path=args.master_path,
+            dir_in=args.dir_in,
+            dir_out=args.dir_out,
+            clients_csv=args.clients_csv,
+            workers=args.workers,
+        )
+    except (FileNotFoundError, ValueError) as exc:
+        logger.error("%s", exc)
+        return 1
+
+    for client_dir in client_dirs:
+        print(client_dir)
+
+    return 0
+
+
+# ---------------------------------------------------------------------------
+# params
+# ---------------------------------------------------------------------------
+def build_params_parser() -> argparse.ArgumentParser:
+    """
+    Build the parser for `template_automation params`.
+
+    Returns:
+        argparse.ArgumentParser: Parser with master, `--rows`, output directory and `-v`.
+    """
+    parser = argparse.ArgumentParser(
+        prog="template_automation params",
+        description=(
+            "Generate one ARM parameter file per client from a CSV or NDJSON file, "
+            "validated against the master template parameters."
+        ),
+    )
+
+    parser.add_argument(
+        "-master",
+        "-m",
+        dest="master_path",
+        type=Path,
+        required=True,
+        help="Path to the master template JSON file (e.g., deploy.json).",
+    )
+
+    parser.add_argument(
+        "--rows",
+        dest="rows_path",
+        type=Path,
+        required=True,
+        help="CSV, .ndjson or .jsonl file with a client_Name key and one key per parameter.",
+    )
+
+    parser.add_argument(
+        "-dirout",
+        "-o",
+        dest="dir_out",
+        type=Path,
+        required=True,
+        help="Output directory for <master>.parameters.<client_Name>.json files.",
+    )
+
+    _add_verbose_argument(parser)
+
+    return parser
+
+
+def _run_params_command(args: argparse.Namespace) -> int:
+    written = failed = 0
+
+    try:
+        for result in generate_parameter_files(args.master_path, args.rows_path, args.dir_out):
+            label = f"line {result.line} ({result.client or '?'})"
+            if result.ok:
+                written += 1
+                print(result.path)
+            else:
+                failed += 1
+                print(f"{label}: FAILED", file=sys.stderr)
+            if result.missing:
+                print(f"{label}: missing {', '.join(result.missing)}", file=sys.stderr)
+            if result.extra:
+                print(f"{label}: extra (ignored) {', '.join(result.extra)}", file=sys.stderr)
+            for error in result.errors:
+                print(f"{label}: {error}", file=sys.stderr)
+    except (FileNotFoundError, ValueError) as exc:
+        logger.error("%s", exc)
+        return 1
+
+    print(f"{written} parameter files written, {failed} rows failed.", file=sys.stderr)
+    return 1 if failed else 0
+
+
+# ---------------------------------------------------------------------------
+# diff
+# ---------------------------------------------------------------------------
+def build_diff_parser() -> argparse.ArgumentParser:
+    """
+    Build the parser for `template_automation diff`.
+
+    Returns:
+        argparse.ArgumentParser: Parser with the two output folders, `--trimmed` and `-v`.
+    """
+    parser = argparse.ArgumentParser(
+        prog="template_automation diff",
+        description=(
+            "Compare two output folders structurally and list the deployments that "
+            "must be redeployed. Optionally write a master with only those deployments."
+        ),
+    )
+
+    parser.add_argument("old_out", type=Path, help="Previous output folder.")
+    parser.add_argument("new_out", type=Path, help="Rebuilt output folder.")
+
+    parser.add_argument(
+        "--trimmed",
+        dest="trimmed_path",
+        type=Path,
+        default=None,
+        help="Where to write the trimmed master (e.g. redeploy.json). Not written if omitted.",
+    )
+
+    _add_verbose_argument(parser)
+
+    return parser
+
+
+def _run_diff_command(args: argparse.Namespace) -> int:
+    try:
+        result = diff_outputs(args.old_out, args.new_out)
+    except (NotADirectoryError, FileNotFoundError, ValueError) as exc:
+        logger.error("%s", exc)
+        return 1
+
+    for name in result.changed:
+        print(f"{name}: {', '.join(result.reasons[name])}")
+    for name in result.removed:
+        print(f"{name}: removed")
+
+    if not result.changed:
+        print("No deployments changed.", file=sys.stderr)
+        return 0
+
+    if args.trimmed_path is not None and result.trimmed_master is not None:
+        written = write_serialized(
+            args.trimmed_path.parent,
+            args.trimmed_path.name,
+            serialize_playbook(result.trimmed_master).encode("utf-8"),
+        )
+        print(f"Trimmed master: {written}", file=sys.stderr)
+
+    return 0
+
+
+# ---------------------------------------------------------------------------
+# evaluate
+# ---------------------------------------------------------------------------
+def build_evaluate_parser() -> argparse.ArgumentParser:
+    """
+    Build the parser for `template_automation evaluate`.
+
+    Returns:
+        argparse.ArgumentParser: Parser with master, output folder, parameter
+        values and `-v`.
+    """
+    parser = argparse.ArgumentParser(
+        prog="template_automation evaluate",
+        description=(
+            "Resolve every ARM expression of a master (and of the playbooks in its "
+            "output folder) offline for a given parameter set, and report failures."
+        ),
+    )
+
+    parser.add_argument(
+        "-master",
+        "-m",
+        dest="master_path",
+        type=Path,
+        required=True,
+        help="Path to the master template JSON file (e.g., output/deploy.json).",
+    )
+
+    parser.add_argument(
+        "-dirout",
+        "-o",
+        dest="output_dir",
+        type=Path,
+        default=None,
+        help="Folder with the transformed playbooks linked by the master (optional).",
+    )
+
+    parser.add_argument(
+        "--parameters",
+        dest="parameters_file",
+        type=Path,
+        default=None,
+        help="ARM parameter file with the master parameter values.",
+    )
+
+    parser.add_argument(
+        "--set",
+        dest="overrides",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="Master parameter value (repeatable); converted to the declared type.",
+    )
+
+    _add_verbose_argument(parser)
+
+    return parser
+
+
+def _run_evaluate_command(args: argparse.Namespace) -> int:
+    try:
+        values = load_parameter_values(args.parameters_file) if args.parameters_file else {}
+
+        if args.overrides:
+            declarations = load_master_template(args.master_path).get("parameters", {})
+            for item in args.overrides:
+                name, sep, raw = item.partition("=")
+                if not sep:
+                    raise ValueError(f'--set expects NAME=VALUE, got "{item}".')
+                declared = declarations.get(name)
+                declared_type = declared.get("type", "string") if isinstance(declared, dict) else "string"
+                values[name] = coerce_parameter_value(raw, declared_type)
+
+        reports = evaluate_pack(args.master_path, values, args.output_dir)
+    except (FileNotFoundError, NotADirectoryError, ValueError) as exc:
+        logger.error("%s", exc)
+        return 1
+
+    failed = 0
+    for report in reports:
+        print(f"{report.source}: {report.resolved} resolved, {len(report.failures)} failed")
+        for failure in report.failures:
+            print(f"  {failure.path}: {failure.message}\n    {failure.expression}")
+        failed += len(report.failures)
+
+    return 1 if failed else 0
+
+
+# ---------------------------------------------------------------------------
+# check
+# ---------------------------------------------------------------------------
+def build_check_parser() -> argparse.ArgumentParser:
+    """
+    Build the parser for `template_automation check`.
+
+    Returns:
+        argparse.ArgumentParser: Parser with one or more output folders and `-v`.
+    """
+    parser = argparse.ArgumentParser(
+        prog="template_automation check",
+        description=(
+            "Check the references of a master and its linked playbooks: undeclared "
+            "parameters/variables, dangling dependsOn, duplicate names and deployment "
+            "parameters that do not match the playbook."
+        ),
+    )
+
+    parser.add_argument(
+        "output_dirs",
+        type=Path,
+        nargs="+",
+        metavar="OUT",
+        help="Output folder with the master (deploy*.json) and the transformed playbooks.",
+    )
+
+    _add_verbose_argument(parser)
+
+    return parser
+
+
+def _run_check_command(args: argparse.Namespace) -> int:
+    failed = 0
+    for output_dir in args.output_dirs:
+        try:
+            issues = check_pack(output_dir)
+        except (FileNotFoundError, NotADirectoryError, ValueError) as exc:
+            logger.error("%s", exc)
+            failed += 1
+            continue
+
+        print(f"{output_dir}: {len(issues)} issue(s)")
+        for issue in issues:
+            print(f"  {issue.source} {issue.path} [{issue.code}] {issue.message}")
+        failed += len(issues)
+
+    return 1 if failed else 0
+
+
+# ---------------------------------------------------------------------------
+# stats
+# ---------------------------------------------------------------------------
+def build_stats_parser() -> argparse.ArgumentParser:
+    """
+    Build the parser for `template_automation stats`.
+
+    Returns:
+        argparse.ArgumentParser: Parser with output folders, JSON export,
+        warning ratio and `-v`.
+    """
+    parser = argparse.ArgumentParser(
+        prog="template_automation stats",
+        description=(
+            "Report size and count figures of a master and its playbooks against "
+            "ARM and Logic Apps limits."
+        ),
+    )
+
+    parser.add_argument(
+        "output_dirs",
+        type=Path,
+        nargs="+",
+        metavar="OUT",
+        help="Output folder with the master (deploy*.json) and the transformed playbooks.",
+    )
+
+    parser.add_argument(
+        "--json",
+        dest="json_path",
+        type=Path,
+        default=None,
+        metavar="PATH",
+        help="Write the report as JSON to PATH ('-' for stdout) instead of the table.",
+    )
+
+    parser.add_argument(
+        "--warn-ratio",
+        dest="warn_ratio",
+        type=float,
+        default=DEFAULT_STATS_WARN_RATIO,
+        help=f"Share of a limit from which a figure is a warning (default: {DEFAULT_STATS_WARN_RATIO}).",
+    )
+
+    _add_verbose_argument(parser)
+
+    return parser
+
+
+def _print_stats(stats: List[DocumentStats], warn_ratio: float) -> None:
+    for doc_stats in stats:
+        print(f"{doc_stats.pack}/{doc_stats.source} ({doc_stats.kind})")
+        for name, entry in doc_stats.budget(warn_ratio).items():
+            if entry["limit"] is None:
+                print(f"  {name:<20} {entry['value']:>10}")
+                continue
+            flag = "" if entry["status"] == OK else f"  {entry['status'].upper()}"
+            print(f"  {name:<20} {entry['value']:>10} / {entry['limit']:<10} {entry['ratio']:>6.1%}{flag}")
+
+
+def _write_stats_json(stats: List[DocumentStats], warn_ratio: float, path: Path) -> None:
+    payload = json.dumps(stats_to_json(stats, warn_ratio), indent=2, ensure_ascii=False)
+    if str(path) == "-":
+        print(payload)
+    else:
+        write_serialized(path.parent, path.name, payload.encode("utf-8"))
+
+
+def _stats_exceeded(stats: List[DocumentStats], warn_ratio: float) -> bool:
+    return any(
+        entry["status"] == EXCEEDED
+        for doc_stats in stats
+        for entry in doc_stats.budget(warn_ratio).values()
+    )
+
+
+def _run_stats_command(args: argparse.Namespace) -> int:
+    stats: List[DocumentStats] = []
+    try:
+        for output_dir in args.output_dirs:
+            stats.extend(output_stats(output_dir))
+    except (FileNotFoundError, NotADirectoryError, ValueError) as exc:
+        logger.error("%s", exc)
+        return 1
+
+    if args.json_path is not None:
+        _write_stats_json(stats, args.warn_ratio, args.json_path)
+    else:
+        _print_stats(stats, args.warn_ratio)
+
+    for doc_stats in stats:
+        for name, entry in doc_stats.budget(args.warn_ratio).items():
+            if entry["status"] != OK:
+                logger.warning(
+                    "%s: %s = %d (%.0f%% del límite %d)",
+                    doc_stats.source, name, entry["value"], entry["ratio"] * 100, entry["limit"],
+                )
+
+    return 1 if _stats_exceeded(stats, args.warn_ratio) else 0
+
+
+# ---------------------------------------------------------------------------
+# foreach
+# ---------------------------------------------------------------------------
+def build_foreach_parser() -> argparse.ArgumentParser:
+    """
+    Build the parser for `template_automation foreach`.
+
+    Returns:
+        argparse.ArgumentParser: Parser with one or more output folders and `-v`.
+    """
+    parser = argparse.ArgumentParser(
+        prog="template_automation foreach",
+        description=(
+            "Classify the Foreach loops of the playbooks linked by a master: current "
+            "concurrency and whether their iterations can safely run in parallel."
+        ),
+    )
+
+    parser.add_argument(
+        "output_dirs",
+        type=Path,
+        nargs="+",
+        metavar="OUT",
+        help="Output folder with the master (deploy*.json) and the transformed playbooks.",
+    )
+
+    _add_verbose_argument(parser)
+
+    return parser
+
+
+def _print_foreach_findings(findings: List[ForeachFinding]) -> None:
+    for finding in findings:
+        mode = finding.mode if finding.repetitions is None else f"{finding.mode} ({finding.repetitions})"
+        flags = ["safe" if finding.safe else "UNSAFE"]
+        if finding.order_sensitive:
+            flags.append("order-sensitive")
+        if finding.collectable and not finding.collected:
+            flags.append("appends can be collected in input order")
+        if finding.collected:
+            flags.append("appends collected in input order")
+        if finding.rewritten:
+            flags.append("concurrency from foreach_Concurrency")
+        if finding.pinned:
+            flags.append("pinned to 1 iteration at a time")
+        print(f"{finding.source} {finding.name}: {mode}, {', '.join(flags)}")
+        for reason in finding.reasons:
+            print(f"  - {reason}")
+
+
+def _run_foreach_command(args: argparse.Namespace) -> int:
+    findings: List[ForeachFinding] = []
+    try:
+        for output_dir in args.output_dirs:
+            master = load_master_template(find_master(output_dir))
+            for _, path in linked_playbooks(output_dir, master):
+                findings.extend(analyze_document(PlaybookDocument(load_playbook(path)), path.name))
+    except (FileNotFoundError, NotADirectoryError, ValueError) as exc:
+        logger.error("%s", exc)
+        return 1
+
+    _print_foreach_findings(findings)
+    print(
+        f"{len(findings)} Foreach loops: "
+        f"{sum(1 for f in findings if f.safe and f.mode == 'sequential')} sequential but safe to parallelize, "
+        f"{sum(1 for f in findings if f.collectable and f.mode != 'sequential')} order-sensitive that "
+        f"--foreach-concurrency collects in input order, "
+        f"{sum(1 for f in findings if not f.safe and not f.collectable and f.mode != 'sequential')} unsafe but "
+        f"running in parallel (pinned to 1 by --foreach-concurrency)."
+    )
+    return 0
+
+
+# ---------------------------------------------------------------------------
+# calls
+# ---------------------------------------------------------------------------
+def build_calls_parser() -> argparse.ArgumentParser:
+    """
+    Build the parser for `template_automation calls`.
+
+    Returns:
+        argparse.ArgumentParser: Parser with one or more output folders and `-v`.
+    """
+    parser = argparse.ArgumentParser(
+        prog="template_automation calls",
+        description=(
+            "Build the call graph of the playbooks linked by a master (Workflow actions) "
+            "and report, per trigger, the nested child runs, the depth of the call "
+            "chains and the children called more than once per run."
+        ),
+    )
+
+    parser.add_argument(
+        "output_dirs",
+        type=Path,
+        nargs="+",
+        metavar="OUT",
+        help="Output folder with the master (deploy*.json) and the transformed playbooks.",
+    )
+
+    _add_verbose_argument(parser)
+
+    return parser
+
+
+def _print_call_graph(graph: CallGraph) -> None:
+    for summary in graph.summaries():
+        if not summary.invocations and not summary.unresolved:
+            continue
+        trigger = f" [{summary.trigger}]" if summary.trigger else ""
+        print(
+            f"{summary.playbook}{trigger}: {summary.direct} direct call(s), "
+            f"{summary.invocations} nested run(s) ({summary.per_item} per item, "
+            f"{summary.conditional} conditional), depth {summary.depth}"
+            + (", CYCLE" if summary.cycle else "")
+        )
+        for child, count in summary.repeated.items():
+            print(f"  - repeated: {child} x{count}" + (" (in a loop)" if count == 1 else ""))
+        for target in summary.unresolved:
+            print(f"  - unresolved: {target}")
+
+    for child, callers in graph.callers().items():
+        if len(callers) > 1:
+            print(f"{child} <- {len(callers)} call sites: {', '.join(sorted(set(callers)))}")
+
+
+def _run_calls_command(args: argparse.Namespace) -> int:
+    try:
+        graphs = [output_call_graph(output_dir) for output_dir in args.output_dirs]
+    except (FileNotFoundError, NotADirectoryError, ValueError) as exc:
+        logger.error("%s", exc)
+        return 1
+
+    for output_dir, graph in zip(args.output_dirs, graphs):
+        print(f"{output_dir}:")
+        _print_call_graph(graph)
+    return 0
+
+
+# ---------------------------------------------------------------------------
+# branches
+# ---------------------------------------------------------------------------
+def build_branches_parser() -> argparse.ArgumentParser:
+    """
+    Build the parser for `template_automation branches`.
+
+    Returns:
+        argparse.ArgumentParser: Parser with one or more output folders and `-v`.
+    """
+    parser = argparse.ArgumentParser(
+        prog="template_automation branches",
+        description=(
+            "Compare the runAfter chains of the playbooks linked by a master with their "
+            "data dependencies and report the critical path before and after running "
+            "the independent actions as parallel branches (files are not modified; "
+            "use --parallel-branches when building)."
+        ),
+    )
+
+    parser.add_argument(
+        "output_dirs",
+        type=Path,
+        nargs="+",
+        metavar="OUT",
+        help="Output folder with the master (deploy*.json) and the transformed playbooks.",
+    )
+
+    _add_verbose_argument(parser)
+
+    return parser
+
+
+def _print_branch_reports(reports: List[BranchReport]) -> None:
+    for report in reports:
+        if not report.scopes and not report.skipped:
+            continue
+        print(f"{report.source}: critical path {report.before} -> {report.after} actions")
+        for path, changed in report.scopes.items():
+            print(f"  - {path}: {', '.join(changed)}")
+        for path, reason in report.skipped.items():
+            print(f"  - {path}: unchanged ({reason})")
+    before = sum(report.before for report in reports)
+    after = sum(report.after for report in reports)
+    print(
+        f"Parallel branches: {sum(1 for report in reports if report.scopes)} playbook(s) rewritten, "
+        f"critical path {before} -> {after} actions in total."
+    )
+
+
+def _run_branches_command(args: argparse.Namespace) -> int:
+    reports: List[BranchReport] = []
+    try:
+        for output_dir in args.output_dirs:
+            master = load_master_template(find_master(output_dir))
+            for _, path in linked_playbooks(output_dir, master):
+                reports.append(parallelize_independent_actions(PlaybookDocument(load_playbook(path)), path.name))
+    except (FileNotFoundError, NotADirectoryError, ValueError) as exc:
+        logger.error("%s", exc)
+        return 1
+
+    _print_branch_reports(reports)
+    return 0
+
+
+# ---------------------------------------------------------------------------
+# cost
+# ---------------------------------------------------------------------------
+def _cardinality(text: str) -> Tuple[str, Range]:
+    name, sep, value = text.partition("=")
+    if not sep or not name:
+        raise argparse.ArgumentTypeError(f"Expected NAME=MIN:EXPECTED:MAX, got {text!r}.")
+    try:
+        return name, Range.parse(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc)) from exc
+
+
+def _range(text: str) -> Range:
+    try:
+        return Range.parse(text)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc)) from exc
+
+
+def build_cost_parser() -> argparse.ArgumentParser:
+    """
+    Build the parser for `template_automation cost`.
+
+    Returns:
+        argparse.ArgumentParser: Parser with output folders, cardinalities,
+        prices and `-v`.
+    """
+    parser = argparse.ArgumentParser(
+        prog="template_automation cost",
+        description=(
+            "Estimate the actions executed (and billed) per run of every playbook linked by "
+            "a master: Foreach items, Until iterations, If/Switch branches and child workflow "
+            "runs, as min / expected / max per playbook and per pack."
+        ),
+    )
+
+    parser.add_argument(
+        "output_dirs",
+        type=Path,
+        nargs="+",
+        metavar="OUT",
+        help="Output folder with the master (deploy*.json) and the transformed playbooks.",
+    )
+
+    parser.add_argument(
+        "--items",
+        type=_range,
+        default=Range(1, 1, 1),
+        metavar="MIN:EXPECTED:MAX",
+        help="Items of the Foreach loops without --cardinality (default: 1).",
+    )
+
+    parser.add_argument(
+        "--cardinality",
+        dest="cardinalities",
+        type=_cardinality,
+        action="append",
+        default=[],
+        metavar="LOOP=MIN:EXPECTED:MAX",
+        help="Items of the Foreach loops whose name matches LOOP (glob, e.g. 'For_each_Indicator*=1:3:20'). Repeatable.",
+    )
+
+    parser.add_argument(
+        "--until-iterations",
+        dest="until_iterations",
+        type=int,
+        default=DEFAULT_UNTIL_ITERATIONS,
+        metavar="N",
+        help=f"Expected iterations of an Until loop (default: {DEFAULT_UNTIL_ITERATIONS}).",
+    )
+
+    parser.add_argument(
+        "--branch-probability",
+        dest="branch_probability",
+        type=float,
+        default=DEFAULT_BRANCH_PROBABILITY,
+        metavar="P",
+        help=f"Expected share of runs taking the true branch of an If (default: {DEFAULT_BRANCH_PROBABILITY}).",
+    )
+
+    parser.add_argument(
+        "--builtin-price",
+        dest="builtin_price",
+        type=float,
+        default=DEFAULT_BUILTIN_ACTION_PRICE,
+        metavar="USD",
+        help=f"Price of a built-in action execution (default: {DEFAULT_BUILTIN_ACTION_PRICE}).",
+    )
+
+    parser.add_argument(
+        "--connector-price",
+        dest="connector_price",
+        type=float,
+        default=DEFAULT_CONNECTOR_ACTION_PRICE,
+        metavar="USD",
+        help=f"Price of a standard connector execution (default: {DEFAULT_CONNECTOR_ACTION_PRICE}).",
+    )
+
+    _add_verbose_argument(parser)
+
+    return parser
+
+
+def _format_range(value: Range, digits: int = 0) -> str:
+    return f"{value.min:.{digits}f} / {value.expected:.{digits}f} / {value.max:.{digits}f}"
+
+
+def _print_cost(pack: PackCost, builtin_price: float, connector_price: float) -> None:
+    print("  playbook: actions (built-in + connector), child runs, USD per run  [min / expected / max]")
+    for cost in pack.playbooks:
+        entry = "" if cost.playbook in pack.entry_points else "  (child)"
+        print(f"{cost.playbook}{entry}")
+        print(
+            f"  actions {_format_range(cost.actions.total, 1)} "
+            f"({_format_range(cost.actions.builtin, 1)} + {_format_range(cost.actions.connector, 1)})"
+        )
+        print(
+            f"  child runs {_format_range(cost.actions.runs, 1)}, "
+            f"USD {_format_range(cost.actions.cost(builtin_price, connector_price), 6)}"
+        )
+        for note in cost.notes:
+            print(f"  - {note}")
+    print(
+        f"Pack ({len(pack.entry_points)} entry point(s), one run each): "
+        f"actions {_format_range(pack.actions.total, 1)}, "
+        f"USD {_format_range(pack.actions.cost(builtin_price, connector_price), 6)}"
+    )
+
+
+def _run_cost_command(args: argparse.Namespace) -> int:
+    if not 0 <= args.branch_probability <= 1:
+        logger.error("--branch-probability debe estar entre 0 y 1.")
+        return 1
+    cardinalities = Cardinalities(
+        items=args.items,
+        loops=dict(args.cardinalities),
+        until_iterations=args.until_iterations,
+        branch_probability=args.branch_probability,
+    )
+    try:
+        packs = [output_cost(output_dir, cardinalities) for output_dir in args.output_dirs]
+    except (FileNotFoundError, NotADirectoryError, ValueError) as exc:
+        logger.error("%s", exc)
+        return 1
+
+    for output_dir, pack in zip(args.output_dirs, packs):
+        print(f"{output_dir}:")
+        _print_cost(pack, args.builtin_price, args.connector_price)
+    return 0
+
+
+# ---------------------------------------------------------------------------
+# latency
+# ---------------------------------------------------------------------------
+def build_latency_parser() -> argparse.ArgumentParser:
+    """
+    Build the parser for `template_automation latency`.
+
+    Returns:
+        argparse.ArgumentParser: Parser with output folders, SLA, request
+        timeout, Foreach items and `-v`.
+    """
+    parser = argparse.ArgumentParser(
+        prog="template_automation latency",
+        description=(
+            "Static worst-case latency of the playbooks linked by a master: bound of every "
+            "Until/Wait polling loop, propagated through runAfter chains and child workflow "
+            "calls. Loops above the SLA are flagged (exit code 1)."
+        ),
+    )
+
+    parser.add_argument(
+        "output_dirs",
+        type=Path,
+        nargs="+",
+        metavar="OUT",
+        help="Output folder with the master (deploy*.json) and the transformed playbooks.",
+    )
+
+    parser.add_argument(
+        "--sla",
+        type=float,
+        default=DEFAULT_LATENCY_SLA,
+        metavar="SECONDS",
+        help=f"Worst case above which a loop or a playbook is flagged (default: {DEFAULT_LATENCY_SLA}).",
+    )
+
+    parser.add_argument(
+        "--action-seconds",
+        dest="action_seconds",
+        type=float,
+        default=DEFAULT_ACTION_SECONDS,
+        metavar="SECONDS",
+        help=(
+            "Worst case of one request (Http, ApiConnection...) without limit.timeout "
+            f"(default: {DEFAULT_ACTION_SECONDS})."
+        ),
+    )
+
+    parser.add_argument(
+        "--items",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Items assumed for every Foreach loop (default: 1).",
+    )
+
+    _add_verbose_argument(parser)
+
+    return parser
+
+
+def _print_latency(results: List[PlaybookLatency]) -> None:
+    for result in results:
+        flag = "  OVER SLA" if result.exceeds_sla else ""
+        print(f"{result.playbook}: {format_seconds(result.seconds)}{flag}")
+        print(f"  critical path: {' -> '.join(result.critical_path)}")
+        for loop in result.loops:
+            flag = "  OVER SLA" if loop.exceeds_sla else ""
+            print(
+                f"  - {loop.name}: {format_seconds(loop.seconds)} (by {loop.limited_by}: "
+                f"{loop.count} x {format_seconds(loop.iteration)}, timeout {format_seconds(loop.timeout)}, "
+                f"wait {format_seconds(loop.wait)}/iteration){flag}"
+            )
+            for note in loop.notes:
+                print(f"      {note}")
+        for note in result.notes:
+            print(f"  - {note}")
+
+
+def _run_latency_command(args: argparse.Namespace) -> int:
+    try:
+        reports = [
+            output_latency(output_dir, args.sla, args.action_seconds, args.items)
+            for output_dir in args.output_dirs
+        ]
+    except (FileNotFoundError, NotADirectoryError, ValueError) as exc:
+        logger.error("%s", exc)
+        return 1
+
+    flagged = 0
+    for output_dir, results in zip(args.output_dirs, reports):
+        print(f"{output_dir}:")
+        _print_latency(results)
+        flagged += sum(loop.exceeds_sla for result in results for loop in result.loops)
+
+    print(f"{flagged} Until loop(s) above the SLA of {format_seconds(args.sla)}.")
+    return 1 if flagged else 0
+
+
+# Subcommands: name -> (parser builder, runner)
+COMMANDS: Dict[str, Tuple[Callable[[], argparse.ArgumentParser], Callable[[argparse.Namespace], int]]] = {
+    "batch": (build_batch_parser, _run_batch_command),
+    "fanout": (build_fanout_parser, _run_fanout_command),
+    "params": (build_params_parser, _run_params_command),
+    "diff": (build_diff_parser, _run_diff_command),
+    "evaluate": (build_evaluate_parser, _run_evaluate_command),
+    "check": (build_check_parser, _run_check_command),
+    "stats": (build_stats_parser, _run_stats_command),
+    "foreach": (build_foreach_parser, _run_foreach_command),
+    "calls": (build_calls_parser, _run_calls_command),
+    "branches": (build_branches_parser, _run_branches_command),
+    "latency": (build_latency_parser, _run_latency_command),
+    "cost": (build_cost_parser, _run_cost_command),
+}
+
+
 def main(argv: list[str] | None = None) -> int:
     """
     Main entry point for the CLI.
@@ -87,27 +1280,99 @@ def main(argv: list[str] | None = None) -> int:
         int: Exit code (0 for success).
 
     Notes:
-        - Configures logging according to the verbosity level.
-        - Executes the main automation pipeline by calling `run_automation`.
+        - If the first argument is a name in `COMMANDS`, that subcommand is run.
+        - Otherwise, configures logging according to the verbosity level and
+          executes the main automation pipeline by calling `run_automation`.
     """
+    argv = list(sys.argv[1:] if argv is None else argv)
+
+    if argv and argv[0] in COMMANDS:
+        build_command_parser, run_command = COMMANDS[argv[0]]
+        args = build_command_parser().parse_args(argv[1:])
+        _setup_verbosity(args.verbose)
+        return run_command(args)
+
     parser = build_parser()
     args = parser.parse_args(argv)
 
-    # Configure logging based on -v level
-    if args.verbose >= 2:
-        level = "DEBUG"
-    elif args.verbose == 1:
-        level = "INFO"
-    else:
-        level = "WARNING"
+    _setup_verbosity(args.verbose)
 
-    setup_logging(level)
+    repo_index = None
+    if args.repo_index:
+        repo_index = open_repo_index(args.dir_in)
+        if repo_index is None:
+            logger.warning("%s no está dentro de un repositorio git indexable; se ignora --repo-index.", args.dir_in)
 
     # Run main automation pipeline
-    run_automation(
+    pack = run_automation(
         master_path=args.master_path,
         dir_in=args.dir_in,
         dir_out=args.dir_out,
+        repo_index=repo_index,
+        hoist_threshold=args.hoist_threshold,
+        minify=args.minify,
+        compact=args.compact,
+        shared_connections=args.shared_connections,
+        foreach_concurrency=args.foreach_concurrency,
+        foreach_allow_reorder=args.foreach_allow_reorder,
+        auth_cache_ttl=args.auth_cache_ttl,
+        retry_profile=RetryProfile() if args.normalize_retries else None,
+        parallel_branches=args.parallel_branches,
+        call_graph=args.call_graph,
     )
 
+    if pack is not None and pack.auth_cache_report is not None:
+        report = pack.auth_cache_report
+        for caller, auth in report.callers.items():
+            print(f"Auth token cache: {caller} -> {auth}")
+        for site, reason in report.skipped.items():
+            print(f"Auth token cache: {site} unchanged ({reason})")
+        print(
+            f"Auth token cache: {len(report.callers)} caller(s) rewired, "
+            f"{report.access_policies} identity(ies) granted access to the vault."
+        )
+
+    if pack is not None and pack.retry_report is not None:
+        report = pack.retry_report
+        for change in report.changed:
+            added = [label for label, done in (("retryPolicy", change.retry_policy), ("timeout", change.timeout)) if done]
+            print(f"Retry profile: {change.source} {change.name} ({change.action_type}): {' + '.join(added)}")
+        print(
+            f"Retry profile: {len(report.changed)} of {report.requests} request action(s) changed, "
+            f"{report.declared} already declared their own, {report.timeout_handled} kept the platform "
+            f"timeout because an action runs after them on TimedOut."
+        )
+
+    if pack is not None and pack.branch_reports:
+        _print_branch_reports(pack.branch_reports)
+
+    if pack is not None and pack.call_graph is not None:
+        _print_call_graph(pack.call_graph)
+
+    if pack is not None and pack.foreach_findings:
+        _print_foreach_findings(pack.foreach_findings)
+
+    if pack is not None and pack.connections_report is not None:
+        report = pack.connections_report
+        print(
+            f"Shared connections: {report.removed_resources} connection resources removed from playbooks, "
+            f"{report.added_resources} deployed by the master."
+        )
+
+    if pack is not None and pack.hoist_reports:
+        for report in pack.hoist_reports:
+            if report.variables:
+                print(f"{report.source}: {len(report.variables)} variables, {report.bytes_saved} bytes saved")
+        total = sum(report.bytes_saved for report in pack.hoist_reports)
+        print(f"Hoisted expressions: {total} bytes saved in total.")
+
+    if pack is not None and pack.minify_reports:
+        for report in pack.minify_reports:
+            print(f"{report.source}: {report.removed} fields removed, {report.bytes_saved} bytes saved")
+        total = sum(report.bytes_saved for report in pack.minify_reports)
+        print(f"Minify: {total} bytes saved in total.")
+
+    if pack is not None and args.stats_json is not None:
+        _write_stats_json(pack_stats(pack, args.dir_out), DEFAULT_STATS_WARN_RATIO, args.stats_json)
+
     return 0
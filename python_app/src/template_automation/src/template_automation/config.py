@@ -5,11 +5,52 @@ Constants:
 - JSON_EXTENSION (str): File extension to process (default: ".json").
 - DEFAULT_OUTPUT_DIR_NAME (str): Default subdirectory name for output (default: "out").
 - PROJECT_ROOT (Path): Project root directory, assuming a `src/` layout.
+- DISCOVERY_EXCLUDE_DIRS (Tuple[str, ...]): Directory-name globs skipped while
+  discovering playbooks (previous outputs, dot-directories, caches).
+- DEFAULT_HOIST_THRESHOLD (int): Minimum `len(expression) * occurrences` for an
+  expression to be moved into a generated variable (`--hoist-expressions`).
+- DEFAULT_STATS_WARN_RATIO (float): Share of an ARM/Logic Apps limit from which
+  `template_automation stats` reports a figure as a warning.
+- DEFAULT_FOREACH_CONCURRENCY (int): Default degree of parallelism given to the
+  Foreach loops made concurrent by `--foreach-concurrency`.
+- DEFAULT_AUTH_CACHE_TTL (int): Seconds a token cached by `--cache-auth-tokens`
+  is reused (below the vendors' token lifetime: CrowdStrike 30 min, Sophos 60 min).
+- DEFAULT_LATENCY_SLA (int): Seconds above which `template_automation latency`
+  flags an Until loop or a playbook run.
+- DEFAULT_ACTION_SECONDS (int): Worst case of one outbound request without
+  `limit.timeout` (Logic Apps Consumption request timeout).
+- DEFAULT_RETRY_COUNT, DEFAULT_RETRY_INTERVAL, DEFAULT_RETRY_MAX_INTERVAL,
+  DEFAULT_REQUEST_TIMEOUT: Retry/timeout profile given by `--normalize-retries`
+  to the Http/ApiConnection actions without one (ISO 8601 durations). The
+  timeout defaults to the platform one (DEFAULT_ACTION_SECONDS), so only a
+  pack parameter chosen at deploy time makes it shorter.
+- DEFAULT_UNTIL_ITERATIONS (int): Expected iterations of an Until loop in
+  `template_automation cost`.
+- DEFAULT_BRANCH_PROBABILITY (float): Expected share of runs taking the `actions`
+  branch of an If in `template_automation cost`.
+- DEFAULT_BUILTIN_ACTION_PRICE, DEFAULT_CONNECTOR_ACTION_PRICE (float): Logic Apps
+  Consumption price (USD) per built-in and per standard connector execution.
 """
 from __future__ import annotations
 
 from pathlib import Path
+from typing import Tuple
 
 JSON_EXTENSION: str = ".json"
 DEFAULT_OUTPUT_DIR_NAME: str = "out"
+DISCOVERY_EXCLUDE_DIRS: Tuple[str, ...] = ("output", DEFAULT_OUTPUT_DIR_NAME, ".*", "__pycache__")
+DEFAULT_HOIST_THRESHOLD: int = 200
+DEFAULT_STATS_WARN_RATIO: float = 0.8
+DEFAULT_FOREACH_CONCURRENCY: int = 20
+DEFAULT_AUTH_CACHE_TTL: int = 1500
+DEFAULT_LATENCY_SLA: int = 900
+DEFAULT_ACTION_SECONDS: int = 120
+DEFAULT_RETRY_COUNT: int = 3
+DEFAULT_RETRY_INTERVAL: str = "PT10S"
+DEFAULT_RETRY_MAX_INTERVAL: str = "PT1M"
+DEFAULT_REQUEST_TIMEOUT: str = "PT2M"
+DEFAULT_UNTIL_ITERATIONS: int = 3
+DEFAULT_BRANCH_PROBABILITY: float = 0.5
+DEFAULT_BUILTIN_ACTION_PRICE: float = 0.000025
+DEFAULT_CONNECTOR_ACTION_PRICE: float = 0.000125
 PROJECT_ROOT: Path = Path(__file__).resolve().parents[2]
@@ -0,0 +1,372 @@
+"""
+Token cache for the callers of the `OrchestatorPart_*_Auth_Playbook` workflows.
+
+Every orchestrator calls its Auth playbook (a nested workflow run plus a
+token request to the vendor) on each run. `cache_auth_tokens` rewires each
+caller so the Auth playbook only runs on a cache miss; the response is kept
+as a Key Vault secret whose `exp` attribute is the expiry time:
+
+    Initialize_AuthTokenResponse        (object variable)
+    Get_Cached_Auth_Token               GET secret (managed identity)
+    Check_Cached_Auth_Token             If: found and exp > now
+        hit:  Use_Cached_Auth_Token     AuthTokenResponse = {statusCode 200, body = cached}
+        miss: <Auth Workflow action>
+              Set_Auth_Token_From_Playbook   AuthTokenResponse = outputs(<Auth>)
+              Store_Auth_Token               PUT secret, exp = now + authCache_TTL
+              Store_Auth_Token_Done          runs whatever the PUT returned
+
+`body('<Auth>')` and `outputs('<Auth>')` become reads of the variable and the
+actions that ran after the Auth call run after the If with the same statuses,
+so the error branches still see the Auth playbook's status code and message.
+Writing the cache is best-effort: `Store_Auth_Token_Done` ends the miss branch
+once the PUT finished, even if it failed (vault in RBAC mode, access policy
+not propagated yet, throttling), so the If only fails when the Auth call
+failed (the PUT is then skipped, and so is `Store_Auth_Token_Done`).
+
+The master gets the pack parameters `authCache_VaultName_Pack` (defaults to
+`keyvault_Name_Pack`) and `authCache_TTL_Pack`, and deploys a Key Vault access
+policy giving the callers' managed identities get/set on secrets. The vault
+must be in the resource group of the deployment and use access policies
+(not Azure RBAC).
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .callgraph import build_call_graph
+from .diff import DEPLOYMENT_TYPE
+from .document import PlaybookDocument, WORKFLOW_TYPE
+from .expressions import is_expression
+from ..config import DEFAULT_AUTH_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+RE_AUTH_PLAYBOOK = re.compile(r"OrchestatorPart_.+_Auth_Playbook", re.IGNORECASE)
+
+VAULT_PARAMETER: str = "authCache_VaultName"
+TTL_PARAMETER: str = "authCache_TTL"
+SECRET_PARAMETER: str = "authCache_SecretName"
+VAULT_PACK_PARAMETER: str = "authCache_VaultName_Pack"
+TTL_PACK_PARAMETER: str = "authCache_TTL_Pack"
+ACCESS_POLICY_TYPE: str = "Microsoft.KeyVault/vaults/accessPolicies"
+KEYVAULT_API_VERSION: str = "7.4"
+MIN_AUTH_CACHE_TTL: int = 60
+
+TOKEN_VARIABLE: str = "AuthTokenResponse"
+INIT_ACTION: str = "Initialize_AuthTokenResponse"
+GET_ACTION: str = "Get_Cached_Auth_Token"
+CHECK_ACTION: str = "Check_Cached_Auth_Token"
+USE_ACTION: str = "Use_Cached_Auth_Token"
+SET_ACTION: str = "Set_Auth_Token_From_Playbook"
+STORE_ACTION: str = "Store_Auth_Token"
+STORED_ACTION: str = "Store_Auth_Token_Done"
+
+_UNIX_NOW = "div(sub(ticks(utcNow()), ticks('1970-01-01T00:00:00Z')), 10000000)"
+_SECRET_URI = (
+    f"https://@{{parameters('{VAULT_PARAMETER}')}}.vault.azure.net/secrets/"
+    f"@{{parameters('{SECRET_PARAMETER}')}}?api-version={KEYVAULT_API_VERSION}"
+)
+_MSI_AUTHENTICATION = {"type": "ManagedServiceIdentity", "audience": "https://vault.azure.net"}
+
+
+@dataclass
+class AuthCacheReport:
+    """
+    Result of `cache_auth_tokens`.
+
+    Attributes:
+        callers (Dict[str, str]): Rewired deployments -> Auth playbook they call.
+        skipped (Dict[str, str]): Auth calls left unchanged (`<deployment>.<action>`) -> reason.
+        access_policies (int): Identities granted access to the vault by the master.
+    """
+
+    callers: Dict[str, str] = field(default_factory=dict)
+    skipped: Dict[str, str] = field(default_factory=dict)
+    access_policies: int = 0
+
+
+def _rewrite_strings(obj: Any, pattern: "re.Pattern[str]", replace: Any) -> Any:
+    if isinstance(obj, str):
+        return pattern.sub(replace, obj) if "@" in obj else obj
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            obj[key] = _rewrite_strings(value, pattern, replace)
+    elif isinstance(obj, list):
+        for i, value in enumerate(obj):
+            obj[i] = _rewrite_strings(value, pattern, replace)
+    return obj
+
+
+def _secret_name_expr(doc: PlaybookDocument, auth_name: str) -> str:
+    # Nombre del workflow Auth del cliente (el mismo que usa la llamada), apto para Key Vault
+    externalid = f"workflows_{auth_name}_externalid"
+    for param in doc.root_parameters:
+        if isinstance(param, str) and param.lower() == externalid.lower():
+            return f"[replace(concat('authcache-', parameters('{param}')), '_', '-')]"
+    return "authcache-" + auth_name.replace("_", "-")
+
+
+def _cache_actions(auth_action: str, auth: Dict[str, Any], run_after: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    auth["runAfter"] = {}
+    return {
+        INIT_ACTION: {
+            "runAfter": run_after,
+            "type": "InitializeVariable",
+            "inputs": {"variables": [{"name": TOKEN_VARIABLE, "type": "object", "value": {}}]},
+        },
+        GET_ACTION: {
+            "runAfter": {INIT_ACTION: ["Succeeded"]},
+            "type": "Http",
+            "inputs": {"method": "GET", "uri": _SECRET_URI, "authentication": dict(_MSI_AUTHENTICATION)},
+            "runtimeConfiguration": {"secureData": {"properties": ["outputs"]}},
+        },
+        CHECK_ACTION: {
+            "runAfter": {GET_ACTION: ["Succeeded", "Failed", "TimedOut"]},
+            "type": "If",
+            "expression": {
+                "and": [
+                    {"equals": [f"@outputs('{GET_ACTION}')?['statusCode']", 200]},
+                    {
+                        "greater": [
+                            f"@coalesce(body('{GET_ACTION}')?['attributes']?['exp'], 0)",
+                            f"@{_UNIX_NOW}",
+                        ]
+                    },
+                ]
+            },
+            "actions": {
+                USE_ACTION: {
+                    "runAfter": {},
+                    "type": "SetVariable",
+                    "inputs": {
+                        "name": TOKEN_VARIABLE,
+                        "value": {"statusCode": 200, "body": f"@json(body('{GET_ACTION}')?['value'])"},
+                    },
+                },
+            },
+            "else": {
+                "actions": {
+                    auth_action: auth,
+                    SET_ACTION: {
+                        "runAfter": {auth_action: ["Succeeded", "Failed", "TimedOut"]},
+                        "type": "SetVariable",
+                        "inputs": {"name": TOKEN_VARIABLE, "value": f"@outputs('{auth_action}')"},
+                    },
+                    STORE_ACTION: {
+                        "runAfter": {auth_action: ["Succeeded"]},
+                        "type": "Http",
+                        "inputs": {
+                            "method": "PUT",
+                            "uri": _SECRET_URI,
+                            "authentication": dict(_MSI_AUTHENTICATION),
+                            "body": {
+                                "value": f"@{{string(body('{auth_action}'))}}",
+                                "contentType": "application/json",
+                                "attributes": {"exp": f"@add({_UNIX_NOW}, parameters('{TTL_PARAMETER}'))"},
+                            },
+                        },
+                        "runtimeConfiguration": {"secureData": {"properties": ["inputs"]}},
+                    },
+                    # Sin Skipped: si falla el Auth playbook el If debe seguir fallando
+                    STORED_ACTION: {
+                        "runAfter": {STORE_ACTION: ["Succeeded", "Failed", "TimedOut"]},
+                        "type": "Compose",
+                        "inputs": f"@outputs('{STORE_ACTION}')?['statusCode']",
+                    },
+                },
+            },
+        },
+    }
+
+
+def _rewire_caller(doc: PlaybookDocument, auth_action: str, auth_name: str, ttl: int) -> Optional[str]:
+    """
+    Rewire one caller in place. Returns the reason when it cannot be rewired.
+    """
+    workflows = [res for res in doc.resources if isinstance(res, dict) and res.get("type") == WORKFLOW_TYPE]
+    if len(workflows) != 1:
+        return f"{len(workflows)} workflows in the template"
+    workflow = workflows[0]
+    definition = doc.definition(workflow)
+    actions = definition.get("actions") if definition is not None else None
+    if not isinstance(actions, dict) or auth_action not in actions:
+        return "the Auth call is not a top-level action"
+
+    taken = {INIT_ACTION, GET_ACTION, CHECK_ACTION, USE_ACTION, SET_ACTION, STORE_ACTION, STORED_ACTION} & set(actions)
+    if taken:
+        return f"action names already in use: {', '.join(sorted(taken))}"
+    if VAULT_PARAMETER in doc.root_parameters:
+        return "already rewired"
+
+    auth = actions.pop(auth_action)
+    run_after = auth.get("runAfter") if isinstance(auth.get("runAfter"), dict) else {}
+
+    # Las lecturas de la respuesta pasan a la variable; quien iba detrás de la llamada va detrás del If
+    name = re.escape(auth_action)
+    _rewrite_strings(actions, re.compile(rf"\bbody\('{name}'\)", re.IGNORECASE), f"variables('{TOKEN_VARIABLE}')?['body']")
+    _rewrite_strings(actions, re.compile(rf"\boutputs\('{name}'\)", re.IGNORECASE), f"variables('{TOKEN_VARIABLE}')")
+    for action in actions.values():
+        action_run_after = action.get("runAfter") if isinstance(action, dict) else None
+        if isinstance(action_run_after, dict) and auth_action in action_run_after:
+            action_run_after[CHECK_ACTION] = action_run_after.pop(auth_action)
+
+    actions.update(_cache_actions(auth_action, auth, run_after))
+
+    workflow.setdefault("identity", {"type": "SystemAssigned"})
+    def_params = doc.ensure_definition_parameters(definition)
+    def_params[VAULT_PARAMETER] = {"type": "String", "defaultValue": f"[parameters('{VAULT_PARAMETER}')]"}
+    def_params[SECRET_PARAMETER] = {"type": "String", "defaultValue": _secret_name_expr(doc, auth_name)}
+    def_params[TTL_PARAMETER] = {"type": "Int", "defaultValue": f"[parameters('{TTL_PARAMETER}')]"}
+
+    root_params = doc.ensure_root_parameters()
+    root_params[VAULT_PARAMETER] = {"type": "String"}
+    root_params[TTL_PARAMETER] = {"type": "Int", "defaultValue": ttl, "minValue": MIN_AUTH_CACHE_TTL}
+    return None
+
+
+def _principal_expr(doc: PlaybookDocument, deployment: Dict[str, Any]) -> Optional[str]:
+    """
+    Master expression of the caller's managed identity, from the workflow name
+    the deployment passes to the playbook.
+    """
+    workflow = next(res for res in doc.resources if isinstance(res, dict) and res.get("type") == WORKFLOW_TYPE)
+    match = re.fullmatch(r"\[parameters\('([^']+)'\)\]", str(workflow.get("name", "")))
+    params = (deployment.get("properties") or {}).get("parameters") or {}
+    entry = params.get(match.group(1)) if match else None
+    value = entry.get("value") if isinstance(entry, dict) else None
+    if not isinstance(value, str):
+        return None
+
+    name_expr = value[1:-1] if is_expression(value) else "'" + value.replace("'", "''") + "'"
+    return (
+        f"[reference(resourceId('Microsoft.Logic/workflows', {name_expr}), "
+        f"'2017-07-01', 'Full').identity.principalId]"
+    )
+
+
+def _access_policy_resource(resources: List[Any], name: str) -> Optional[Dict[str, Any]]:
+    for res in resources:
+        if isinstance(res, dict) and res.get("type") == ACCESS_POLICY_TYPE and res.get("name") == name:
+            return res
+    return None
+
+
+def cache_auth_tokens(
+    master_template: Dict[str, Any],
+    playbooks: Iterable[Tuple[str, PlaybookDocument, str]],
+    ttl: int = DEFAULT_AUTH_CACHE_TTL,
+) -> AuthCacheReport:
+    """
+    Make every caller of an `OrchestatorPart_*_Auth_Playbook` reuse a cached
+    token, in place, and add the cache parameters and access policy to the master.
+
+    Args:
+        master_template (Dict[str, Any]): Master of the pack.
+        playbooks (Iterable[Tuple[str, PlaybookDocument, str]]):
+            `(deployment name, playbook, source name)` triples.
+        ttl (int): Default seconds a cached token is reused.
+
+    Returns:
+        AuthCacheReport: Callers rewired and skipped.
+
+    Raises:
+        ValueError: If `ttl` is below 60 seconds.
+    """
+    if ttl < MIN_AUTH_CACHE_TTL:
+        raise ValueError(f"Auth token cache TTL must be at least {MIN_AUTH_CACHE_TTL} seconds, got {ttl}.")
+
+    playbooks = list(playbooks)
+    docs = {name: doc for name, doc, _ in playbooks}
+    graph = build_call_graph(playbooks)
+    deployments = {
+        res.get("name"): res
+        for res in master_template.get("resources", [])
+        if isinstance(res, dict) and res.get("type") == DEPLOYMENT_TYPE
+    }
+
+    report = AuthCacheReport()
+    policies: List[Dict[str, Any]] = []
+    for call in graph.calls():
+        if call.child is None or not RE_AUTH_PLAYBOOK.fullmatch(call.child):
+            continue
+        site = f"{call.caller}.{call.action}"
+        if call.caller in report.callers:
+            report.skipped[site] = "the playbook already uses the cache for another Auth call"
+            continue
+        if call.loops or call.branches:
+            report.skipped[site] = "inside a loop or a branch"
+            continue
+
+        doc = docs[call.caller]
+        reason = _rewire_caller(doc, call.action, call.child, ttl)
+        if reason is not None:
+            report.skipped[site] = reason
+            continue
+        report.callers[call.caller] = call.child
+
+        deployment = deployments.get(call.caller)
+        if deployment is None:
+            continue
+        props = deployment.setdefault("properties", {})
+        params = props.get("parameters")
+        if not isinstance(params, dict):
+            params = {}
+            props["parameters"] = params
+        params[VAULT_PARAMETER] = {"value": f"[parameters('{VAULT_PACK_PARAMETER}')]"}
+        params[TTL_PARAMETER] = {"value": f"[parameters('{TTL_PACK_PARAMETER}')]"}
+
+        principal = _principal_expr(doc, deployment)
+        if principal is None:
+            logger.warning(
+                "No se puede obtener la identidad de %s desde la master; "
+                "hay que darle acceso get/set a los secretos del Key Vault manualmente.",
+                call.caller,
+            )
+            continue
+        policies.append(
+            {
+                "tenantId": "[subscription().tenantId]",
+                "objectId": principal,
+                "permissions": {"secrets": ["get", "set"]},
+            }
+        )
+
+    for name, reason in report.skipped.items():
+        logger.warning("Caché de token: %s no se modifica (%s).", name, reason)
+
+    if not report.callers:
+        logger.info("Ningún playbook llama a un OrchestatorPart_*_Auth_Playbook que se pueda cachear.")
+        return report
+
+    master_params = master_template.get("parameters")
+    if not isinstance(master_params, dict):
+        master_params = {}
+        master_template["parameters"] = master_params
+    vault_param: Dict[str, Any] = {"type": "string"}
+    if "keyvault_Name_Pack" in master_params:
+        vault_param["defaultValue"] = "[parameters('keyvault_Name_Pack')]"
+    master_params[VAULT_PACK_PARAMETER] = vault_param
+    master_params[TTL_PACK_PARAMETER] = {"defaultValue": ttl, "type": "int", "minValue": MIN_AUTH_CACHE_TTL}
+
+    if policies:
+        resources = master_template.setdefault("resources", [])
+        policy_name = f"[concat(parameters('{VAULT_PACK_PARAMETER}'), '/add')]"
+        access_policy = _access_policy_resource(resources, policy_name)
+        if access_policy is None:
+            # Una master ya procesada (modo batch) conserva la suya: se actualiza en lugar de añadir otra
+            access_policy = {"type": ACCESS_POLICY_TYPE, "apiVersion": "2022-07-01", "name": policy_name}
+            resources.append(access_policy)
+        access_policy["dependsOn"] = [name for name in report.callers if name in deployments]
+        access_policy.setdefault("properties", {})["accessPolicies"] = policies
+        report.access_policies = len(policies)
+
+    logger.info(
+        "Caché de token: %d playbooks reutilizan el token del Auth playbook, %d sin cambios.",
+        len(report.callers),
+        len(report.skipped),
+    )
+    return report
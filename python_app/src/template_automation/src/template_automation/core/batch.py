@@ -0,0 +1,306 @@
+"""
+Batch processing of every integration in the repository.
+
+Layout assumed (same as `tools/`):
+    <repo>/<Integration>/<playbook>.json          -> input playbooks
+    <repo>/<Integration>/output/<deploy*.json>    -> master template
+    <repo>/<Integration>/output/<playbook>.json   -> transformed playbooks
+
+With `since`, only the deployments affected by the files changed since that
+git ref are transformed (plus every deployment that depends on them through
+`dependsOn` or `workflows_*_externalid`), and only those are re-synced in the
+master template.
+"""
+
+from __future__ import annotations
+
+import logging
+import subprocess
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from .master_loader import load_master_template
+from .transformer import RE_WORKFLOW_EXTERNALID, run_automation
+from ..utils.repo_index import OUTPUT_DIR_NAME, RepoIndex, find_repo_root
+
+logger = logging.getLogger(__name__)
+
+# Cambios bajo esta ruta (el código del propio transformador) obligan a reconstruirlo todo
+TOOL_SOURCE_PREFIX: str = "python_app/src/template_automation/src/"
+
+DEPLOYMENT_TYPE: str = "Microsoft.Resources/deployments"
+
+
+@dataclass
+class IntegrationTarget:
+    """
+    One integration to process.
+
+    Attributes:
+        name (str): Integration folder name.
+        master_path (Path): Master template (`output/deploy*.json`).
+        dir_in (Path): Folder with the input playbooks.
+        dir_out (Path): Folder where transformed playbooks are written.
+        deployments (Optional[Set[str]]): Deployments to process; None means all.
+    """
+
+    name: str
+    master_path: Path
+    dir_in: Path
+    dir_out: Path
+    deployments: Optional[Set[str]] = field(default=None)
+
+
+def git_changed_paths(repo_root: Path, since: str) -> List[str]:
+    """
+    Return the repository-relative paths changed since `since`.
+
+    Includes committed and uncommitted changes to tracked files
+    (`git diff --name-only <since>`) plus untracked, non-ignored files.
+
+    Args:
+        repo_root (Path): Root of the git repository.
+        since (str): Any git revision (branch, tag, SHA, `HEAD~1`...).
+
+    Returns:
+        List[str]: POSIX paths relative to the repository root.
+
+    Raises:
+        RuntimeError: If git is not available or the revision is unknown.
+    """
+    commands = [
+        ["git", "-C", str(repo_root), "-c", "core.quotePath=false", "diff", "--name-only", "--no-renames", since, "--"],
+        ["git", "-C", str(repo_root), "-c", "core.quotePath=false", "ls-files", "--others", "--exclude-standard"],
+    ]
+
+    paths: List[str] = []
+    for cmd in commands:
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        except FileNotFoundError as exc:
+            raise RuntimeError("git no está disponible en el PATH.") from exc
+        except subprocess.CalledProcessError as exc:
+            raise RuntimeError(f"{' '.join(cmd[5:])} falló: {exc.stderr.strip()}") from exc
+
+        paths.extend(line.strip() for line in result.stdout.splitlines() if line.strip())
+
+    return sorted(set(paths))
+
+
+def find_integrations(index: RepoIndex) -> Dict[str, IntegrationTarget]:
+    """
+    Build one target per integration that has a master template in `output/`.
+
+    Args:
+        index (RepoIndex): Refreshed repository index.
+
+    Returns:
+        Dict[str, IntegrationTarget]: Targets keyed by integration name.
+    """
+    targets: Dict[str, IntegrationTarget] = {}
+
+    for entry in index.deploy_files():
+        if entry.parent != f"{entry.integration}/{OUTPUT_DIR_NAME}":
+            continue
+        if entry.integration in targets:
+            logger.warning(
+                "La integración '%s' tiene varios deploy templates; se usa %s.",
+                entry.integration,
+                targets[entry.integration].master_path.name,
+            )
+            continue
+
+        dir_in = index.root / entry.integration
+        targets[entry.integration] = IntegrationTarget(
+            name=entry.integration,
+            master_path=index.root / entry.path,
+            dir_in=dir_in,
+            dir_out=dir_in / OUTPUT_DIR_NAME,
+        )
+
+    return targets
+
+
+def build_reverse_dependencies(master_template: Dict) -> Dict[str, Set[str]]:
+    """
+    Map each deployment to the deployments that depend on it.
+
+    A deployment D depends on E when D's `dependsOn` references E, or when D
+    receives a `workflows_E_externalid` parameter.
+
+    Args:
+        master_template (Dict): Loaded master template.
+
+    Returns:
+        Dict[str, Set[str]]: `{E: {D, ...}}` for every deployment name E.
+    """
+    deployments = [
+        res for res in master_template.get("resources", [])
+        if isinstance(res, dict) and res.get("type") == DEPLOYMENT_TYPE and isinstance(res.get("name"), str)
+    ]
+    names = {res["name"] for res in deployments}
+    reverse: Dict[str, Set[str]] = {name: set() for name in names}
+
+    for res in deployments:
+        dependent = res["name"]
+
+        depends_on = res.get("dependsOn")
+        if isinstance(depends_on, list):
+            for dep in depends_on:
+                if not isinstance(dep, str):
+                    continue
+                for name in names:
+                    if dep == name or f"'{name}'" in dep:
+                        reverse[name].add(dependent)
+
+        props = res.get("properties")
+        params = props.get("parameters") if isinstance(props, dict) else None
+        if isinstance(params, dict):
+            for pname in params:
+                if not isinstance(pname, str) or not RE_WORKFLOW_EXTERNALID.fullmatch(pname):
+                    continue
+                target = pname[len("workflows_"): -len("_externalid")]
+                if target in reverse and target != dependent:
+                    reverse[target].add(dependent)
+
+    return reverse
+
+
+def dependents_closure(seeds: Iterable[str], reverse: Dict[str, Set[str]]) -> Set[str]:
+    """
+    Return `seeds` plus every deployment that (transitively) depends on them.
+    """
+    closure: Set[str] = set()
+    pending = list(seeds)
+
+    while pending:
+        name = pending.pop()
+        if name in closure:
+            continue
+        closure.add(name)
+        pending.extend(reverse.get(name, ()))
+
+    return closure
+
+
+def select_changed_targets(
+    targets: Dict[str, IntegrationTarget],
+    changed_paths: Iterable[str],
+    index: RepoIndex,
+) -> Dict[str, IntegrationTarget]:
+    """
+    Restrict `targets` to the deployments affected by `changed_paths`.
+
+    Rules:
+        - A change to the transformer sources rebuilds everything.
+        - A change to an integration's master template rebuilds that whole integration.
+        - A change to `<Integration>/[output/]<[Cliente_]Name>.json` marks deployment
+          `Name`, then the reverse-dependency closure is added.
+
+    Returns:
+        Dict[str, IntegrationTarget]: Affected targets with `deployments` filled in
+        (None means the whole integration).
+    """
+    changed = list(changed_paths)
+
+    if any(p.startswith(TOOL_SOURCE_PREFIX) for p in changed):
+        logger.info("Han cambiado fuentes de template_automation: se procesa todo.")
+        return targets
+
+    seeds: Dict[str, Set[str]] = {}
+    full: Set[str] = set()
+
+    for rel in changed:
+        parts = rel.split("/")
+        integration = parts[0]
+        if integration not in targets or not rel.lower().endswith(".json"):
+            continue
+
+        target = targets[integration]
+        if (index.root / rel) == target.master_path:
+            full.add(integration)
+            continue
+
+        if len(parts) == 2 or (len(parts) == 3 and parts[1] == OUTPUT_DIR_NAME):
+            stem = parts[-1][: -len(".json")]
+            logical = stem[len("Cliente_"):] if stem.startswith("Cliente_") else stem
+            seeds.setdefault(integration, set()).add(logical)
+
+    selected: Dict[str, IntegrationTarget] = {}
+
+    for integration in sorted(full | set(seeds)):
+        target = targets[integration]
+
+        if integration in full:
+            target.deployments = None
+            selected[integration] = target
+            continue
+
+        master = load_master_template(target.master_path)
+        reverse = build_reverse_dependencies(master)
+
+        known = {name for name in seeds[integration] if name in reverse}
+        for unknown in sorted(seeds[integration] - known):
+            logger.debug("'%s' no es un deployment de la master de %s; se ignora.", unknown, integration)
+        if not known:
+            continue
+
+        target.deployments = dependents_closure(known, reverse)
+        selected[integration] = target
+
+    return selected
+
+
+def run_batch(root: Path, since: Optional[str] = None) -> Dict[str, Optional[Set[str]]]:
+    """
+    Transform every integration of the repository, or only what changed since `since`.
+
+    Args:
+        root (Path): Any path inside the repository.
+        since (Optional[str], optional): Git revision to diff against. When None,
+            all integrations are processed. Defaults to None.
+
+    Returns:
+        Dict[str, Optional[Set[str]]]: Processed integrations and the deployments
+        handled in each one (None means all of them).
+
+    Raises:
+        NotADirectoryError: If `root` is not inside a git repository.
+        RuntimeError: If the git diff fails.
+    """
+    repo_root = find_repo_root(root)
+    if repo_root is None:
+        raise NotADirectoryError(f"Not inside a git repository: {root}")
+
+    index = RepoIndex.open(repo_root)
+    targets = find_integrations(index)
+
+    if since is not None:
+        changed = git_changed_paths(repo_root, since)
+        logger.info("%d ficheros cambiados desde %s.", len(changed), since)
+        targets = select_changed_targets(targets, changed, index)
+
+    if not targets:
+        logger.info("No hay integraciones afectadas.")
+        index.save()
+        return {}
+
+    processed: Dict[str, Optional[Set[str]]] = {}
+
+    for name, target in targets.items():
+        logger.info(
+            "Procesando integración %s (%s).",
+            name,
+            "todos los deployments" if target.deployments is None else sorted(target.deployments),
+        )
+        run_automation(
+            master_path=target.master_path,
+            dir_in=target.dir_in,
+            dir_out=target.dir_out,
+            deployments=target.deployments,
+            repo_index=index,
+        )
+        processed[name] = target.deployments
+
+    return processed
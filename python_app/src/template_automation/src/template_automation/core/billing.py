@@ -0,0 +1,354 @@
+"""
+Static estimate of the actions executed (and billed) per run of a playbook.
+
+Logic Apps Consumption bills every executed trigger and action: built-in ones
+at one price, managed connector ones (`ApiConnection*`) at a higher one. For
+one run of a playbook's trigger the estimator counts, as min / expected / max:
+
+    action       1
+    Foreach      1 + items * body      (items from the cardinalities)
+    Until        1 + iterations * body (1 / expected / limit.count)
+    If, Switch   1 + branch            (min and max branch; expected weighted
+                                        by the branch probability / evenly)
+    Scope        1 + body
+    Workflow     1 + the child playbook's run, followed across the pack
+    error path   actions that only run after a failure (runAfter without
+                 Succeeded) only count in the max
+
+Cardinalities are given per Foreach action name (glob), e.g. 1 / 3 / 20
+indicators per incident, with a default for the rest. Retries and disabled
+actions are not counted. The pack figure is one run of every entry point
+(playbooks no other playbook of the pack calls).
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .callgraph import build_call_graph
+from .diff import find_master, linked_playbooks
+from .document import PlaybookDocument, WORKFLOW_TYPE
+from .master_loader import load_master_template
+from .playbook_loader import load_playbook
+from ..config import DEFAULT_BRANCH_PROBABILITY, DEFAULT_UNTIL_ITERATIONS
+
+logger = logging.getLogger(__name__)
+
+# Valor por defecto de Logic Apps para limit.count de un Until
+UNTIL_DEFAULT_COUNT: int = 60
+
+_CONNECTOR_PREFIX = "apiconnection"
+
+
+@dataclass(frozen=True)
+class Range:
+    """
+    Minimum, expected and maximum of a figure.
+    """
+
+    min: float = 0.0
+    expected: float = 0.0
+    max: float = 0.0
+
+    def __add__(self, other: "Range") -> "Range":
+        return Range(self.min + other.min, self.expected + other.expected, self.max + other.max)
+
+    def __mul__(self, other: "Range") -> "Range":
+        return Range(self.min * other.min, self.expected * other.expected, self.max * other.max)
+
+    @classmethod
+    def fixed(cls, value: float) -> "Range":
+        return cls(value, value, value)
+
+    @classmethod
+    def parse(cls, text: str) -> "Range":
+        """
+        `N` or `MIN:EXPECTED:MAX` (e.g. `1:3:20`).
+
+        Raises:
+            ValueError: If the text is not one or three non-negative numbers in order.
+        """
+        parts = [float(part) for part in text.split(":")]
+        if len(parts) == 1:
+            parts = parts * 3
+        if len(parts) != 3 or parts[0] < 0 or not parts[0] <= parts[1] <= parts[2]:
+            raise ValueError(f"Invalid cardinality {text!r}: expected N or MIN:EXPECTED:MAX in increasing order.")
+        return cls(*parts)
+
+
+@dataclass(frozen=True)
+class ActionCount:
+    """
+    Executed actions split by billing meter.
+
+    Attributes:
+        builtin (Range): Built-in triggers and actions.
+        connector (Range): Managed connector triggers and actions (`ApiConnection*`).
+        runs (Range): Child workflow runs started, nested ones included.
+    """
+
+    builtin: Range = Range()
+    connector: Range = Range()
+    runs: Range = Range()
+
+    def __add__(self, other: "ActionCount") -> "ActionCount":
+        return ActionCount(self.builtin + other.builtin, self.connector + other.connector, self.runs + other.runs)
+
+    def scale(self, factor: Range) -> "ActionCount":
+        return ActionCount(self.builtin * factor, self.connector * factor, self.runs * factor)
+
+    @property
+    def total(self) -> Range:
+        return self.builtin + self.connector
+
+    def cost(self, builtin_price: float, connector_price: float) -> Range:
+        """
+        Estimated cost of the actions with the given unit prices.
+        """
+        return self.builtin * Range.fixed(builtin_price) + self.connector * Range.fixed(connector_price)
+
+
+def _combine(branches: List[ActionCount], weights: List[float]) -> ActionCount:
+    """
+    One of several branches runs: min and max branch, weighted expectation.
+    """
+    def pick(attr: str) -> Range:
+        ranges = [getattr(branch, attr) for branch in branches]
+        return Range(
+            min(r.min for r in ranges),
+            sum(r.expected * w for r, w in zip(ranges, weights)),
+            max(r.max for r in ranges),
+        )
+
+    return ActionCount(pick("builtin"), pick("connector"), pick("runs"))
+
+
+@dataclass
+class Cardinalities:
+    """
+    Expected sizes used by the estimate.
+
+    Attributes:
+        items (Range): Default Foreach items.
+        loops (Dict[str, Range]): Foreach action name (glob) -> items.
+        until_iterations (int): Expected iterations of an Until loop.
+        branch_probability (float): Probability of the `actions` branch of an If.
+    """
+
+    items: Range = Range(1, 1, 1)
+    loops: Dict[str, Range] = field(default_factory=dict)
+    until_iterations: int = DEFAULT_UNTIL_ITERATIONS
+    branch_probability: float = DEFAULT_BRANCH_PROBABILITY
+
+    def foreach(self, name: str) -> Range:
+        for pattern, items in self.loops.items():
+            if fnmatch.fnmatchcase(name.lower(), pattern.lower()):
+                return items
+        return self.items
+
+
+@dataclass
+class PlaybookCost:
+    """
+    Estimate of one run of a playbook.
+
+    Attributes:
+        playbook (str): Deployment name of the playbook.
+        source (str): File name of the playbook.
+        actions (ActionCount): Executed trigger and actions, child runs included.
+        notes (List[str]): Assumptions made (unresolved or recursive calls, ...).
+    """
+
+    playbook: str
+    source: str
+    actions: ActionCount = ActionCount()
+    notes: List[str] = field(default_factory=list)
+
+
+@dataclass
+class PackCost:
+    """
+    Estimate of a pack.
+
+    Attributes:
+        playbooks (List[PlaybookCost]): One entry per playbook, in pack order.
+        entry_points (List[str]): Playbooks no other playbook of the pack calls.
+        actions (ActionCount): One run of every entry point.
+    """
+
+    playbooks: List[PlaybookCost] = field(default_factory=list)
+    entry_points: List[str] = field(default_factory=list)
+    actions: ActionCount = ActionCount()
+
+
+def _meter(action_type: str) -> ActionCount:
+    one = Range.fixed(1)
+    return ActionCount(connector=one) if action_type.startswith(_CONNECTOR_PREFIX) else ActionCount(builtin=one)
+
+
+def _error_path_only(action: Dict[str, Any]) -> bool:
+    run_after = action.get("runAfter")
+    if not isinstance(run_after, dict) or not run_after:
+        return False
+    return all(
+        isinstance(statuses, list) and "succeeded" not in {str(status).lower() for status in statuses}
+        for statuses in run_after.values()
+    )
+
+
+class _Estimator:
+    """
+    Walks the definitions of a pack; child playbooks are estimated on demand
+    (memoised), so every playbook is estimated once whatever the call order.
+    """
+
+    def __init__(self, playbooks: List[Tuple[str, PlaybookDocument, str]], cardinalities: Cardinalities) -> None:
+        self.documents = {name: (doc, source) for name, doc, source in playbooks}
+        self.children = {call.path: call.child for call in build_call_graph(playbooks).calls()}
+        self.cardinalities = cardinalities
+        self.results: Dict[str, PlaybookCost] = {}
+        self.in_progress: Set[str] = set()
+
+    def playbook(self, name: str) -> PlaybookCost:
+        if name in self.results:
+            return self.results[name]
+
+        doc, source = self.documents[name]
+        result = PlaybookCost(playbook=name, source=source)
+        self.in_progress.add(name)
+        for index, res in enumerate(doc.resources):
+            if not isinstance(res, dict) or res.get("type") != WORKFLOW_TYPE:
+                continue
+            definition = doc.definition(res)
+            if definition is None:
+                continue
+            triggers = definition.get("triggers")
+            if isinstance(triggers, dict) and triggers:
+                # Una ejecución = un disparo de uno de sus triggers
+                trigger = next(iter(triggers.values()))
+                result.actions += _meter(str(trigger.get("type", "")).lower() if isinstance(trigger, dict) else "")
+            base = f"$.resources[{index}].properties.definition.actions"
+            result.actions += self._block(definition.get("actions"), base, result)
+        self.in_progress.discard(name)
+
+        self.results[name] = result
+        return result
+
+    def _block(self, actions: Any, path: str, result: PlaybookCost) -> ActionCount:
+        count = ActionCount()
+        if not isinstance(actions, dict):
+            return count
+        for name, action in actions.items():
+            if not isinstance(action, dict):
+                continue
+            own = self._action(name, action, f"{path}.{name}", result)
+            if _error_path_only(action):
+                own = ActionCount(
+                    Range(0, 0, own.builtin.max), Range(0, 0, own.connector.max), Range(0, 0, own.runs.max)
+                )
+            count += own
+        return count
+
+    def _action(self, name: str, action: Dict[str, Any], path: str, result: PlaybookCost) -> ActionCount:
+        action_type = str(action.get("type", "")).lower()
+        count = _meter(action_type)
+
+        if action_type == "scope":
+            return count + self._block(action.get("actions"), f"{path}.actions", result)
+        if action_type == "foreach":
+            body = self._block(action.get("actions"), f"{path}.actions", result)
+            return count + body.scale(self.cardinalities.foreach(name))
+        if action_type == "until":
+            limit = action.get("limit") if isinstance(action.get("limit"), dict) else {}
+            maximum = limit.get("count") if isinstance(limit.get("count"), int) else UNTIL_DEFAULT_COUNT
+            iterations = Range(1, min(self.cardinalities.until_iterations, maximum), maximum)
+            return count + self._block(action.get("actions"), f"{path}.actions", result).scale(iterations)
+        if action_type == "if":
+            branch = action.get("else")
+            then_count = self._block(action.get("actions"), f"{path}.actions", result)
+            else_count = self._block(
+                branch.get("actions") if isinstance(branch, dict) else None, f"{path}.else.actions", result
+            )
+            p = self.cardinalities.branch_probability
+            return count + _combine([then_count, else_count], [p, 1 - p])
+        if action_type == "switch":
+            branches: List[ActionCount] = []
+            cases = action.get("cases")
+            if isinstance(cases, dict):
+                branches.extend(
+                    self._block(case.get("actions"), f"{path}.cases.{case_name}.actions", result)
+                    for case_name, case in cases.items()
+                    if isinstance(case, dict)
+                )
+            default = action.get("default")
+            branches.append(
+                self._block(default.get("actions") if isinstance(default, dict) else None, f"{path}.default.actions", result)
+            )
+            return count + _combine(branches, [1 / len(branches)] * len(branches))
+        if action_type == "workflow":
+            return count + self._workflow(name, path, result)
+        return count
+
+    def _workflow(self, name: str, path: str, result: PlaybookCost) -> ActionCount:
+        child = self.children.get(path)
+        if child is None or child not in self.documents:
+            result.notes.append(f"{name}: child workflow not in the pack, its actions are not counted")
+            return ActionCount()
+        if child in self.in_progress:
+            result.notes.append(f"{name}: recursive call to {child}, counted once")
+            return ActionCount()
+        return self.playbook(child).actions + ActionCount(runs=Range.fixed(1))
+
+
+def estimate_pack(
+    playbooks: Iterable[Tuple[str, PlaybookDocument, str]],
+    cardinalities: Optional[Cardinalities] = None,
+) -> PackCost:
+    """
+    Estimate the executed actions of every playbook of a pack.
+
+    Args:
+        playbooks (Iterable[Tuple[str, PlaybookDocument, str]]):
+            `(deployment name, playbook, source name)` triples.
+        cardinalities (Optional[Cardinalities]): Expected sizes (defaults if None).
+
+    Returns:
+        PackCost: Per-playbook figures and the pack total.
+    """
+    playbooks = list(playbooks)
+    estimator = _Estimator(playbooks, cardinalities or Cardinalities())
+
+    pack = PackCost(playbooks=[estimator.playbook(name) for name, _, _ in playbooks])
+    called = set(estimator.children.values())
+    pack.entry_points = [cost.playbook for cost in pack.playbooks if cost.playbook not in called]
+    for cost in pack.playbooks:
+        if cost.playbook in pack.entry_points:
+            pack.actions += cost.actions
+    return pack
+
+
+def output_cost(
+    output_dir: Path,
+    cardinalities: Optional[Cardinalities] = None,
+    master_path: Optional[Path] = None,
+) -> PackCost:
+    """
+    Estimate of the playbooks linked by the master of an output folder.
+
+    Raises:
+        NotADirectoryError: If `output_dir` is not a directory.
+        FileNotFoundError: If no master template is found.
+    """
+    master = load_master_template(master_path or find_master(output_dir))
+    return estimate_pack(
+        (
+            (name, PlaybookDocument(load_playbook(path)), path.name)
+            for name, path in linked_playbooks(output_dir, master)
+        ),
+        cardinalities,
+    )
+
@@ -0,0 +1,316 @@
+"""
+Parallel branches for actions chained only by the designer's ordering.
+
+Exported definitions chain most actions through `runAfter` in the order they
+were added in the designer, even when they share no data (consecutive
+InitializeVariable, independent ParseJson, separate lookups). For every scope
+(the definition's `actions` and the ones nested in Scope/If/Switch/Foreach/Until)
+the `runAfter` graph is compared with the data-dependency graph built from:
+
+    body('X'), outputs('X'), actions('X'), result('X')
+                 the action reads X (or an action nested in X)
+    variables('v')
+                 the action reads v: it runs after the actions that write v
+                 (InitializeVariable, SetVariable, Append*, Increment/Decrement),
+                 and a writer of v runs after the actions that read or write it
+
+Actions with side effects (Http/ApiConnection calls other than GET, Workflow,
+Wait, Response, Terminate, ... or containers holding any of them) are barriers:
+they keep every predecessor and every later action stays after them, so no
+side effect moves relative to another action. Only pure actions between two
+barriers are regrouped. A dependency is only kept when it was already implied
+by the original graph, so the rewrite never adds an ordering.
+
+Error handling is kept as is: an action that runs after a status other than
+Succeeded, the action it watches and everything before them keep their
+`runAfter` and count as barriers. The report gives the critical path (actions on
+the longest `runAfter` chain, containers counting their own) before and after.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Set, Tuple
+
+from .document import PlaybookDocument, WORKFLOW_TYPE, iter_actions
+from .expressions import workflow_references
+
+logger = logging.getLogger(__name__)
+
+SUCCEEDED: str = "Succeeded"
+
+_PURE_TYPES = frozenset({
+    "compose",
+    "parsejson",
+    "select",
+    "query",
+    "join",
+    "table",
+    "initializevariable",
+    "setvariable",
+    "appendtoarrayvariable",
+    "appendtostringvariable",
+    "incrementvariable",
+    "decrementvariable",
+})
+_REQUEST_TYPES = frozenset({"http", "apiconnection"})
+_CONTAINER_TYPES = frozenset({"scope", "if", "switch", "foreach", "until"})
+_WRITE_TYPES = frozenset({
+    "setvariable",
+    "appendtoarrayvariable",
+    "appendtostringvariable",
+    "incrementvariable",
+    "decrementvariable",
+})
+_ACTION_FUNCTIONS = frozenset({"body", "outputs", "actions", "result"})
+
+
+@dataclass
+class BranchReport:
+    """
+    Parallel branches extracted from one playbook.
+
+    Attributes:
+        source (str): Document name.
+        before (int): Critical path of the definitions before the rewrite.
+        after (int): Critical path after the rewrite.
+        scopes (Dict[str, List[str]]): Rewritten scope path -> actions whose
+            `runAfter` changed.
+        skipped (Dict[str, str]): Scope path -> why it was left untouched.
+    """
+
+    source: str
+    before: int = 0
+    after: int = 0
+    scopes: Dict[str, List[str]] = field(default_factory=dict)
+    skipped: Dict[str, str] = field(default_factory=dict)
+
+
+def _iter_strings(obj: Any) -> Iterator[str]:
+    if isinstance(obj, str):
+        yield obj
+    elif isinstance(obj, dict):
+        for value in obj.values():
+            yield from _iter_strings(value)
+    elif isinstance(obj, list):
+        for item in obj:
+            yield from _iter_strings(item)
+
+
+def _nested_scopes(action: Dict[str, Any], path: str) -> Iterator[Tuple[Any, str]]:
+    """
+    `actions` dicts directly nested in a container action, with their paths.
+    """
+    yield action.get("actions"), f"{path}.actions"
+    for key in ("else", "default"):
+        branch = action.get(key)
+        if isinstance(branch, dict):
+            yield branch.get("actions"), f"{path}.{key}.actions"
+    cases = action.get("cases")
+    if isinstance(cases, dict):
+        for case_name, case in cases.items():
+            if isinstance(case, dict):
+                yield case.get("actions"), f"{path}.cases.{case_name}.actions"
+
+
+def _is_pure(action: Dict[str, Any]) -> bool:
+    action_type = str(action.get("type", "")).lower()
+    if action_type in _PURE_TYPES:
+        return True
+    if action_type in _REQUEST_TYPES:
+        inputs = action.get("inputs") if isinstance(action.get("inputs"), dict) else {}
+        return str(inputs.get("method", "")).lower() in ("get", "head")
+    if action_type in _CONTAINER_TYPES:
+        return all(
+            _is_pure(inner)
+            for actions, _ in _nested_scopes(action, "")
+            for _, inner, _, _ in iter_actions(actions)
+        )
+    return False
+
+
+def _variable_writes(action: Dict[str, Any]) -> Set[str]:
+    names: Set[str] = set()
+    for _, inner, _, _ in iter_actions({"": action}):
+        action_type = str(inner.get("type", "")).lower()
+        inputs = inner.get("inputs") if isinstance(inner.get("inputs"), dict) else {}
+        if action_type == "initializevariable":
+            for variable in inputs.get("variables") or []:
+                if isinstance(variable, dict) and isinstance(variable.get("name"), str):
+                    names.add(variable["name"].lower())
+        elif action_type in _WRITE_TYPES and isinstance(inputs.get("name"), str):
+            names.add(inputs["name"].lower())
+    return names
+
+
+def _critical_path(actions: Any) -> int:
+    """
+    Actions on the longest `runAfter` chain of a scope; a container counts
+    itself plus the critical path of its slowest nested scope.
+    """
+    if not isinstance(actions, dict):
+        return 0
+    own = {
+        name: 1 + max((_critical_path(inner) for inner, _ in _nested_scopes(action, "")), default=0)
+        if str(action.get("type", "")).lower() in _CONTAINER_TYPES else 1
+        for name, action in actions.items()
+        if isinstance(action, dict)
+    }
+    finish: Dict[str, int] = {}
+
+    def finish_of(name: str, visiting: Tuple[str, ...]) -> int:
+        if name not in finish:
+            run_after = actions[name].get("runAfter")
+            previous = [
+                finish_of(p, visiting + (name,))
+                for p in (run_after if isinstance(run_after, dict) else {})
+                if p in own and p not in visiting
+            ]
+            finish[name] = own[name] + max(previous, default=0)
+        return finish[name]
+
+    return max((finish_of(name, ()) for name in own), default=0)
+
+
+def _order(actions: Dict[str, Dict[str, Any]]) -> List[str]:
+    """
+    Topological order of a scope by `runAfter`, document order among ready actions.
+    """
+    pending = list(actions)
+    done: Set[str] = set()
+    order: List[str] = []
+    while pending:
+        for name in pending:
+            run_after = actions[name].get("runAfter") or {}
+            if all(p in done or p not in actions for p in run_after):
+                break
+        else:
+            # Ciclo (definición inválida): se conserva el orden del documento
+            name = pending[0]
+        pending.remove(name)
+        done.add(name)
+        order.append(name)
+    return order
+
+
+def _rewrite_scope(actions: Any, path: str, report: BranchReport) -> None:
+    if not isinstance(actions, dict):
+        return
+    actions = {name: action for name, action in actions.items() if isinstance(action, dict)}
+    if len(actions) < 2:
+        return
+
+    # Manejo de errores: las acciones con runAfter distinto de Succeeded, las
+    # que vigilan y todo lo anterior a ellas conservan su runAfter tal cual
+    fixed: Set[str] = set()
+    for name, action in actions.items():
+        run_after = action.get("runAfter") or {}
+        if not isinstance(run_after, dict):
+            report.skipped[path] = f"{name}: invalid runAfter"
+            return
+        for previous, statuses in run_after.items():
+            if previous not in actions:
+                report.skipped[path] = f"{name}: runAfter {previous} outside the scope"
+                return
+            if [str(status).lower() for status in statuses or []] != [SUCCEEDED.lower()]:
+                fixed.update((name, previous))
+
+    # Acción (o acción anidada) -> acción del scope que la contiene
+    owner: Dict[str, str] = {}
+    for name, action in actions.items():
+        for inner_name, _, _, _ in iter_actions({name: action}):
+            owner.setdefault(inner_name.lower(), name)
+
+    reads: Dict[str, Set[str]] = {}
+    uses: Dict[str, Set[str]] = {}
+    writes: Dict[str, Set[str]] = {}
+    pure: Dict[str, bool] = {}
+    for name, action in actions.items():
+        refs = {
+            (kind, ref.lower())
+            for text in _iter_strings({key: value for key, value in action.items() if key != "runAfter"})
+            for kind, ref in workflow_references(text)
+        }
+        uses[name] = {owner[ref] for kind, ref in refs if kind in _ACTION_FUNCTIONS and ref in owner} - {name}
+        reads[name] = {ref for kind, ref in refs if kind == "variables"}
+        writes[name] = _variable_writes(action)
+        pure[name] = _is_pure(action) and name not in fixed
+
+    order = _order(actions)
+    ancestors: Dict[str, Set[str]] = {}
+    for name in order:
+        found: Set[str] = set()
+        for previous in actions[name].get("runAfter") or {}:
+            found |= ancestors.get(previous, set()) | {previous}
+        ancestors[name] = found
+    rigid = fixed.union(*(ancestors[name] for name in fixed))
+
+    new_ancestors: Dict[str, Set[str]] = {}
+    new_run_after: Dict[str, Set[str]] = {}
+    for name in order:
+        before = ancestors[name]
+        if name in rigid:
+            needed = set(actions[name].get("runAfter") or {})
+        elif not pure[name]:
+            needed = set(before)
+        else:
+            needed = {p for p in before if not pure[p]} | (uses[name] & before)
+            for previous in before:
+                if writes[previous] & (reads[name] | writes[name]) or writes[name] & reads[previous]:
+                    needed.add(previous)
+
+        implied = set().union(*(new_ancestors[p] for p in needed)) if needed else set()
+        new_run_after[name] = needed - implied
+        new_ancestors[name] = needed | implied
+
+    if all(new_ancestors[name] == ancestors[name] for name in actions):
+        return
+
+    changed: List[str] = []
+    for name in order:
+        action = actions[name]
+        if name in rigid or set(action.get("runAfter") or {}) == new_run_after[name]:
+            continue
+        action["runAfter"] = {previous: [SUCCEEDED] for previous in order if previous in new_run_after[name]}
+        changed.append(name)
+    report.scopes[path] = changed
+
+
+def parallelize_independent_actions(doc: PlaybookDocument, source: str = "") -> BranchReport:
+    """
+    Rewrite every scope of a playbook so that actions with no data dependency
+    run as parallel branches, in place.
+
+    Args:
+        doc (PlaybookDocument): Playbook to rewrite.
+        source (str): Name used in the report.
+
+    Returns:
+        BranchReport: Critical path before/after and the scopes rewritten or skipped.
+    """
+    report = BranchReport(source=source)
+    for index, res in enumerate(doc.resources):
+        if not isinstance(res, dict) or res.get("type") != WORKFLOW_TYPE:
+            continue
+        definition = doc.definition(res)
+        if definition is None:
+            continue
+        actions = definition.get("actions")
+        report.before += _critical_path(actions)
+
+        base = f"$.resources[{index}].properties.definition.actions"
+        _rewrite_scope(actions, base, report)
+        for _, action, path, _ in iter_actions(actions, base):
+            if str(action.get("type", "")).lower() in _CONTAINER_TYPES:
+                for inner, inner_path in _nested_scopes(action, path):
+                    _rewrite_scope(inner, inner_path, report)
+
+        report.after += _critical_path(actions)
+
+    if report.scopes:
+        logger.info(
+            "%s: %d scopes con ramas paralelas, camino crítico %d -> %d acciones.",
+            source, len(report.scopes), report.before, report.after,
+        )
+    return report
@@ -0,0 +1,407 @@
+"""
+Pack-wide call graph of the child workflows invoked through `Workflow` actions.
+
+Playbooks call each other with `Workflow` actions whose `host.workflow.id` is
+the `var_workflows_<child>_externalid` variable created by the transformer
+(or, in unconverted exports, the `workflows_<child>_externalid` parameter or a
+literal resource id). Each call site is resolved to a playbook of the pack and
+annotated with the scopes that enclose it:
+
+    loops      Foreach / Until actions: the call runs once per iteration
+    branches   If / Switch branches: the call may not run at all
+
+From one run of a playbook's trigger the graph follows the calls transitively
+and reports how many child runs it starts, how long the longest chain of
+nested calls is and which children run more than once (repeated call sites or
+calls inside loops), e.g. the `*_Auth_Playbook` called by every orchestrator.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .diff import find_master, linked_playbooks
+from .document import PlaybookDocument, WORKFLOW_TYPE
+from .expressions import is_expression, references
+from .master_loader import load_master_template
+from .playbook_loader import load_playbook
+
+logger = logging.getLogger(__name__)
+
+_RE_EXTERNALID = re.compile(r"(?:var_)?workflows_(.+)_externalid")
+_RE_NAME_PARAMETER = re.compile(r"(?:workflows_)?(.+)_name", re.IGNORECASE)
+_LOOP_TYPES = frozenset({"foreach", "until"})
+
+
+@dataclass
+class WorkflowCall:
+    """
+    One `Workflow` action.
+
+    Attributes:
+        caller (str): Playbook that contains the action.
+        action (str): Action name.
+        path (str): JSON path of the action inside the playbook.
+        target (str): Raw `host.workflow.id`.
+        child (Optional[str]): Playbook of the pack it resolves to (None if unknown).
+        trigger (str): `host.triggerName` of the call.
+        loops (List[str]): Enclosing Foreach/Until actions, outermost first.
+        branches (List[str]): Enclosing If/Switch branches (`<action>.<branch>`).
+    """
+
+    caller: str
+    action: str
+    path: str
+    target: str
+    child: Optional[str] = None
+    trigger: str = ""
+    loops: List[str] = field(default_factory=list)
+    branches: List[str] = field(default_factory=list)
+
+
+@dataclass
+class PlaybookCalls:
+    """
+    Node of the call graph.
+
+    Attributes:
+        name (str): Deployment name of the playbook in the master.
+        source (str): File name of the playbook.
+        triggers (Dict[str, str]): Trigger name -> trigger type.
+        calls (List[WorkflowCall]): `Workflow` actions, in document order.
+    """
+
+    name: str
+    source: str
+    triggers: Dict[str, str] = field(default_factory=dict)
+    calls: List[WorkflowCall] = field(default_factory=list)
+
+
+@dataclass
+class InvocationSummary:
+    """
+    Child workflow runs started by one run of a playbook's trigger.
+
+    Attributes:
+        playbook (str): Playbook whose trigger starts the run.
+        trigger (str): Trigger name (`type` in brackets).
+        direct (int): `Workflow` actions of the playbook itself.
+        invocations (int): Child runs, following calls transitively, counting
+            every call site once (one iteration per loop, every branch taken).
+        per_item (int): Of `invocations`, the ones inside a Foreach/Until,
+            which run once per iteration.
+        conditional (int): Of `invocations`, the ones under an If/Switch branch.
+        depth (int): Longest chain of nested child calls (0 = calls nothing).
+        repeated (Dict[str, int]): Children that run more than once per trigger
+            run -> call sites (a call inside a loop always counts as repeated).
+        unresolved (List[str]): Call targets that are not playbooks of the pack.
+        cycle (bool): Whether the calls loop back to a playbook already in the chain.
+    """
+
+    playbook: str
+    trigger: str
+    direct: int = 0
+    invocations: int = 0
+    per_item: int = 0
+    conditional: int = 0
+    depth: int = 0
+    repeated: Dict[str, int] = field(default_factory=dict)
+    unresolved: List[str] = field(default_factory=list)
+    cycle: bool = False
+
+
+def _iter_scoped_actions(
+    actions: Any,
+    path: str,
+    loops: Tuple[str, ...] = (),
+    branches: Tuple[str, ...] = (),
+) -> Iterator[Tuple[str, Dict[str, Any], str, Tuple[str, ...], Tuple[str, ...]]]:
+    if not isinstance(actions, dict):
+        return
+    for name, action in actions.items():
+        if not isinstance(action, dict):
+            continue
+        action_path = f"{path}.{name}"
+        yield name, action, action_path, loops, branches
+
+        action_type = str(action.get("type", "")).lower()
+        inner_loops = loops + (name,) if action_type in _LOOP_TYPES else loops
+        then_branches = branches + (f"{name}.actions",) if action_type == "if" else branches
+        yield from _iter_scoped_actions(action.get("actions"), f"{action_path}.actions", inner_loops, then_branches)
+
+        for key in ("else", "default"):
+            branch = action.get(key)
+            if isinstance(branch, dict):
+                yield from _iter_scoped_actions(
+                    branch.get("actions"), f"{action_path}.{key}.actions", loops, branches + (f"{name}.{key}",)
+                )
+        cases = action.get("cases")
+        if isinstance(cases, dict):
+            for case_name, case in cases.items():
+                if isinstance(case, dict):
+                    yield from _iter_scoped_actions(
+                        case.get("actions"),
+                        f"{action_path}.cases.{case_name}.actions",
+                        loops,
+                        branches + (f"{name}.{case_name}",),
+                    )
+
+
+def _target_name(target: str) -> Optional[str]:
+    """
+    Workflow name a `host.workflow.id` points to, as written in the playbook.
+    """
+    if is_expression(target):
+        names = sorted(name for kind, name in references(target) if kind in ("parameters", "variables"))
+        for ref_name in names:
+            match = _RE_EXTERNALID.fullmatch(ref_name)
+            if match:
+                return match.group(1)
+        # Exportaciones que pasan el nombre del workflow en un parámetro <X>_Name
+        for ref_name in names:
+            match = _RE_NAME_PARAMETER.fullmatch(ref_name)
+            if match:
+                return match.group(1)
+        return None
+    if "/workflows/" in target:
+        return target.rstrip("/").rsplit("/", 1)[-1]
+    return None
+
+
+def _resolve(name: Optional[str], known: Dict[str, str]) -> Optional[str]:
+    """
+    Playbook of the pack for a workflow name: exact match (case-insensitive),
+    otherwise the longest playbook name it ends with (client/test prefixes),
+    otherwise the only playbook name that ends with it.
+    """
+    if not name:
+        return None
+    lowered = name.lower()
+    if lowered in known:
+        return known[lowered]
+    suffixes = [key for key in known if lowered.endswith("_" + key)]
+    if suffixes:
+        return known[max(suffixes, key=len)]
+    # Nombre abreviado (sin el prefijo OrchestatorPart_, ...): solo si es inequívoco
+    extended = {known[key] for key in known if key.endswith("_" + lowered)}
+    return extended.pop() if len(extended) == 1 else None
+
+
+def _playbook_calls(name: str, doc: PlaybookDocument, source: str) -> PlaybookCalls:
+    node = PlaybookCalls(name=name, source=source)
+    for index, res in enumerate(doc.resources):
+        if not isinstance(res, dict) or res.get("type") != WORKFLOW_TYPE:
+            continue
+        definition = doc.definition(res)
+        if definition is None:
+            continue
+
+        triggers = definition.get("triggers")
+        if isinstance(triggers, dict):
+            for trigger_name, trigger in triggers.items():
+                node.triggers[trigger_name] = str(trigger.get("type", "")) if isinstance(trigger, dict) else ""
+
+        base = f"$.resources[{index}].properties.definition.actions"
+        for action_name, action, path, loops, branches in _iter_scoped_actions(definition.get("actions"), base):
+            if str(action.get("type", "")).lower() != "workflow":
+                continue
+            inputs = action.get("inputs") if isinstance(action.get("inputs"), dict) else {}
+            host = inputs.get("host") if isinstance(inputs.get("host"), dict) else {}
+            workflow = host.get("workflow") if isinstance(host.get("workflow"), dict) else {}
+            node.calls.append(
+                WorkflowCall(
+                    caller=name,
+                    action=action_name,
+                    path=path,
+                    target=str(workflow.get("id", "")),
+                    trigger=str(host.get("triggerName", "")),
+                    loops=list(loops),
+                    branches=list(branches),
+                )
+            )
+    return node
+
+
+@dataclass
+class CallGraph:
+    """
+    Call graph of a pack.
+
+    Attributes:
+        nodes (Dict[str, PlaybookCalls]): Playbooks keyed by deployment name.
+    """
+
+    nodes: Dict[str, PlaybookCalls] = field(default_factory=dict)
+
+    def calls(self) -> Iterator[WorkflowCall]:
+        """
+        Every call site of the pack, in playbook order.
+        """
+        for node in self.nodes.values():
+            yield from node.calls
+
+    def callers(self) -> Dict[str, List[str]]:
+        """
+        Resolved children -> playbooks that call them (one entry per call site).
+        """
+        result: Dict[str, List[str]] = {}
+        for call in self.calls():
+            if call.child is not None:
+                result.setdefault(call.child, []).append(call.caller)
+        return result
+
+    def roots(self) -> List[str]:
+        """
+        Playbooks no other playbook of the pack calls (the entry points).
+        """
+        called = set(self.callers())
+        return [name for name in self.nodes if name not in called]
+
+    def summarize(self, name: str) -> List[InvocationSummary]:
+        """
+        Invocation figures of one playbook, one entry per trigger.
+
+        Args:
+            name (str): Deployment name of the playbook.
+
+        Returns:
+            List[InvocationSummary]: The figures do not depend on the trigger
+            (every trigger runs the same actions); a playbook without
+            triggers gets one entry with an empty trigger.
+        """
+        node = self.nodes[name]
+        summary = InvocationSummary(playbook=name, trigger="", direct=len(node.calls))
+        repeated: Counter = Counter()
+        looped: Set[str] = set()
+        summary.depth = self._expand(name, (name,), False, False, summary, repeated, looped)
+        summary.repeated = {
+            child: count for child, count in sorted(repeated.items()) if count > 1 or child in looped
+        }
+
+        triggers = [f"{trigger} ({kind})" for trigger, kind in node.triggers.items()] or [""]
+        return [
+            InvocationSummary(
+                playbook=name,
+                trigger=trigger,
+                direct=summary.direct,
+                invocations=summary.invocations,
+                per_item=summary.per_item,
+                conditional=summary.conditional,
+                depth=summary.depth,
+                repeated=dict(summary.repeated),
+                unresolved=list(dict.fromkeys(summary.unresolved)),
+                cycle=summary.cycle,
+            )
+            for trigger in triggers
+        ]
+
+    def _expand(
+        self,
+        name: str,
+        chain: Tuple[str, ...],
+        in_loop: bool,
+        in_branch: bool,
+        summary: InvocationSummary,
+        repeated: Counter,
+        looped: Set[str],
+    ) -> int:
+        depth = 0
+        for call in self.nodes[name].calls:
+            if call.child is None:
+                summary.unresolved.append(f"{call.caller}.{call.action}: {call.target}")
+                continue
+
+            per_item = in_loop or bool(call.loops)
+            conditional = in_branch or bool(call.branches)
+            summary.invocations += 1
+            summary.per_item += per_item
+            summary.conditional += conditional
+            repeated[call.child] += 1
+            if per_item:
+                # Dentro de un bucle se repite aunque solo haya un punto de llamada
+                looped.add(call.child)
+
+            if call.child in chain:
+                summary.cycle = True
+                depth = max(depth, 1)
+                continue
+            depth = max(
+                depth,
+                1 + self._expand(
+                    call.child, chain + (call.child,), per_item, conditional, summary, repeated, looped
+                ),
+            )
+        return depth
+
+    def summaries(self) -> List[InvocationSummary]:
+        """
+        Invocation figures of every playbook of the pack, in pack order.
+        """
+        return [summary for name in self.nodes for summary in self.summarize(name)]
+
+
+def build_call_graph(playbooks: Iterable[Tuple[str, PlaybookDocument, str]]) -> CallGraph:
+    """
+    Build the call graph of a pack and resolve every call site to its child.
+
+    Args:
+        playbooks (Iterable[Tuple[str, PlaybookDocument, str]]):
+            `(deployment name, playbook, source name)` triples.
+
+    Returns:
+        CallGraph: Nodes in the given order; unresolved calls keep `child=None`.
+    """
+    graph = CallGraph()
+    known: Dict[str, str] = {}
+    for name, doc, source in playbooks:
+        graph.nodes[name] = _playbook_calls(name, doc, source)
+        known[name.lower()] = name
+        stem = source.rsplit(".", 1)[0].lower()
+        known.setdefault(stem, name)
+        if stem.startswith("cliente_"):
+            known.setdefault(stem[len("cliente_"):], name)
+
+    unresolved = 0
+    for call in graph.calls():
+        call.child = _resolve(_target_name(call.target), known)
+        if call.child is None:
+            unresolved += 1
+            logger.warning(
+                "%s.%s llama a un workflow que no está en el pack: %s", call.caller, call.action, call.target
+            )
+
+    logger.info(
+        "Grafo de llamadas: %d playbooks, %d llamadas a workflows, %d sin resolver.",
+        len(graph.nodes),
+        sum(len(node.calls) for node in graph.nodes.values()),
+        unresolved,
+    )
+    return graph
+
+
+def output_call_graph(output_dir: Path, master_path: Optional[Path] = None) -> CallGraph:
+    """
+    Call graph of an output folder: the playbooks linked by its master.
+
+    Args:
+        output_dir (Path): Folder with the master and the transformed playbooks.
+        master_path (Optional[Path]): Master template; defaults to the
+            `deploy*.json` inside `output_dir`.
+
+    Returns:
+        CallGraph: Graph of the pack.
+
+    Raises:
+        NotADirectoryError: If `output_dir` is not a directory.
+        FileNotFoundError: If no master template is found.
+    """
+    master = load_master_template(master_path or find_master(output_dir))
+    return build_call_graph(
+        (name, PlaybookDocument(load_playbook(path)), path.name)
+        for name, path in linked_playbooks(output_dir, master)
+    )
@@ -0,0 +1,480 @@
+"""
+Foreach concurrency analysis and rewrite for Logic Apps workflows.
+
+Every `Foreach` loop is classified by its current mode:
+    sequential   `concurrency.repetitions` is 1 or `operationOptions` is Sequential
+    default      no `runtimeConfiguration.concurrency` (platform default, 20 in parallel)
+    parallel     explicit `concurrency.repetitions` > 1
+
+and by whether its iterations can run concurrently:
+    safe         the body only accumulates into variables with Append actions
+                 (atomic in Logic Apps) and never reads those variables back
+    unsafe       the body uses SetVariable / IncrementVariable / DecrementVariable
+                 (state shared across iterations), reads a variable it appends
+                 to, or appends to a string variable (`order_sensitive`: once
+                 parallel the text follows completion order, not input order)
+
+`parallelize_foreach_loops` rewrites the loops of a built pack:
+
+- Order-sensitive loops whose string appends are top-level actions of the body
+  (`collectable`) keep the input order in parallel: each append becomes a
+  Compose with the same text and, after the loop, the texts of the iterations
+  are read with `result()` (one entry per iteration and action, in input
+  order), filtered, mapped with a Select and appended once with `join()`:
+
+      For_each            Append_X -> Compose Append_X (same text)
+      Filter_<loop>       Query over result('<loop>'): Append_X that succeeded
+      Select_<loop>       their outputs
+      Append_<loop>       AppendToStringVariable join(body('Select_<loop>'), '')
+
+  The actions that ran after the loop keep their `runAfter` on it and also
+  wait for `Append_<loop>`; if nothing ran after it, `Check_<loop>` (run only
+  when the loop succeeded) keeps the loop's status as the status of its scope.
+- Safe loops that run with the platform default take their degree of
+  parallelism from a playbook parameter, which the master fills from one pack
+  parameter, so it is chosen at deploy time.
+- Unsafe loops that run in parallel are pinned to `repetitions: 1`.
+
+Loops the author made sequential (`repetitions: 1` or `Sequential`) are kept
+as they are. With `allow_reorder` the caller accepts that the order of the
+appended text follows completion order: order-sensitive loops that cannot be
+collected count as safe and explicitly sequential ones are rewritten too.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .diff import DEPLOYMENT_TYPE
+from .document import PlaybookDocument, WORKFLOW_TYPE, iter_actions
+from .expressions import call_sites, is_expression
+from ..config import DEFAULT_FOREACH_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+CONCURRENCY_PARAMETER: str = "foreach_Concurrency"
+CONCURRENCY_PACK_PARAMETER: str = "foreach_Concurrency_Pack"
+# Límite de Logic Apps (Consumption) para concurrency.repetitions de un Foreach
+MAX_FOREACH_CONCURRENCY: int = 50
+# Límite de Logic Apps para la longitud del nombre de una acción
+MAX_ACTION_NAME: int = 80
+
+SEQUENTIAL = "sequential"
+DEFAULT = "default"
+PARALLEL = "parallel"
+
+_APPEND_TYPES = frozenset({"appendtoarrayvariable", "appendtostringvariable"})
+_STATE_TYPES = frozenset({"setvariable", "incrementvariable", "decrementvariable"})
+_ALL_STATUSES = ["Succeeded", "Failed", "TimedOut", "Skipped"]
+
+
+@dataclass
+class ForeachFinding:
+    """
+    Analysis of one `Foreach` loop.
+
+    Attributes:
+        source (str): Document name.
+        path (str): JSON path of the loop inside the workflow definition.
+        name (str): Action name.
+        mode (str): SEQUENTIAL, DEFAULT or PARALLEL.
+        repetitions (Optional[int]): Explicit degree of parallelism, if any.
+        safe (bool): Whether iterations can run concurrently.
+        order_sensitive (bool): The body appends to a string variable, so the
+            text order depends on the execution order. Unsafe unless the
+            analysis was run with `allow_reorder` or the loop is collected.
+        collectable (bool): Order-sensitive only, with every string append at
+            the top level of the body, so the appends can be collected in
+            input order.
+        reasons (List[str]): Why the loop is unsafe (empty when safe).
+        rewritten (bool): Set by `parallelize_foreach_loops` when the loop
+            reads its concurrency from `foreach_Concurrency`.
+        collected (bool): Set by `parallelize_foreach_loops` when the string
+            appends were moved after the loop in input order.
+        pinned (bool): Set by `parallelize_foreach_loops` when an unsafe
+            parallel loop was made sequential.
+    """
+
+    source: str
+    path: str
+    name: str
+    mode: str
+    repetitions: Optional[int] = None
+    safe: bool = True
+    order_sensitive: bool = False
+    collectable: bool = False
+    reasons: List[str] = field(default_factory=list)
+    rewritten: bool = False
+    collected: bool = False
+    pinned: bool = False
+
+
+def _iter_strings(obj: Any) -> Iterator[str]:
+    if isinstance(obj, str):
+        yield obj
+    elif isinstance(obj, dict):
+        for value in obj.values():
+            yield from _iter_strings(value)
+    elif isinstance(obj, list):
+        for item in obj:
+            yield from _iter_strings(item)
+
+
+def _variable_reads(obj: Any) -> Set[str]:
+    """
+    Logic Apps `variables('X')` read anywhere in `obj` (not ARM `variables()`).
+    """
+    names: Set[str] = set()
+    for text in _iter_strings(obj):
+        arm = is_expression(text)
+        for site in call_sites(text):
+            if site.kind == "variables" and (not arm or site.start < 0):
+                names.add(site.name)
+    return names
+
+
+def _mode(loop: Dict[str, Any]) -> Tuple[str, Optional[int]]:
+    if str(loop.get("operationOptions", "")).lower() == "sequential":
+        return SEQUENTIAL, 1
+    runtime = loop.get("runtimeConfiguration")
+    concurrency = runtime.get("concurrency") if isinstance(runtime, dict) else None
+    repetitions = concurrency.get("repetitions") if isinstance(concurrency, dict) else None
+    if repetitions is None:
+        return DEFAULT, None
+    if isinstance(repetitions, int):
+        return (SEQUENTIAL if repetitions <= 1 else PARALLEL), repetitions
+    # Expresión (p.ej. un parámetro ya aplicado por esta misma pasada)
+    return PARALLEL, None
+
+
+def analyze_foreach(
+    loop: Dict[str, Any],
+    name: str,
+    path: str,
+    source: str = "",
+    allow_reorder: bool = False,
+) -> ForeachFinding:
+    """
+    Classify one `Foreach` action.
+
+    Args:
+        loop (Dict[str, Any]): The Foreach action.
+        name (str): Action name.
+        path (str): JSON path used in the report.
+        source (str): Document name used in the report.
+        allow_reorder (bool): Consider loops that append to a string variable
+            safe (the text order will follow completion order).
+
+    Returns:
+        ForeachFinding: Mode, safety and reasons.
+    """
+    mode, repetitions = _mode(loop)
+    finding = ForeachFinding(source=source, path=path, name=name, mode=mode, repetitions=repetitions)
+
+    body = loop.get("actions") if isinstance(loop.get("actions"), dict) else {}
+    appended: Set[str] = set()
+    order_reasons: List[str] = []
+    nested_string_append = False
+    for action_name, action, _, depth in iter_actions(body, f"{path}.actions"):
+        action_type = str(action.get("type", "")).lower()
+        inputs = action.get("inputs")
+        target = inputs.get("name") if isinstance(inputs, dict) else None
+        if action_type in _STATE_TYPES:
+            finding.reasons.append(f"{action.get('type')} '{target}' in {action_name}")
+        elif action_type in _APPEND_TYPES and isinstance(target, str):
+            appended.add(target)
+            if action_type == "appendtostringvariable":
+                finding.order_sensitive = True
+                nested_string_append = nested_string_append or depth > 1
+                order_reasons.append(f"appends to string variable '{target}' in {action_name} (order)")
+        elif action_type == "until":
+            finding.reasons.append(f"Until loop {action_name}")
+
+    read_back = sorted(appended & _variable_reads(loop))
+    for var in read_back:
+        finding.reasons.append(f"reads appended variable '{var}'")
+
+    finding.collectable = finding.order_sensitive and not finding.reasons and not nested_string_append
+    if not allow_reorder:
+        finding.reasons.extend(order_reasons)
+    finding.safe = not finding.reasons
+    return finding
+
+
+def _nested_scopes(action: Dict[str, Any], path: str) -> Iterator[Tuple[Any, str]]:
+    yield action.get("actions"), f"{path}.actions"
+    for key in ("else", "default"):
+        branch = action.get(key)
+        if isinstance(branch, dict):
+            yield branch.get("actions"), f"{path}.{key}.actions"
+    cases = action.get("cases")
+    if isinstance(cases, dict):
+        for case_name, case in cases.items():
+            if isinstance(case, dict):
+                yield case.get("actions"), f"{path}.cases.{case_name}.actions"
+
+
+def _iter_scoped_foreach(actions: Any, path: str) -> Iterator[Tuple[str, Dict[str, Any], str, Dict[str, Any]]]:
+    """
+    Every Foreach below `actions`, in document order, with the `actions` dict that holds it.
+    """
+    if not isinstance(actions, dict):
+        return
+    for name, action in list(actions.items()):
+        if not isinstance(action, dict):
+            continue
+        action_path = f"{path}.{name}"
+        if str(action.get("type", "")).lower() == "foreach":
+            yield name, action, action_path, actions
+        for inner, inner_path in _nested_scopes(action, action_path):
+            yield from _iter_scoped_foreach(inner, inner_path)
+
+
+def _iter_foreach(doc: PlaybookDocument) -> Iterator[Tuple[str, Dict[str, Any], str, Dict[str, Any], Dict[str, Any]]]:
+    for index, res in enumerate(doc.resources):
+        if not isinstance(res, dict) or res.get("type") != WORKFLOW_TYPE:
+            continue
+        definition = doc.definition(res)
+        if definition is None:
+            continue
+        base = f"$.resources[{index}].properties.definition.actions"
+        for name, loop, path, scope in _iter_scoped_foreach(definition.get("actions"), base):
+            yield name, loop, path, scope, definition
+
+
+def analyze_document(doc: PlaybookDocument, source: str = "", allow_reorder: bool = False) -> List[ForeachFinding]:
+    """
+    Classify every `Foreach` loop of a playbook.
+
+    Args:
+        doc (PlaybookDocument): Playbook to analyze.
+        source (str): Name used in the report.
+        allow_reorder (bool): See `analyze_foreach`.
+
+    Returns:
+        List[ForeachFinding]: One entry per loop, in document order.
+    """
+    return [
+        analyze_foreach(loop, name, path, source, allow_reorder)
+        for name, loop, path, _, _ in _iter_foreach(doc)
+    ]
+
+
+def _collect_appends(
+    scope: Dict[str, Any],
+    name: str,
+    loop: Dict[str, Any],
+    taken: Set[str],
+) -> Optional[str]:
+    """
+    Move the string appends of a collectable loop after it, in input order, in
+    place. Returns the reason when it cannot be done.
+    """
+    body = loop["actions"]
+    appends: Dict[str, List[str]] = {}
+    for action_name, action in body.items():
+        if isinstance(action, dict) and str(action.get("type", "")).lower() == "appendtostringvariable":
+            appends.setdefault(action["inputs"]["name"], []).append(action_name)
+
+    suffixes = [""] if len(appends) == 1 else [f"_{i}" for i in range(1, len(appends) + 1)]
+    names = [
+        (f"Filter_{name}{suffix}", f"Select_{name}{suffix}", f"Append_{name}{suffix}")
+        for suffix in suffixes
+    ]
+    successors = [
+        other for other, action in scope.items()
+        if isinstance(action, dict) and isinstance(action.get("runAfter"), dict) and name in action["runAfter"]
+    ]
+    check = f"Check_{name}"
+    new_names = [n for group in names for n in group] + ([] if successors else [check])
+    clash = sorted(n for n in new_names if n.lower() in taken)
+    if clash:
+        return f"action names already in use: {', '.join(clash)}"
+    if any(len(n) > MAX_ACTION_NAME for n in new_names):
+        return f"action names longer than {MAX_ACTION_NAME} characters"
+
+    for action_names in appends.values():
+        for action_name in action_names:
+            action = body[action_name]
+            action["type"] = "Compose"
+            action["inputs"] = action["inputs"].get("value", "")
+
+    # El texto se añade una vez terminado el bucle, termine como termine
+    previous, statuses = name, ["Succeeded", "Failed", "TimedOut"]
+    for (variable, action_names), (filter_name, select_name, append_name) in zip(appends.items(), names):
+        listed = ", ".join("'" + n.replace("'", "''") + "'" for n in action_names)
+        scope[filter_name] = {
+            "runAfter": {previous: statuses},
+            "type": "Query",
+            "inputs": {
+                "from": f"@result('{name}')",
+                "where": (
+                    f"@and(contains(createArray({listed}), item()?['name']), "
+                    f"equals(item()?['status'], 'Succeeded'))"
+                ),
+            },
+        }
+        scope[select_name] = {
+            "runAfter": {filter_name: ["Succeeded"]},
+            "type": "Select",
+            "inputs": {"from": f"@body('{filter_name}')", "select": "@item()?['outputs']"},
+        }
+        scope[append_name] = {
+            "runAfter": {select_name: ["Succeeded"]},
+            "type": "AppendToStringVariable",
+            "inputs": {"name": variable, "value": f"@{{join(body('{select_name}'), '')}}"},
+        }
+        previous, statuses = append_name, ["Succeeded"]
+
+    # Lo que iba detrás del bucle sigue dependiendo de su estado y espera al texto
+    for other in successors:
+        scope[other]["runAfter"][previous] = list(_ALL_STATUSES)
+    if not successors:
+        # Sin sucesores el estado del scope lo daría la última acción añadida:
+        # Check_<loop> solo se ejecuta si el bucle terminó bien y conserva su fallo
+        scope[check] = {
+            "runAfter": {name: ["Succeeded"], previous: list(_ALL_STATUSES)},
+            "type": "Compose",
+            "inputs": f"@length(body('{names[-1][1]}'))",
+        }
+    taken.update(n.lower() for n in new_names)
+    return None
+
+
+def _rewrite_document(
+    doc: PlaybookDocument,
+    source: str,
+    default: int,
+    allow_reorder: bool,
+) -> List[ForeachFinding]:
+    findings: List[ForeachFinding] = []
+    taken: Dict[int, Set[str]] = {}
+    for name, loop, path, scope, definition in _iter_foreach(doc):
+        finding = analyze_foreach(loop, name, path, source, allow_reorder)
+        names = taken.get(id(definition))
+        if names is None:
+            names = {n.lower() for n, _, _, _ in iter_actions(definition.get("actions"))}
+            taken[id(definition)] = names
+
+        # Un Foreach secuencial lo decidió el autor: solo se cambia si se acepta el reordenamiento
+        runs_parallel = finding.mode != SEQUENTIAL or allow_reorder
+        if finding.collectable and runs_parallel:
+            reason = _collect_appends(scope, name, loop, names)
+            if reason is None:
+                finding.collected = True
+                finding.reasons = []
+                finding.safe = True
+            elif not finding.safe:
+                finding.reasons.append(reason)
+
+        if finding.safe and (finding.mode == DEFAULT or (finding.mode == SEQUENTIAL and allow_reorder)):
+            loop.pop("operationOptions", None)
+            runtime = loop.get("runtimeConfiguration")
+            if not isinstance(runtime, dict):
+                runtime = {}
+                loop["runtimeConfiguration"] = runtime
+            runtime["concurrency"] = {"repetitions": f"[parameters('{CONCURRENCY_PARAMETER}')]"}
+            finding.rewritten = True
+        elif not finding.safe and finding.mode != SEQUENTIAL:
+            # Iteraciones que comparten estado: en paralelo hay condiciones de carrera
+            runtime = loop.get("runtimeConfiguration")
+            if not isinstance(runtime, dict):
+                runtime = {}
+                loop["runtimeConfiguration"] = runtime
+            runtime["concurrency"] = {"repetitions": 1}
+            finding.pinned = True
+        findings.append(finding)
+
+    if any(f.rewritten for f in findings):
+        doc.ensure_root_parameters()[CONCURRENCY_PARAMETER] = {
+            "type": "Int",
+            "defaultValue": default,
+            "minValue": 1,
+            "maxValue": MAX_FOREACH_CONCURRENCY,
+        }
+    return findings
+
+
+def parallelize_foreach_loops(
+    master_template: Dict[str, Any],
+    playbooks: Iterable[Tuple[str, PlaybookDocument, str]],
+    concurrency: int = DEFAULT_FOREACH_CONCURRENCY,
+    allow_reorder: bool = False,
+) -> List[ForeachFinding]:
+    """
+    Make the `Foreach` loops of a built pack safely concurrent, in place.
+
+    String appends of order-sensitive loops are collected in input order,
+    safe loops that run with the platform default read their degree of
+    parallelism from the playbook parameter `foreach_Concurrency` (filled by
+    each affected deployment of the master from the pack parameter
+    `foreach_Concurrency_Pack`, default `concurrency`) and unsafe loops that
+    run in parallel are pinned to one iteration at a time. Explicitly
+    sequential loops are only rewritten with `allow_reorder`.
+
+    Args:
+        master_template (Dict[str, Any]): Master of the pack.
+        playbooks (Iterable[Tuple[str, PlaybookDocument, str]]):
+            `(deployment name, playbook, source name)` triples.
+        concurrency (int): Default degree of parallelism (1-50).
+        allow_reorder (bool): Also rewrite explicitly sequential loops, and
+            parallelize order-sensitive loops that cannot be collected.
+
+    Returns:
+        List[ForeachFinding]: Every loop of the pack, with `rewritten`,
+        `collected` and `pinned` set on the ones changed.
+
+    Raises:
+        ValueError: If `concurrency` is outside 1-50.
+    """
+    if not 1 <= concurrency <= MAX_FOREACH_CONCURRENCY:
+        raise ValueError(f"Foreach concurrency must be between 1 and {MAX_FOREACH_CONCURRENCY}, got {concurrency}.")
+
+    deployments = {
+        res.get("name"): res
+        for res in master_template.get("resources", [])
+        if isinstance(res, dict) and res.get("type") == DEPLOYMENT_TYPE
+    }
+
+    findings: List[ForeachFinding] = []
+    rewritten_any = False
+    for name, doc, source in playbooks:
+        doc_findings = _rewrite_document(doc, source, concurrency, allow_reorder)
+        findings.extend(doc_findings)
+        if not any(f.rewritten for f in doc_findings):
+            continue
+
+        deployment = deployments.get(name)
+        if deployment is None:
+            continue
+        props = deployment.setdefault("properties", {})
+        params = props.get("parameters")
+        if not isinstance(params, dict):
+            params = {}
+            props["parameters"] = params
+        params[CONCURRENCY_PARAMETER] = {"value": f"[parameters('{CONCURRENCY_PACK_PARAMETER}')]"}
+        rewritten_any = True
+
+    if rewritten_any:
+        master_params = master_template.get("parameters")
+        if not isinstance(master_params, dict):
+            master_params = {}
+            master_template["parameters"] = master_params
+        master_params[CONCURRENCY_PACK_PARAMETER] = {
+            "defaultValue": concurrency,
+            "type": "int",
+            "minValue": 1,
+            "maxValue": MAX_FOREACH_CONCURRENCY,
+        }
+
+    logger.info(
+        "Foreach: %d bucles, %d paralelizados, %d con el texto en orden de entrada, %d pasan a secuenciales, %d no seguros.",
+        len(findings),
+        sum(1 for f in findings if f.rewritten),
+        sum(1 for f in findings if f.collected),
+        sum(1 for f in findings if f.pinned),
+        sum(1 for f in findings if not f.safe),
+    )
+    return findings
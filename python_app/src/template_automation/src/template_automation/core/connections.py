@@ -0,0 +1,336 @@
+"""
+API connection resources and the shared per-pack connection mode.
+
+By default every playbook deploys its own `azuresentinel-<playbook>` (and
+`keyvault-<playbook>`) connection. `share_connections` rewrites a built pack
+so the master deploys one Sentinel and one Key Vault connection for the whole
+pack, in an inline `SharedConnections` deployment that runs first:
+
+    master:   SharedConnections (Microsoft.Web/connections x 2)
+              <playbook> deployments: dependsOn SharedConnections,
+                  AzureSentinelConnectionId / KeyVaultConnectionId parameters
+    playbook: no connection resources; $connections uses the ids received
+
+Key Vault is only shared when every playbook that uses it receives the same
+`keyvault_Name` from the master; otherwise those playbooks keep their own.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .diff import DEPLOYMENT_TYPE
+from .document import CONNECTION_TYPE, PlaybookDocument
+
+logger = logging.getLogger(__name__)
+
+SHARED_CONNECTIONS_DEPLOYMENT: str = "SharedConnections"
+DEFAULT_DEPLOYMENT_API_VERSION: str = "2022-09-01"
+
+
+@dataclass(frozen=True)
+class _ConnectionKind:
+    # Variable del playbook con el nombre de la conexión
+    variable: str
+    # Clave en $connections.value
+    key: str
+    # Parámetro del playbook con el id de la conexión compartida
+    id_parameter: str
+    # Variable de la master con el nombre de la conexión compartida
+    master_variable: str
+    prefix: str
+
+
+SENTINEL = _ConnectionKind(
+    "AzureSentinelConnectionName", "azuresentinel", "AzureSentinelConnectionId",
+    "SharedAzureSentinelConnectionName", "azuresentinel-",
+)
+KEYVAULT = _ConnectionKind(
+    "keyvault_Connection_Name", "keyvault", "KeyVaultConnectionId",
+    "SharedKeyVaultConnectionName", "keyvault-",
+)
+
+
+def azuresentinel_connection_resource(name_expr: str) -> Dict[str, Any]:
+    """
+    Microsoft.Web/connections resource for Azure Sentinel (managed identity).
+
+    Args:
+        name_expr (str): Connection name (usually an expression).
+
+    Returns:
+        Dict[str, Any]: The connection resource.
+    """
+    api_id_expr = (
+        "[concat('/subscriptions/', subscription().subscriptionId, "
+        "'/providers/Microsoft.Web/locations/', resourceGroup().location, "
+        "'/managedApis/azuresentinel')]"
+    )
+    return {
+        "type": CONNECTION_TYPE,
+        "apiVersion": "2016-06-01",
+        "name": name_expr,
+        "location": "[resourceGroup().location]",
+        "kind": "V1",
+        "properties": {
+            "displayName": name_expr,
+            "customParameterValues": {},
+            "parameterValueType": "Alternative",
+            "api": {"id": api_id_expr},
+        },
+    }
+
+
+def keyvault_connection_resource(name_expr: str, vault_name_expr: str) -> Dict[str, Any]:
+    """
+    Microsoft.Web/connections resource for Key Vault.
+
+    Args:
+        name_expr (str): Connection name (usually an expression).
+        vault_name_expr (str): Vault name value or expression.
+
+    Returns:
+        Dict[str, Any]: The connection resource.
+    """
+    api_id_expr = (
+        "[concat(subscription().id, '/providers/Microsoft.Web/locations/', "
+        "resourceGroup().location, '/managedApis/', 'keyvault')]"
+    )
+    return {
+        "type": CONNECTION_TYPE,
+        "apiVersion": "2016-06-01",
+        "name": name_expr,
+        "location": "[resourceGroup().location]",
+        "properties": {
+            "api": {"id": api_id_expr},
+            "displayName": name_expr,
+            "parameterValueType": "Alternative",
+            "AlternativeParameterValues": {"vaultName": vault_name_expr},
+        },
+    }
+
+
+@dataclass
+class SharedConnectionsReport:
+    """
+    Result of `share_connections`.
+
+    Attributes:
+        sentinel_playbooks (List[str]): Deployments now using the shared Sentinel connection.
+        keyvault_playbooks (List[str]): Deployments now using the shared Key Vault connection.
+        removed_resources (int): Connection resources removed from the playbooks.
+        added_resources (int): Connection resources deployed by the master.
+    """
+
+    sentinel_playbooks: List[str] = field(default_factory=list)
+    keyvault_playbooks: List[str] = field(default_factory=list)
+    removed_resources: int = 0
+    added_resources: int = 0
+
+
+def _deployment(master_template: Dict[str, Any], name: str) -> Optional[Dict[str, Any]]:
+    for res in master_template.get("resources", []):
+        if isinstance(res, dict) and res.get("type") == DEPLOYMENT_TYPE and res.get("name") == name:
+            return res
+    return None
+
+
+def _deployment_parameters(deployment: Dict[str, Any]) -> Dict[str, Any]:
+    props = deployment.setdefault("properties", {})
+    params = props.get("parameters")
+    if not isinstance(params, dict):
+        params = {}
+        props["parameters"] = params
+    return params
+
+
+def _connection_expr(kind: _ConnectionKind) -> str:
+    return f"[variables('{kind.variable}')]"
+
+
+def _uses(doc: PlaybookDocument, kind: _ConnectionKind) -> bool:
+    return doc.has_connection(_connection_expr(kind))
+
+
+def _detach_playbook(doc: PlaybookDocument, kind: _ConnectionKind) -> int:
+    """
+    Make a playbook use a connection id received as parameter instead of its
+    own connection resource. Returns the number of resources removed.
+    """
+    name_expr = _connection_expr(kind)
+    dependency = f"[resourceId('Microsoft.Web/connections', variables('{kind.variable}'))]"
+
+    resources = doc.data.get("resources", [])
+    kept = [
+        res for res in resources
+        if not (isinstance(res, dict) and res.get("type") == CONNECTION_TYPE and res.get("name") == name_expr)
+    ]
+    removed = len(resources) - len(kept)
+    doc.data["resources"] = kept
+    doc.reindex()
+
+    for workflow in doc.workflows:
+        depends_on = workflow.get("dependsOn")
+        if isinstance(depends_on, list) and dependency in depends_on:
+            depends_on.remove(dependency)
+            if not depends_on:
+                del workflow["dependsOn"]
+
+        props = doc.properties(workflow) or {}
+        connections = (props.get("parameters") or {}).get("$connections")
+        value = connections.get("value") if isinstance(connections, dict) else None
+        entry = value.get(kind.key) if isinstance(value, dict) else None
+        if isinstance(entry, dict):
+            entry["connectionId"] = f"[parameters('{kind.id_parameter}')]"
+
+    doc.ensure_root_parameters()[kind.id_parameter] = {"type": "String"}
+    # El nombre se sigue necesitando en $connections: último segmento del id
+    doc.ensure_variables()[kind.variable] = f"[last(split(parameters('{kind.id_parameter}'), '/'))]"
+
+    return removed
+
+
+def _shared_deployment_index(master_template: Dict[str, Any]) -> Optional[int]:
+    for index, res in enumerate(master_template.get("resources", [])):
+        if (
+            isinstance(res, dict)
+            and res.get("type") == DEPLOYMENT_TYPE
+            and res.get("name") == SHARED_CONNECTIONS_DEPLOYMENT
+        ):
+            return index
+    return None
+
+
+def share_connections(
+    master_template: Dict[str, Any],
+    playbooks: Iterable[Tuple[str, PlaybookDocument]],
+    pack_name: str = "pack",
+) -> SharedConnectionsReport:
+    """
+    Move the per-playbook Sentinel and Key Vault connections of a built pack
+    to one shared connection of each kind deployed by the master, in place.
+
+    Args:
+        master_template (Dict[str, Any]): Master of the pack (already synced).
+        playbooks (Iterable[Tuple[str, PlaybookDocument]]): `(deployment name, playbook)`
+            pairs, already transformed.
+        pack_name (str): Used in the connection names when the master has no
+            `client_Name` parameter.
+
+    Returns:
+        SharedConnectionsReport: Playbooks rewired and resources removed/added.
+    """
+    report = SharedConnectionsReport()
+    playbooks = [(name, doc) for name, doc in playbooks if _deployment(master_template, name) is not None]
+
+    sentinel_users = [(name, doc) for name, doc in playbooks if _uses(doc, SENTINEL)]
+    keyvault_users = [(name, doc) for name, doc in playbooks if _uses(doc, KEYVAULT)]
+
+    # Key Vault solo se comparte si todos reciben el mismo keyvault_Name
+    vault_values = {
+        repr(_deployment_parameters(_deployment(master_template, name)).get("keyvault_Name"))
+        for name, _ in keyvault_users
+    }
+    vault_name_expr: Optional[Any] = None
+    if keyvault_users:
+        first = _deployment_parameters(_deployment(master_template, keyvault_users[0][0])).get("keyvault_Name")
+        if len(vault_values) == 1 and isinstance(first, dict) and "value" in first:
+            vault_name_expr = first["value"]
+        else:
+            logger.warning(
+                "Los playbooks con Key Vault no reciben el mismo keyvault_Name; "
+                "se mantiene una conexión de Key Vault por playbook."
+            )
+            keyvault_users = []
+
+    if not sentinel_users and not keyvault_users:
+        logger.info("Ningún playbook tiene conexiones que compartir.")
+        return report
+
+    master_params = master_template.get("parameters")
+    has_client = isinstance(master_params, dict) and "client_Name" in master_params
+    variables = master_template.get("variables")
+    if not isinstance(variables, dict):
+        variables = {}
+        master_template["variables"] = variables
+
+    shared_resources: List[Dict[str, Any]] = []
+    for kind, users in ((SENTINEL, sentinel_users), (KEYVAULT, keyvault_users)):
+        if not users:
+            continue
+
+        variables[kind.master_variable] = (
+            f"[concat('{kind.prefix}', parameters('client_Name'))]" if has_client else f"{kind.prefix}{pack_name}"
+        )
+        master_name_expr = f"[variables('{kind.master_variable}')]"
+        if kind is SENTINEL:
+            shared_resources.append(azuresentinel_connection_resource(master_name_expr))
+        else:
+            shared_resources.append(keyvault_connection_resource(master_name_expr, vault_name_expr))
+
+        connection_id = f"[resourceId('Microsoft.Web/connections', variables('{kind.master_variable}'))]"
+        for name, doc in users:
+            report.removed_resources += _detach_playbook(doc, kind)
+
+            deployment = _deployment(master_template, name)
+            dep_params = _deployment_parameters(deployment)
+            dep_params[kind.id_parameter] = {"value": connection_id}
+
+            depends_on = deployment.get("dependsOn")
+            if not isinstance(depends_on, list):
+                depends_on = []
+                deployment["dependsOn"] = depends_on
+            if SHARED_CONNECTIONS_DEPLOYMENT not in depends_on:
+                depends_on.insert(0, SHARED_CONNECTIONS_DEPLOYMENT)
+
+            if kind is KEYVAULT:
+                # keyvault_Name se conserva aunque solo lo usara la conexión propia:
+                # al reprocesar la master (modo batch) el transformador lo necesita
+                # para reconstruir la conexión que se vuelve a compartir aquí
+                report.keyvault_playbooks.append(name)
+            else:
+                report.sentinel_playbooks.append(name)
+
+    api_version = next(
+        (
+            res.get("apiVersion") for res in master_template.get("resources", [])
+            if isinstance(res, dict) and res.get("type") == DEPLOYMENT_TYPE and res.get("apiVersion")
+        ),
+        DEFAULT_DEPLOYMENT_API_VERSION,
+    )
+    shared_deployment = {
+        "type": DEPLOYMENT_TYPE,
+        "apiVersion": api_version,
+        "name": SHARED_CONNECTIONS_DEPLOYMENT,
+        "properties": {
+            "mode": "Incremental",
+            "expressionEvaluationOptions": {"scope": "outer"},
+            "template": {
+                "$schema": "https://schema.management.azure.com/schemas/2019-04-01/deploymentTemplate.json#",
+                "contentVersion": "1.0.0.0",
+                "resources": shared_resources,
+            },
+        },
+    }
+
+    # Una master ya procesada (modo batch: se lee y escribe el mismo deploy.json)
+    # conserva su SharedConnections: se sustituye en lugar de añadir otro
+    resources = master_template.setdefault("resources", [])
+    existing = _shared_deployment_index(master_template)
+    if existing is None:
+        resources.insert(0, shared_deployment)
+    else:
+        resources[existing] = shared_deployment
+    report.added_resources = len(shared_resources)
+
+    logger.info(
+        "Conexiones compartidas: %d playbooks con Sentinel, %d con Key Vault; "
+        "%d conexiones eliminadas de los playbooks, %d desplegadas desde la master.",
+        len(report.sentinel_playbooks),
+        len(report.keyvault_playbooks),
+        report.removed_resources,
+        report.added_resources,
+    )
+    return report
@@ -0,0 +1,311 @@
+"""
+Structural diff of two output folders and minimal redeploy master.
+
+Both folders are expected to contain a master template (`deploy*.json`) and
+the transformed playbooks it links to. Documents are compared after parsing,
+so key order and formatting never count as a change.
+
+A deployment is reported as changed when:
+    - it is new in the new master,
+    - its resource in the master changed (parameters, dependsOn, templateLink...),
+    - or the playbook it links to changed.
+
+The trimmed master keeps only the changed deployments, drops `dependsOn`
+entries pointing to deployments that are not redeployed (they already exist
+in Azure) and keeps only the parameters/variables those deployments need.
+"""
+
+from __future__ import annotations
+
+import copy
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Set, Tuple
+
+from .expressions import references
+from .master_loader import load_master_template
+from .playbook_loader import find_playbook, is_playbook_file, load_playbook, playbook_files
+from ..utils.file_system import JsonFileEntry
+from ..utils.repo_index import RE_DEPLOY
+
+logger = logging.getLogger(__name__)
+
+DEPLOYMENT_TYPE: str = "Microsoft.Resources/deployments"
+
+
+
+@dataclass
+class OutputDiff:
+    """
+    Result of comparing two output folders.
+
+    Attributes:
+        changed (List[str]): Deployments to redeploy, in master order.
+        added (List[str]): Subset of `changed` that did not exist before.
+        removed (List[str]): Deployments only present in the old master.
+        reasons (Dict[str, List[str]]): Why each deployment was marked as changed.
+        trimmed_master (Optional[Dict[str, Any]]): Master with only the changed
+            deployments, or None when nothing changed.
+    """
+
+    changed: List[str] = field(default_factory=list)
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    reasons: Dict[str, List[str]] = field(default_factory=dict)
+    trimmed_master: Optional[Dict[str, Any]] = None
+
+
+def find_master(output_dir: Path) -> Path:
+    """
+    Return the master template (`*deploy*.json`) directly inside `output_dir`.
+
+    Raises:
+        NotADirectoryError: If `output_dir` is not a directory.
+        FileNotFoundError: If no master template is found.
+    """
+    if not output_dir.is_dir():
+        raise NotADirectoryError(f"Invalid output directory: {output_dir}")
+
+    candidates = sorted(
+        p for p in output_dir.iterdir()
+        if p.is_file() and p.suffix.lower() == ".json" and RE_DEPLOY.search(p.name)
+    )
+    if not candidates:
+        raise FileNotFoundError(f"No se encontró ningún deploy*.json en {output_dir}")
+    if len(candidates) > 1:
+        logger.warning("Varios deploy templates en %s; se usa %s.", output_dir, candidates[0].name)
+    return candidates[0]
+
+
+def _deployments(master_template: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    return {
+        res["name"]: res
+        for res in master_template.get("resources", [])
+        if isinstance(res, dict) and res.get("type") == DEPLOYMENT_TYPE and isinstance(res.get("name"), str)
+    }
+
+
+def is_inline_deployment(deployment: Dict[str, Any]) -> bool:
+    """
+    Indicate whether a deployment carries its template inline (`properties.template`)
+    instead of linking to a playbook file.
+    """
+    props = deployment.get("properties")
+    return isinstance(props, dict) and isinstance(props.get("template"), dict)
+
+
+def linked_playbook(
+    output_dir: Path,
+    name: str,
+    deployment: Dict[str, Any],
+    files: Optional[Mapping[str, JsonFileEntry]] = None,
+) -> Optional[Path]:
+    """
+    Playbook file a deployment links to: the `templateLink.uri` file name if it
+    exists in `output_dir`, otherwise the usual `[Cliente_]<name>.json` lookup.
+    Inline deployments link to no file (None). `files` are the files of
+    `output_dir` already discovered (see `playbook_files`), used instead of
+    probing the disk.
+    """
+    if is_inline_deployment(deployment):
+        return None
+
+    props = deployment.get("properties")
+    link = props.get("templateLink") if isinstance(props, dict) else None
+    uri = link.get("uri") if isinstance(link, dict) else None
+
+    if isinstance(uri, str) and not uri.startswith("["):
+        candidate = output_dir / uri.rsplit("/", 1)[-1].split("?", 1)[0]
+        if is_playbook_file(candidate, files) if files is not None else candidate.is_file():
+            return candidate
+
+    return find_playbook(output_dir, name, files=files)
+
+
+def linked_playbooks(output_dir: Path, master_template: Dict[str, Any]) -> List[Tuple[str, Path]]:
+    """
+    `(deployment name, playbook file)` of every linked deployment of a master
+    whose playbook exists in `output_dir`, in master order, each file once.
+    """
+    result: List[Tuple[str, Path]] = []
+    seen: Set[Path] = set()
+    files = playbook_files(output_dir)
+    for name, res in _deployments(master_template).items():
+        path = linked_playbook(output_dir, name, res, files)
+        if path is None:
+            if not is_inline_deployment(res):
+                logger.warning("No se encuentra el playbook de '%s' en %s.", name, output_dir)
+            continue
+        if path in seen:
+            continue
+        seen.add(path)
+        result.append((name, path))
+    return result
+
+
+def _load_or_none(path: Optional[Path]) -> Optional[Any]:
+    if path is None:
+        return None
+    try:
+        return load_playbook(path)
+    except (OSError, ValueError) as exc:
+        logger.warning("No se puede leer %s: %s", path, exc)
+        return None
+
+
+def _iter_strings(obj: Any) -> Iterator[str]:
+    if isinstance(obj, str):
+        yield obj
+    elif isinstance(obj, dict):
+        for value in obj.values():
+            yield from _iter_strings(value)
+    elif isinstance(obj, list):
+        for item in obj:
+            yield from _iter_strings(item)
+
+
+def _referenced(obj: Any, kind: str) -> Set[str]:
+    names: Set[str] = set()
+    for text in _iter_strings(obj):
+        names.update(name for ref_kind, name in references(text) if ref_kind == kind)
+    return names
+
+
+def build_trimmed_master(master_template: Dict[str, Any], keep: Set[str]) -> Dict[str, Any]:
+    """
+    Return a copy of `master_template` with only the deployments in `keep`.
+
+    Args:
+        master_template (Dict[str, Any]): New master template.
+        keep (Set[str]): Deployment names to redeploy.
+
+    Returns:
+        Dict[str, Any]: Master with the kept deployments, their `dependsOn`
+        restricted to kept deployments, and only the variables, parameters and
+        outputs they reference.
+    """
+    all_deployments = set(_deployments(master_template))
+    dropped = all_deployments - keep
+
+    resources: List[Dict[str, Any]] = []
+    for res in master_template.get("resources", []):
+        if not isinstance(res, dict):
+            continue
+        if res.get("type") == DEPLOYMENT_TYPE and res.get("name") not in keep:
+            continue
+
+        res = copy.deepcopy(res)
+        depends_on = res.get("dependsOn")
+        if isinstance(depends_on, list):
+            res["dependsOn"] = [
+                dep for dep in depends_on
+                if not isinstance(dep, str) or not any(dep == n or f"'{n}'" in dep for n in dropped)
+            ]
+            if not res["dependsOn"]:
+                del res["dependsOn"]
+        resources.append(res)
+
+    # Outputs that refer to a deployment that is not redeployed cannot be evaluated
+    outputs = {
+        name: copy.deepcopy(value)
+        for name, value in (master_template.get("outputs") or {}).items()
+        if not any(f"'{n}'" in text for text in _iter_strings(value) for n in dropped)
+    }
+
+    # Variables needed (transitively), then parameters needed by resources, outputs and variables
+    variables_src = master_template.get("variables") or {}
+    needed_vars: Set[str] = set()
+    pending = list(_referenced(resources, "variables") | _referenced(outputs, "variables"))
+    while pending:
+        name = pending.pop()
+        if name in needed_vars or name not in variables_src:
+            continue
+        needed_vars.add(name)
+        pending.extend(_referenced(variables_src[name], "variables"))
+
+    variables = {name: copy.deepcopy(v) for name, v in variables_src.items() if name in needed_vars}
+    needed_params = (
+        _referenced(resources, "parameters")
+        | _referenced(outputs, "parameters")
+        | _referenced(variables, "parameters")
+    )
+    parameters = {
+        name: copy.deepcopy(p)
+        for name, p in (master_template.get("parameters") or {}).items()
+        if name in needed_params
+    }
+
+    trimmed: Dict[str, Any] = {}
+    for key, value in master_template.items():
+        if key == "resources":
+            trimmed[key] = resources
+        elif key == "parameters":
+            trimmed[key] = parameters
+        elif key == "variables":
+            trimmed[key] = variables
+        elif key == "outputs":
+            trimmed[key] = outputs
+        else:
+            trimmed[key] = copy.deepcopy(value)
+
+    return trimmed
+
+
+def diff_outputs(old_dir: Path, new_dir: Path) -> OutputDiff:
+    """
+    Compare two output folders and compute the minimal redeploy set.
+
+    Args:
+        old_dir (Path): Previous output folder (e.g. what is deployed).
+        new_dir (Path): Rebuilt output folder.
+
+    Returns:
+        OutputDiff: Changed, added and removed deployments and the trimmed master.
+
+    Raises:
+        NotADirectoryError: If either folder does not exist.
+        FileNotFoundError: If either folder has no master template.
+    """
+    old_master = load_master_template(find_master(old_dir))
+    new_master = load_master_template(find_master(new_dir))
+
+    old_deployments = _deployments(old_master)
+    new_deployments = _deployments(new_master)
+
+    result = OutputDiff()
+    result.removed = [name for name in old_deployments if name not in new_deployments]
+
+    old_files = playbook_files(old_dir)
+    new_files = playbook_files(new_dir)
+
+    for name, new_res in new_deployments.items():
+        old_res = old_deployments.get(name)
+        reasons: List[str] = []
+
+        if old_res is None:
+            reasons.append("new deployment")
+            result.added.append(name)
+        else:
+            if old_res != new_res:
+                reasons.append("master resource")
+
+            old_playbook = _load_or_none(linked_playbook(old_dir, name, old_res, old_files))
+            new_playbook = _load_or_none(linked_playbook(new_dir, name, new_res, new_files))
+            if new_playbook is None and not is_inline_deployment(new_res):
+                logger.warning("No se encuentra el playbook de '%s' en %s.", name, new_dir)
+            if old_playbook != new_playbook:
+                reasons.append("playbook")
+
+        if reasons:
+            result.changed.append(name)
+            result.reasons[name] = reasons
+
+    for name in result.removed:
+        logger.warning("El deployment '%s' ya no existe en la nueva master (no se elimina de Azure).", name)
+
+    if result.changed:
+        result.trimmed_master = build_trimmed_master(new_master, set(result.changed))
+
+    return result
+
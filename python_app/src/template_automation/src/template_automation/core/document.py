@@ -0,0 +1,213 @@
+"""
+Typed view over a playbook (ARM template) built once per transformation.
+
+The view indexes the `Microsoft.Logic/workflows` and `Microsoft.Web/connections`
+resources, the root `parameters`/`variables` sections and each workflow's
+`properties.definition`, so transformation passes can look them up directly
+instead of re-scanning `playbook["resources"]` and repeating the same
+`isinstance` checks in every pass.
+
+The view holds references to the underlying dictionaries: edits made through
+those dictionaries are visible immediately. Structural changes (new sections,
+new connection resources) must go through the `ensure_*`/`add_*` methods so
+the indexes stay consistent.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+WORKFLOW_TYPE: str = "Microsoft.Logic/workflows"
+CONNECTION_TYPE: str = "Microsoft.Web/connections"
+
+
+def iter_actions(actions: Any, path: str = "$.actions", depth: int = 1) -> Iterator[Tuple[str, Dict[str, Any], str, int]]:
+    """
+    Yield every Logic Apps action of an `actions` dict, including the ones
+    nested in Scope/Foreach/Until (`actions`), If (`else`) and Switch
+    (`cases`, `default`).
+
+    Args:
+        actions (Any): A workflow `definition.actions` dict (or any nested one).
+        path (str): JSON path of `actions`, used to build each action's path.
+        depth (int): Nesting depth of the actions in `actions` (top level = 1).
+
+    Yields:
+        Tuple[str, Dict[str, Any], str, int]: `(name, action, path, depth)`.
+    """
+    if not isinstance(actions, dict):
+        return
+    for name, action in actions.items():
+        if not isinstance(action, dict):
+            continue
+        action_path = f"{path}.{name}"
+        yield name, action, action_path, depth
+
+        yield from iter_actions(action.get("actions"), f"{action_path}.actions", depth + 1)
+        for key in ("else", "default"):
+            branch = action.get(key)
+            if isinstance(branch, dict):
+                yield from iter_actions(branch.get("actions"), f"{action_path}.{key}.actions", depth + 1)
+        cases = action.get("cases")
+        if isinstance(cases, dict):
+            for case_name, case in cases.items():
+                if isinstance(case, dict):
+                    yield from iter_actions(case.get("actions"), f"{action_path}.cases.{case_name}.actions", depth + 1)
+
+
+class PlaybookDocument:
+    """
+    Indexed view of a playbook dictionary.
+
+    Attributes:
+        data (Dict[str, Any]): The underlying playbook, modified in place.
+        workflows (List[Dict[str, Any]]): Workflow resources, in document order.
+        connections (Dict[str, Dict[str, Any]]): Connection resources keyed by name.
+    """
+
+    def __init__(self, playbook: Dict[str, Any]) -> None:
+        self.data: Dict[str, Any] = playbook
+        self.workflows: List[Dict[str, Any]] = []
+        self.connections: Dict[str, Dict[str, Any]] = {}
+        self.reindex()
+
+    def reindex(self) -> None:
+        """
+        Rebuild the resource indexes from `data["resources"]`.
+
+        Only needed if resources were added or removed without going through
+        this view.
+        """
+        self.workflows = []
+        self.connections = {}
+
+        for res in self.resources:
+            if not isinstance(res, dict):
+                continue
+            res_type = res.get("type")
+            if res_type == WORKFLOW_TYPE:
+                self.workflows.append(res)
+            elif res_type == CONNECTION_TYPE and isinstance(res.get("name"), str):
+                self.connections.setdefault(res["name"], res)
+
+    # ------------------------------------------------------------------
+    # Root sections
+    # ------------------------------------------------------------------
+    @property
+    def resources(self) -> List[Any]:
+        resources = self.data.get("resources", [])
+        return resources if isinstance(resources, list) else []
+
+    @property
+    def root_parameters(self) -> Dict[str, Any]:
+        """
+        Root `parameters` section, or an empty (detached) dict if missing/invalid.
+        """
+        params = self.data.get("parameters", {})
+        return params if isinstance(params, dict) else {}
+
+    @property
+    def variables(self) -> Dict[str, Any]:
+        """
+        Root `variables` section, or an empty (detached) dict if missing/invalid.
+        """
+        variables = self.data.get("variables", {})
+        return variables if isinstance(variables, dict) else {}
+
+    def ensure_root_parameters(self) -> Dict[str, Any]:
+        params = self.data.get("parameters")
+        if not isinstance(params, dict):
+            params = {}
+            self.data["parameters"] = params
+        return params
+
+    def ensure_variables(self) -> Dict[str, Any]:
+        variables = self.data.get("variables")
+        if not isinstance(variables, dict):
+            variables = {}
+            self.data["variables"] = variables
+        return variables
+
+    # ------------------------------------------------------------------
+    # Workflows
+    # ------------------------------------------------------------------
+    @staticmethod
+    def properties(workflow: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        props = workflow.get("properties")
+        return props if isinstance(props, dict) else None
+
+    @staticmethod
+    def ensure_properties(workflow: Dict[str, Any]) -> Dict[str, Any]:
+        props = workflow.get("properties")
+        if not isinstance(props, dict):
+            props = {}
+            workflow["properties"] = props
+        return props
+
+    @classmethod
+    def definition(cls, workflow: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        props = cls.properties(workflow)
+        if props is None:
+            return None
+        definition = props.get("definition")
+        return definition if isinstance(definition, dict) else None
+
+    def definitions(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yield `properties.definition` of every workflow that has a valid one.
+        """
+        for workflow in self.workflows:
+            definition = self.definition(workflow)
+            if definition is not None:
+                yield definition
+
+    @staticmethod
+    def definition_parameters(definition: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        params = definition.get("parameters")
+        return params if isinstance(params, dict) else None
+
+    @staticmethod
+    def ensure_definition_parameters(definition: Dict[str, Any]) -> Dict[str, Any]:
+        params = definition.get("parameters")
+        if not isinstance(params, dict):
+            params = {}
+            definition["parameters"] = params
+        return params
+
+    def all_definition_parameters(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yield the existing `definition.parameters` dict of every workflow.
+        """
+        for definition in self.definitions():
+            params = self.definition_parameters(definition)
+            if params is not None:
+                yield params
+
+    def parameter_names(self) -> Set[str]:
+        """
+        Names declared as root parameters or in any workflow's definition parameters.
+        """
+        names: Set[str] = {k for k in self.root_parameters if isinstance(k, str)}
+        for params in self.all_definition_parameters():
+            names.update(k for k in params if isinstance(k, str))
+        return names
+
+    # ------------------------------------------------------------------
+    # Connections
+    # ------------------------------------------------------------------
+    def has_connection(self, name: str) -> bool:
+        return name in self.connections
+
+    def add_connection(self, resource: Dict[str, Any]) -> None:
+        """
+        Append a `Microsoft.Web/connections` resource and index it.
+        """
+        resources = self.data.get("resources")
+        if not isinstance(resources, list):
+            resources = []
+            self.data["resources"] = resources
+
+        resources.append(resource)
+        name = resource.get("name")
+        if isinstance(name, str):
+            self.connections.setdefault(name, resource)
@@ -0,0 +1,475 @@
+"""
+Offline evaluation of the ARM expressions used in masters and playbooks.
+
+Only the subset the transformer emits is supported:
+    concat, parameters, variables, resourceGroup, subscription, resourceId,
+    encodeURIComponent, split, last, replace, reference
+plus property access (`resourceGroup().name`) and indexing. Any other
+function is reported as a failure, so an unexpected expression is noticed
+here instead of during the deployment.
+
+Results are memoized per evaluator (one per parameter set): every distinct
+expression string and every sub-expression is computed once.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import quote
+
+from .diff import DEPLOYMENT_TYPE, is_inline_deployment, linked_playbook
+from .expressions import Call, ExpressionError, Index, Literal, Node, Property, is_expression, parse
+from .master_loader import load_master_template
+from .playbook_loader import load_playbook, playbook_files
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DeploymentContext:
+    """
+    Values returned by `subscription()` and `resourceGroup()`.
+    """
+
+    subscription_id: str = "00000000-0000-0000-0000-000000000000"
+    tenant_id: str = "00000000-0000-0000-0000-000000000000"
+    resource_group: str = "rg-sentinel"
+    location: str = "westeurope"
+
+    def subscription_object(self) -> Dict[str, Any]:
+        return {
+            "id": f"/subscriptions/{self.subscription_id}",
+            "subscriptionId": self.subscription_id,
+            "tenantId": self.tenant_id,
+            "displayName": "offline",
+        }
+
+    def resource_group_object(self) -> Dict[str, Any]:
+        return {
+            "id": f"/subscriptions/{self.subscription_id}/resourceGroups/{self.resource_group}",
+            "name": self.resource_group,
+            "type": "Microsoft.Resources/resourceGroups",
+            "location": self.location,
+            "tags": {},
+            "properties": {"provisioningState": "Succeeded"},
+        }
+
+
+@dataclass
+class EvaluationFailure:
+    """
+    Expression that could not be evaluated.
+
+    Attributes:
+        path (str): JSON path of the string in the document (e.g. `$.resources[0].name`).
+        expression (str): The expression text.
+        message (str): Reason of the failure.
+    """
+
+    path: str
+    expression: str
+    message: str
+
+
+@dataclass
+class EvaluationReport:
+    """
+    Result of evaluating every expression of a document.
+
+    Attributes:
+        source (str): Document evaluated (file name or description).
+        resolved (int): Number of expressions evaluated successfully.
+        failures (List[EvaluationFailure]): Expressions that failed.
+    """
+
+    source: str
+    resolved: int = 0
+    failures: List[EvaluationFailure] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.failures
+
+
+def _lookup(section: Dict[str, Any], name: str) -> Tuple[bool, Any]:
+    # ARM resuelve nombres de parámetros/variables sin distinguir mayúsculas
+    if name in section:
+        return True, section[name]
+    lowered = name.lower()
+    for key, value in section.items():
+        if isinstance(key, str) and key.lower() == lowered:
+            return True, value
+    return False, None
+
+
+def _to_text(value: Any, function: str) -> str:
+    if isinstance(value, bool):
+        return "True" if value else "False"
+    if isinstance(value, (str, int)):
+        return str(value)
+    raise ExpressionError(f"{function}() expects strings, got {type(value).__name__}.")
+
+
+class ExpressionEvaluator:
+    """
+    Evaluate the expressions of one template for one parameter set.
+
+    Args:
+        template (Dict[str, Any]): Master or playbook (provides `parameters`
+            declarations and `variables`).
+        parameter_values (Dict[str, Any]): Values for the template parameters;
+            declared parameters not given here use their `defaultValue`.
+        context (Optional[DeploymentContext]): Subscription/resource group values.
+    """
+
+    def __init__(
+        self,
+        template: Dict[str, Any],
+        parameter_values: Optional[Dict[str, Any]] = None,
+        context: Optional[DeploymentContext] = None,
+    ) -> None:
+        declarations = template.get("parameters")
+        variables = template.get("variables")
+        self.declarations: Dict[str, Any] = declarations if isinstance(declarations, dict) else {}
+        self.variables: Dict[str, Any] = variables if isinstance(variables, dict) else {}
+        self.parameter_values: Dict[str, Any] = dict(parameter_values or {})
+        self.context: DeploymentContext = context or DeploymentContext()
+
+        self._strings: Dict[str, Tuple[bool, Any]] = {}
+        self._nodes: Dict[Node, Any] = {}
+        self._parameters: Dict[str, Any] = {}
+        self._variables: Dict[str, Any] = {}
+        self._resolving: Set[str] = set()
+
+        self._functions: Dict[str, Callable[[Tuple[Node, ...]], Any]] = {
+            "concat": self._concat,
+            "parameters": self._parameter,
+            "variables": self._variable,
+            "resourcegroup": lambda args: self._no_args("resourceGroup", args, self.context.resource_group_object),
+            "subscription": lambda args: self._no_args("subscription", args, self.context.subscription_object),
+            "resourceid": self._resource_id,
+            "encodeuricomponent": self._encode_uri_component,
+            "split": self._split,
+            "last": self._last,
+            "replace": self._replace,
+            "reference": self._reference,
+        }
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def evaluate_string(self, text: str) -> Any:
+        """
+        Evaluate a JSON string value: expressions are resolved, `[[` escapes
+        are unescaped and any other string is returned unchanged.
+
+        Raises:
+            ExpressionError: If the expression is malformed or cannot be resolved.
+        """
+        if not is_expression(text):
+            return text[1:] if text.startswith("[[") else text
+
+        cached = self._strings.get(text)
+        if cached is None:
+            try:
+                cached = (True, self._eval(parse(text)))
+            except ExpressionError as exc:
+                cached = (False, str(exc))
+            self._strings[text] = cached
+
+        ok, value = cached
+        if not ok:
+            raise ExpressionError(value)
+        return value
+
+    def evaluate_value(self, value: Any) -> Any:
+        """
+        Evaluate every string inside a JSON value (dicts and lists recursively).
+        """
+        if isinstance(value, str):
+            return self.evaluate_string(value)
+        if isinstance(value, dict):
+            return {k: self.evaluate_value(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.evaluate_value(v) for v in value]
+        return value
+
+    def evaluate_document(self, document: Dict[str, Any], source: str = "") -> EvaluationReport:
+        """
+        Evaluate every expression of `document` (except parameter declarations,
+        which are only evaluated when used).
+
+        Returns:
+            EvaluationReport: Number of resolved expressions and the failures.
+        """
+        report = EvaluationReport(source=source)
+
+        def _walk(obj: Any, path: str) -> None:
+            if isinstance(obj, str):
+                if not is_expression(obj):
+                    return
+                try:
+                    self.evaluate_string(obj)
+                    report.resolved += 1
+                except ExpressionError as exc:
+                    report.failures.append(EvaluationFailure(path, obj, str(exc)))
+            elif isinstance(obj, dict):
+                for key, value in obj.items():
+                    _walk(value, f"{path}.{key}")
+            elif isinstance(obj, list):
+                for i, value in enumerate(obj):
+                    _walk(value, f"{path}[{i}]")
+
+        for key, value in document.items():
+            if key != "parameters":
+                _walk(value, f"$.{key}")
+
+        return report
+
+    # ------------------------------------------------------------------
+    # Evaluation
+    # ------------------------------------------------------------------
+    def _eval(self, node: Node) -> Any:
+        if node in self._nodes:
+            return self._nodes[node]
+
+        if isinstance(node, Literal):
+            value: Any = node.value
+        elif isinstance(node, Call):
+            function = self._functions.get(node.name.lower())
+            if function is None:
+                raise ExpressionError(f"Unsupported function {node.name}().")
+            value = function(node.args)
+        elif isinstance(node, Property):
+            target = self._eval(node.target)
+            if not isinstance(target, dict):
+                raise ExpressionError(f"Cannot read property '{node.name}' of {type(target).__name__}.")
+            found, value = _lookup(target, node.name)
+            if not found:
+                raise ExpressionError(f"Property '{node.name}' does not exist.")
+        elif isinstance(node, Index):
+            target = self._eval(node.target)
+            index = self._eval(node.index)
+            try:
+                value = target[index]
+            except (KeyError, IndexError, TypeError):
+                raise ExpressionError(f"Invalid index {index!r}.") from None
+        else:
+            raise ExpressionError(f"Unknown node {node!r}.")
+
+        self._nodes[node] = value
+        return value
+
+    def _single_name(self, function: str, args: Tuple[Node, ...]) -> str:
+        if len(args) != 1:
+            raise ExpressionError(f"{function}() expects 1 argument, got {len(args)}.")
+        name = self._eval(args[0])
+        if not isinstance(name, str):
+            raise ExpressionError(f"{function}() expects a string name.")
+        return name
+
+    def _no_args(self, function: str, args: Tuple[Node, ...], factory: Callable[[], Any]) -> Any:
+        if args:
+            raise ExpressionError(f"{function}() takes no arguments in offline evaluation.")
+        return factory()
+
+    def _parameter(self, args: Tuple[Node, ...]) -> Any:
+        name = self._single_name("parameters", args)
+        if name in self._parameters:
+            return self._parameters[name]
+
+        declared, declaration = _lookup(self.declarations, name)
+        if not declared:
+            raise ExpressionError(f"Parameter '{name}' is not declared.")
+
+        given, value = _lookup(self.parameter_values, name)
+        if not given:
+            if not isinstance(declaration, dict) or "defaultValue" not in declaration:
+                raise ExpressionError(f"Parameter '{name}' has no value and no defaultValue.")
+            value = self._resolve_nested(f"parameters('{name}')", declaration["defaultValue"])
+
+        self._parameters[name] = value
+        return value
+
+    def _variable(self, args: Tuple[Node, ...]) -> Any:
+        name = self._single_name("variables", args)
+        if name in self._variables:
+            return self._variables[name]
+
+        found, raw = _lookup(self.variables, name)
+        if not found:
+            raise ExpressionError(f"Variable '{name}' is not declared.")
+
+        value = self._resolve_nested(f"variables('{name}')", raw)
+        self._variables[name] = value
+        return value
+
+    def _resolve_nested(self, key: str, raw: Any) -> Any:
+        if key in self._resolving:
+            raise ExpressionError(f"Circular reference through {key}.")
+        self._resolving.add(key)
+        try:
+            return self.evaluate_value(raw)
+        finally:
+            self._resolving.discard(key)
+
+    def _concat(self, args: Tuple[Node, ...]) -> Any:
+        values = [self._eval(arg) for arg in args]
+        if values and all(isinstance(v, list) for v in values):
+            return [item for v in values for item in v]
+        return "".join(_to_text(v, "concat") for v in values)
+
+    def _encode_uri_component(self, args: Tuple[Node, ...]) -> str:
+        if len(args) != 1:
+            raise ExpressionError(f"encodeURIComponent() expects 1 argument, got {len(args)}.")
+        return quote(_to_text(self._eval(args[0]), "encodeURIComponent"), safe="-_.!~*'()")
+
+    def _split(self, args: Tuple[Node, ...]) -> List[str]:
+        if len(args) != 2:
+            raise ExpressionError(f"split() expects 2 arguments, got {len(args)}.")
+        text = _to_text(self._eval(args[0]), "split")
+        delimiter = _to_text(self._eval(args[1]), "split")
+        return text.split(delimiter)
+
+    def _last(self, args: Tuple[Node, ...]) -> Any:
+        if len(args) != 1:
+            raise ExpressionError(f"last() expects 1 argument, got {len(args)}.")
+        value = self._eval(args[0])
+        if isinstance(value, (str, list)):
+            return value[-1] if value else ""
+        raise ExpressionError("last() expects a string or an array.")
+
+    def _replace(self, args: Tuple[Node, ...]) -> str:
+        if len(args) != 3:
+            raise ExpressionError(f"replace() expects 3 arguments, got {len(args)}.")
+        text, old, new = (_to_text(self._eval(arg), "replace") for arg in args)
+        return text.replace(old, new)
+
+    def _reference(self, args: Tuple[Node, ...]) -> Dict[str, Any]:
+        # Estado en tiempo de despliegue: offline solo se comprueban los argumentos
+        if not 1 <= len(args) <= 3:
+            raise ExpressionError(f"reference() expects 1 to 3 arguments, got {len(args)}.")
+        resource_id = _to_text(self._eval(args[0]), "reference")
+        full = len(args) == 3 and _to_text(self._eval(args[2]), "reference").lower() == "full"
+        properties: Dict[str, Any] = {}
+        if not full:
+            return properties
+        return {
+            "id": resource_id,
+            "properties": properties,
+            "identity": {"principalId": "00000000-0000-0000-0000-000000000000", "tenantId": self.context.tenant_id},
+        }
+
+    def _resource_id(self, args: Tuple[Node, ...]) -> str:
+        values = [_to_text(self._eval(arg), "resourceId") for arg in args]
+
+        type_pos = next((i for i, v in enumerate(values) if "/" in v), None)
+        if type_pos is None or type_pos > 2:
+            raise ExpressionError("resourceId() needs a resource type such as 'Microsoft.Web/connections'.")
+
+        scope = values[:type_pos]
+        subscription_id = scope[0] if len(scope) == 2 else self.context.subscription_id
+        resource_group = scope[-1] if scope else self.context.resource_group
+
+        namespace, *type_segments = values[type_pos].split("/")
+        names = values[type_pos + 1:]
+        if not type_segments or len(names) != len(type_segments):
+            raise ExpressionError(
+                f"resourceId() for '{values[type_pos]}' expects {len(type_segments)} name(s), got {len(names)}."
+            )
+
+        path = "/".join(f"{segment}/{name}" for segment, name in zip(type_segments, names))
+        return (
+            f"/subscriptions/{subscription_id}/resourceGroups/{resource_group}"
+            f"/providers/{namespace}/{path}"
+        )
+
+
+def load_parameter_values(path: Path) -> Dict[str, Any]:
+    """
+    Read parameter values from an ARM parameter file
+    (`{"parameters": {"X": {"value": ...}}}`, as written by `params`).
+
+    Raises:
+        ValueError: If the file is not a valid parameter file.
+    """
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    parameters = data.get("parameters") if isinstance(data, dict) else None
+    if not isinstance(parameters, dict):
+        raise ValueError(f'{path}: missing "parameters" object.')
+
+    values: Dict[str, Any] = {}
+    for name, entry in parameters.items():
+        if isinstance(entry, dict) and "value" in entry:
+            values[name] = entry["value"]
+        else:
+            logger.warning("%s: el parámetro '%s' no tiene 'value'; se ignora.", path, name)
+    return values
+
+
+def evaluate_pack(
+    master_path: Path,
+    parameter_values: Optional[Dict[str, Any]] = None,
+    output_dir: Optional[Path] = None,
+    context: Optional[DeploymentContext] = None,
+) -> List[EvaluationReport]:
+    """
+    Evaluate a master and, optionally, the playbooks its deployments link to.
+
+    Each deployment's `properties.parameters` are evaluated in the master and
+    the resulting values are used as the parameter set of its playbook.
+
+    Args:
+        master_path (Path): Master template.
+        parameter_values (Optional[Dict[str, Any]]): Values for the master parameters.
+        output_dir (Optional[Path]): Folder with the linked playbooks; when None,
+            only the master is evaluated.
+        context (Optional[DeploymentContext]): Subscription/resource group values.
+
+    Returns:
+        List[EvaluationReport]: Master report first, then one per playbook.
+    """
+    context = context or DeploymentContext()
+    master = load_master_template(master_path)
+    master_eval = ExpressionEvaluator(master, parameter_values, context)
+    reports = [master_eval.evaluate_document(master, master_path.name)]
+
+    if output_dir is None:
+        return reports
+
+    files = playbook_files(output_dir)
+    for res in master.get("resources", []):
+        if not isinstance(res, dict) or res.get("type") != DEPLOYMENT_TYPE or not isinstance(res.get("name"), str):
+            continue
+
+        if is_inline_deployment(res):
+            continue
+
+        playbook_path = linked_playbook(output_dir, res["name"], res, files)
+        if playbook_path is None:
+            logger.warning("No se encuentra el playbook de '%s' en %s.", res["name"], output_dir)
+            continue
+
+        props = res.get("properties")
+        deployment_params = props.get("parameters") if isinstance(props, dict) else None
+        values: Dict[str, Any] = {}
+        for pname, pvalue in (deployment_params or {}).items():
+            if not isinstance(pvalue, dict) or "value" not in pvalue:
+                continue
+            try:
+                values[pname] = master_eval.evaluate_value(pvalue["value"])
+            except ExpressionError:
+                # Ya se informa en el informe de la master
+                continue
+
+        playbook = load_playbook(playbook_path)
+        playbook_eval = ExpressionEvaluator(playbook, values, context)
+        reports.append(playbook_eval.evaluate_document(playbook, playbook_path.name))
+
+    return reports
@@ -0,0 +1,430 @@
+"""
+Tokenizer, parser and reference model for template expressions.
+
+An ARM expression is a JSON string wrapped in square brackets, e.g.
+`[concat(parameters('client_Name'), '_X')]`. Strings starting with `[[` are
+escaped literals and are not expressions.
+
+Grammar handled:
+    expression := primary ( '.' IDENT | '[' expression ']' )*
+    primary    := STRING | INTEGER | IDENT '(' [ expression (',' expression)* ] ')'
+
+Logic Apps expressions inside workflow definitions (`@parameters('X')`,
+`@{variables('Y')}`) use the same call syntax; `references` and `rewrite`
+understand both, and never look inside string literals.
+
+The same strings repeat heavily across workflows and packs, so `parse` and
+the call-site scan behind `references`/`rewrite` are LRU-memoized: each
+distinct string is tokenized once per process.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import FrozenSet, List, Mapping, Tuple, Union
+
+
+class ExpressionError(ValueError):
+    """
+    Raised when an expression cannot be parsed or evaluated.
+    """
+
+
+@dataclass(frozen=True)
+class Literal:
+    value: Union[str, int]
+
+
+@dataclass(frozen=True)
+class Call:
+    name: str
+    args: Tuple["Node", ...]
+
+
+@dataclass(frozen=True)
+class Property:
+    target: "Node"
+    name: str
+
+
+@dataclass(frozen=True)
+class Index:
+    target: "Node"
+    index: "Node"
+
+
+Node = Union[Literal, Call, Property, Index]
+
+# Token kinds
+STRING = "string"
+INTEGER = "integer"
+IDENT = "ident"
+PUNCT = "punct"
+
+# (kind, value, start, end) with offsets into the tokenized source
+Token = Tuple[str, Union[str, int], int, int]
+
+# ("parameters" | "variables", name)
+Reference = Tuple[str, str]
+
+_PUNCTUATION = "(),.[]"
+_REFERENCE_FUNCTIONS = frozenset({"parameters", "variables"})
+# Funciones de Logic Apps que leen el resultado de una acción o una variable
+_WORKFLOW_FUNCTIONS = frozenset({"body", "outputs", "actions", "result", "variables"})
+
+PARSE_CACHE_SIZE: int = 8192
+
+
+def is_expression(text: str) -> bool:
+    """
+    Indicate whether a JSON string is an ARM expression (`[...]`, not `[[...`).
+    """
+    return len(text) >= 2 and text[0] == "[" and text[-1] == "]" and not text.startswith("[[")
+
+
+def tokenize(source: str, lenient: bool = False) -> List[Token]:
+    """
+    Split the inside of an expression (without the outer brackets) into tokens.
+
+    Args:
+        source (str): Expression text.
+        lenient (bool): Accept any character as punctuation and stop at an
+            unterminated string instead of failing. Used to scan Logic Apps
+            expressions (`?[`, `{`...) for references.
+
+    Returns:
+        List[Token]: `(kind, value, start, end)` tuples.
+
+    Raises:
+        ExpressionError: On an unterminated string or an unexpected character
+            (only when not lenient).
+    """
+    tokens: List[Token] = []
+    i = 0
+    n = len(source)
+
+    while i < n:
+        ch = source[i]
+
+        if ch.isspace():
+            i += 1
+        elif ch == "'":
+            # '' dentro de un literal es una comilla escapada
+            start = i
+            i += 1
+            chunks: List[str] = []
+            while True:
+                end = source.find("'", i)
+                if end < 0:
+                    if lenient:
+                        return tokens
+                    raise ExpressionError(f"Unterminated string literal at position {start}.")
+                chunks.append(source[i:end])
+                if end + 1 < n and source[end + 1] == "'":
+                    chunks.append("'")
+                    i = end + 2
+                    continue
+                i = end + 1
+                break
+            tokens.append((STRING, "".join(chunks), start, i))
+        elif ch.isdigit() or (ch == "-" and i + 1 < n and source[i + 1].isdigit()):
+            start = i
+            i += 1
+            while i < n and source[i].isdigit():
+                i += 1
+            tokens.append((INTEGER, int(source[start:i]), start, i))
+        elif ch.isalpha() or ch == "_":
+            start = i
+            while i < n and (source[i].isalnum() or source[i] == "_"):
+                i += 1
+            tokens.append((IDENT, source[start:i], start, i))
+        elif ch in _PUNCTUATION or lenient:
+            tokens.append((PUNCT, ch, i, i + 1))
+            i += 1
+        else:
+            raise ExpressionError(f"Unexpected character {ch!r} at position {i}.")
+
+    return tokens
+
+
+class _Parser:
+    def __init__(self, tokens: List[Token]) -> None:
+        self.tokens = tokens
+        self.pos = 0
+
+    def _peek(self) -> Token:
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return ("eof", "", -1, -1)
+
+    def _take(self) -> Token:
+        token = self._peek()
+        self.pos += 1
+        return token
+
+    def _expect(self, value: str) -> None:
+        kind, tok, position, _ = self._take()
+        if kind != PUNCT or tok != value:
+            where = "end of expression" if kind == "eof" else f"{tok!r} at position {position}"
+            raise ExpressionError(f"Expected {value!r}, found {where}.")
+
+    def parse(self) -> Node:
+        node = self.expression()
+        kind, tok, position, _ = self._peek()
+        if kind != "eof":
+            raise ExpressionError(f"Unexpected {tok!r} at position {position}.")
+        return node
+
+    def expression(self) -> Node:
+        node = self.primary()
+
+        while True:
+            kind, tok, _, _ = self._peek()
+            if kind == PUNCT and tok == ".":
+                self._take()
+                name_kind, name, position, _ = self._take()
+                if name_kind != IDENT:
+                    raise ExpressionError(f"Expected a property name at position {position}.")
+                node = Property(node, str(name))
+            elif kind == PUNCT and tok == "[":
+                self._take()
+                index = self.expression()
+                self._expect("]")
+                node = Index(node, index)
+            else:
+                return node
+
+    def primary(self) -> Node:
+        kind, tok, position, _ = self._take()
+
+        if kind in (STRING, INTEGER):
+            return Literal(tok)
+
+        if kind == IDENT:
+            self._expect("(")
+            args: List[Node] = []
+            next_kind, next_tok, _, _ = self._peek()
+            if not (next_kind == PUNCT and next_tok == ")"):
+                args.append(self.expression())
+                while True:
+                    next_kind, next_tok, _, _ = self._peek()
+                    if next_kind == PUNCT and next_tok == ",":
+                        self._take()
+                        args.append(self.expression())
+                    else:
+                        break
+            self._expect(")")
+            return Call(str(tok), tuple(args))
+
+        if kind == "eof":
+            raise ExpressionError("Unexpected end of expression.")
+        raise ExpressionError(f"Unexpected {tok!r} at position {position}.")
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse(text: str) -> Node:
+    """
+    Parse an ARM expression string (including its outer brackets).
+
+    Memoized: the returned tree is shared and immutable.
+
+    Args:
+        text (str): JSON string value, e.g. `[parameters('client_Name')]`.
+
+    Returns:
+        Node: Root of the expression tree.
+
+    Raises:
+        ExpressionError: If `text` is not an expression or is malformed.
+    """
+    if not is_expression(text):
+        raise ExpressionError(f"Not an ARM expression: {text!r}")
+    return _Parser(tokenize(text[1:-1])).parse()
+
+
+def to_source(node: Node) -> str:
+    """
+    Render an expression tree back to text (without the outer brackets).
+
+    Args:
+        node (Node): Expression tree, e.g. as returned by `parse`.
+
+    Returns:
+        str: Canonical text: `name(arg, arg)`, string literals in single quotes.
+    """
+    if isinstance(node, Literal):
+        if isinstance(node.value, str):
+            return "'" + node.value.replace("'", "''") + "'"
+        return str(node.value)
+    if isinstance(node, Call):
+        return f"{node.name}({', '.join(to_source(arg) for arg in node.args)})"
+    if isinstance(node, Property):
+        return f"{to_source(node.target)}.{node.name}"
+    if isinstance(node, Index):
+        return f"{to_source(node.target)}[{to_source(node.index)}]"
+    raise ExpressionError(f"Unknown node {node!r}.")
+
+
+# ---------------------------------------------------------------------------
+# References
+# ---------------------------------------------------------------------------
+@dataclass(frozen=True)
+class CallSite:
+    """
+    One `parameters('<name>')` / `variables('<name>')` call found in a string.
+
+    Attributes:
+        kind (str): "parameters" or "variables" (lower-case).
+        name (str): Referenced name.
+        start (int): Offset of the call in the string, or -1 when the call is
+            not rewritable in place (Logic Apps code inside an ARM literal).
+        end (int): Offset just after the closing parenthesis, or -1.
+    """
+
+    kind: str
+    name: str
+    start: int
+    end: int
+
+
+def _scan_calls(
+    tokens: List[Token], offset: int, functions: FrozenSet[str] = _REFERENCE_FUNCTIONS
+) -> List[CallSite]:
+    sites: List[CallSite] = []
+    for i in range(len(tokens) - 3):
+        kind, value, start, _ = tokens[i]
+        if kind != IDENT or str(value).lower() not in functions:
+            continue
+        open_tok, arg, close_tok = tokens[i + 1], tokens[i + 2], tokens[i + 3]
+        if open_tok[:2] != (PUNCT, "(") or arg[0] != STRING or close_tok[:2] != (PUNCT, ")"):
+            continue
+        sites.append(CallSite(str(value).lower(), str(arg[1]), start + offset, close_tok[3] + offset))
+    return sites
+
+
+def _workflow_segments(text: str) -> List[Tuple[int, int]]:
+    """
+    Offsets of the Logic Apps expression code inside a string: the whole
+    string after a leading `@`, or the inside of each `@{...}` interpolation.
+    """
+    if text.startswith("@@"):
+        return []
+    if text.startswith("@") and not text.startswith("@{"):
+        return [(1, len(text))]
+
+    segments: List[Tuple[int, int]] = []
+    pos = text.find("@{")
+    while pos >= 0:
+        start = pos + 2
+        i = start
+        in_string = False
+        while i < len(text):
+            ch = text[i]
+            if ch == "'":
+                in_string = not in_string
+            elif ch == "}" and not in_string:
+                break
+            i += 1
+        if i >= len(text):
+            break
+        segments.append((start, i))
+        pos = text.find("@{", i + 1)
+    return segments
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def call_sites(text: str) -> Tuple[CallSite, ...]:
+    """
+    Every `parameters('<name>')` / `variables('<name>')` call in a JSON string.
+
+    ARM expressions are tokenized as a whole; the Logic Apps code that ARM
+    string literals will produce is also scanned (reported with offsets -1).
+    Other strings are only scanned inside their Logic Apps expression parts,
+    so plain text that happens to contain `parameters('X')` is ignored.
+    """
+    sites: List[CallSite] = []
+
+    if is_expression(text):
+        tokens = tokenize(text[1:-1], lenient=True)
+        sites.extend(_scan_calls(tokens, 1))
+        for kind, value, _, _ in tokens:
+            if kind == STRING and "@" in str(value):
+                sites.extend(
+                    CallSite(site.kind, site.name, -1, -1) for site in call_sites(str(value))
+                )
+        return tuple(sites)
+
+    for start, end in _workflow_segments(text):
+        sites.extend(_scan_calls(tokenize(text[start:end], lenient=True), start))
+    return tuple(sites)
+
+
+def references(text: str) -> FrozenSet[Reference]:
+    """
+    Names referenced through `parameters()` / `variables()` in a JSON string.
+
+    Args:
+        text (str): Any JSON string value or key.
+
+    Returns:
+        FrozenSet[Reference]: `("parameters" | "variables", name)` pairs.
+    """
+    return frozenset((site.kind, site.name) for site in call_sites(text))
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def workflow_references(text: str) -> FrozenSet[Reference]:
+    """
+    Actions and variables read by the Logic Apps code of a JSON string.
+
+    Only workflow code is scanned (`@...`, `@{...}`, and the Logic Apps code
+    inside ARM string literals), never the ARM calls themselves.
+
+    Args:
+        text (str): Any JSON string value.
+
+    Returns:
+        FrozenSet[Reference]: `("body" | "outputs" | "actions" | "result" |
+        "variables", name)` pairs.
+    """
+    found: List[Reference] = []
+    if is_expression(text):
+        for kind, value, _, _ in tokenize(text[1:-1], lenient=True):
+            if kind == STRING and "@" in str(value):
+                found.extend(workflow_references(str(value)))
+        return frozenset(found)
+
+    for start, end in _workflow_segments(text):
+        found.extend(
+            (site.kind, site.name)
+            for site in _scan_calls(tokenize(text[start:end], lenient=True), start, _WORKFLOW_FUNCTIONS)
+        )
+    return frozenset(found)
+
+
+def rewrite(text: str, mapping: Mapping[Reference, Reference]) -> str:
+    """
+    Replace references in a JSON string, keeping the rest of the text as is.
+
+    Args:
+        text (str): JSON string value.
+        mapping (Mapping[Reference, Reference]): e.g.
+            `{("variables", "Name"): ("parameters", "keyvault_Name")}`.
+
+    Returns:
+        str: The rewritten string (the same object if nothing matched).
+    """
+    sites = [s for s in call_sites(text) if s.start >= 0 and (s.kind, s.name) in mapping]
+    if not sites:
+        return text
+
+    parts: List[str] = []
+    last = 0
+    for site in sites:
+        kind, name = mapping[(site.kind, site.name)]
+        parts.append(text[last:site.start])
+        parts.append(f"{kind}('{name.replace(chr(39), chr(39) * 2)}')")
+        last = site.end
+    parts.append(text[last:])
+    return "".join(parts)
@@ -0,0 +1,188 @@
+"""
+Multi-client fan-out of a transformed pack.
+
+The base pack (master + playbooks) is loaded and transformed once. Each client
+row of a CSV file then only overrides the master parameter defaults that
+differ for that client (`client_Name`, `keyvault_Name_Pack`, `*_Pack`, ...):
+
+    <dir_out>/<client_Name>/deploy.json        -> master with the client's defaults
+    <dir_out>/<client_Name>/<playbook>.json    -> shared transformed playbooks
+
+Playbooks are serialized once and the same bytes are written for every
+client; masters are copy-on-write overlays of the base master, so the cost of
+an extra client is close to writing its files.
+"""
+
+from __future__ import annotations
+
+import csv
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .transformer import build_pack
+from .writer import serialize_playbook, write_serialized
+from ..utils.validation import coerce_parameter_value
+
+logger = logging.getLogger(__name__)
+
+CLIENT_NAME_PARAM: str = "client_Name"
+
+
+def load_clients(
+    csv_path: Path,
+    master_parameters: Dict[str, Any],
+) -> List[Dict[str, Any]]:
+    """
+    Read the clients CSV and convert every value to its declared parameter type.
+
+    The header must contain `client_Name`; every other column must be a
+    parameter of the master template. Empty cells keep the master default.
+
+    Args:
+        csv_path (Path): CSV file, one row per client.
+        master_parameters (Dict[str, Any]): `parameters` section of the master.
+
+    Returns:
+        List[Dict[str, Any]]: One `{parameter: value}` mapping per client
+        (only the non-empty cells).
+
+    Raises:
+        ValueError: If the header is invalid, a column is not a master parameter,
+            a client name is missing, duplicated or not usable as a folder name,
+            or a value does not match its declared type.
+    """
+    with csv_path.open("r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        header = reader.fieldnames or []
+
+        if CLIENT_NAME_PARAM not in header:
+            raise ValueError(f'{csv_path}: missing required column "{CLIENT_NAME_PARAM}".')
+
+        unknown = [col for col in header if col not in master_parameters]
+        if unknown:
+            raise ValueError(f"{csv_path}: columns are not master parameters: {unknown}")
+
+        clients: List[Dict[str, Any]] = []
+        seen: Set[str] = set()
+
+        for line_no, row in enumerate(reader, start=2):
+            name = (row.get(CLIENT_NAME_PARAM) or "").strip()
+            if not name:
+                raise ValueError(f"{csv_path}:{line_no}: empty {CLIENT_NAME_PARAM}.")
+            if name in (".", "..") or "/" in name or "\\" in name:
+                raise ValueError(f'{csv_path}:{line_no}: "{name}" is not a valid folder name.')
+            if name in seen:
+                raise ValueError(f'{csv_path}:{line_no}: duplicated client "{name}".')
+            seen.add(name)
+
+            values: Dict[str, Any] = {}
+            for column in header:
+                raw = row.get(column)
+                if raw is None or raw == "":
+                    continue
+
+                declared = master_parameters[column]
+                declared_type = declared.get("type", "string") if isinstance(declared, dict) else "string"
+                try:
+                    values[column] = coerce_parameter_value(raw, declared_type)
+                except ValueError as exc:
+                    raise ValueError(f"{csv_path}:{line_no}: {column}: {exc}") from None
+
+            values[CLIENT_NAME_PARAM] = name
+            clients.append(values)
+
+    return clients
+
+
+def overlay_master(master_template: Dict[str, Any], overrides: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Return a copy-on-write view of the master with some parameter defaults replaced.
+
+    Only the top-level dict, the `parameters` dict and the overridden parameter
+    entries are new objects; every other section is shared with the base master
+    and must not be modified through the result.
+
+    Args:
+        master_template (Dict[str, Any]): Base master template.
+        overrides (Dict[str, Any]): `{parameter: defaultValue}` for this client.
+
+    Returns:
+        Dict[str, Any]: Master template for the client.
+    """
+    base_params = master_template.get("parameters", {})
+    params = dict(base_params)
+
+    for name, value in overrides.items():
+        entry = base_params.get(name)
+        params[name] = {**(entry if isinstance(entry, dict) else {}), "defaultValue": value}
+
+    result = dict(master_template)
+    result["parameters"] = params
+    return result
+
+
+def run_fanout(
+    master_path: Path,
+    dir_in: Path,
+    dir_out: Path,
+    clients_csv: Path,
+    workers: Optional[int] = None,
+) -> List[Path]:
+    """
+    Build the base pack once and write one output tree per client.
+
+    Args:
+        master_path (Path): Master template of the pack.
+        dir_in (Path): Folder with the input playbooks.
+        dir_out (Path): Folder under which `<client_Name>/` trees are created.
+        clients_csv (Path): CSV with `client_Name` plus master parameter columns.
+        workers (Optional[int], optional): Number of writer threads. Defaults to
+            the `ThreadPoolExecutor` default.
+
+    Returns:
+        List[Path]: The client output folders, in CSV order.
+
+    Raises:
+        ValueError: If the clients CSV is invalid (see `load_clients`).
+    """
+    pack = build_pack(master_path, dir_in)
+    if pack is None:
+        return []
+
+    master_params = pack.master_template.get("parameters")
+    if not isinstance(master_params, dict):
+        master_params = {}
+
+    clients = load_clients(clients_csv, master_params)
+    if not clients:
+        logger.warning("El fichero de clientes %s no contiene filas.", clients_csv)
+        return []
+
+    # Se serializa una sola vez lo que comparten todos los clientes
+    shared: List[Tuple[str, bytes]] = [
+        (built.source_path.name, serialize_playbook(built.doc.data).encode("utf-8"))
+        for built in pack.playbooks
+    ]
+    master_name = master_path.name
+
+    def _write_client(overrides: Dict[str, Any]) -> Path:
+        client_dir = dir_out / overrides[CLIENT_NAME_PARAM]
+        for file_name, payload in shared:
+            write_serialized(client_dir, file_name, payload)
+
+        master = overlay_master(pack.master_template, overrides)
+        write_serialized(client_dir, master_name, serialize_playbook(master).encode("utf-8"))
+        logger.info("Pack generado para el cliente %s en %s", overrides[CLIENT_NAME_PARAM], client_dir)
+        return client_dir
+
+    logger.info(
+        "Generando %d clientes (%d playbooks cada uno) en %s",
+        len(clients),
+        len(shared),
+        dir_out,
+    )
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_write_client, clients))
@@ -0,0 +1,352 @@
+"""
+Reference-integrity checks for a built pack (master + linked playbooks).
+
+Every document is walked once. The walk records the symbols each document
+declares (parameters, variables, resources, Logic Apps action names and
+initialized variables) and every reference it makes, each with its JSON
+path; references are resolved against the symbol tables afterwards, so a
+whole pack is checked in time linear in its size.
+
+Issues reported (`IntegrityIssue.code`):
+    unresolved-parameter   ARM `parameters('X')` not declared in the template
+    unresolved-variable    ARM `variables('X')` not declared in the template
+    unresolved-workflow-parameter  Logic Apps `@parameters('X')` not in definition.parameters
+    unresolved-workflow-variable   Logic Apps `@variables('X')` never initialized
+    dangling-dependency    `dependsOn` entry that matches no resource of the template
+    duplicate-resource     two resources with the same type and name
+    duplicate-action       two Logic Apps actions with the same name in one workflow
+    unknown-deployment-parameter   deployment passes a parameter the playbook does not declare
+    missing-deployment-parameter   playbook parameter without defaultValue not passed
+    missing-playbook       deployment whose linked playbook is not in the output folder
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .diff import DEPLOYMENT_TYPE, find_master, is_inline_deployment, linked_playbook
+from .document import PlaybookDocument, WORKFLOW_TYPE, iter_actions
+from .expressions import Call, ExpressionError, Literal, call_sites, is_expression, parse, to_source
+from .master_loader import load_master_template
+from .playbook_loader import load_playbook, playbook_files
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class IntegrityIssue:
+    """
+    One integrity problem.
+
+    Attributes:
+        source (str): File name of the document.
+        path (str): JSON path of the offending value.
+        code (str): Issue kind (see module docstring).
+        message (str): Human-readable description.
+    """
+
+    source: str
+    path: str
+    code: str
+    message: str
+
+
+@dataclass
+class _Symbols:
+    """
+    Symbols and references collected from one document.
+    """
+
+    parameters: Set[str] = field(default_factory=set)
+    variables: Set[str] = field(default_factory=set)
+    # (type lower, canonical name) -> first JSON path
+    resources: Dict[Tuple[str, str], str] = field(default_factory=dict)
+    # (path, type, name, first path) of repeated resources
+    duplicates: List[Tuple[str, str, str, str]] = field(default_factory=list)
+    # ("parameters" | "variables", name, path)
+    arm_refs: List[Tuple[str, str, str]] = field(default_factory=list)
+    # (path, entry)
+    depends_on: List[Tuple[str, str]] = field(default_factory=list)
+
+
+def _canonical_name(name: Any) -> str:
+    """
+    Resource name normalized so that `[variables('X')]` and `[variables( 'X' )]` match.
+    """
+    if isinstance(name, str) and is_expression(name):
+        try:
+            return f"[{to_source(parse(name))}]"
+        except ExpressionError:
+            return name
+    return name if isinstance(name, str) else repr(name)
+
+
+def _walk_arm(obj: Any, path: str, symbols: _Symbols) -> None:
+    """
+    Collect ARM `parameters()`/`variables()` references (not Logic Apps code).
+    """
+    if isinstance(obj, str):
+        if is_expression(obj):
+            for site in call_sites(obj):
+                if site.start >= 0:
+                    symbols.arm_refs.append((site.kind, site.name, path))
+    elif isinstance(obj, dict):
+        for key, value in obj.items():
+            _walk_arm(value, f"{path}.{key}", symbols)
+    elif isinstance(obj, list):
+        for i, value in enumerate(obj):
+            _walk_arm(value, f"{path}[{i}]", symbols)
+
+
+def _collect_symbols(data: Dict[str, Any]) -> _Symbols:
+    symbols = _Symbols()
+
+    params = data.get("parameters")
+    if isinstance(params, dict):
+        symbols.parameters = {k.lower() for k in params if isinstance(k, str)}
+        for name, declaration in params.items():
+            # defaultValue puede usar otros parámetros (no variables)
+            if isinstance(declaration, dict) and "defaultValue" in declaration:
+                _walk_arm(declaration["defaultValue"], f"$.parameters.{name}.defaultValue", symbols)
+
+    variables = data.get("variables")
+    if isinstance(variables, dict):
+        symbols.variables = {k.lower() for k in variables if isinstance(k, str)}
+        _walk_arm(variables, "$.variables", symbols)
+
+    for key, value in data.items():
+        if key in ("parameters", "variables", "resources"):
+            continue
+        _walk_arm(value, f"$.{key}", symbols)
+
+    resources = data.get("resources")
+    if isinstance(resources, list):
+        for i, res in enumerate(resources):
+            path = f"$.resources[{i}]"
+            if not isinstance(res, dict):
+                continue
+            _walk_arm(res, path, symbols)
+
+            key = (str(res.get("type", "")).lower(), _canonical_name(res.get("name")))
+            if key in symbols.resources:
+                symbols.duplicates.append((path, key[0], key[1], symbols.resources[key]))
+            else:
+                symbols.resources[key] = path
+
+            depends_on = res.get("dependsOn")
+            if isinstance(depends_on, list):
+                for j, dep in enumerate(depends_on):
+                    if isinstance(dep, str):
+                        symbols.depends_on.append((f"{path}.dependsOn[{j}]", dep))
+
+    return symbols
+
+
+def _dependency_matches(dep: str, resources: Dict[Tuple[str, str], str]) -> bool:
+    """
+    Resolve a `dependsOn` entry: a plain resource name, `type/name`, or a
+    `[resourceId('type', name)]` expression compared structurally.
+    """
+    if is_expression(dep):
+        try:
+            node = parse(dep)
+        except ExpressionError:
+            return False
+
+        if isinstance(node, Call) and node.name.lower() == "resourceid" and len(node.args) >= 2:
+            # resourceId([sub], [rg], 'Namespace/type', name) -> tipo y nombre (un solo nivel)
+            type_arg, name_arg = node.args[-2], node.args[-1]
+            if isinstance(type_arg, Literal) and isinstance(type_arg.value, str):
+                if isinstance(name_arg, Literal) and isinstance(name_arg.value, str):
+                    name = name_arg.value
+                else:
+                    name = f"[{to_source(name_arg)}]"
+                return (type_arg.value.lower(), name) in resources
+
+        canonical = _canonical_name(dep)
+        return any(name == canonical for _, name in resources)
+
+    if any(name == dep for _, name in resources):
+        return True
+    return any(f"{rtype}/{name}".lower() == dep.lower() for rtype, name in resources)
+
+
+def _check_document(data: Dict[str, Any], source: str, issues: List[IntegrityIssue]) -> _Symbols:
+    symbols = _collect_symbols(data)
+
+    for kind, name, path in symbols.arm_refs:
+        declared = symbols.parameters if kind == "parameters" else symbols.variables
+        if name.lower() not in declared:
+            code = "unresolved-parameter" if kind == "parameters" else "unresolved-variable"
+            issues.append(IntegrityIssue(source, path, code, f"{kind}('{name}') is not declared."))
+
+    for path, dep in symbols.depends_on:
+        if not _dependency_matches(dep, symbols.resources):
+            issues.append(IntegrityIssue(source, path, "dangling-dependency", f"'{dep}' matches no resource."))
+
+    for path, rtype, name, first in symbols.duplicates:
+        issues.append(
+            IntegrityIssue(source, path, "duplicate-resource", f"Resource {rtype} '{name}' already declared at {first}.")
+        )
+
+    doc = PlaybookDocument(data)
+    for index, res in enumerate(doc.resources):
+        if isinstance(res, dict) and res.get("type") == WORKFLOW_TYPE:
+            definition = doc.definition(res)
+            if definition is not None:
+                _check_workflow(definition, f"$.resources[{index}].properties.definition", source, issues)
+
+    return symbols
+
+
+def _check_workflow(definition: Dict[str, Any], path: str, source: str, issues: List[IntegrityIssue]) -> None:
+    """
+    Logic Apps references inside one workflow definition: `@parameters()`
+    against definition.parameters, `@variables()` against InitializeVariable
+    actions, plus action name uniqueness.
+    """
+    def_params = definition.get("parameters")
+    declared_params = {k.lower() for k in def_params} if isinstance(def_params, dict) else set()
+
+    seen_actions: Dict[str, str] = {}
+    initialized: Set[str] = set()
+
+    for name, action, action_path, _ in iter_actions(definition.get("actions"), f"{path}.actions"):
+        if name in seen_actions:
+            issues.append(
+                IntegrityIssue(source, action_path, "duplicate-action", f"Action '{name}' also at {seen_actions[name]}.")
+            )
+        else:
+            seen_actions[name] = action_path
+
+        if str(action.get("type", "")).lower() == "initializevariable":
+            inputs = action.get("inputs")
+            for var in (inputs.get("variables") if isinstance(inputs, dict) else None) or []:
+                if isinstance(var, dict) and isinstance(var.get("name"), str):
+                    initialized.add(var["name"].lower())
+
+    refs: List[Tuple[str, str, str]] = []
+
+    def _walk(obj: Any, obj_path: str) -> None:
+        if isinstance(obj, str):
+            if not is_expression(obj):
+                for site in call_sites(obj):
+                    refs.append((site.kind, site.name, obj_path))
+        elif isinstance(obj, dict):
+            for key, value in obj.items():
+                _walk(value, f"{obj_path}.{key}")
+        elif isinstance(obj, list):
+            for i, value in enumerate(obj):
+                _walk(value, f"{obj_path}[{i}]")
+
+    for key in ("triggers", "actions", "outputs"):
+        if key in definition:
+            _walk(definition[key], f"{path}.{key}")
+
+    for kind, name, ref_path in refs:
+        if kind == "parameters" and name.lower() not in declared_params:
+            issues.append(
+                IntegrityIssue(
+                    source, ref_path, "unresolved-workflow-parameter",
+                    f"@parameters('{name}') is not in definition.parameters.",
+                )
+            )
+        elif kind == "variables" and name.lower() not in initialized:
+            issues.append(
+                IntegrityIssue(
+                    source, ref_path, "unresolved-workflow-variable",
+                    f"@variables('{name}') is never initialized.",
+                )
+            )
+
+
+def _check_deployment_parameters(
+    deployment: Dict[str, Any],
+    deployment_path: str,
+    playbook: Dict[str, Any],
+    master_source: str,
+    playbook_source: str,
+    issues: List[IntegrityIssue],
+) -> None:
+    props = deployment.get("properties")
+    passed = props.get("parameters") if isinstance(props, dict) else None
+    passed = passed if isinstance(passed, dict) else {}
+
+    declared = playbook.get("parameters")
+    declared = declared if isinstance(declared, dict) else {}
+    declared_lower = {k.lower(): k for k in declared if isinstance(k, str)}
+    passed_lower = {k.lower() for k in passed if isinstance(k, str)}
+
+    for name in passed:
+        if isinstance(name, str) and name.lower() not in declared_lower:
+            issues.append(
+                IntegrityIssue(
+                    master_source,
+                    f"{deployment_path}.properties.parameters.{name}",
+                    "unknown-deployment-parameter",
+                    f"'{name}' is not a parameter of {playbook_source}.",
+                )
+            )
+
+    for lower, name in declared_lower.items():
+        declaration = declared[name]
+        if lower in passed_lower or (isinstance(declaration, dict) and "defaultValue" in declaration):
+            continue
+        issues.append(
+            IntegrityIssue(
+                master_source,
+                f"{deployment_path}.properties.parameters",
+                "missing-deployment-parameter",
+                f"{playbook_source} requires '{name}' (no defaultValue) but the deployment does not pass it.",
+            )
+        )
+
+
+def check_pack(output_dir: Path, master_path: Optional[Path] = None) -> List[IntegrityIssue]:
+    """
+    Check a master and every playbook it links to in `output_dir`.
+
+    Args:
+        output_dir (Path): Folder with the master and the transformed playbooks.
+        master_path (Optional[Path]): Master template; defaults to the
+            `deploy*.json` inside `output_dir`.
+
+    Returns:
+        List[IntegrityIssue]: Every issue found (empty when the pack is consistent).
+
+    Raises:
+        NotADirectoryError: If `output_dir` is not a directory.
+        FileNotFoundError: If no master template is found.
+    """
+    master_path = master_path or find_master(output_dir)
+    master = load_master_template(master_path)
+    issues: List[IntegrityIssue] = []
+
+    _check_document(master, master_path.name, issues)
+
+    files = playbook_files(output_dir)
+    for index, res in enumerate(master.get("resources", [])):
+        if not isinstance(res, dict) or res.get("type") != DEPLOYMENT_TYPE or not isinstance(res.get("name"), str):
+            continue
+
+        if is_inline_deployment(res):
+            continue
+
+        deployment_path = f"$.resources[{index}]"
+        playbook_path = linked_playbook(output_dir, res["name"], res, files)
+        if playbook_path is None:
+            issues.append(
+                IntegrityIssue(
+                    master_path.name, deployment_path, "missing-playbook",
+                    f"No playbook for deployment '{res['name']}' in {output_dir}.",
+                )
+            )
+            continue
+
+        playbook = load_playbook(playbook_path)
+        _check_document(playbook, playbook_path.name, issues)
+        _check_deployment_parameters(res, deployment_path, playbook, master_path.name, playbook_path.name, issues)
+
+    return issues
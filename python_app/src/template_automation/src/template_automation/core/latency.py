@@ -0,0 +1,433 @@
+"""
+Worst-case latency bounds of Logic Apps workflows.
+
+Static upper bound of how long one run of a playbook can take, driven by the
+`Until` polling loops (`Wait` + vendor API call) of the pack:
+
+    Wait         `interval` count * unit (a `until` timestamp is unbounded)
+    Http, ...    explicit `limit.timeout`, otherwise the platform timeout of
+                 an outbound request, times the attempts of its retry policy
+                 plus the worst retry intervals
+    Workflow     worst case of the child playbook of the pack it calls
+    Scope        longest `runAfter` chain of its actions
+    If/Switch    slowest branch
+    Foreach      body * ceil(items / degree of parallelism)
+    Until        min(limit.count * body, limit.timeout + body): the timeout is
+                 only checked between iterations, so the running one finishes
+    others       0 (data operations and variables)
+
+Inside every scope the bound is the longest path of the `runAfter` graph, so
+actions that run in parallel do not add up. Loops whose bound exceeds the SLA
+are flagged; expressions in `limit` fall back to the platform defaults
+(60 iterations, one hour) and are reported as notes.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .callgraph import CallGraph, build_call_graph
+from .diff import find_master, linked_playbooks
+from .document import PlaybookDocument, WORKFLOW_TYPE
+from .expressions import is_expression
+from .master_loader import load_master_template
+from .playbook_loader import load_playbook
+from ..config import DEFAULT_ACTION_SECONDS, DEFAULT_FOREACH_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+UNBOUNDED: float = math.inf
+
+# Valores por defecto de Logic Apps (Consumption)
+UNTIL_DEFAULT_COUNT: int = 60
+UNTIL_DEFAULT_TIMEOUT: float = 3600.0
+PLATFORM_RETRY_COUNT: int = 4
+PLATFORM_RETRY_MAX_INTERVAL: float = 45.0
+EXPONENTIAL_MAX_INTERVAL: float = 86400.0
+
+_UNIT_SECONDS: Dict[str, float] = {
+    "second": 1.0,
+    "minute": 60.0,
+    "hour": 3600.0,
+    "day": 86400.0,
+    "week": 604800.0,
+    "month": 2592000.0,
+}
+_RE_DURATION = re.compile(
+    r"P(?:(?P<weeks>\d+(?:\.\d+)?)W)?(?:(?P<days>\d+(?:\.\d+)?)D)?"
+    r"(?:T(?:(?P<hours>\d+(?:\.\d+)?)H)?(?:(?P<minutes>\d+(?:\.\d+)?)M)?(?:(?P<seconds>\d+(?:\.\d+)?)S)?)?",
+    re.IGNORECASE,
+)
+_RE_PARAMETER = re.compile(r"\[parameters\('([^']+)'\)\]")
+_DURATION_SECONDS = {"weeks": 604800.0, "days": 86400.0, "hours": 3600.0, "minutes": 60.0, "seconds": 1.0}
+_REQUEST_TYPES = frozenset({"http", "apiconnection", "function", "httpwebhook", "apiconnectionwebhook"})
+
+
+def parse_duration(value: Any) -> Optional[float]:
+    """
+    Seconds of an ISO 8601 duration (`PT5M`, `P1DT2H`...); None if it is not one.
+    Years and months are not accepted: Logic Apps limits never use them.
+    """
+    if not isinstance(value, str) or is_expression(value):
+        return None
+    match = _RE_DURATION.fullmatch(value.strip())
+    if match is None or not any(match.groupdict().values()):
+        return None
+    return sum(float(amount) * _DURATION_SECONDS[unit] for unit, amount in match.groupdict().items() if amount)
+
+
+def format_seconds(seconds: float) -> str:
+    """
+    Human-readable duration (`1h 02m 30s`), `unbounded` for infinity.
+    """
+    if math.isinf(seconds):
+        return "unbounded"
+    total = int(math.ceil(seconds))
+    hours, rest = divmod(total, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}h {minutes:02d}m {secs:02d}s"
+    if minutes:
+        return f"{minutes}m {secs:02d}s"
+    return f"{secs}s"
+
+
+@dataclass
+class UntilBound:
+    """
+    Worst-case bound of one `Until` loop (one run of the loop).
+
+    Attributes:
+        playbook (str): Playbook that contains the loop.
+        name (str): Action name.
+        path (str): JSON path of the loop inside the playbook.
+        count (int): Maximum iterations (`limit.count`).
+        timeout (float): Seconds of `limit.timeout`.
+        wait (float): Seconds spent in `Wait` actions per iteration.
+        iteration (float): Worst case of one iteration.
+        seconds (float): Worst case of the loop.
+        limited_by (str): "count" or "timeout", whichever bounds the loop.
+        exceeds_sla (bool): Whether `seconds` is above the SLA.
+        notes (List[str]): Assumptions made (expressions in `limit`, ...).
+    """
+
+    playbook: str
+    name: str
+    path: str
+    count: int = UNTIL_DEFAULT_COUNT
+    timeout: float = UNTIL_DEFAULT_TIMEOUT
+    wait: float = 0.0
+    iteration: float = 0.0
+    seconds: float = 0.0
+    limited_by: str = "count"
+    exceeds_sla: bool = False
+    notes: List[str] = field(default_factory=list)
+
+
+@dataclass
+class PlaybookLatency:
+    """
+    Worst-case latency of one run of a playbook.
+
+    Attributes:
+        playbook (str): Deployment name of the playbook.
+        source (str): File name of the playbook.
+        seconds (float): Worst case of a run, child playbooks included.
+        critical_path (List[str]): Top-level actions of the slowest `runAfter` chain.
+        loops (List[UntilBound]): `Until` loops of the playbook itself.
+        exceeds_sla (bool): Whether `seconds` is above the SLA.
+        notes (List[str]): Assumptions made (unresolved or recursive calls, ...).
+    """
+
+    playbook: str
+    source: str
+    seconds: float = 0.0
+    critical_path: List[str] = field(default_factory=list)
+    loops: List[UntilBound] = field(default_factory=list)
+    exceeds_sla: bool = False
+    notes: List[str] = field(default_factory=list)
+
+
+class _Analyzer:
+    """
+    Walks the definitions of a pack; child playbooks are analysed on demand
+    (memoised), so every playbook is bounded once whatever the call order.
+    """
+
+    def __init__(
+        self,
+        playbooks: List[Tuple[str, PlaybookDocument, str]],
+        graph: CallGraph,
+        sla: float,
+        action_seconds: float,
+        items: int,
+    ) -> None:
+        self.documents = {name: (doc, source) for name, doc, source in playbooks}
+        self.children = {call.path: call.child for call in graph.calls()}
+        self.sla = sla
+        self.action_seconds = action_seconds
+        self.items = max(1, items)
+        self.results: Dict[str, PlaybookLatency] = {}
+        self.in_progress: Set[str] = set()
+
+    def playbook(self, name: str) -> PlaybookLatency:
+        if name in self.results:
+            return self.results[name]
+
+        doc, source = self.documents[name]
+        result = PlaybookLatency(playbook=name, source=source)
+        self.in_progress.add(name)
+        for index, res in enumerate(doc.resources):
+            if not isinstance(res, dict) or res.get("type") != WORKFLOW_TYPE:
+                continue
+            definition = doc.definition(res)
+            if definition is None:
+                continue
+            base = f"$.resources[{index}].properties.definition.actions"
+            seconds, chain = self._block(definition.get("actions"), base, result)
+            if seconds >= result.seconds:
+                result.seconds, result.critical_path = seconds, chain
+        self.in_progress.discard(name)
+
+        result.exceeds_sla = result.seconds > self.sla
+        self.results[name] = result
+        return result
+
+    def _block(self, actions: Any, path: str, result: PlaybookLatency) -> Tuple[float, List[str]]:
+        """
+        Longest `runAfter` chain of a scope: (seconds, action names).
+        """
+        if not isinstance(actions, dict):
+            return 0.0, []
+
+        own = {
+            name: self._action(name, action, f"{path}.{name}", result)
+            for name, action in actions.items()
+            if isinstance(action, dict)
+        }
+        finish: Dict[str, Tuple[float, List[str]]] = {}
+
+        def finish_of(name: str, visiting: Tuple[str, ...]) -> Tuple[float, List[str]]:
+            if name in finish:
+                return finish[name]
+            before: Tuple[float, List[str]] = (0.0, [])
+            run_after = actions[name].get("runAfter")
+            if isinstance(run_after, dict):
+                for previous in run_after:
+                    if previous in own and previous not in visiting:
+                        candidate = finish_of(previous, visiting + (name,))
+                        if candidate[0] > before[0]:
+                            before = candidate
+            finish[name] = (before[0] + own[name], before[1] + [name])
+            return finish[name]
+
+        best: Tuple[float, List[str]] = (0.0, [])
+        for name in own:
+            candidate = finish_of(name, ())
+            if candidate[0] > best[0] or not best[1]:
+                best = candidate
+        return best
+
+    def _action(self, name: str, action: Dict[str, Any], path: str, result: PlaybookLatency) -> float:
+        action_type = str(action.get("type", "")).lower()
+
+        if action_type == "wait":
+            return self._wait(action)
+        if action_type in _REQUEST_TYPES:
+            return self._request(action, result)
+        if action_type == "workflow":
+            return self._workflow(name, path, result)
+        if action_type == "scope":
+            return self._block(action.get("actions"), f"{path}.actions", result)[0]
+        if action_type == "if":
+            branch = action.get("else")
+            return max(
+                self._block(action.get("actions"), f"{path}.actions", result)[0],
+                self._block(branch.get("actions") if isinstance(branch, dict) else None, f"{path}.else.actions", result)[0],
+            )
+        if action_type == "switch":
+            branches = [0.0]
+            cases = action.get("cases")
+            if isinstance(cases, dict):
+                branches.extend(
+                    self._block(case.get("actions"), f"{path}.cases.{case_name}.actions", result)[0]
+                    for case_name, case in cases.items()
+                    if isinstance(case, dict)
+                )
+            default = action.get("default")
+            if isinstance(default, dict):
+                branches.append(self._block(default.get("actions"), f"{path}.default.actions", result)[0])
+            return max(branches)
+        if action_type == "foreach":
+            body = self._block(action.get("actions"), f"{path}.actions", result)[0]
+            return body * math.ceil(self.items / self._parallelism(action))
+        if action_type == "until":
+            return self._until(name, action, path, result)
+        return 0.0
+
+    @staticmethod
+    def _wait(action: Dict[str, Any]) -> float:
+        inputs = action.get("inputs") if isinstance(action.get("inputs"), dict) else {}
+        interval = inputs.get("interval")
+        if isinstance(interval, dict):
+            count = interval.get("count")
+            unit = _UNIT_SECONDS.get(str(interval.get("unit", "")).lower())
+            if isinstance(count, (int, float)) and unit is not None:
+                return float(count) * unit
+        # Espera hasta una fecha (`until`) o intervalo calculado en ejecución
+        return UNBOUNDED
+
+    def _literal(self, value: Any, result: PlaybookLatency) -> Any:
+        """
+        Default value of a playbook parameter referenced as `[parameters('x')]`
+        (e.g. the profile of `--normalize-retries`); other values unchanged.
+        """
+        match = _RE_PARAMETER.fullmatch(value) if isinstance(value, str) else None
+        if match is None:
+            return value
+        parameter = self.documents[result.playbook][0].root_parameters.get(match.group(1))
+        return parameter.get("defaultValue", value) if isinstance(parameter, dict) else value
+
+    def _request(self, action: Dict[str, Any], result: PlaybookLatency) -> float:
+        limit = action.get("limit") if isinstance(action.get("limit"), dict) else {}
+        timeout = parse_duration(self._literal(limit.get("timeout"), result))
+        attempt = self.action_seconds if timeout is None else timeout
+
+        inputs = action.get("inputs") if isinstance(action.get("inputs"), dict) else {}
+        policy = inputs.get("retryPolicy")
+        if not isinstance(policy, dict):
+            # Política por defecto: 4 reintentos exponenciales de como mucho 45 s
+            return attempt * (1 + PLATFORM_RETRY_COUNT) + PLATFORM_RETRY_COUNT * PLATFORM_RETRY_MAX_INTERVAL
+
+        kind = str(policy.get("type", "")).lower()
+        retries = self._literal(policy.get("count"), result)
+        if not isinstance(retries, int):
+            retries = PLATFORM_RETRY_COUNT
+        if kind == "none":
+            return attempt
+        interval = parse_duration(self._literal(policy.get("interval"), result)) or 0.0
+        if kind == "fixed":
+            return attempt * (1 + retries) + retries * interval
+        if kind == "exponential":
+            maximum = parse_duration(self._literal(policy.get("maximumInterval"), result)) or EXPONENTIAL_MAX_INTERVAL
+            waits = sum(min(interval * 2 ** retry, maximum) for retry in range(retries))
+            return attempt * (1 + retries) + waits
+        return attempt * (1 + PLATFORM_RETRY_COUNT) + PLATFORM_RETRY_COUNT * PLATFORM_RETRY_MAX_INTERVAL
+
+    def _workflow(self, name: str, path: str, result: PlaybookLatency) -> float:
+        child = self.children.get(path)
+        if child is None or child not in self.documents:
+            result.notes.append(f"{name}: child workflow not in the pack, counted as one request")
+            return self.action_seconds
+        if child in self.in_progress:
+            result.notes.append(f"{name}: recursive call to {child}, counted as one request")
+            return self.action_seconds
+        return self.playbook(child).seconds
+
+    @staticmethod
+    def _parallelism(action: Dict[str, Any]) -> int:
+        if str(action.get("operationOptions", "")).lower() == "sequential":
+            return 1
+        runtime = action.get("runtimeConfiguration")
+        concurrency = runtime.get("concurrency") if isinstance(runtime, dict) else None
+        if not isinstance(concurrency, dict) or "repetitions" not in concurrency:
+            return DEFAULT_FOREACH_CONCURRENCY
+        repetitions = concurrency.get("repetitions")
+        # Un grado de paralelismo en una expresión se acota como secuencial
+        return repetitions if isinstance(repetitions, int) and repetitions > 1 else 1
+
+    def _until(self, name: str, action: Dict[str, Any], path: str, result: PlaybookLatency) -> float:
+        loop = UntilBound(playbook=result.playbook, name=name, path=path)
+        limit = action.get("limit") if isinstance(action.get("limit"), dict) else {}
+
+        count = limit.get("count")
+        if isinstance(count, int) and count > 0:
+            loop.count = count
+        elif count is not None:
+            loop.notes.append(f"limit.count {count!r} not a literal, assumed {UNTIL_DEFAULT_COUNT}")
+        timeout = limit.get("timeout")
+        seconds = parse_duration(timeout)
+        if seconds is not None:
+            loop.timeout = seconds
+        elif timeout is not None:
+            loop.notes.append(f"limit.timeout {timeout!r} not a literal, assumed PT1H")
+
+        inner = action.get("actions")
+        loop.iteration = self._block(inner, f"{path}.actions", result)[0]
+        loop.wait = sum(
+            self._wait(child) for child in (inner or {}).values()
+            if isinstance(child, dict) and str(child.get("type", "")).lower() == "wait"
+        )
+        by_count = loop.count * loop.iteration
+        by_timeout = loop.timeout + loop.iteration
+        loop.limited_by = "count" if by_count <= by_timeout else "timeout"
+        loop.seconds = min(by_count, by_timeout)
+        loop.exceeds_sla = loop.seconds > self.sla
+
+        result.loops.append(loop)
+        return loop.seconds
+
+
+def analyze_latency(
+    playbooks: Iterable[Tuple[str, PlaybookDocument, str]],
+    sla: float,
+    action_seconds: float = DEFAULT_ACTION_SECONDS,
+    items: int = 1,
+) -> List[PlaybookLatency]:
+    """
+    Worst-case latency of every playbook of a pack.
+
+    Args:
+        playbooks (Iterable[Tuple[str, PlaybookDocument, str]]):
+            `(deployment name, playbook, source name)` triples.
+        sla (float): Seconds above which a loop or a playbook is flagged.
+        action_seconds (float): Worst case of one request without `limit.timeout`.
+        items (int): Items assumed for every Foreach loop.
+
+    Returns:
+        List[PlaybookLatency]: One entry per playbook, in the given order.
+    """
+    playbooks = list(playbooks)
+    graph = build_call_graph(playbooks)
+    analyzer = _Analyzer(playbooks, graph, sla, action_seconds, items)
+    results = [analyzer.playbook(name) for name, _, _ in playbooks]
+
+    for result in results:
+        for loop in result.loops:
+            if loop.exceeds_sla:
+                logger.warning(
+                    "%s.%s: el Until puede tardar %s (límite %s), por encima del SLA de %s.",
+                    loop.playbook, loop.name, format_seconds(loop.seconds), loop.limited_by, format_seconds(sla),
+                )
+    return results
+
+
+def output_latency(
+    output_dir: Path,
+    sla: float,
+    action_seconds: float = DEFAULT_ACTION_SECONDS,
+    items: int = 1,
+    master_path: Optional[Path] = None,
+) -> List[PlaybookLatency]:
+    """
+    Worst-case latency of the playbooks linked by the master of an output folder.
+
+    Raises:
+        NotADirectoryError: If `output_dir` is not a directory.
+        FileNotFoundError: If no master template is found.
+    """
+    master = load_master_template(master_path or find_master(output_dir))
+    return analyze_latency(
+        (
+            (name, PlaybookDocument(load_playbook(path)), path.name)
+            for name, path in linked_playbooks(output_dir, master)
+        ),
+        sla,
+        action_seconds,
+        items,
+    )
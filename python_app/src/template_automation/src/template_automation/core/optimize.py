@@ -0,0 +1,363 @@
+"""
+Size optimizations applied to built templates before they are written.
+
+`hoist_repeated_expressions` moves ARM (sub-)expressions that are repeated
+across a document into generated `variables` entries:
+
+    "[resourceId('Microsoft.Web/connections', variables('AzureSentinelConnectionName'))]"  x N
+        -> variables.hoisted_1 = "[resourceId(...)]"
+        -> "[variables('hoisted_1')]"  x N
+
+An expression is hoisted when `len(expression) * occurrences` reaches the
+threshold and the replacement actually makes the document smaller. Only
+expressions made of functions that are valid inside `variables` are hoisted
+(no `reference()`, `list*()`, `copyIndex()`...).
+
+`minify_workflow_definitions` removes fields of `Microsoft.Logic/workflows`
+definitions that only restate the default: empty `runAfter`/`metadata`,
+designer bookkeeping in `metadata`, an `else` branch without actions, the
+default `$schema`/`contentVersion` and `outputs: {}`. Action `inputs` and
+anything outside the definition are never touched.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+
+from .document import PlaybookDocument, iter_actions
+from .expressions import Call, ExpressionError, Index, Literal, Node, Property, is_expression, parse, to_source
+from .writer import serialize_playbook
+from ..config import DEFAULT_HOIST_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+HOISTED_VARIABLE_PREFIX: str = "hoisted_"
+
+# Funciones que pueden aparecer en una variable (se evalúan antes que los recursos)
+HOISTABLE_FUNCTIONS = frozenset({
+    "concat",
+    "encodeuricomponent",
+    "format",
+    "parameters",
+    "replace",
+    "resourcegroup",
+    "resourceid",
+    "string",
+    "subscription",
+    "tolower",
+    "toupper",
+    "uniquestring",
+    "variables",
+})
+
+# Coste fijo aproximado de una entrada en "variables" con indent=2 (sangría, comillas, ": ", ",\n")
+_VARIABLE_ENTRY_OVERHEAD: int = 12
+
+
+@dataclass
+class HoistReport:
+    """
+    Result of `hoist_repeated_expressions` on one document.
+
+    Attributes:
+        source (str): Document name.
+        variables (Dict[str, str]): Generated variables and their expression.
+        bytes_before (int): Serialized size before the pass.
+        bytes_after (int): Serialized size after the pass.
+    """
+
+    source: str
+    variables: Dict[str, str] = field(default_factory=dict)
+    bytes_before: int = 0
+    bytes_after: int = 0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+
+def _serialized_size(data: Dict[str, Any]) -> int:
+    return len(serialize_playbook(data).encode("utf-8"))
+
+
+def _iter_expression_strings(data: Dict[str, Any]) -> Iterator[str]:
+    """
+    Yield every expression string of the document, except the `parameters`
+    section (defaultValue cannot use variables) and `variables` itself.
+    """
+    def _walk(obj: Any) -> Iterator[str]:
+        if isinstance(obj, str):
+            if is_expression(obj):
+                yield obj
+        elif isinstance(obj, dict):
+            for value in obj.values():
+                yield from _walk(value)
+        elif isinstance(obj, list):
+            for item in obj:
+                yield from _walk(item)
+
+    for key, value in data.items():
+        if key not in ("parameters", "variables"):
+            yield from _walk(value)
+
+
+def _rewrite_strings(data: Dict[str, Any], rewrite: Callable[[str], str]) -> None:
+    def _walk(obj: Any) -> Any:
+        if isinstance(obj, str):
+            return rewrite(obj) if is_expression(obj) else obj
+        if isinstance(obj, dict):
+            for k, v in obj.items():
+                obj[k] = _walk(v)
+            return obj
+        if isinstance(obj, list):
+            for i, v in enumerate(obj):
+                obj[i] = _walk(v)
+            return obj
+        return obj
+
+    for key in list(data):
+        if key not in ("parameters", "variables"):
+            data[key] = _walk(data[key])
+
+
+def _is_hoistable(node: Node) -> bool:
+    if isinstance(node, Literal):
+        return True
+    if isinstance(node, Call):
+        return node.name.lower() in HOISTABLE_FUNCTIONS and all(_is_hoistable(a) for a in node.args)
+    if isinstance(node, Property):
+        return _is_hoistable(node.target)
+    if isinstance(node, Index):
+        return _is_hoistable(node.target) and _is_hoistable(node.index)
+    return False
+
+
+def _is_variable_reference(node: Node) -> bool:
+    return isinstance(node, Call) and node.name.lower() == "variables"
+
+
+def _children(node: Node) -> List[Node]:
+    if isinstance(node, Call):
+        return list(node.args)
+    if isinstance(node, Property):
+        return [node.target]
+    if isinstance(node, Index):
+        return [node.target, node.index]
+    return []
+
+
+def _count_candidates(trees: Dict[str, Node], weights: Counter, chosen: Set[Node]) -> Counter:
+    """
+    Count non-literal sub-expressions, weighted by how often each string
+    appears, without descending into already chosen sub-expressions.
+    """
+    counts: Counter = Counter()
+
+    def _visit(node: Node, weight: int) -> None:
+        if node in chosen:
+            return
+        if not isinstance(node, Literal) and not _is_variable_reference(node):
+            counts[node] += weight
+        for child in _children(node):
+            _visit(child, weight)
+
+    for text, tree in trees.items():
+        _visit(tree, weights[text])
+
+    return counts
+
+
+def _replace_chosen(node: Node, names: Dict[Node, str]) -> Node:
+    name = names.get(node)
+    if name is not None:
+        return Call("variables", (Literal(name),))
+    if isinstance(node, Call):
+        return Call(node.name, tuple(_replace_chosen(a, names) for a in node.args))
+    if isinstance(node, Property):
+        return Property(_replace_chosen(node.target, names), node.name)
+    if isinstance(node, Index):
+        return Index(_replace_chosen(node.target, names), _replace_chosen(node.index, names))
+    return node
+
+
+def hoist_repeated_expressions(
+    doc: PlaybookDocument,
+    threshold: int = DEFAULT_HOIST_THRESHOLD,
+    source: str = "",
+) -> HoistReport:
+    """
+    Move repeated expressions of `doc` into generated variables, in place.
+
+    Args:
+        doc (PlaybookDocument): Playbook or master to optimize.
+        threshold (int): Minimum `len(expression) * occurrences` to consider.
+        source (str): Name used in the report and logs.
+
+    Returns:
+        HoistReport: Generated variables and serialized size before/after.
+    """
+    report = HoistReport(source=source, bytes_before=_serialized_size(doc.data))
+    report.bytes_after = report.bytes_before
+
+    weights: Counter = Counter(_iter_expression_strings(doc.data))
+    trees: Dict[str, Node] = {}
+    for text in weights:
+        try:
+            tree = parse(text)
+        except ExpressionError:
+            # Textos tipo "[IMPORTANTE] ..." no son expresiones válidas: no se tocan
+            continue
+        if _is_hoistable(tree):
+            trees[text] = tree
+
+    existing = set(doc.variables)
+    names: Dict[Node, str] = {}
+    counter = 0
+
+    while True:
+        counter_candidate = counter + 1
+        while f"{HOISTED_VARIABLE_PREFIX}{counter_candidate}" in existing:
+            counter_candidate += 1
+        var_name = f"{HOISTED_VARIABLE_PREFIX}{counter_candidate}"
+        reference_len = len(f"variables('{var_name}')")
+
+        best: Optional[Node] = None
+        best_saving = 0
+        for node, count in _count_candidates(trees, weights, set(names)).items():
+            if count < 2:
+                continue
+            size = len(to_source(node))
+            if size * count < threshold:
+                continue
+            saving = count * (size - reference_len) - (size + len(var_name) + _VARIABLE_ENTRY_OVERHEAD)
+            if saving > best_saving:
+                best, best_saving = node, saving
+
+        if best is None:
+            break
+
+        counter = counter_candidate
+        names[best] = var_name
+
+    if not names:
+        return report
+
+    variables = doc.ensure_variables()
+    for node, var_name in names.items():
+        expression = f"[{to_source(_replace_chosen(node, {k: v for k, v in names.items() if k != node}))}]"
+        variables[var_name] = expression
+        report.variables[var_name] = expression
+
+    rewritten: Dict[str, str] = {}
+    for text, tree in trees.items():
+        new_tree = _replace_chosen(tree, names)
+        if new_tree != tree:
+            rewritten[text] = f"[{to_source(new_tree)}]"
+
+    _rewrite_strings(doc.data, lambda text: rewritten.get(text, text))
+
+    report.bytes_after = _serialized_size(doc.data)
+    logger.info(
+        "%s: %d expresiones movidas a variables, %d bytes ahorrados.",
+        source or "documento",
+        len(report.variables),
+        report.bytes_saved,
+    )
+    return report
+
+
+# ---------------------------------------------------------------------------
+# Minify
+# ---------------------------------------------------------------------------
+DEFAULT_WORKFLOW_SCHEMA: str = (
+    "https://schema.management.azure.com/providers/Microsoft.Logic/schemas/2016-06-01/workflowdefinition.json#"
+)
+DEFAULT_WORKFLOW_CONTENT_VERSION: str = "1.0.0.0"
+
+# Claves de metadata que solo usa el diseñador del portal
+DESIGNER_METADATA_KEYS = ("operationMetadataId", "flowSystemMetadata")
+
+
+@dataclass
+class MinifyReport:
+    """
+    Result of `minify_workflow_definitions` on one document.
+
+    Attributes:
+        source (str): Document name.
+        removed (int): Number of fields removed.
+        bytes_before (int): Serialized size before the pass (as `write_playbook` writes it).
+        bytes_after (int): Serialized size after the pass, in the mode it will be written.
+    """
+
+    source: str
+    removed: int = 0
+    bytes_before: int = 0
+    bytes_after: int = 0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+
+def _drop_if(container: Dict[str, Any], key: str, default: Any) -> int:
+    if key in container and container[key] == default:
+        del container[key]
+        return 1
+    return 0
+
+
+def _minify_metadata(item: Dict[str, Any]) -> int:
+    metadata = item.get("metadata")
+    if not isinstance(metadata, dict):
+        return 0
+    removed = 0
+    for key in DESIGNER_METADATA_KEYS:
+        if key in metadata:
+            del metadata[key]
+            removed += 1
+    return removed + _drop_if(item, "metadata", {})
+
+
+def minify_workflow_definitions(doc: PlaybookDocument, source: str = "", compact: bool = False) -> MinifyReport:
+    """
+    Remove default-valued and no-op fields from every workflow definition, in place.
+
+    Args:
+        doc (PlaybookDocument): Playbook to minify.
+        source (str): Name used in the report and logs.
+        compact (bool): Measure `bytes_after` as the compact writer will write it.
+
+    Returns:
+        MinifyReport: Fields removed and serialized size before/after.
+    """
+    report = MinifyReport(source=source, bytes_before=_serialized_size(doc.data))
+
+    for definition in doc.definitions():
+        report.removed += _drop_if(definition, "$schema", DEFAULT_WORKFLOW_SCHEMA)
+        report.removed += _drop_if(definition, "contentVersion", DEFAULT_WORKFLOW_CONTENT_VERSION)
+        report.removed += _drop_if(definition, "outputs", {})
+        report.removed += _minify_metadata(definition)
+
+        triggers = definition.get("triggers")
+        for trigger in (triggers.values() if isinstance(triggers, dict) else []):
+            if isinstance(trigger, dict):
+                report.removed += _minify_metadata(trigger)
+
+        for _, action, _, _ in iter_actions(definition.get("actions")):
+            report.removed += _drop_if(action, "runAfter", {})
+            report.removed += _minify_metadata(action)
+            # Un If sin acciones en la rama else equivale a no tener else
+            report.removed += _drop_if(action, "else", {"actions": {}})
+
+    report.bytes_after = len(serialize_playbook(doc.data, compact=compact).encode("utf-8"))
+    logger.info(
+        "%s: %d campos eliminados, %d bytes ahorrados.",
+        source or "documento",
+        report.removed,
+        report.bytes_saved,
+    )
+    return report
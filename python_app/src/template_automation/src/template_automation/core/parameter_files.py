@@ -0,0 +1,195 @@
+"""
+Streaming generation of ARM parameter files from client values.
+
+The master's `parameters` section is read once; rows are then streamed from a
+CSV or NDJSON file and each one is written as:
+
+    <dir_out>/<master_stem>.parameters.<client_Name>.json
+
+Every row is validated against the declared parameter types (and
+`allowedValues`). Rows missing a required parameter (no `defaultValue`) or
+with invalid values are not written; unknown keys are reported and ignored.
+Rows are processed one at a time, so memory use does not grow with the file.
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .master_loader import load_master_template
+from .writer import serialize_playbook, write_serialized
+from ..utils.validation import check_parameter_value, coerce_parameter_value
+
+logger = logging.getLogger(__name__)
+
+PARAMETERS_SCHEMA: str = (
+    "https://schema.management.azure.com/schemas/2019-04-01/deploymentParameters.json#"
+)
+CLIENT_NAME_PARAM: str = "client_Name"
+NDJSON_EXTENSIONS = (".ndjson", ".jsonl")
+
+
+@dataclass
+class RowResult:
+    """
+    Outcome of one input row.
+
+    Attributes:
+        line (int): Line number in the input file.
+        client (str): Value of `client_Name` (or "" if missing).
+        path (Optional[Path]): Written parameter file, or None if the row failed.
+        missing (List[str]): Required parameters without a value.
+        extra (List[str]): Keys that are not parameters of the master (ignored).
+        errors (List[str]): Type / allowed-value errors.
+    """
+
+    line: int
+    client: str
+    path: Optional[Path] = None
+    missing: List[str] = field(default_factory=list)
+    extra: List[str] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return self.path is not None
+
+
+def iter_rows(rows_path: Path) -> Iterator[Tuple[int, Dict[str, Any], bool]]:
+    """
+    Lazily yield the rows of a CSV or NDJSON file.
+
+    Args:
+        rows_path (Path): `.csv`, `.ndjson` or `.jsonl` file.
+
+    Yields:
+        Tuple[int, Dict[str, Any], bool]: Line number, row values and whether
+        the values are text that still has to be converted (CSV).
+
+    Raises:
+        ValueError: If an NDJSON line is not a JSON object.
+    """
+    if rows_path.suffix.lower() in NDJSON_EXTENSIONS:
+        with rows_path.open("r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as exc:
+                    raise ValueError(f"{rows_path}:{line_no}: invalid JSON ({exc}).") from None
+                if not isinstance(row, dict):
+                    raise ValueError(f"{rows_path}:{line_no}: each line must be a JSON object.")
+                yield line_no, row, False
+        return
+
+    with rows_path.open("r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            # Celdas vacías = sin valor (se usa el defaultValue de la master)
+            values = {k: v for k, v in row.items() if k is not None and v not in (None, "")}
+            yield reader.line_num, values, True
+
+
+def build_parameters(
+    master_parameters: Dict[str, Any],
+    row: Dict[str, Any],
+    from_text: bool,
+    result: RowResult,
+) -> Dict[str, Any]:
+    """
+    Validate one row and return the `parameters` section of its parameter file.
+
+    Missing required parameters, unknown keys and invalid values are recorded
+    in `result`.
+    """
+    values: Dict[str, Any] = {}
+
+    for key in row:
+        if key not in master_parameters:
+            result.extra.append(key)
+
+    for name, declaration in master_parameters.items():
+        if not isinstance(declaration, dict):
+            continue
+
+        if name not in row:
+            if "defaultValue" not in declaration:
+                result.missing.append(name)
+            continue
+
+        raw = row[name]
+        try:
+            value = coerce_parameter_value(raw, str(declaration.get("type", "string"))) if from_text else raw
+            check_parameter_value(value, declaration)
+        except ValueError as exc:
+            result.errors.append(f"{name}: {exc}")
+            continue
+
+        values[name] = {"value": value}
+
+    return values
+
+
+def generate_parameter_files(
+    master_path: Path,
+    rows_path: Path,
+    dir_out: Path,
+) -> Iterator[RowResult]:
+    """
+    Stream `rows_path` and write one validated parameter file per row.
+
+    Args:
+        master_path (Path): Master template whose `parameters` are filled.
+        rows_path (Path): CSV or NDJSON file with one client per row.
+        dir_out (Path): Output directory for the parameter files.
+
+    Yields:
+        RowResult: One result per row, as soon as it is processed.
+    """
+    master_template = load_master_template(master_path)
+    master_parameters = master_template.get("parameters", {})
+    if not isinstance(master_parameters, dict):
+        master_parameters = {}
+
+    stem = master_path.stem
+
+    for line_no, row, from_text in iter_rows(rows_path):
+        client = row.get(CLIENT_NAME_PARAM)
+        client = client.strip() if isinstance(client, str) else ""
+        result = RowResult(line=line_no, client=client)
+
+        if not client:
+            result.missing.append(CLIENT_NAME_PARAM)
+        elif client in (".", "..") or "/" in client or "\\" in client:
+            result.errors.append(f'{CLIENT_NAME_PARAM}: "{client}" is not usable in a file name.')
+
+        parameters = build_parameters(master_parameters, row, from_text, result)
+
+        if result.missing or result.errors:
+            logger.warning(
+                "Fila %d (%s) no generada: faltan %s, errores %s",
+                line_no,
+                client or "?",
+                result.missing,
+                result.errors,
+            )
+            yield result
+            continue
+
+        document = {
+            "$schema": PARAMETERS_SCHEMA,
+            "contentVersion": "1.0.0.0",
+            "parameters": parameters,
+        }
+        result.path = write_serialized(
+            dir_out,
+            f"{stem}.parameters.{client}.json",
+            serialize_playbook(document).encode("utf-8"),
+        )
+        yield result
@@ -6,33 +6,144 @@ from __future__ import annotations
 
 import json
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Mapping, Optional, Sequence
 
-from ..config import JSON_EXTENSION
-from ..utils.file_system import iter_json_files
+from ..config import DISCOVERY_EXCLUDE_DIRS, JSON_EXTENSION
+from ..utils.file_system import JsonFileEntry, is_selected, scan_json_files
+from ..utils.repo_index import RepoIndex
 
 
-def discover_playbooks(dir_in: Path) -> List[Path]:
+def discover_playbooks(
+    dir_in: Path,
+    index: Optional[RepoIndex] = None,
+    include: Optional[Sequence[str]] = None,
+    max_depth: Optional[int] = None,
+    exclude: Sequence[str] = DISCOVERY_EXCLUDE_DIRS,
+) -> List[JsonFileEntry]:
     """
     Discover all JSON playbooks in the given directory.
 
     Args:
         dir_in (Path): Directory to search for playbook JSON files.
+        index (Optional[RepoIndex], optional): Repository index to answer from
+            instead of walking `dir_in`. Defaults to None.
+        include (Optional[Sequence[str]], optional): File-name globs to accept,
+            e.g. ["Action_*", "OrchestatorPart_*"]. Defaults to None (all).
+        max_depth (Optional[int], optional): Maximum directory depth below
+            `dir_in` (0 = only `dir_in`). Defaults to None (unlimited).
+        exclude (Sequence[str], optional): Directory-name globs to skip.
+            Defaults to `DISCOVERY_EXCLUDE_DIRS`, so previous `output/` folders,
+            dot-directories and `__pycache__` are never swept up.
 
     Returns:
-        List[Path]: List of paths to the discovered playbook files.
+        List[JsonFileEntry]: The discovered playbook files with the size and
+        mtime gathered by the walk (or stored in the index), so callers can
+        look files up and compare them without probing the disk again. Use
+        `entry.path` where a plain `Path` is needed (this function used to
+        return `List[Path]`).
 
     Raises:
         NotADirectoryError: If the provided path is not a valid directory.
 
     Notes:
-        This function uses `iter_json_files` to iterate over JSON files
-        with the extension specified in `JSON_EXTENSION`.
+        Without an index (or when `dir_in` lies outside the indexed tree), this
+        function walks `dir_in` with `scan_json_files` for files with the
+        extension specified in `JSON_EXTENSION`. Both paths apply the same filters.
     """
     if not dir_in.is_dir():
         raise NotADirectoryError(f"Invalid input directory: {dir_in}")
 
-    return list(iter_json_files(dir_in, extension=JSON_EXTENSION))
+    if index is not None and index.covers(dir_in):
+        # Components of dir_in relative to the index root ("Sophos/_" -> 1)
+        prefix_len = (index.relative(dir_in / "_") or "_").count("/")
+        return [
+            JsonFileEntry(path=index.root / e.path, size=e.size, mtime_ns=e.mtime_ns, depth=len(parts) - 1)
+            for e in index.files_under(dir_in)
+            for parts in [e.path.split("/")[prefix_len:]]
+            if is_selected(parts, exclude, max_depth, include)
+        ]
+
+    return list(
+        scan_json_files(
+            dir_in,
+            extension=JSON_EXTENSION,
+            exclude=exclude,
+            max_depth=max_depth,
+            include=include,
+        )
+    )
+
+
+def playbook_files(dir_in: Path, index: Optional[RepoIndex] = None) -> Dict[str, JsonFileEntry]:
+    """
+    JSON files directly inside `dir_in`, by file name, from one `discover_playbooks` pass.
+
+    Args:
+        dir_in (Path): Directory containing the playbooks.
+        index (Optional[RepoIndex], optional): Repository index to answer from. Defaults to None.
+
+    Returns:
+        Dict[str, JsonFileEntry]: File name -> discovered file. Empty if
+        `dir_in` is not a directory.
+    """
+    if not dir_in.is_dir():
+        return {}
+    return {entry.path.name: entry for entry in discover_playbooks(dir_in, index, max_depth=0)}
+
+
+def is_playbook_file(path: Path, files: Mapping[str, JsonFileEntry]) -> bool:
+    """
+    Indicate whether `path` exists, answering from `files` when possible.
+
+    Args:
+        path (Path): Candidate file inside the directory `files` was built from.
+        files (Mapping[str, JsonFileEntry]): Result of `playbook_files`.
+
+    Returns:
+        bool: True if `path.name` is one of `files`. If only a name differing
+        in case is listed, `Path.is_file` decides, so the filesystem's own
+        name matching applies (case-insensitive on Windows and macOS, as
+        before `files` existed). Names absent from `files` are never probed.
+    """
+    if path.name in files:
+        return True
+    folded = path.name.casefold()
+    return any(name.casefold() == folded for name in files) and path.is_file()
+
+
+def find_playbook(
+    dir_in: Path,
+    deployment_name: str,
+    index: Optional[RepoIndex] = None,
+    files: Optional[Mapping[str, JsonFileEntry]] = None,
+) -> Optional[Path]:
+    """
+    Locate the playbook file for a master template deployment.
+
+    Args:
+        dir_in (Path): Directory containing the playbooks.
+        deployment_name (str): Name of the deployment in the master template.
+        index (Optional[RepoIndex], optional): Repository index used instead of
+            probing the filesystem. Defaults to None.
+        files (Optional[Mapping[str, JsonFileEntry]], optional): Files of
+            `dir_in` already discovered (see `playbook_files`); when given,
+            the candidates are looked up there instead of probed (see
+            `is_playbook_file`). Defaults to None.
+
+    Returns:
+        Optional[Path]: `Cliente_<name>.json` or `<name>.json` (in that order),
+        or None if neither exists.
+    """
+    candidate_paths = [
+        dir_in / f"Cliente_{deployment_name}{JSON_EXTENSION}",
+        dir_in / f"{deployment_name}{JSON_EXTENSION}",
+    ]
+
+    if files is not None:
+        return next((p for p in candidate_paths if is_playbook_file(p, files)), None)
+
+    is_file = index.is_file if index is not None else Path.is_file
+    return next((p for p in candidate_paths if is_file(p)), None)
 
 
 def load_playbook(path: Path) -> Dict[str, Any]:
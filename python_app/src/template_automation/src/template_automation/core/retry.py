@@ -0,0 +1,286 @@
+"""
+Pack-level retry and timeout profile for the outbound requests of a pack.
+
+Most `Http` and `ApiConnection` actions do not declare a `retryPolicy`, so
+Logic Apps applies its default one (four exponential retries without a cap
+chosen by us) and the platform request timeout. Under vendor throttling (429)
+those retries stretch the handling of every incident.
+
+`normalize_request_policies` gives every such action that does not declare
+its own policy:
+
+    inputs.retryPolicy   exponential, `count` retries starting at `interval`
+                         and capped at `maximumInterval`
+    limit.timeout        explicit timeout of each attempt
+
+Actions that already declare `retryPolicy` (including `type: none` in polling
+loops) or `limit.timeout` keep them. Actions watched by an error branch that
+runs after `TimedOut` keep the platform timeout, so that branch keeps firing
+when it does today. The timeout defaults to the platform one (120 s), so
+requests only time out sooner if the pack parameter is lowered. The values are playbook parameters that
+the master fills from the `retryPolicy_*_Pack` / `request_Timeout_Pack` pack
+parameters, so the profile is chosen at deploy time like the other `*_Pack`
+parameters.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Set, Tuple
+
+from .diff import DEPLOYMENT_TYPE
+from .document import PlaybookDocument, WORKFLOW_TYPE, iter_actions
+from .latency import parse_duration
+from ..config import (
+    DEFAULT_REQUEST_TIMEOUT,
+    DEFAULT_RETRY_COUNT,
+    DEFAULT_RETRY_INTERVAL,
+    DEFAULT_RETRY_MAX_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+
+RETRY_COUNT_PARAMETER: str = "retryPolicy_Count"
+RETRY_INTERVAL_PARAMETER: str = "retryPolicy_Interval"
+RETRY_MAX_INTERVAL_PARAMETER: str = "retryPolicy_MaximumInterval"
+TIMEOUT_PARAMETER: str = "request_Timeout"
+PACK_SUFFIX: str = "_Pack"
+
+# Límite de Logic Apps para retryPolicy.count
+MAX_RETRY_COUNT: int = 90
+
+_REQUEST_TYPES = frozenset({"http", "apiconnection"})
+
+
+@dataclass
+class RetryProfile:
+    """
+    Default values of the pack parameters.
+
+    Attributes:
+        count (int): Retries after the first attempt (1-90).
+        interval (str): First retry interval (ISO 8601 duration).
+        maximum_interval (str): Cap of the exponential interval (ISO 8601 duration).
+        timeout (str): Timeout of each attempt (ISO 8601 duration).
+    """
+
+    count: int = DEFAULT_RETRY_COUNT
+    interval: str = DEFAULT_RETRY_INTERVAL
+    maximum_interval: str = DEFAULT_RETRY_MAX_INTERVAL
+    timeout: str = DEFAULT_REQUEST_TIMEOUT
+
+    def validate(self) -> None:
+        """
+        Raises:
+            ValueError: If the count is outside 1-90, a duration is not a valid
+                ISO 8601 duration or the interval is above its cap.
+        """
+        if not 1 <= self.count <= MAX_RETRY_COUNT:
+            raise ValueError(f"Retry count must be between 1 and {MAX_RETRY_COUNT}, got {self.count}.")
+        for label, value in (
+            ("interval", self.interval),
+            ("maximum interval", self.maximum_interval),
+            ("timeout", self.timeout),
+        ):
+            if parse_duration(value) is None:
+                raise ValueError(f"Invalid ISO 8601 duration for the retry {label}: {value!r}.")
+        if parse_duration(self.interval) > parse_duration(self.maximum_interval):
+            raise ValueError(
+                f"Retry interval {self.interval} is above the maximum interval {self.maximum_interval}."
+            )
+
+
+@dataclass
+class RequestChange:
+    """
+    One action given the pack profile.
+
+    Attributes:
+        source (str): Document name.
+        name (str): Action name.
+        path (str): JSON path of the action inside the playbook.
+        action_type (str): `Http` or `ApiConnection`.
+        retry_policy (bool): Whether `inputs.retryPolicy` was added.
+        timeout (bool): Whether `limit.timeout` was added.
+    """
+
+    source: str
+    name: str
+    path: str
+    action_type: str
+    retry_policy: bool = False
+    timeout: bool = False
+
+
+@dataclass
+class RetryReport:
+    """
+    Result of `normalize_request_policies`.
+
+    Attributes:
+        changed (List[RequestChange]): Actions that got a retry policy and/or a timeout.
+        requests (int): `Http`/`ApiConnection` actions of the pack.
+        declared (int): Of `requests`, the ones that already declared both.
+        timeout_handled (int): Of `requests`, the ones left without `limit.timeout`
+            because an action runs after them when they time out.
+    """
+
+    changed: List[RequestChange] = field(default_factory=list)
+    requests: int = 0
+    declared: int = 0
+    timeout_handled: int = 0
+
+
+def _timed_out_watched(actions: Any) -> Set[str]:
+    """
+    Actions that another action runs after with the `TimedOut` status.
+    """
+    watched: Set[str] = set()
+    for _, action, _, _ in iter_actions(actions):
+        run_after = action.get("runAfter")
+        if not isinstance(run_after, dict):
+            continue
+        for previous, statuses in run_after.items():
+            if any(str(status).lower() == "timedout" for status in statuses or []):
+                watched.add(previous)
+    return watched
+
+
+def _iter_requests(doc: PlaybookDocument) -> Iterator[Tuple[str, Dict[str, Any], str, bool]]:
+    for index, res in enumerate(doc.resources):
+        if not isinstance(res, dict) or res.get("type") != WORKFLOW_TYPE:
+            continue
+        definition = doc.definition(res)
+        if definition is None:
+            continue
+        watched = _timed_out_watched(definition.get("actions"))
+        base = f"$.resources[{index}].properties.definition.actions"
+        for name, action, path, _ in iter_actions(definition.get("actions"), base):
+            if str(action.get("type", "")).lower() in _REQUEST_TYPES:
+                yield name, action, path, name in watched
+
+
+def _rewrite_document(doc: PlaybookDocument, source: str, profile: RetryProfile, report: RetryReport) -> bool:
+    changed = False
+    for name, action, path, timeout_handled in _iter_requests(doc):
+        report.requests += 1
+        change = RequestChange(source=source, name=name, path=path, action_type=str(action.get("type")))
+
+        inputs = action.get("inputs")
+        if isinstance(inputs, dict) and "retryPolicy" not in inputs:
+            inputs["retryPolicy"] = {
+                "type": "exponential",
+                "count": f"[parameters('{RETRY_COUNT_PARAMETER}')]",
+                "interval": f"[parameters('{RETRY_INTERVAL_PARAMETER}')]",
+                "maximumInterval": f"[parameters('{RETRY_MAX_INTERVAL_PARAMETER}')]",
+            }
+            change.retry_policy = True
+
+        limit = action.get("limit")
+        if not isinstance(limit, dict):
+            limit = {}
+        if "timeout" not in limit:
+            if timeout_handled:
+                # Un timeout más corto dispararía antes la rama de error que ya vigila TimedOut
+                report.timeout_handled += 1
+            else:
+                limit["timeout"] = f"[parameters('{TIMEOUT_PARAMETER}')]"
+                action["limit"] = limit
+                change.timeout = True
+
+        if change.retry_policy or change.timeout:
+            report.changed.append(change)
+            changed = True
+        elif "timeout" in limit:
+            report.declared += 1
+
+    if changed:
+        root_params = doc.ensure_root_parameters()
+        root_params[RETRY_COUNT_PARAMETER] = {
+            "type": "Int",
+            "defaultValue": profile.count,
+            "minValue": 1,
+            "maxValue": MAX_RETRY_COUNT,
+        }
+        root_params[RETRY_INTERVAL_PARAMETER] = {"type": "String", "defaultValue": profile.interval}
+        root_params[RETRY_MAX_INTERVAL_PARAMETER] = {"type": "String", "defaultValue": profile.maximum_interval}
+        root_params[TIMEOUT_PARAMETER] = {"type": "String", "defaultValue": profile.timeout}
+    return changed
+
+
+def normalize_request_policies(
+    master_template: Dict[str, Any],
+    playbooks: Iterable[Tuple[str, PlaybookDocument, str]],
+    profile: RetryProfile,
+) -> RetryReport:
+    """
+    Give the pack retry/timeout profile to every `Http`/`ApiConnection` action
+    that does not declare its own, in place.
+
+    Args:
+        master_template (Dict[str, Any]): Master of the pack.
+        playbooks (Iterable[Tuple[str, PlaybookDocument, str]]):
+            `(deployment name, playbook, source name)` triples.
+        profile (RetryProfile): Default values of the pack parameters.
+
+    Returns:
+        RetryReport: Actions changed and totals.
+
+    Raises:
+        ValueError: If the profile is not valid.
+    """
+    profile.validate()
+
+    deployments = {
+        res.get("name"): res
+        for res in master_template.get("resources", [])
+        if isinstance(res, dict) and res.get("type") == DEPLOYMENT_TYPE
+    }
+    parameters = (RETRY_COUNT_PARAMETER, RETRY_INTERVAL_PARAMETER, RETRY_MAX_INTERVAL_PARAMETER, TIMEOUT_PARAMETER)
+
+    report = RetryReport()
+    changed_any = False
+    for name, doc, source in playbooks:
+        if not _rewrite_document(doc, source, profile, report):
+            continue
+
+        deployment = deployments.get(name)
+        if deployment is None:
+            continue
+        props = deployment.setdefault("properties", {})
+        params = props.get("parameters")
+        if not isinstance(params, dict):
+            params = {}
+            props["parameters"] = params
+        for parameter in parameters:
+            params[parameter] = {"value": f"[parameters('{parameter}{PACK_SUFFIX}')]"}
+        changed_any = True
+
+    if changed_any:
+        master_params = master_template.get("parameters")
+        if not isinstance(master_params, dict):
+            master_params = {}
+            master_template["parameters"] = master_params
+        master_params[RETRY_COUNT_PARAMETER + PACK_SUFFIX] = {
+            "defaultValue": profile.count,
+            "type": "int",
+            "minValue": 1,
+            "maxValue": MAX_RETRY_COUNT,
+        }
+        master_params[RETRY_INTERVAL_PARAMETER + PACK_SUFFIX] = {"defaultValue": profile.interval, "type": "string"}
+        master_params[RETRY_MAX_INTERVAL_PARAMETER + PACK_SUFFIX] = {
+            "defaultValue": profile.maximum_interval,
+            "type": "string",
+        }
+        master_params[TIMEOUT_PARAMETER + PACK_SUFFIX] = {"defaultValue": profile.timeout, "type": "string"}
+
+    logger.info(
+        "Reintentos: %d peticiones, %d con política o timeout añadidos, %d ya declaraban ambos, "
+        "%d sin timeout porque una rama de error espera su TimedOut.",
+        report.requests,
+        len(report.changed),
+        report.declared,
+        report.timeout_handled,
+    )
+    return report
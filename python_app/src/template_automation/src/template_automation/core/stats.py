@@ -0,0 +1,264 @@
+"""
+Size and count figures of built templates, checked against Azure limits.
+
+For every document (master and playbooks) the report gives:
+    bytes, minified_bytes            serialized size (as written / without whitespace)
+    parameters, variables,
+    resources, outputs               root section sizes (ARM template limits)
+    expressions                      ARM `[...]` and Logic Apps `@...` strings
+    longest_expression               longest ARM expression, in characters
+    actions, nesting_depth,
+    workflow_parameters              largest value over the document's workflows
+                                     (Logic Apps limits apply per workflow)
+
+Figures are computed from in-memory documents, so a build can report on the
+pack it just produced (`pack_stats`) without reading its output back.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from .diff import DEPLOYMENT_TYPE, find_master, is_inline_deployment, linked_playbook
+from .document import PlaybookDocument, iter_actions
+from .expressions import is_expression
+from .master_loader import load_master_template
+from .playbook_loader import load_playbook, playbook_files
+from .transformer import BuiltPack
+from .writer import serialize_playbook
+
+logger = logging.getLogger(__name__)
+
+# Límites documentados de ARM (plantilla) y Logic Apps (definición de workflow)
+ARM_LIMITS: Dict[str, int] = {
+    "bytes": 4 * 1024 * 1024,
+    "minified_bytes": 4 * 1024 * 1024,
+    "parameters": 256,
+    "variables": 256,
+    "resources": 800,
+    "outputs": 64,
+    "longest_expression": 24576,
+}
+
+LOGIC_APPS_LIMITS: Dict[str, int] = {
+    "actions": 500,
+    "nesting_depth": 8,
+    "workflow_parameters": 50,
+}
+
+METRICS = (
+    "bytes",
+    "minified_bytes",
+    "parameters",
+    "variables",
+    "resources",
+    "outputs",
+    "expressions",
+    "longest_expression",
+    "actions",
+    "nesting_depth",
+    "workflow_parameters",
+)
+
+OK = "ok"
+WARNING = "warning"
+EXCEEDED = "exceeded"
+
+
+@dataclass
+class DocumentStats:
+    """
+    Figures of one master or playbook.
+
+    Attributes:
+        source (str): File name of the document.
+        kind (str): "master" or "playbook".
+        pack (str): Folder of the pack the document belongs to.
+        metrics (Dict[str, int]): Value of each name in `METRICS`.
+    """
+
+    source: str
+    kind: str
+    pack: str = ""
+    metrics: Dict[str, int] = field(default_factory=dict)
+
+    def budget(self, warn_ratio: float) -> Dict[str, Dict[str, Any]]:
+        """
+        Each metric with its limit, usage ratio and status.
+
+        Args:
+            warn_ratio (float): Usage ratio (0-1) from which a metric is a warning.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: `{metric: {"value", "limit", "ratio", "status"}}`;
+            `limit` and `ratio` are None for metrics without a limit.
+        """
+        result: Dict[str, Dict[str, Any]] = {}
+        for name in METRICS:
+            value = self.metrics.get(name, 0)
+            limit = ARM_LIMITS.get(name, LOGIC_APPS_LIMITS.get(name))
+            ratio = value / limit if limit else None
+            if ratio is None or ratio < warn_ratio:
+                status = OK
+            elif ratio <= 1:
+                status = WARNING
+            else:
+                status = EXCEEDED
+            result[name] = {"value": value, "limit": limit, "ratio": ratio, "status": status}
+        return result
+
+
+def _section_size(data: Dict[str, Any], key: str) -> int:
+    section = data.get(key)
+    return len(section) if isinstance(section, (dict, list)) else 0
+
+
+def _iter_strings(obj: Any) -> Iterator[str]:
+    if isinstance(obj, str):
+        yield obj
+    elif isinstance(obj, dict):
+        for key, value in obj.items():
+            yield key
+            yield from _iter_strings(value)
+    elif isinstance(obj, list):
+        for item in obj:
+            yield from _iter_strings(item)
+
+
+def _is_workflow_expression(text: str) -> bool:
+    return (text.startswith("@") and not text.startswith("@@")) or "@{" in text
+
+
+def document_stats(data: Dict[str, Any], source: str, kind: str, pack: str = "") -> DocumentStats:
+    """
+    Compute the figures of one parsed document.
+
+    Args:
+        data (Dict[str, Any]): Master or playbook template.
+        source (str): Name shown in the report.
+        kind (str): "master" or "playbook".
+        pack (str): Folder of the pack, shown to tell packs apart.
+
+    Returns:
+        DocumentStats: Figures of the document.
+    """
+    serialized = serialize_playbook(data)
+    minified = serialize_playbook(data, compact=True)
+
+    metrics: Dict[str, int] = {
+        "bytes": len(serialized.encode("utf-8")),
+        "minified_bytes": len(minified.encode("utf-8")),
+        "parameters": _section_size(data, "parameters"),
+        "variables": _section_size(data, "variables"),
+        "resources": _section_size(data, "resources"),
+        "outputs": _section_size(data, "outputs"),
+        "expressions": 0,
+        "longest_expression": 0,
+        "actions": 0,
+        "nesting_depth": 0,
+        "workflow_parameters": 0,
+    }
+
+    for text in _iter_strings(data):
+        if is_expression(text):
+            metrics["expressions"] += 1
+            metrics["longest_expression"] = max(metrics["longest_expression"], len(text) - 2)
+        elif _is_workflow_expression(text):
+            metrics["expressions"] += 1
+
+    doc = PlaybookDocument(data)
+    for definition in doc.definitions():
+        actions = 0
+        depth = 0
+        for _, _, _, action_depth in iter_actions(definition.get("actions")):
+            actions += 1
+            depth = max(depth, action_depth)
+        params = doc.definition_parameters(definition) or {}
+
+        metrics["actions"] = max(metrics["actions"], actions)
+        metrics["nesting_depth"] = max(metrics["nesting_depth"], depth)
+        metrics["workflow_parameters"] = max(metrics["workflow_parameters"], len(params))
+
+    return DocumentStats(source=source, kind=kind, pack=pack, metrics=metrics)
+
+
+def pack_stats(pack: BuiltPack, output_dir: Optional[Path] = None) -> List[DocumentStats]:
+    """
+    Figures of a pack built in memory (master first), without reparsing.
+
+    Args:
+        pack (BuiltPack): Result of `build_pack` / `run_automation`.
+        output_dir (Optional[Path]): Folder the pack was written to, used as
+            `pack` so entries match `output_stats`; defaults to the master's folder.
+
+    Returns:
+        List[DocumentStats]: One entry per document.
+    """
+    folder = str(output_dir or pack.master_path.parent)
+    stats = [document_stats(pack.master_template, pack.master_path.name, "master", folder)]
+    stats.extend(
+        document_stats(built.doc.data, built.source_path.name, "playbook", folder) for built in pack.playbooks
+    )
+    return stats
+
+
+def output_stats(output_dir: Path, master_path: Optional[Path] = None) -> List[DocumentStats]:
+    """
+    Figures of an output folder: the master and every playbook it links to.
+
+    Args:
+        output_dir (Path): Folder with the master and the transformed playbooks.
+        master_path (Optional[Path]): Master template; defaults to the
+            `deploy*.json` inside `output_dir`.
+
+    Returns:
+        List[DocumentStats]: One entry per document, master first.
+
+    Raises:
+        NotADirectoryError: If `output_dir` is not a directory.
+        FileNotFoundError: If no master template is found.
+    """
+    master_path = master_path or find_master(output_dir)
+    master = load_master_template(master_path)
+    stats = [document_stats(master, master_path.name, "master", str(output_dir))]
+
+    seen = set()
+    files = playbook_files(output_dir)
+    for res in master.get("resources", []):
+        if not isinstance(res, dict) or res.get("type") != DEPLOYMENT_TYPE or not isinstance(res.get("name"), str):
+            continue
+        if is_inline_deployment(res):
+            continue
+        path = linked_playbook(output_dir, res["name"], res, files)
+        if path is None:
+            logger.warning("No se encuentra el playbook de '%s' en %s.", res["name"], output_dir)
+            continue
+        if path in seen:
+            continue
+        seen.add(path)
+        stats.append(document_stats(load_playbook(path), path.name, "playbook", str(output_dir)))
+
+    return stats
+
+
+def stats_to_json(stats: List[DocumentStats], warn_ratio: float) -> Dict[str, Any]:
+    """
+    JSON-serializable report (for CI trend tracking).
+
+    Args:
+        stats (List[DocumentStats]): Figures to export.
+        warn_ratio (float): Usage ratio from which a metric is a warning.
+
+    Returns:
+        Dict[str, Any]: `{"warn_ratio", "documents": [{"pack", "source", "kind", "metrics"}]}`.
+    """
+    return {
+        "warn_ratio": warn_ratio,
+        "documents": [
+            {"pack": s.pack, "source": s.source, "kind": s.kind, "metrics": s.budget(warn_ratio)}
+            for s in stats
+        ],
+    }
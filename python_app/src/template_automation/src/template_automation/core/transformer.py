@@ -64,15 +64,31 @@ Flujo actual:
 
 from __future__ import annotations
 
-import json
 import logging
 import re
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, List, Optional
-
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .authcache import AuthCacheReport, cache_auth_tokens
+from .branches import BranchReport, parallelize_independent_actions
+from .callgraph import CallGraph, build_call_graph
+from .concurrency import ForeachFinding, parallelize_foreach_loops
+from .connections import (
+    SharedConnectionsReport,
+    azuresentinel_connection_resource,
+    keyvault_connection_resource,
+    share_connections,
+)
+from .diff import is_inline_deployment
+from .document import PlaybookDocument
+from .expressions import Call, ExpressionError, Literal, is_expression, parse, references, rewrite
 from .master_loader import load_master_template
-from .playbook_loader import load_playbook
+from .optimize import HoistReport, MinifyReport, hoist_repeated_expressions, minify_workflow_definitions
+from .playbook_loader import find_playbook, load_playbook, playbook_files
+from .retry import RetryProfile, RetryReport, normalize_request_policies
 from .writer import write_playbook
+from ..utils.repo_index import RepoIndex
 
 logger = logging.getLogger(__name__)
 
@@ -103,6 +119,10 @@ def get_deployment_names_from_master(master_template: Dict[str, Any]) -> List[st
         if res.get("type") != "Microsoft.Resources/deployments":
             continue
 
+        # Deployments con plantilla inline (p.ej. conexiones compartidas) no tienen playbook
+        if is_inline_deployment(res):
+            continue
+
         name = res.get("name")
         if isinstance(name, str):
             deployment_names.append(name)
@@ -148,7 +168,7 @@ def get_deployment_parameters_from_master(
 def _sync_master_deployment_parameters_with_playbook(
     master_template: Dict[str, Any],
     deployment_name: str,
-    playbook: Dict[str, Any],
+    doc: PlaybookDocument,
 ) -> None:
     """
     Sincroniza los parámetros de la master con el playbook ya transformado.
@@ -165,37 +185,7 @@ def _sync_master_deployment_parameters_with_playbook(
     if not isinstance(resources, list):
         return
 
-    used_param_names: set[str] = set()
-
-    params_root = playbook.get("parameters", {})
-    if isinstance(params_root, dict):
-        for pname in params_root.keys():
-            if isinstance(pname, str):
-                used_param_names.add(pname)
-
-    pb_resources = playbook.get("resources", [])
-    if isinstance(pb_resources, list):
-        for res in pb_resources:
-            if not isinstance(res, dict):
-                continue
-            if res.get("type") != "Microsoft.Logic/workflows":
-                continue
-
-            props = res.get("properties")
-            if not isinstance(props, dict):
-                continue
-
-            definition = props.get("definition")
-            if not isinstance(definition, dict):
-                continue
-
-            def_params = definition.get("parameters")
-            if not isinstance(def_params, dict):
-                continue
-
-            for pname in def_params.keys():
-                if isinstance(pname, str):
-                    used_param_names.add(pname)
+    used_param_names = doc.parameter_names()
 
     if not used_param_names:
         return
@@ -280,17 +270,13 @@ def inspect_workflow_parameters(playbook: Dict[str, Any], source_name: str) -> N
 # ---------------------------------------------------------------------------
 # Helpers: nombre del playbook + detección de keyvault externalid
 # ---------------------------------------------------------------------------
-def _get_workflow_name_param(playbook: Dict[str, Any]) -> str:
+def _get_workflow_name_param(doc: PlaybookDocument) -> str:
     """
     Devuelve el nombre del parámetro que representa el nombre del playbook:
       - primer workflows_*_name que encuentre
       - o 'PlaybookName' como fallback.
     """
-    params = playbook.get("parameters", {})
-    if not isinstance(params, dict):
-        return "PlaybookName"
-
-    for pname in params.keys():
+    for pname in doc.root_parameters.keys():
         if isinstance(pname, str) and RE_WORKFLOW_NAME.fullmatch(pname):
             return pname
 
@@ -301,15 +287,11 @@ def _get_workflow_name_param(playbook: Dict[str, Any]) -> str:
     return "PlaybookName"
 
 
-def _has_keyvault_externalid(playbook: Dict[str, Any]) -> bool:
+def _has_keyvault_externalid(doc: PlaybookDocument) -> bool:
     """
     Indica si el playbook tiene algún parámetro connections_keyvault_*_externalid.
     """
-    params = playbook.get("parameters", {})
-    if not isinstance(params, dict):
-        return False
-
-    for key in params.keys():
+    for key in doc.root_parameters.keys():
         if isinstance(key, str) and RE_CONNECTION_KEYVAULT_EXTERNALID.fullmatch(key):
             return True
     return False
@@ -318,19 +300,16 @@ def _has_keyvault_externalid(playbook: Dict[str, Any]) -> bool:
 # ---------------------------------------------------------------------------
 # AzureSentinelConnectionName por playbook
 # ---------------------------------------------------------------------------
-def _ensure_azuresentinel_connection_name(playbook: Dict[str, Any]) -> None:
+def _ensure_azuresentinel_connection_name(doc: PlaybookDocument) -> None:
     """
     Para cada playbook asegura que exista la variable:
 
       AzureSentinelConnectionName =
         "[concat('azuresentinel-', parameters('<nombredelplaybook>'))]"
     """
-    workflow_name_param = _get_workflow_name_param(playbook)
+    workflow_name_param = _get_workflow_name_param(doc)
 
-    variables = playbook.get("variables")
-    if not isinstance(variables, dict):
-        variables = {}
-        playbook["variables"] = variables
+    variables = doc.ensure_variables()
 
     expression = "[concat('azuresentinel-', parameters('" + workflow_name_param + "'))]"
     variables["AzureSentinelConnectionName"] = expression
@@ -345,22 +324,19 @@ def _ensure_azuresentinel_connection_name(playbook: Dict[str, Any]) -> None:
 # ---------------------------------------------------------------------------
 # keyvault_Connection_Name por playbook (si hay keyvault externalid)
 # ---------------------------------------------------------------------------
-def _ensure_keyvault_connection_name(playbook: Dict[str, Any]) -> None:
+def _ensure_keyvault_connection_name(doc: PlaybookDocument) -> None:
     """
     Si el playbook usa connections_keyvault_*_externalid, asegura que exista:
 
       keyvault_Connection_Name =
         "[concat('keyvault-', parameters('<nombredelplaybook>'))]"
     """
-    if not _has_keyvault_externalid(playbook):
+    if not _has_keyvault_externalid(doc):
         return
 
-    workflow_name_param = _get_workflow_name_param(playbook)
+    workflow_name_param = _get_workflow_name_param(doc)
 
-    variables = playbook.get("variables")
-    if not isinstance(variables, dict):
-        variables = {}
-        playbook["variables"] = variables
+    variables = doc.ensure_variables()
 
     expression = "[concat('keyvault-', parameters('" + workflow_name_param + "'))]"
     variables["keyvault_Connection_Name"] = expression
@@ -375,16 +351,12 @@ def _ensure_keyvault_connection_name(playbook: Dict[str, Any]) -> None:
 # ---------------------------------------------------------------------------
 # workflows_*_externalid → variables
 # ---------------------------------------------------------------------------
-def _add_workflow_externalid_variables(playbook: Dict[str, Any]) -> List[str]:
+def _add_workflow_externalid_variables(doc: PlaybookDocument) -> List[str]:
     """
     Crea var_<workflows_*_externalid> con el resourceId de Microsoft.Logic/workflows.
     """
-    params = playbook.get("parameters", {})
-    if not isinstance(params, dict):
-        return []
-
     externalid_params: List[str] = []
-    for key, definition in params.items():
+    for key, definition in doc.root_parameters.items():
         if not isinstance(key, str) or not isinstance(definition, dict):
             continue
         if not RE_WORKFLOW_EXTERNALID.fullmatch(key):
@@ -394,10 +366,7 @@ def _add_workflow_externalid_variables(playbook: Dict[str, Any]) -> List[str]:
     if not externalid_params:
         return []
 
-    variables = playbook.get("variables")
-    if not isinstance(variables, dict):
-        variables = {}
-        playbook["variables"] = variables
+    variables = doc.ensure_variables()
 
     for param_name in externalid_params:
         var_name = f"var_{param_name}"
@@ -439,10 +408,24 @@ def _replace_parameters_with_variables(
     if not param_names:
         return
 
-    replacements = {
-        f"[parameters('{param_name}')]": f"[variables('var_{param_name}')]"
-        for param_name in param_names
-    }
+    # Solo expresiones que son exactamente [parameters('<nombre_param>')]; los usos
+    # anidados (concat(parameters(...), ...)) siguen necesitando el nombre, no el id
+    replacements = {param_name: f"[variables('var_{param_name}')]" for param_name in param_names}
+
+    def _bare_parameter(s: str) -> Optional[str]:
+        try:
+            node = parse(s)
+        except ExpressionError:
+            return None
+        if (
+            isinstance(node, Call)
+            and node.name.lower() == "parameters"
+            and len(node.args) == 1
+            and isinstance(node.args[0], Literal)
+            and isinstance(node.args[0].value, str)
+        ):
+            return node.args[0].value
+        return None
 
     def _walk(obj: Any) -> Any:
         if isinstance(obj, dict):
@@ -453,12 +436,11 @@ def _replace_parameters_with_variables(
             for i, v in enumerate(obj):
                 obj[i] = _walk(v)
             return obj
-        if isinstance(obj, str):
-            s = obj
-            for old, new in replacements.items():
-                if old in s:
-                    s = s.replace(old, new)
-            return s
+        if isinstance(obj, str) and is_expression(obj):
+            name = _bare_parameter(obj)
+            if name is not None and name in replacements:
+                return replacements[name]
+            return obj
         return obj
 
     _walk(playbook)
@@ -467,33 +449,13 @@ def _replace_parameters_with_variables(
 # ---------------------------------------------------------------------------
 # NUEVO: asegurar definition.parameters.$connections en todos los workflows
 # ---------------------------------------------------------------------------
-def _ensure_definition_connections_parameter(playbook: Dict[str, Any]) -> None:
+def _ensure_definition_connections_parameter(doc: PlaybookDocument) -> None:
     """
     Asegura que cada workflow tenga:
       properties.definition.parameters.$connections = { "type": "Object", "defaultValue": {} }
     """
-    resources = playbook.get("resources", [])
-    if not isinstance(resources, list):
-        return
-
-    for res in resources:
-        if not isinstance(res, dict):
-            continue
-        if res.get("type") != "Microsoft.Logic/workflows":
-            continue
-
-        props = res.get("properties")
-        if not isinstance(props, dict):
-            continue
-
-        definition = props.get("definition")
-        if not isinstance(definition, dict):
-            continue
-
-        def_params = definition.get("parameters")
-        if not isinstance(def_params, dict):
-            def_params = {}
-            definition["parameters"] = def_params
+    for definition in doc.definitions():
+        def_params = doc.ensure_definition_parameters(definition)
 
         if "$connections" not in def_params or not isinstance(def_params.get("$connections"), dict):
             def_params["$connections"] = {"type": "Object", "defaultValue": {}}
@@ -524,26 +486,17 @@ def _replace_numbered_azuresentinel_in_body(playbook: Dict[str, Any]) -> None:
 # ---------------------------------------------------------------------------
 # NUEVO: quitar conexiones "azuresentinel-<numero>" del $connections.value
 # ---------------------------------------------------------------------------
-def _remove_numbered_azuresentinel_connections(playbook: Dict[str, Any]) -> None:
+def _remove_numbered_azuresentinel_connections(doc: PlaybookDocument) -> None:
     """
     En cada workflow, elimina entradas del bloque:
       properties.parameters.$connections.value
     cuyas keys sean: azuresentinel-<NUMERO> (ej: azuresentinel-1).
     """
-    resources = playbook.get("resources", [])
-    if not isinstance(resources, list):
-        return
-
     removed_total = 0
 
-    for res in resources:
-        if not isinstance(res, dict):
-            continue
-        if res.get("type") != "Microsoft.Logic/workflows":
-            continue
-
-        props = res.get("properties")
-        if not isinstance(props, dict):
+    for res in doc.workflows:
+        props = doc.properties(res)
+        if props is None:
             continue
 
         parameters = props.get("parameters")
@@ -573,33 +526,21 @@ def _remove_numbered_azuresentinel_connections(playbook: Dict[str, Any]) -> None
             removed_total,
         )
     
-    _replace_numbered_azuresentinel_in_body(playbook)
+    _replace_numbered_azuresentinel_in_body(doc.data)
 
 # ---------------------------------------------------------------------------
 # Bloques $connections + dependsOn usando AzureSentinelConnectionName y keyvault_Connection_Name
 # ---------------------------------------------------------------------------
-def _ensure_workflow_connection_blocks(playbook: Dict[str, Any]) -> None:
-    resources = playbook.get("resources", [])
-    if not isinstance(resources, list):
-        return
-
-    variables = playbook.get("variables", {})
+def _ensure_workflow_connection_blocks(doc: PlaybookDocument) -> None:
+    variables = doc.variables
     has_azure = "AzureSentinelConnectionName" in variables
     has_kv = "keyvault_Connection_Name" in variables
 
     if not has_azure and not has_kv:
         return
 
-    for res in resources:
-        if not isinstance(res, dict):
-            continue
-        if res.get("type") != "Microsoft.Logic/workflows":
-            continue
-
-        props = res.get("properties")
-        if not isinstance(props, dict):
-            props = {}
-            res["properties"] = props
+    for res in doc.workflows:
+        props = doc.ensure_properties(res)
 
         parameters = props.get("parameters")
         if not isinstance(parameters, dict):
@@ -647,13 +588,12 @@ def _ensure_workflow_connection_blocks(playbook: Dict[str, Any]) -> None:
 # ---------------------------------------------------------------------------
 # Recursos Microsoft.Web/connections para azuresentinel y keyvault
 # ---------------------------------------------------------------------------
-def _ensure_connection_resources(playbook: Dict[str, Any]) -> None:
-    resources = playbook.get("resources", [])
-    if not isinstance(resources, list):
+def _ensure_connection_resources(doc: PlaybookDocument) -> None:
+    if not isinstance(doc.data.get("resources", []), list):
         return
 
-    variables = playbook.get("variables", {})
-    params = playbook.get("parameters", {})
+    variables = doc.variables
+    params = doc.root_parameters
 
     has_azure = "AzureSentinelConnectionName" in variables
     has_kv = "keyvault_Connection_Name" in variables and "keyvault_Name" in params
@@ -661,92 +601,30 @@ def _ensure_connection_resources(playbook: Dict[str, Any]) -> None:
     # Azure Sentinel connection
     if has_azure:
         azure_name_expr = "[variables('AzureSentinelConnectionName')]"
-        azure_api_id_expr = (
-            "[concat('/subscriptions/', subscription().subscriptionId, "
-            "'/providers/Microsoft.Web/locations/', resourceGroup().location, "
-            "'/managedApis/azuresentinel')]"
-        )
-
-        exists = False
-        for res in resources:
-            if (
-                isinstance(res, dict)
-                and res.get("type") == "Microsoft.Web/connections"
-                and res.get("name") == azure_name_expr
-            ):
-                exists = True
-                break
-
-        if not exists:
-            resources.append(
-                {
-                    "type": "Microsoft.Web/connections",
-                    "apiVersion": "2016-06-01",
-                    "name": azure_name_expr,
-                    "location": "[resourceGroup().location]",
-                    "kind": "V1",
-                    "properties": {
-                        "displayName": azure_name_expr,
-                        "customParameterValues": {},
-                        "parameterValueType": "Alternative",
-                        "api": {"id": azure_api_id_expr},
-                    },
-                }
-            )
+        if not doc.has_connection(azure_name_expr):
+            doc.add_connection(azuresentinel_connection_resource(azure_name_expr))
 
     # Key Vault connection
     if has_kv:
         kv_name_expr = "[variables('keyvault_Connection_Name')]"
-        kv_api_id_expr = (
-            "[concat(subscription().id, '/providers/Microsoft.Web/locations/', "
-            "resourceGroup().location, '/managedApis/', 'keyvault')]"
-        )
-
-        exists_kv = False
-        for res in resources:
-            if (
-                isinstance(res, dict)
-                and res.get("type") == "Microsoft.Web/connections"
-                and res.get("name") == kv_name_expr
-            ):
-                exists_kv = True
-                break
-
-        if not exists_kv:
-            resources.append(
-                {
-                    "type": "Microsoft.Web/connections",
-                    "apiVersion": "2016-06-01",
-                    "name": kv_name_expr,
-                    "location": "[resourceGroup().location]",
-                    "properties": {
-                        "api": {"id": kv_api_id_expr},
-                        "displayName": kv_name_expr,
-                        "parameterValueType": "Alternative",
-                        "AlternativeParameterValues": {"vaultName": "[parameters('keyvault_Name')]"},
-                    },
-                }
-            )
+        if not doc.has_connection(kv_name_expr):
+            doc.add_connection(keyvault_connection_resource(kv_name_expr, "[parameters('keyvault_Name')]"))
 
 
 # ---------------------------------------------------------------------------
 # Merge de parámetros de la master hacia el playbook
 # ---------------------------------------------------------------------------
 def _merge_deployment_parameters_into_playbook(
-    playbook: Dict[str, Any],
+    doc: PlaybookDocument,
     deployment_params: Optional[Dict[str, Any]],
 ) -> None:
     if not deployment_params or not isinstance(deployment_params, dict):
         return
 
-    params = playbook.get("parameters")
-    if not isinstance(params, dict):
-        params = {}
-        playbook["parameters"] = params
+    params = doc.ensure_root_parameters()
 
-    resources = playbook.get("resources", [])
-    if not isinstance(resources, list):
-        resources = []
+    # definition.parameters de cada workflow (se crean si faltan), resueltos una sola vez
+    def_params_list = [doc.ensure_definition_parameters(d) for d in doc.definitions()]
 
     for pname in deployment_params.keys():
         if pname not in params:
@@ -754,26 +632,7 @@ def _merge_deployment_parameters_into_playbook(
             params[pname] = entry
             logger.debug("Añadido parámetro root desde master al playbook: %s -> %r", pname, entry)
 
-        for res in resources:
-            if not isinstance(res, dict):
-                continue
-            if res.get("type") != "Microsoft.Logic/workflows":
-                continue
-
-            props = res.get("properties")
-            if not isinstance(props, dict):
-                props = {}
-                res["properties"] = props
-
-            definition = props.get("definition")
-            if not isinstance(definition, dict):
-                continue
-
-            def_params = definition.get("parameters")
-            if not isinstance(def_params, dict):
-                def_params = {}
-                definition["parameters"] = def_params
-
+        for def_params in def_params_list:
             if pname in def_params:
                 continue
 
@@ -797,7 +656,7 @@ def _replace_keyvault_variable_references(
     if not deployment_params or not isinstance(deployment_params, dict):
         return
 
-    replacements: Dict[str, str] = {}
+    replacements: Dict[Tuple[str, str], Tuple[str, str]] = {}
 
     for pname in deployment_params.keys():
         if not isinstance(pname, str):
@@ -809,10 +668,10 @@ def _replace_keyvault_variable_references(
         if not suffix:
             continue
 
-        replacements[f"variables('{suffix}')"] = f"parameters('{pname}')"
+        replacements[("variables", suffix)] = ("parameters", pname)
 
         if not suffix.startswith("keyvault_"):
-            replacements[f"parameters('{suffix}')"] = f"parameters('{pname}')"
+            replacements[("parameters", suffix)] = ("parameters", pname)
 
     if not replacements:
         return
@@ -827,11 +686,7 @@ def _replace_keyvault_variable_references(
                 obj[i] = _walk(v)
             return obj
         if isinstance(obj, str):
-            s = obj
-            for old, new in replacements.items():
-                if old in s:
-                    s = s.replace(old, new)
-            return s
+            return rewrite(obj, replacements)
         return obj
 
     _walk(playbook)
@@ -845,49 +700,66 @@ def _replace_keyvault_variable_references(
 # ---------------------------------------------------------------------------
 # Limpieza iterativa de parámetros no usados
 # ---------------------------------------------------------------------------
-def _remove_unused_definition_parameters(playbook: Dict[str, Any]) -> bool:
-    resources = playbook.get("resources", [])
-    if not isinstance(resources, list) or not resources:
-        return False
+def _referenced_parameters(doc: PlaybookDocument, include_root: bool) -> Set[str]:
+    """
+    Nombres (en minúsculas) referenciados con parameters('<nombre>') en el playbook,
+    sin contar los definition.parameters de los workflows (ni los parameters root,
+    si include_root). Las secciones se sustituyen temporalmente por {} y se
+    restauran después, sin copiar el documento.
+    """
+    detached: List[tuple] = []
 
-    stripped = json.loads(json.dumps(playbook))
-    stripped_resources = stripped.get("resources", [])
-    if isinstance(stripped_resources, list):
-        for res in stripped_resources:
-            if isinstance(res, dict) and res.get("type") == "Microsoft.Logic/workflows":
-                props = res.get("properties")
-                if not isinstance(props, dict):
-                    continue
-                definition = props.get("definition")
-                if isinstance(definition, dict) and "parameters" in definition:
-                    del definition["parameters"]
-
-    stripped_str = json.dumps(stripped)
-    changed = False
+    for definition in doc.definitions():
+        if "parameters" in definition:
+            detached.append((definition, definition["parameters"]))
+            definition["parameters"] = {}
 
-    for res in resources:
-        if not isinstance(res, dict):
-            continue
-        if res.get("type") != "Microsoft.Logic/workflows":
-            continue
+    if include_root and "parameters" in doc.data:
+        detached.append((doc.data, doc.data["parameters"]))
+        doc.data["parameters"] = {}
 
-        props = res.get("properties")
-        if not isinstance(props, dict):
-            continue
+    names: Set[str] = set()
 
-        definition = props.get("definition")
-        if not isinstance(definition, dict):
-            continue
+    def _collect(text: str) -> None:
+        for kind, name in references(text):
+            if kind == "parameters":
+                names.add(name.lower())
+
+    def _walk(obj: Any) -> None:
+        if isinstance(obj, str):
+            _collect(obj)
+        elif isinstance(obj, dict):
+            for k, v in obj.items():
+                if isinstance(k, str):
+                    _collect(k)
+                _walk(v)
+        elif isinstance(obj, list):
+            for v in obj:
+                _walk(v)
+
+    try:
+        _walk(doc.data)
+        return names
+    finally:
+        for owner, value in detached:
+            owner["parameters"] = value
+
+
+def _remove_unused_definition_parameters(doc: PlaybookDocument) -> bool:
+    if not doc.resources:
+        return False
 
-        def_params = definition.get("parameters")
-        if not isinstance(def_params, dict) or not def_params:
+    referenced = _referenced_parameters(doc, include_root=False)
+    changed = False
+
+    for def_params in doc.all_definition_parameters():
+        if not def_params:
             continue
 
         for pname in list(def_params.keys()):
             if not isinstance(pname, str):
                 continue
-            pattern = f"parameters('{pname}')"
-            if pattern in stripped_str:
+            if pname.lower() in referenced:
                 continue
 
             logger.debug("Parámetro definition.parameters no usado detectado. Se eliminará: %s", pname)
@@ -897,36 +769,19 @@ def _remove_unused_definition_parameters(playbook: Dict[str, Any]) -> bool:
     return changed
 
 
-def _remove_unused_root_parameters(playbook: Dict[str, Any]) -> bool:
-    params_root = playbook.get("parameters")
+def _remove_unused_root_parameters(doc: PlaybookDocument) -> bool:
+    params_root = doc.data.get("parameters")
     if not isinstance(params_root, dict) or not params_root:
         return False
 
-    stripped = json.loads(json.dumps(playbook))
-
-    if "parameters" in stripped:
-        del stripped["parameters"]
-
-    stripped_resources = stripped.get("resources", [])
-    if isinstance(stripped_resources, list):
-        for res in stripped_resources:
-            if isinstance(res, dict) and res.get("type") == "Microsoft.Logic/workflows":
-                props = res.get("properties")
-                if not isinstance(props, dict):
-                    continue
-                definition = props.get("definition")
-                if isinstance(definition, dict) and "parameters" in definition:
-                    del definition["parameters"]
-
-    stripped_str = json.dumps(stripped)
+    referenced = _referenced_parameters(doc, include_root=True)
     changed = False
 
     for pname in list(params_root.keys()):
         if not isinstance(pname, str):
             continue
 
-        pattern = f"parameters('{pname}')"
-        if pattern in stripped_str:
+        if pname.lower() in referenced:
             continue
 
         logger.debug("Parámetro root no usado detectado. Se eliminará: %s", pname)
@@ -936,14 +791,14 @@ def _remove_unused_root_parameters(playbook: Dict[str, Any]) -> bool:
     return changed
 
 
-def _cleanup_unused_parameters(playbook: Dict[str, Any]) -> None:
+def _cleanup_unused_parameters(doc: PlaybookDocument) -> None:
     while True:
-        changed_def = _remove_unused_definition_parameters(playbook)
-        changed_root = _remove_unused_root_parameters(playbook)
+        changed_def = _remove_unused_definition_parameters(doc)
+        changed_root = _remove_unused_root_parameters(doc)
         if not (changed_def or changed_root):
             break
 
-def _sanitize_workflow_parameters(playbook: Dict[str, Any]) -> None:
+def _sanitize_workflow_parameters(doc: PlaybookDocument) -> None:
     """
     Sanitizes only root parameters whose name starts with 'workflows_'.
 
@@ -951,11 +806,7 @@ def _sanitize_workflow_parameters(playbook: Dict[str, Any]) -> None:
       - parameters["workflows_*"].defaultValue (string) -> "BORRAR"
       - Everything else remains untouched
     """
-    params = playbook.get("parameters")
-    if not isinstance(params, dict):
-        return
-
-    for pname, pdef in params.items():
+    for pname, pdef in doc.root_parameters.items():
         if not isinstance(pname, str):
             continue
         if not pname.startswith("workflows_"):
@@ -968,48 +819,101 @@ def _sanitize_workflow_parameters(playbook: Dict[str, Any]) -> None:
 # ---------------------------------------------------------------------------
 # Transformación principal
 # ---------------------------------------------------------------------------
-def transform_playbook(
-    playbook: Dict[str, Any],
+def transform_document(
+    doc: PlaybookDocument,
     deployment_parameters: Optional[Dict[str, Any]],
-) -> Dict[str, Any]:
+) -> PlaybookDocument:
+    """
+    Aplica todas las pasadas de transformación sobre la vista del playbook.
+    """
     logger.debug("Iniciando transformación de playbook.")
 
-    _merge_deployment_parameters_into_playbook(playbook, deployment_parameters)
-    _replace_keyvault_variable_references(playbook, deployment_parameters)
+    _merge_deployment_parameters_into_playbook(doc, deployment_parameters)
+    _replace_keyvault_variable_references(doc.data, deployment_parameters)
 
-    _ensure_azuresentinel_connection_name(playbook)
-    _ensure_keyvault_connection_name(playbook)
+    _ensure_azuresentinel_connection_name(doc)
+    _ensure_keyvault_connection_name(doc)
 
-    wf_params = _add_workflow_externalid_variables(playbook)
+    wf_params = _add_workflow_externalid_variables(doc)
     if wf_params:
         logger.info("Variables creadas para parámetros *_externalid (workflows): %s", wf_params)
-        _replace_parameters_with_variables(playbook, wf_params)
+        _replace_parameters_with_variables(doc.data, wf_params)
     else:
         logger.debug("No se encontraron parámetros workflows_*_externalid en este playbook.")
 
-    _remove_numbered_azuresentinel_connections(playbook)
+    _remove_numbered_azuresentinel_connections(doc)
 
     # Final step: sanitize only workflows_* root parameters
-    _sanitize_workflow_parameters(playbook)
+    _sanitize_workflow_parameters(doc)
 
-    _ensure_workflow_connection_blocks(playbook)
-    _ensure_connection_resources(playbook)
+    _ensure_workflow_connection_blocks(doc)
+    _ensure_connection_resources(doc)
 
-    _cleanup_unused_parameters(playbook)
-    _ensure_definition_connections_parameter(playbook)
+    _cleanup_unused_parameters(doc)
+    _ensure_definition_connections_parameter(doc)
 
     logger.debug("Transformación completada.")
-    return playbook
+    return doc
+
+
+def transform_playbook(
+    playbook: Dict[str, Any],
+    deployment_parameters: Optional[Dict[str, Any]],
+) -> Dict[str, Any]:
+    return transform_document(PlaybookDocument(playbook), deployment_parameters).data
 
 
 # ---------------------------------------------------------------------------
 # Orquestador
 # ---------------------------------------------------------------------------
-def run_automation(
+@dataclass
+class BuiltPlaybook:
+    """
+    Playbook transformado en memoria.
+
+    - name: nombre del deployment en la master.
+    - source_path: fichero de entrada (su nombre se reutiliza al escribir).
+    - doc: vista del playbook ya transformado.
+    """
+
+    name: str
+    source_path: Path
+    doc: PlaybookDocument
+
+
+@dataclass
+class BuiltPack:
+    """
+    Resultado de aplicar una master sobre sus playbooks, sin escribir nada a disco.
+    """
+
+    master_path: Path
+    master_template: Dict[str, Any]
+    playbooks: List[BuiltPlaybook] = field(default_factory=list)
+    hoist_reports: List[HoistReport] = field(default_factory=list)
+    minify_reports: List[MinifyReport] = field(default_factory=list)
+    connections_report: Optional[SharedConnectionsReport] = None
+    foreach_findings: List[ForeachFinding] = field(default_factory=list)
+    auth_cache_report: Optional[AuthCacheReport] = None
+    retry_report: Optional[RetryReport] = None
+    branch_reports: List[BranchReport] = field(default_factory=list)
+    call_graph: Optional[CallGraph] = None
+
+
+def build_pack(
     master_path: Path,
     dir_in: Path,
-    dir_out: Path,
-) -> None:
+    deployments: Optional[Iterable[str]] = None,
+    repo_index: Optional[RepoIndex] = None,
+) -> Optional[BuiltPack]:
+    """
+    Carga la master, transforma en memoria los playbooks de sus deployments y
+    sincroniza la master con ellos. Devuelve None si la master no tiene deployments.
+
+    - deployments: si se indica, solo se transforman (y se sincronizan en la master)
+      esos deployments; el resto de la master queda intacto.
+    - repo_index: índice del repositorio para localizar los playbooks sin sondear disco.
+    """
     logger.info("Cargando master template desde %s", master_path)
     master_template = load_master_template(master_path)
 
@@ -1018,17 +922,22 @@ def run_automation(
 
     if not deployment_names:
         logger.warning("No se han encontrado deployments en la master template.")
-        return
+        return None
 
     logger.info("Se han encontrado %d deployments: %s", len(deployment_names), deployment_names)
 
-    for name in deployment_names:
-        candidate_paths = [
-            dir_in / f"Cliente_{name}.json",
-            dir_in / f"{name}.json",
-        ]
+    if deployments is not None:
+        selected = set(deployments)
+        deployment_names = [name for name in deployment_names if name in selected]
+        logger.info("Se procesarán solo %d deployments: %s", len(deployment_names), deployment_names)
 
-        playbook_path = next((p for p in candidate_paths if p.is_file()), None)
+    pack = BuiltPack(master_path=master_path, master_template=master_template)
+
+    # Un solo recorrido de dir_in (o consulta al índice) para todos los deployments
+    files = playbook_files(dir_in, repo_index)
+
+    for name in deployment_names:
+        playbook_path = find_playbook(dir_in, name, files=files)
 
         if playbook_path is None:
             logger.warning(
@@ -1046,14 +955,138 @@ def run_automation(
 
         inspect_workflow_parameters(playbook_data, source_name=playbook_path.name)
 
-        transformed = transform_playbook(playbook_data, deployment_params)
+        doc = transform_document(PlaybookDocument(playbook_data), deployment_params)
+
+        _sync_master_deployment_parameters_with_playbook(master_template, name, doc)
+
+        pack.playbooks.append(BuiltPlaybook(name=name, source_path=playbook_path, doc=doc))
+
+    return pack
+
+
+def run_automation(
+    master_path: Path,
+    dir_in: Path,
+    dir_out: Path,
+    deployments: Optional[Iterable[str]] = None,
+    repo_index: Optional[RepoIndex] = None,
+    hoist_threshold: Optional[int] = None,
+    minify: bool = False,
+    compact: bool = False,
+    shared_connections: bool = False,
+    foreach_concurrency: Optional[int] = None,
+    foreach_allow_reorder: bool = False,
+    auth_cache_ttl: Optional[int] = None,
+    retry_profile: Optional[RetryProfile] = None,
+    parallel_branches: bool = False,
+    call_graph: bool = False,
+) -> Optional[BuiltPack]:
+    """
+    Aplica la master sobre los playbooks de dir_in y escribe el resultado en dir_out.
+    Devuelve el pack escrito (None si la master no tiene deployments).
+
+    - deployments: si se indica, solo se transforman (y se sincronizan en la master)
+      esos deployments; el resto de la master queda intacto.
+    - repo_index: índice del repositorio ya abierto (modo batch o --repo-index);
+      si no se pasa, los playbooks se buscan directamente en dir_in y no se
+      lee ni escribe ningún índice.
+    - hoist_threshold: si se indica, las expresiones repetidas de cada playbook y
+      de la master se mueven a variables (ver core/optimize.py) antes de escribir.
+    - minify: elimina de las definiciones de los workflows los campos con valor
+      por defecto o sin efecto (ver core/optimize.py).
+    - compact: escribe JSON sin sangría ni espacios.
+    - shared_connections: la master despliega una única conexión de Sentinel y
+      otra de Key Vault para todo el pack (ver core/connections.py).
+    - foreach_concurrency: si se indica, los Foreach que pueden ejecutarse en
+      paralelo pasan a usar ese grado de paralelismo como parámetro del pack
+      (ver core/concurrency.py).
+    - foreach_allow_reorder: con foreach_concurrency, también se paralelizan los
+      Foreach secuenciales y los que añaden texto a una variable string, cuyo
+      orden pasa a ser el de finalización.
+    - auth_cache_ttl: si se indica, los playbooks que llaman a un
+      OrchestatorPart_*_Auth_Playbook reutilizan su respuesta, guardada en Key Vault
+      durante ese número de segundos (ver core/authcache.py).
+    - retry_profile: si se indica, las acciones Http/ApiConnection sin retryPolicy
+      o sin limit.timeout reciben los de ese perfil como parámetros del pack
+      (ver core/retry.py).
+    - parallel_branches: las acciones encadenadas por runAfter que no comparten
+      datos pasan a ejecutarse en ramas paralelas (ver core/branches.py).
+    - call_graph: construye el grafo de llamadas entre los playbooks del pack
+      (acciones Workflow) y lo deja en pack.call_graph (ver core/callgraph.py).
+    """
+    pack = build_pack(master_path, dir_in, deployments, repo_index)
+    if pack is None:
+        return None
+
+    if shared_connections:
+        pack.connections_report = share_connections(
+            pack.master_template,
+            [(built.name, built.doc) for built in pack.playbooks],
+            master_path.parent.parent.name or master_path.stem,
+        )
+
+    if foreach_concurrency is not None:
+        pack.foreach_findings = parallelize_foreach_loops(
+            pack.master_template,
+            [(built.name, built.doc, built.source_path.name) for built in pack.playbooks],
+            foreach_concurrency,
+            foreach_allow_reorder,
+        )
+
+    if auth_cache_ttl is not None:
+        pack.auth_cache_report = cache_auth_tokens(
+            pack.master_template,
+            [(built.name, built.doc, built.source_path.name) for built in pack.playbooks],
+            auth_cache_ttl,
+        )
+
+    if retry_profile is not None:
+        pack.retry_report = normalize_request_policies(
+            pack.master_template,
+            [(built.name, built.doc, built.source_path.name) for built in pack.playbooks],
+            retry_profile,
+        )
+
+    if parallel_branches:
+        for built in pack.playbooks:
+            pack.branch_reports.append(parallelize_independent_actions(built.doc, built.source_path.name))
+
+    if call_graph:
+        pack.call_graph = build_call_graph(
+            (built.name, built.doc, built.source_path.name) for built in pack.playbooks
+        )
 
-        _sync_master_deployment_parameters_with_playbook(master_template, name, transformed)
+    if hoist_threshold is not None:
+        for built in pack.playbooks:
+            pack.hoist_reports.append(
+                hoist_repeated_expressions(built.doc, hoist_threshold, built.source_path.name)
+            )
+        pack.hoist_reports.append(
+            hoist_repeated_expressions(PlaybookDocument(pack.master_template), hoist_threshold, master_path.name)
+        )
 
+    if minify:
+        for built in pack.playbooks:
+            pack.minify_reports.append(
+                minify_workflow_definitions(built.doc, built.source_path.name, compact)
+            )
+        pack.minify_reports.append(
+            minify_workflow_definitions(PlaybookDocument(pack.master_template), master_path.name, compact)
+        )
+
+    for built in pack.playbooks:
         logger.info("Guardando playbook en el directorio de salida...")
-        saved_path = write_playbook(dir_out, playbook_path, transformed)
+        saved_path = write_playbook(dir_out, built.source_path, built.doc.data, compact)
         logger.info("Playbook guardado correctamente en: %s", saved_path)
+        if repo_index is not None:
+            repo_index.update_file(saved_path)
 
     logger.info("Guardando master template transformada en el directorio de salida...")
-    saved_master = write_playbook(dir_out, master_path, master_template)
+    saved_master = write_playbook(dir_out, master_path, pack.master_template, compact)
     logger.info("Master template guardada en: %s", saved_master)
+
+    if repo_index is not None:
+        repo_index.update_file(saved_master)
+        repo_index.save()
+
+    return pack
@@ -10,11 +10,15 @@ from typing import Any, Dict
 
 from ..utils.file_system import ensure_dir_exists
 
+# Separadores sin espacios para el modo compacto
+COMPACT_SEPARATORS = (",", ":")
+
 
 def write_playbook(
     output_dir: Path,
     input_path: Path,
     playbook_data: Dict[str, Any],
+    compact: bool = False,
 ) -> Path:
     """
     Write the transformed playbook to the specified output directory.
@@ -25,19 +29,65 @@ def write_playbook(
         output_dir (Path): Directory where the playbook will be written.
         input_path (Path): Original path of the input playbook (used for naming).
         playbook_data (Dict[str, Any]): The transformed playbook data to write.
+        compact (bool): Write dense JSON (no indentation or spaces) for deploy artifacts.
 
     Returns:
         Path: Full path to the written output file.
 
     Notes:
         This function ensures that the output directory exists before writing.
-        The JSON file is written with indentation of 2 spaces and UTF-8 encoding.
+        The JSON file is written with indentation of 2 spaces (unless compact)
+        and UTF-8 encoding.
     """
     ensure_dir_exists(output_dir)
 
     output_path = output_dir / input_path.name
 
     with output_path.open("w", encoding="utf-8") as f:
-        json.dump(playbook_data, f, indent=2, ensure_ascii=False)
+        if compact:
+            json.dump(playbook_data, f, separators=COMPACT_SEPARATORS, ensure_ascii=False)
+        else:
+            json.dump(playbook_data, f, indent=2, ensure_ascii=False)
+
+    return output_path
+
+
+def serialize_playbook(playbook_data: Dict[str, Any], compact: bool = False) -> str:
+    """
+    Serialize a playbook exactly as `write_playbook` writes it.
+
+    Args:
+        playbook_data (Dict[str, Any]): The playbook data to serialize.
+        compact (bool): Dense JSON, as `write_playbook(..., compact=True)`.
+
+    Returns:
+        str: JSON text with indentation of 2 spaces (or none when compact) and
+        non-ASCII characters kept.
+    """
+    if compact:
+        return json.dumps(playbook_data, separators=COMPACT_SEPARATORS, ensure_ascii=False)
+    return json.dumps(playbook_data, indent=2, ensure_ascii=False)
+
+
+def write_serialized(output_dir: Path, file_name: str, payload: bytes) -> Path:
+    """
+    Write an already serialized (UTF-8 encoded) document to the output directory.
+
+    Args:
+        output_dir (Path): Directory where the file will be written.
+        file_name (str): Name of the output file.
+        payload (bytes): Encoded JSON content.
+
+    Returns:
+        Path: Full path to the written output file.
+
+    Notes:
+        Used when the same serialized content is written many times (e.g. one
+        copy per client), so it is only serialized and encoded once.
+    """
+    ensure_dir_exists(output_dir)
+
+    output_path = output_dir / file_name
+    output_path.write_bytes(payload)
 
     return output_path
@@ -4,8 +4,31 @@ Filesystem-related utilities.
 
 from __future__ import annotations
 
+import os
+from dataclasses import dataclass
+from fnmatch import fnmatchcase
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Iterator, Optional, Sequence
+
+from ..config import DISCOVERY_EXCLUDE_DIRS
+
+
+@dataclass(frozen=True)
+class JsonFileEntry:
+    """
+    File found by `scan_json_files`.
+
+    Attributes:
+        path (Path): Full path of the file.
+        size (int): File size in bytes, from the stat collected during the walk.
+        mtime_ns (int): Modification time in nanoseconds, from the same stat.
+        depth (int): Directory depth relative to the scanned root (0 = top level).
+    """
+
+    path: Path
+    size: int
+    mtime_ns: int
+    depth: int
 
 
 def ensure_dir_exists(path: Path) -> None:
@@ -23,21 +46,156 @@ def ensure_dir_exists(path: Path) -> None:
     path.mkdir(parents=True, exist_ok=True)
 
 
-def iter_json_files(directory: Path, extension: str = ".json") -> Iterable[Path]:
+def is_excluded_dir(name: str, exclude: Sequence[str]) -> bool:
+    """
+    Indicate whether a directory name matches any of the exclude globs.
+
+    Args:
+        name (str): Directory name (not a path).
+        exclude (Sequence[str]): Glob patterns such as "output", ".*" or "__pycache__".
+
+    Returns:
+        bool: True if the directory must be skipped.
+    """
+    return any(fnmatchcase(name, pattern) for pattern in exclude)
+
+
+def matches_name(name: str, include: Optional[Sequence[str]]) -> bool:
+    """
+    Indicate whether a file name matches the optional include globs.
+
+    Args:
+        name (str): File name.
+        include (Optional[Sequence[str]]): Glob patterns such as "Action_*" or
+            "OrchestatorPart_*". None or empty accepts every name.
+
+    Returns:
+        bool: True if the file is selected.
+    """
+    if not include:
+        return True
+    return any(fnmatchcase(name, pattern) for pattern in include)
+
+
+def is_selected(
+    relative_parts: Sequence[str],
+    exclude: Sequence[str] = DISCOVERY_EXCLUDE_DIRS,
+    max_depth: Optional[int] = None,
+    include: Optional[Sequence[str]] = None,
+) -> bool:
+    """
+    Apply the discovery filters to a path given relative to the scanned root.
+
+    Args:
+        relative_parts (Sequence[str]): Path components, file name last.
+        exclude (Sequence[str], optional): Directory-name globs to skip.
+        max_depth (Optional[int], optional): Maximum directory depth (0 = only
+            the root directory). None means unlimited.
+        include (Optional[Sequence[str]], optional): File-name globs to accept.
+
+    Returns:
+        bool: True if `scan_json_files` would yield the file.
+    """
+    dirs = relative_parts[:-1]
+    if max_depth is not None and len(dirs) > max_depth:
+        return False
+    if any(is_excluded_dir(d, exclude) for d in dirs):
+        return False
+    return matches_name(relative_parts[-1], include)
+
+
+def scan_json_files(
+    directory: Path,
+    extension: str = ".json",
+    exclude: Sequence[str] = DISCOVERY_EXCLUDE_DIRS,
+    max_depth: Optional[int] = None,
+    include: Optional[Sequence[str]] = None,
+) -> Iterator[JsonFileEntry]:
+    """
+    Lazily walk `directory` with `os.scandir` and yield the matching files.
+
+    Excluded directories are pruned (never descended into), entries are
+    visited in name order, and every file is yielded together with the stat
+    information gathered by the walk so callers do not need to stat it again.
+
+    Args:
+        directory (Path): Directory to search for files.
+        extension (str, optional): File extension to filter by. Defaults to ".json".
+        exclude (Sequence[str], optional): Directory-name globs to prune.
+            Defaults to `DISCOVERY_EXCLUDE_DIRS` (output dirs, dot-dirs, `__pycache__`).
+        max_depth (Optional[int], optional): Maximum directory depth (0 = only
+            `directory` itself). None means unlimited. Defaults to None.
+        include (Optional[Sequence[str]], optional): File-name globs to accept
+            (e.g. ["Action_*", "OrchestatorPart_*"]). Defaults to None (all).
+
+    Yields:
+        JsonFileEntry: Matching files with their stat information.
+
+    Notes:
+        If `directory` is not a valid directory, nothing is yielded.
+    """
+    if not directory.is_dir():
+        return
+
+    extension = extension.lower()
+    stack = [(directory, 0)]
+
+    while stack:
+        current, depth = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+
+        subdirs = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if (max_depth is None or depth < max_depth) and not is_excluded_dir(entry.name, exclude):
+                    subdirs.append((Path(entry.path), depth + 1))
+                continue
+
+            if not entry.name.lower().endswith(extension) or not matches_name(entry.name, include):
+                continue
+
+            try:
+                if not entry.is_file():
+                    continue
+                st = entry.stat()
+            except OSError:
+                continue
+
+            yield JsonFileEntry(path=Path(entry.path), size=st.st_size, mtime_ns=st.st_mtime_ns, depth=depth)
+
+        # Pushed in reverse so the stack pops subdirectories in name order
+        stack.extend(reversed(subdirs))
+
+
+def iter_json_files(
+    directory: Path,
+    extension: str = ".json",
+    exclude: Sequence[str] = DISCOVERY_EXCLUDE_DIRS,
+    max_depth: Optional[int] = None,
+    include: Optional[Sequence[str]] = None,
+) -> Iterable[Path]:
     """
     Recursively iterate over all files with the given extension in the directory.
 
     Args:
         directory (Path): Directory to search for files.
         extension (str, optional): File extension to filter by. Defaults to ".json".
+        exclude (Sequence[str], optional): Directory-name globs to prune.
+            Defaults to `DISCOVERY_EXCLUDE_DIRS`.
+        max_depth (Optional[int], optional): Maximum directory depth. Defaults to None.
+        include (Optional[Sequence[str]], optional): File-name globs to accept.
+            Defaults to None (all).
 
     Returns:
-        Iterable[Path]: Generator of Path objects matching the extension.
+        Iterable[Path]: Generator of Path objects matching the filters.
 
     Notes:
+        Thin wrapper over `scan_json_files` for callers that only need paths.
         If `directory` is not a valid directory, an empty generator is returned.
     """
-    if not directory.is_dir():
-        return []
-
-    yield from directory.rglob(f"*{extension}")
+    for entry in scan_json_files(directory, extension, exclude, max_depth, include):
+        yield entry.path
@@ -0,0 +1,387 @@
+"""
+Persisted index of the repository layout.
+
+The index records every JSON file of the repository (integrations, deploy
+templates and playbooks) with its size and mtime, and is shared
+by the `template_automation` CLI and the CI tools under `tools/`, so that all
+of them answer layout questions from one cheap scan instead of walking the
+tree on their own.
+
+Layout assumed:
+    <repo>/<Integration>/<playbook>.json
+    <repo>/<Integration>/output/<playbook>.json
+    <repo>/<Integration>/output/<deploy*.json>
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE_NAME: str = ".repo_index.json"
+INDEX_VERSION: int = 1
+OUTPUT_DIR_NAME: str = "output"
+
+# Directories never indexed (besides any dot-directory).
+PRUNE_DIRS = frozenset({"__pycache__", "python_app", "tools"})
+
+RE_DEPLOY = re.compile(r"deploy", re.IGNORECASE)
+CLIENT_PREFIX: str = "Cliente_"
+
+
+@dataclass
+class IndexEntry:
+    """
+    Indexed JSON file.
+
+    Attributes:
+        path (str): POSIX path relative to the index root.
+        size (int): File size in bytes.
+        mtime_ns (int): Modification time in nanoseconds.
+        integration (str): First path component (integration folder), or "".
+        logical_name (str): File stem without the `Cliente_` prefix; matches
+            the deployment name used in the master template.
+        kind (str): "deploy" for deploy templates inside `output/`,
+            "playbook" otherwise.
+    """
+
+    path: str
+    size: int
+    mtime_ns: int
+    integration: str
+    logical_name: str
+    kind: str
+
+    @property
+    def name(self) -> str:
+        return self.path.rsplit("/", 1)[-1]
+
+    @property
+    def parent(self) -> str:
+        return self.path.rsplit("/", 1)[0] if "/" in self.path else ""
+
+    @property
+    def in_output(self) -> bool:
+        return self.parent.rsplit("/", 1)[-1] == OUTPUT_DIR_NAME
+
+
+def _is_pruned(dir_name: str) -> bool:
+    return dir_name.startswith(".") or dir_name in PRUNE_DIRS
+
+
+def _make_entry(rel: str, size: int, mtime_ns: int) -> IndexEntry:
+    parts = rel.split("/")
+    name = parts[-1]
+    stem = name[: -len(".json")] if name.lower().endswith(".json") else name
+    logical = stem[len(CLIENT_PREFIX):] if stem.startswith(CLIENT_PREFIX) else stem
+    in_output = len(parts) >= 2 and parts[-2] == OUTPUT_DIR_NAME
+    kind = "deploy" if in_output and RE_DEPLOY.search(name) else "playbook"
+
+    return IndexEntry(
+        path=rel,
+        size=size,
+        mtime_ns=mtime_ns,
+        integration=parts[0] if len(parts) > 1 else "",
+        logical_name=logical,
+        kind=kind,
+    )
+
+
+def find_repo_root(start: Path) -> Optional[Path]:
+    """
+    Return the closest ancestor of `start` (inclusive) that contains `.git`.
+
+    Args:
+        start (Path): File or directory inside the repository.
+
+    Returns:
+        Optional[Path]: Repository root, or None if `start` is not inside a repository.
+    """
+    current = start.resolve()
+    if not current.is_dir():
+        current = current.parent
+
+    for candidate in (current, *current.parents):
+        if (candidate / ".git").exists():
+            return candidate
+    return None
+
+
+class RepoIndex:
+    """
+    Incrementally refreshed index of the JSON files under `root`.
+
+    Usage:
+        index = RepoIndex.open(root)   # load persisted index + refresh
+        index.deploy_files()
+        index.save()
+    """
+
+    def __init__(self, root: Path, index_path: Optional[Path] = None) -> None:
+        self.root: Path = root.resolve()
+        self.index_path: Path = index_path or (self.root / INDEX_FILE_NAME)
+        self.entries: Dict[str, IndexEntry] = {}
+        self._dirty: bool = False
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    @classmethod
+    def load(cls, root: Path, index_path: Optional[Path] = None) -> "RepoIndex":
+        """
+        Load the persisted index without touching the filesystem tree.
+
+        A missing, unreadable or outdated index file yields an empty index.
+        """
+        index = cls(root, index_path)
+
+        if not index.index_path.is_file():
+            return index
+
+        try:
+            data = json.loads(index.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as exc:
+            logger.warning("Índice de repositorio ilegible (%s), se reconstruirá: %s", exc, index.index_path)
+            return index
+
+        if not isinstance(data, dict) or data.get("version") != INDEX_VERSION:
+            return index
+
+        files = data.get("files")
+        if not isinstance(files, dict):
+            return index
+
+        for rel, raw in files.items():
+            if not isinstance(raw, dict):
+                continue
+            # Índices escritos por versiones anteriores pueden traer además "sha256"; se ignora
+            try:
+                index.entries[rel] = _make_entry(rel, int(raw["size"]), int(raw["mtime_ns"]))
+            except (KeyError, TypeError, ValueError):
+                continue
+
+        return index
+
+    @classmethod
+    def open(cls, root: Path, index_path: Optional[Path] = None) -> "RepoIndex":
+        """
+        Load the persisted index for `root` and bring it up to date.
+        """
+        index = cls.load(root, index_path)
+        index.refresh()
+        return index
+
+    def save(self) -> None:
+        """
+        Write the index to disk if it changed since it was loaded.
+        """
+        if not self._dirty and self.index_path.is_file():
+            return
+
+        data = {
+            "version": INDEX_VERSION,
+            "files": {
+                rel: {k: v for k, v in asdict(entry).items() if k != "path"}
+                for rel, entry in sorted(self.entries.items())
+            },
+        }
+        self.index_path.write_text(json.dumps(data, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        self._dirty = False
+
+    # ------------------------------------------------------------------
+    # Refresh
+    # ------------------------------------------------------------------
+    def _walk(self, directory: Path, rel_dir: str, seen: Dict[str, os.stat_result]) -> None:
+        try:
+            it = os.scandir(directory)
+        except OSError as exc:
+            logger.debug("No se puede listar %s: %s", directory, exc)
+            return
+
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if _is_pruned(entry.name):
+                        continue
+                    child_rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                    self._walk(Path(entry.path), child_rel, seen)
+                elif entry.is_file() and entry.name.lower().endswith(".json"):
+                    # Ficheros ocultos (este índice, manifests de tools/) no se indexan
+                    if entry.name.startswith("."):
+                        continue
+                    rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                    seen[rel] = entry.stat()
+
+    def refresh(self) -> bool:
+        """
+        Rescan the tree and update changed entries.
+
+        The scan only stats the files: entries whose size and mtime match are
+        kept as they are, new or modified files get a new entry and deleted
+        files are dropped. File contents are never read.
+
+        Returns:
+            bool: True if any entry was added, updated or removed.
+        """
+        seen: Dict[str, os.stat_result] = {}
+        self._walk(self.root, "", seen)
+
+        changed = False
+
+        for rel in list(self.entries):
+            if rel not in seen:
+                del self.entries[rel]
+                changed = True
+
+        for rel, st in seen.items():
+            current = self.entries.get(rel)
+            if current is not None and current.size == st.st_size and current.mtime_ns == st.st_mtime_ns:
+                continue
+
+            self.entries[rel] = _make_entry(rel, st.st_size, st.st_mtime_ns)
+            changed = True
+
+        if changed:
+            self._dirty = True
+            logger.debug("Índice de repositorio actualizado: %d ficheros.", len(self.entries))
+
+        return changed
+
+    def update_file(self, path: Path) -> None:
+        """
+        Re-stat a single file after it was written by the caller.
+        """
+        rel = self.relative(path)
+        if rel is None:
+            return
+
+        full = self.root / rel
+        if not full.is_file():
+            if self.entries.pop(rel, None) is not None:
+                self._dirty = True
+            return
+
+        st = full.stat()
+        self.entries[rel] = _make_entry(rel, st.st_size, st.st_mtime_ns)
+        self._dirty = True
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def relative(self, path: Path) -> Optional[str]:
+        """
+        Return `path` relative to the index root, or None if it falls outside
+        the indexed tree (outside the root or inside a pruned directory).
+        """
+        try:
+            rel = path.resolve().relative_to(self.root)
+        except ValueError:
+            return None
+
+        parts = rel.parts
+        if any(_is_pruned(p) for p in parts[:-1]):
+            return None
+        return "/".join(parts)
+
+    def covers(self, directory: Path) -> bool:
+        """
+        Indicate whether `directory` lies inside the indexed tree.
+        """
+        rel = self.relative(directory / "_")
+        return rel is not None
+
+    def get(self, path: Path) -> Optional[IndexEntry]:
+        rel = self.relative(path)
+        return self.entries.get(rel) if rel is not None else None
+
+    def is_file(self, path: Path) -> bool:
+        """
+        Indexed equivalent of `Path.is_file` for JSON files.
+
+        Paths outside the indexed tree (or non-JSON files) are checked on disk.
+        """
+        rel = self.relative(path)
+        if rel is None or not rel.lower().endswith(".json"):
+            return path.is_file()
+        return rel in self.entries
+
+    def files_under(self, directory: Path, recursive: bool = True) -> List[IndexEntry]:
+        """
+        Entries located under `directory`, sorted by path.
+        """
+        rel = self.relative(directory / "_")
+        if rel is None:
+            return []
+
+        prefix = rel[: -len("_")]
+        result = [
+            e for key, e in self.entries.items()
+            if key.startswith(prefix) and (recursive or "/" not in key[len(prefix):])
+        ]
+        return sorted(result, key=lambda e: e.path)
+
+    def integrations(self) -> List[str]:
+        """
+        Integration folders that contain at least one JSON in `output/`,
+        sorted case-insensitively.
+        """
+        names = {
+            e.integration for e in self.entries.values()
+            if e.integration and e.parent == f"{e.integration}/{OUTPUT_DIR_NAME}"
+        }
+        return sorted(names, key=str.lower)
+
+    def output_files(self, integration: str) -> List[IndexEntry]:
+        """
+        JSON files directly inside `<integration>/output/`, sorted by name.
+        """
+        parent = f"{integration}/{OUTPUT_DIR_NAME}"
+        return sorted(
+            (e for e in self.entries.values() if e.parent == parent),
+            key=lambda e: e.name,
+        )
+
+    def deploy_files(self) -> List[IndexEntry]:
+        """
+        Deploy templates (`*deploy*.json` whose parent folder is `output/`).
+        """
+        return sorted(
+            (e for e in self.entries.values() if e.kind == "deploy"),
+            key=lambda e: e.path,
+        )
+
+    def paths(self, entries: Iterable[IndexEntry]) -> List[Path]:
+        """
+        Convert entries back to absolute paths.
+        """
+        return [self.root / e.path for e in entries]
+
+
+def open_repo_index(start: Path) -> Optional[RepoIndex]:
+    """
+    Open (and refresh) the index of the repository containing `start`.
+
+    Args:
+        start (Path): File or directory inside the repository.
+
+    Returns:
+        Optional[RepoIndex]: The refreshed index, or None when `start` is not
+        inside a git repository or lies in a directory the index skips.
+    """
+    root = find_repo_root(start)
+    if root is None:
+        return None
+
+    index = RepoIndex.load(root)
+    if not index.covers(start if start.is_dir() else start.parent):
+        return None
+
+    index.refresh()
+    return index
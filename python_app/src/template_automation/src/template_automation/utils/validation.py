@@ -4,8 +4,22 @@ Validation functions for master templates, playbooks, etc.
 """
 
 from __future__ import annotations
+
+import json
 from typing import Any, Dict, List
 
+# ARM parameter types (lower-case) -> expected Python type
+ARM_PARAMETER_TYPES: Dict[str, type] = {
+    "string": str,
+    "securestring": str,
+    "int": int,
+    "bool": bool,
+    "object": dict,
+    "secureobject": dict,
+    "array": list,
+}
+
+
 def validate_master_template(template: Dict[str, Any]) -> None:
     """
     Validate an Azure Resource Manager (ARM) template.
@@ -54,3 +68,81 @@ def validate_master_template(template: Dict[str, Any]) -> None:
     # - Check for unique resource names
     # - Validate allowed resource types
     # - Validate dependencies
+
+
+def coerce_parameter_value(raw: str, declared_type: str) -> Any:
+    """
+    Convert a textual value (e.g. a CSV cell) to the declared ARM parameter type.
+
+    Args:
+        raw (str): Value as text.
+        declared_type (str): ARM type of the parameter ("string", "int", "bool",
+            "object", "array", "securestring", "secureObject"), case-insensitive.
+
+    Returns:
+        Any: The converted value.
+
+    Raises:
+        ValueError: If the type is unknown or the value cannot be converted.
+    """
+    arm_type = declared_type.lower()
+    expected = ARM_PARAMETER_TYPES.get(arm_type)
+    if expected is None:
+        raise ValueError(f'Unknown parameter type "{declared_type}".')
+
+    if expected is str:
+        return raw
+
+    text = raw.strip()
+
+    if expected is bool:
+        lowered = text.lower()
+        if lowered in ("true", "1", "yes"):
+            return True
+        if lowered in ("false", "0", "no"):
+            return False
+        raise ValueError(f'"{raw}" is not a valid bool.')
+
+    if expected is int:
+        try:
+            return int(text)
+        except ValueError:
+            raise ValueError(f'"{raw}" is not a valid int.') from None
+
+    try:
+        value = json.loads(text)
+    except ValueError:
+        raise ValueError(f'"{raw}" is not valid JSON for type {declared_type}.') from None
+
+    if not isinstance(value, expected):
+        raise ValueError(f'"{raw}" is not a valid {declared_type}.')
+    return value
+
+
+def check_parameter_value(value: Any, declaration: Dict[str, Any]) -> None:
+    """
+    Check an already typed value against an ARM parameter declaration.
+
+    Args:
+        value (Any): Value to check (e.g. parsed from JSON or `coerce_parameter_value`).
+        declaration (Dict[str, Any]): Parameter declaration from the template
+            (`type`, optional `allowedValues`).
+
+    Raises:
+        ValueError: If the value does not match the declared type or is not
+            one of the allowed values.
+    """
+    declared_type = str(declaration.get("type", "string"))
+    expected = ARM_PARAMETER_TYPES.get(declared_type.lower())
+    if expected is None:
+        raise ValueError(f'Unknown parameter type "{declared_type}".')
+
+    # bool is a subclass of int in Python; ARM keeps them apart
+    if expected is int and isinstance(value, bool):
+        raise ValueError(f"{value!r} is not a valid {declared_type}.")
+    if not isinstance(value, expected):
+        raise ValueError(f"{value!r} is not a valid {declared_type}.")
+
+    allowed = declaration.get("allowedValues")
+    if isinstance(allowed, list) and value not in allowed:
+        raise ValueError(f"{value!r} is not one of the allowed values {allowed}.")
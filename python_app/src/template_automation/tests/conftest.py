@@ -0,0 +1,36 @@
+"""
+Shared fixtures for the template_automation tests.
+
+The package lives in `src/` and has no installable build, so the tests put it
+on `sys.path` themselves; run them from `python_app/src/template_automation`
+with `python -m pytest`.
+"""
+
+from __future__ import annotations
+
+import shutil
+import sys
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+TESTS_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(TESTS_DIR.parent / "src"))
+
+# Raíz del repositorio: <repo>/python_app/src/template_automation/tests
+REPO_ROOT = TESTS_DIR.parents[3]
+
+
+@pytest.fixture
+def integration(tmp_path: Path) -> Callable[[str], Path]:
+    """
+    Copy an integration folder of the repository (playbooks plus `output/`)
+    into a temporary directory and return the copy.
+    """
+    def _copy(name: str) -> Path:
+        target = tmp_path / name
+        shutil.copytree(REPO_ROOT / name, target)
+        return target
+
+    return _copy
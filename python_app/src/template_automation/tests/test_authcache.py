@@ -0,0 +1,223 @@
+"""
+Auth token cache (`core/authcache.py`) on a small caller/Auth pack.
+"""
+
+from __future__ import annotations
+
+import copy
+from typing import Any, Dict, List
+
+import pytest
+
+from template_automation.core.authcache import (
+    ACCESS_POLICY_TYPE,
+    CHECK_ACTION,
+    GET_ACTION,
+    INIT_ACTION,
+    SET_ACTION,
+    STORE_ACTION,
+    STORED_ACTION,
+    TOKEN_VARIABLE,
+    USE_ACTION,
+    VAULT_PARAMETER,
+    _rewire_caller,
+    cache_auth_tokens,
+)
+from template_automation.core.diff import DEPLOYMENT_TYPE
+from template_automation.core.document import PlaybookDocument, WORKFLOW_TYPE
+
+AUTH = "OrchestatorPart_Vendor_Auth_Playbook"
+CALLER = "OrchestatorPart_Vendor_Playbook"
+
+
+def _workflow(name: str, actions: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "parameters": {"PlaybookName": {"type": "String"}},
+        "resources": [
+            {
+                "type": WORKFLOW_TYPE,
+                "name": "[parameters('PlaybookName')]",
+                "properties": {"definition": {"parameters": {}, "actions": actions}},
+            }
+        ],
+    }
+
+
+def _caller_actions() -> Dict[str, Any]:
+    return {
+        "Initialize_Result": {"runAfter": {}, "type": "InitializeVariable", "inputs": {}},
+        "Get_Token": {
+            "runAfter": {"Initialize_Result": ["Succeeded"]},
+            "type": "Workflow",
+            "inputs": {
+                "host": {
+                    "triggerName": "manual",
+                    "workflow": {
+                        "id": f"[resourceId('Microsoft.Logic/workflows', variables('var_workflows_{AUTH}_externalid'))]"
+                    },
+                },
+            },
+        },
+        "Call_Vendor": {
+            "runAfter": {"Get_Token": ["Succeeded"]},
+            "type": "Http",
+            "inputs": {"method": "GET", "headers": {"Authorization": "Bearer @{body('Get_Token')?['access_token']}"}},
+        },
+        "Report_Auth_Error": {
+            "runAfter": {"Get_Token": ["Failed", "TimedOut"]},
+            "type": "Compose",
+            "inputs": "@{outputs('Get_Token')?['statusCode']}: @{body('Get_Token')?['message']}",
+        },
+    }
+
+
+def _caller() -> PlaybookDocument:
+    return PlaybookDocument(_workflow(CALLER, _caller_actions()))
+
+
+def _actions(doc: PlaybookDocument) -> Dict[str, Any]:
+    return doc.definition(doc.workflows[0])["actions"]
+
+
+def _pack():
+    master = {
+        "parameters": {"keyvault_Name_Pack": {"type": "string"}},
+        "resources": [
+            {
+                "type": DEPLOYMENT_TYPE,
+                "name": name,
+                "properties": {"parameters": {"PlaybookName": {"value": f"[concat('Client_', '{name}')]"}}},
+            }
+            for name in (AUTH, CALLER)
+        ],
+    }
+    playbooks = [
+        (AUTH, PlaybookDocument(_workflow(AUTH, {"Response": {"runAfter": {}, "type": "Response"}})), f"{AUTH}.json"),
+        (CALLER, _caller(), f"{CALLER}.json"),
+    ]
+    return master, playbooks
+
+
+def _access_policies(master: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [res for res in master["resources"] if res.get("type") == ACCESS_POLICY_TYPE]
+
+
+def test_cache_miss_runs_the_auth_playbook_and_stores_only_successes() -> None:
+    doc = _caller()
+
+    assert _rewire_caller(doc, "Get_Token", AUTH, 900) is None
+
+    actions = _actions(doc)
+    assert "Get_Token" not in actions
+    assert actions[INIT_ACTION]["runAfter"] == {"Initialize_Result": ["Succeeded"]}
+    assert actions[CHECK_ACTION]["runAfter"] == {GET_ACTION: ["Succeeded", "Failed", "TimedOut"]}
+
+    miss = actions[CHECK_ACTION]["else"]["actions"]
+    assert miss["Get_Token"]["runAfter"] == {}
+    assert miss[SET_ACTION]["runAfter"] == {"Get_Token": ["Succeeded", "Failed", "TimedOut"]}
+    assert miss[SET_ACTION]["inputs"] == {"name": TOKEN_VARIABLE, "value": "@outputs('Get_Token')"}
+    assert miss[STORE_ACTION]["runAfter"] == {"Get_Token": ["Succeeded"]}
+    assert miss[STORE_ACTION]["inputs"]["method"] == "PUT"
+
+
+def _scope_status(actions: Dict[str, Any], outcomes: Dict[str, str]) -> str:
+    """
+    Status of a Logic Apps scope: each action runs if its predecessors ended
+    with one of the statuses of its runAfter (otherwise it is Skipped) and
+    ends as `outcomes` says (Succeeded by default). The scope fails if a last
+    action failed, or was skipped because something before it failed.
+    """
+    status: Dict[str, str] = {}
+    pending = list(actions)
+    while pending:
+        name = next(n for n in pending if all(p in status for p in actions[n]["runAfter"]))
+        pending.remove(name)
+        run_after = actions[name]["runAfter"]
+        runs = all(status[p] in statuses for p, statuses in run_after.items())
+        status[name] = outcomes.get(name, "Succeeded") if runs else "Skipped"
+
+    failed = any(value in ("Failed", "TimedOut") for value in status.values())
+    last = [n for n in actions if not any(n in actions[other]["runAfter"] for other in actions)]
+    if any(status[n] in ("Failed", "TimedOut") or (status[n] == "Skipped" and failed) for n in last):
+        return "Failed"
+    return "Succeeded"
+
+
+@pytest.mark.parametrize(
+    "outcomes, expected",
+    [
+        ({}, "Succeeded"),
+        ({STORE_ACTION: "Failed"}, "Succeeded"),
+        ({STORE_ACTION: "TimedOut"}, "Succeeded"),
+        ({"Get_Token": "Failed"}, "Failed"),
+        ({"Get_Token": "TimedOut"}, "Failed"),
+    ],
+    ids=["stored", "store-failed", "store-timed-out", "auth-failed", "auth-timed-out"],
+)
+def test_cache_write_is_best_effort(outcomes: Dict[str, str], expected: str) -> None:
+    doc = _caller()
+    _rewire_caller(doc, "Get_Token", AUTH, 900)
+
+    miss = _actions(doc)[CHECK_ACTION]["else"]["actions"]
+
+    assert miss[STORED_ACTION]["runAfter"] == {STORE_ACTION: ["Succeeded", "Failed", "TimedOut"]}
+    assert _scope_status(miss, outcomes) == expected
+
+
+def test_cache_hit_uses_the_stored_secret() -> None:
+    doc = _caller()
+    _rewire_caller(doc, "Get_Token", AUTH, 900)
+
+    check = _actions(doc)[CHECK_ACTION]
+    hit = check["actions"]
+
+    assert list(hit) == [USE_ACTION]
+    assert hit[USE_ACTION]["inputs"]["value"] == {"statusCode": 200, "body": f"@json(body('{GET_ACTION}')?['value'])"}
+    assert {"equals": [f"@outputs('{GET_ACTION}')?['statusCode']", 200]} in check["expression"]["and"]
+
+
+def test_error_branches_keep_their_statuses_and_read_the_variable() -> None:
+    doc = _caller()
+    _rewire_caller(doc, "Get_Token", AUTH, 900)
+
+    actions = _actions(doc)
+
+    assert actions["Call_Vendor"]["runAfter"] == {CHECK_ACTION: ["Succeeded"]}
+    assert actions["Report_Auth_Error"]["runAfter"] == {CHECK_ACTION: ["Failed", "TimedOut"]}
+    assert actions["Report_Auth_Error"]["inputs"] == (
+        f"@{{variables('{TOKEN_VARIABLE}')?['statusCode']}}: @{{variables('{TOKEN_VARIABLE}')?['body']?['message']}}"
+    )
+    assert "Get_Token" not in actions["Call_Vendor"]["inputs"]["headers"]["Authorization"]
+
+
+def test_rewired_caller_is_not_rewired_again() -> None:
+    doc = _caller()
+    _rewire_caller(doc, "Get_Token", AUTH, 900)
+    rewired = copy.deepcopy(doc.data)
+
+    assert _rewire_caller(doc, "Get_Token", AUTH, 900) == "the Auth call is not a top-level action"
+    assert doc.data == rewired
+
+
+def test_caller_with_taken_action_names_is_skipped() -> None:
+    actions = _caller_actions()
+    actions[GET_ACTION] = {"runAfter": {}, "type": "Compose", "inputs": 1}
+    doc = PlaybookDocument(_workflow(CALLER, actions))
+
+    assert _rewire_caller(doc, "Get_Token", AUTH, 900) == f"action names already in use: {GET_ACTION}"
+    assert VAULT_PARAMETER not in doc.root_parameters
+
+
+def test_master_keeps_one_access_policy_when_rebuilt() -> None:
+    master, playbooks = _pack()
+
+    report = cache_auth_tokens(master, playbooks, 900)
+    assert report.callers == {CALLER: AUTH}
+    first = copy.deepcopy(master)
+
+    # Reconstrucción en modo batch: misma master ya procesada, playbooks sin modificar
+    _, fresh = _pack()
+    cache_auth_tokens(master, fresh, 900)
+
+    assert len(_access_policies(master)) == 1
+    assert master == first
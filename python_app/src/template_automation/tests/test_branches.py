@@ -0,0 +1,176 @@
+"""
+Parallel branch rewrite (`core/branches.py`) on small hand-written scopes.
+"""
+
+from __future__ import annotations
+
+import copy
+from typing import Any, Dict, Set
+
+from template_automation.core.branches import BranchReport, _rewrite_scope, parallelize_independent_actions
+from template_automation.core.document import PlaybookDocument, WORKFLOW_TYPE
+
+
+def _chain(**actions: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Chain the actions with runAfter Succeeded in the given order, as the designer does."""
+    previous = None
+    for name, action in actions.items():
+        action.setdefault("runAfter", {previous: ["Succeeded"]} if previous else {})
+        previous = name
+    return actions
+
+
+def _init(variable: str) -> Dict[str, Any]:
+    return {"type": "InitializeVariable", "inputs": {"variables": [{"name": variable, "type": "string"}]}}
+
+
+def _set(variable: str, value: str) -> Dict[str, Any]:
+    return {"type": "SetVariable", "inputs": {"name": variable, "value": value}}
+
+
+def _compose(value: str) -> Dict[str, Any]:
+    return {"type": "Compose", "inputs": value}
+
+
+def _http(method: str) -> Dict[str, Any]:
+    return {"type": "Http", "inputs": {"method": method, "uri": "https://example.com"}}
+
+
+def _run_after(actions: Dict[str, Dict[str, Any]]) -> Dict[str, Set[str]]:
+    return {name: set(action["runAfter"]) for name, action in actions.items()}
+
+
+def _ancestors(actions: Dict[str, Dict[str, Any]]) -> Dict[str, Set[str]]:
+    def of(name: str) -> Set[str]:
+        found: Set[str] = set()
+        for previous in actions[name]["runAfter"]:
+            found |= {previous} | of(previous)
+        return found
+
+    return {name: of(name) for name in actions}
+
+
+def _rewrite(actions: Dict[str, Dict[str, Any]]) -> BranchReport:
+    original = _ancestors(copy.deepcopy(actions))
+    report = BranchReport(source="test")
+    _rewrite_scope(actions, "$", report)
+
+    # La reescritura nunca añade un orden que no existiera
+    for name, ancestors in _ancestors(actions).items():
+        assert ancestors <= original[name], name
+    return report
+
+
+def test_independent_actions_become_parallel_branches() -> None:
+    actions = _chain(A=_init("a"), B=_init("b"), C=_compose("x"))
+
+    report = _rewrite(actions)
+
+    assert _run_after(actions) == {"A": set(), "B": set(), "C": set()}
+    assert report.scopes == {"$": ["B", "C"]}
+
+
+def test_data_dependencies_are_kept() -> None:
+    actions = _chain(
+        List=_http("GET"),
+        Parse=_compose("@body('List')?['value']"),
+        Count=_compose("@length(outputs('Parse'))"),
+    )
+
+    _rewrite(actions)
+
+    assert _run_after(actions) == {"List": set(), "Parse": {"List"}, "Count": {"Parse"}}
+
+
+def test_non_get_request_is_a_barrier() -> None:
+    actions = _chain(A=_init("a"), B=_init("b"), Post=_http("POST"), C=_compose("x"), D=_compose("y"))
+
+    _rewrite(actions)
+
+    assert _run_after(actions) == {"A": set(), "B": set(), "Post": {"A", "B"}, "C": {"Post"}, "D": {"Post"}}
+
+
+def test_get_requests_are_regrouped() -> None:
+    actions = _chain(First=_http("GET"), Second=_http("get"))
+
+    _rewrite(actions)
+
+    assert _run_after(actions) == {"First": set(), "Second": set()}
+
+
+def test_container_with_a_side_effect_is_a_barrier() -> None:
+    scope = {"type": "Scope", "actions": {"Notify": {"runAfter": {}, **_http("POST")}}}
+    actions = _chain(A=_init("a"), Scope=scope, B=_init("b"))
+
+    _rewrite(actions)
+
+    assert _run_after(actions) == {"A": set(), "Scope": {"A"}, "B": {"Scope"}}
+
+
+def test_variable_reads_follow_writes_and_writes_follow_reads() -> None:
+    actions = _chain(
+        Init=_init("v"),
+        Other=_init("w"),
+        First=_set("v", "1"),
+        Read=_compose("@variables('v')"),
+        Second=_set("v", "2"),
+        Unrelated=_compose("@variables('w')"),
+    )
+
+    _rewrite(actions)
+
+    assert _run_after(actions) == {
+        "Init": set(),
+        "Other": set(),
+        "First": {"Init"},
+        "Read": {"First"},
+        "Second": {"Read"},
+        "Unrelated": {"Other"},
+    }
+
+
+def test_error_handling_keeps_its_run_after() -> None:
+    actions = _chain(A=_init("a"), Call=_http("GET"), Unrelated=_compose("x"))
+    actions["On_Error"] = {"runAfter": {"Call": ["Failed", "TimedOut"]}, **_compose("@body('Call')")}
+    original = copy.deepcopy(_run_after(actions))
+
+    _rewrite(actions)
+
+    rewritten = _run_after(actions)
+    # Call, lo que le precede y el manejador conservan su runAfter
+    for name in ("A", "Call", "On_Error"):
+        assert rewritten[name] == original[name]
+    assert actions["On_Error"]["runAfter"] == {"Call": ["Failed", "TimedOut"]}
+    assert rewritten["Unrelated"] == {"Call"}
+
+
+def test_run_after_outside_the_scope_is_skipped() -> None:
+    actions = _chain(A={"runAfter": {"Elsewhere": ["Succeeded"]}, **_init("a")}, B=_init("b"))
+    original = copy.deepcopy(actions)
+    report = BranchReport(source="test")
+
+    _rewrite_scope(actions, "$", report)
+
+    assert actions == original
+    assert report.skipped == {"$": "A: runAfter Elsewhere outside the scope"}
+
+
+def test_playbook_rewrite_is_idempotent_and_reports_the_critical_path() -> None:
+    inner = _chain(X=_init("x"), Y=_init("y"))
+    actions = _chain(A=_init("a"), B=_init("b"), Loop={"type": "Foreach", "foreach": "@body('A')", "actions": inner})
+    playbook = {
+        "resources": [{"type": WORKFLOW_TYPE, "name": "p", "properties": {"definition": {"actions": actions}}}]
+    }
+    doc = PlaybookDocument(playbook)
+
+    report = parallelize_independent_actions(doc, "p.json")
+    rewritten = copy.deepcopy(playbook)
+    again = parallelize_independent_actions(doc, "p.json")
+
+    assert (report.before, report.after) == (5, 3)
+    assert set(report.scopes) == {
+        "$.resources[0].properties.definition.actions",
+        "$.resources[0].properties.definition.actions.Loop.actions",
+    }
+    assert playbook == rewritten
+    assert again.scopes == {} and again.before == again.after == 3
@@ -0,0 +1,248 @@
+"""
+Foreach classification and rewrite (`core/concurrency.py`) on small
+hand-written definitions.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+import pytest
+
+from template_automation.core.concurrency import (
+    CONCURRENCY_PACK_PARAMETER,
+    CONCURRENCY_PARAMETER,
+    DEFAULT,
+    PARALLEL,
+    SEQUENTIAL,
+    analyze_foreach,
+    parallelize_foreach_loops,
+)
+from template_automation.core.diff import DEPLOYMENT_TYPE
+from template_automation.core.document import PlaybookDocument, WORKFLOW_TYPE
+
+
+def _append(kind: str, variable: str, value: str = "@item()") -> Dict[str, Any]:
+    return {"type": kind, "inputs": {"name": variable, "value": value}}
+
+
+def _loop(actions: Dict[str, Any], repetitions: Optional[int] = None, **extra: Any) -> Dict[str, Any]:
+    loop: Dict[str, Any] = {"type": "Foreach", "foreach": "@body('List')", "actions": actions, **extra}
+    if repetitions is not None:
+        loop["runtimeConfiguration"] = {"concurrency": {"repetitions": repetitions}}
+    return loop
+
+
+def _pack(loop: Dict[str, Any], **after: Dict[str, Any]):
+    playbook = {
+        "resources": [
+            {
+                "type": WORKFLOW_TYPE,
+                "name": "Playbook",
+                "properties": {"definition": {"actions": {"For_each": loop, **after}}},
+            }
+        ]
+    }
+    master = {"parameters": {}, "resources": [{"type": DEPLOYMENT_TYPE, "name": "Playbook", "properties": {}}]}
+    return master, PlaybookDocument(playbook)
+
+
+def _rewrite(loop: Dict[str, Any], allow_reorder: bool = False, **after: Dict[str, Any]):
+    master, doc = _pack(loop, **after)
+    findings = parallelize_foreach_loops(master, [("Playbook", doc, "Playbook.json")], 10, allow_reorder)
+    return master, doc, findings[0]
+
+
+def test_array_append_loop_is_safe_and_rewritten() -> None:
+    loop = _loop({"Append": _append("AppendToArrayVariable", "ids")})
+
+    master, doc, finding = _rewrite(loop)
+
+    assert finding.safe and finding.mode == DEFAULT and finding.rewritten
+    assert loop["runtimeConfiguration"]["concurrency"]["repetitions"] == f"[parameters('{CONCURRENCY_PARAMETER}')]"
+    assert doc.root_parameters[CONCURRENCY_PARAMETER]["defaultValue"] == 10
+    assert CONCURRENCY_PACK_PARAMETER in master["parameters"]
+
+
+@pytest.mark.parametrize("kind", ["SetVariable", "IncrementVariable", "DecrementVariable"])
+def test_shared_state_loop_is_unsafe(kind: str) -> None:
+    loop = _loop({"Update": {"type": kind, "inputs": {"name": "count", "value": 1}}})
+
+    master, _, finding = _rewrite(loop, allow_reorder=True)
+
+    assert not finding.safe and not finding.rewritten and finding.pinned
+    assert loop["runtimeConfiguration"] == {"concurrency": {"repetitions": 1}}
+    assert master["parameters"] == {}
+
+
+def test_unsafe_explicitly_parallel_loop_is_pinned() -> None:
+    loop = _loop({"Update": {"type": "SetVariable", "inputs": {"name": "host", "value": "@item()"}}}, repetitions=5)
+
+    _, _, finding = _rewrite(loop)
+
+    assert finding.mode == PARALLEL and finding.pinned
+    assert loop["runtimeConfiguration"]["concurrency"]["repetitions"] == 1
+
+
+def test_unsafe_sequential_loop_is_left_alone() -> None:
+    loop = _loop({"Update": {"type": "SetVariable", "inputs": {"name": "host", "value": "@item()"}}}, repetitions=1)
+
+    _, _, finding = _rewrite(loop)
+
+    assert not finding.safe and not finding.pinned and not finding.rewritten
+
+
+def test_reading_an_appended_variable_is_unsafe() -> None:
+    finding = analyze_foreach(
+        _loop({
+            "Append": _append("AppendToArrayVariable", "ids"),
+            "Log": {"type": "Compose", "inputs": "@length(variables('ids'))"},
+        }),
+        "For_each",
+        "$.actions.For_each",
+    )
+
+    assert not finding.safe
+    assert finding.reasons == ["reads appended variable 'ids'"]
+
+
+def _text_loop() -> Dict[str, Any]:
+    return _loop({
+        "Block": {"runAfter": {}, "type": "Http", "inputs": {"method": "POST"}},
+        "Append_Ok": {"runAfter": {"Block": ["Succeeded"]}, **_append("AppendToStringVariable", "report", "ok @{item()}\n")},
+        "Append_Error": {"runAfter": {"Block": ["Failed"]}, **_append("AppendToStringVariable", "report", "error @{item()}\n")},
+    })
+
+
+def test_string_append_loop_is_collected_in_input_order() -> None:
+    loop = _text_loop()
+
+    _, doc, finding = _rewrite(loop)
+
+    assert finding.order_sensitive and finding.collectable and finding.collected
+    assert finding.safe and finding.rewritten and not finding.reasons
+    assert loop["actions"]["Append_Ok"] == {"runAfter": {"Block": ["Succeeded"]}, "type": "Compose", "inputs": "ok @{item()}\n"}
+    assert loop["actions"]["Append_Error"]["type"] == "Compose"
+
+    actions = doc.definition(doc.workflows[0])["actions"]
+    assert list(actions) == [
+        "For_each", "Filter_For_each", "Select_For_each", "Append_For_each", "Check_For_each",
+    ]
+    assert actions["Filter_For_each"]["runAfter"] == {"For_each": ["Succeeded", "Failed", "TimedOut"]}
+    assert actions["Filter_For_each"]["inputs"] == {
+        "from": "@result('For_each')",
+        "where": (
+            "@and(contains(createArray('Append_Ok', 'Append_Error'), item()?['name']), "
+            "equals(item()?['status'], 'Succeeded'))"
+        ),
+    }
+    assert actions["Select_For_each"]["inputs"] == {"from": "@body('Filter_For_each')", "select": "@item()?['outputs']"}
+    assert actions["Append_For_each"]["inputs"] == {
+        "name": "report", "value": "@{join(body('Select_For_each'), '')}",
+    }
+    # El scope sigue fallando si el bucle falla
+    assert actions["Check_For_each"]["runAfter"]["For_each"] == ["Succeeded"]
+
+
+def test_collected_loop_successors_wait_for_the_text() -> None:
+    loop = _text_loop()
+    respond = {"runAfter": {"For_each": ["Succeeded"]}, "type": "Response", "inputs": "@variables('report')"}
+    on_error = {"runAfter": {"For_each": ["Failed", "TimedOut"]}, "type": "Response", "inputs": "@variables('report')"}
+
+    _, doc, finding = _rewrite(loop, Respond=respond, On_Error=on_error)
+
+    actions = doc.definition(doc.workflows[0])["actions"]
+    all_statuses = ["Succeeded", "Failed", "TimedOut", "Skipped"]
+    assert finding.collected and "Check_For_each" not in actions
+    assert respond["runAfter"] == {"For_each": ["Succeeded"], "Append_For_each": all_statuses}
+    assert on_error["runAfter"] == {"For_each": ["Failed", "TimedOut"], "Append_For_each": all_statuses}
+
+
+def test_string_appends_to_several_variables_are_collected_per_variable() -> None:
+    loop = _loop({
+        "Append_A": _append("AppendToStringVariable", "a"),
+        "Append_B": {"runAfter": {"Append_A": ["Succeeded"]}, **_append("AppendToStringVariable", "b")},
+    })
+
+    _, doc, finding = _rewrite(loop)
+
+    actions = doc.definition(doc.workflows[0])["actions"]
+    assert finding.collected
+    assert actions["Append_For_each_1"]["inputs"]["name"] == "a"
+    assert actions["Append_For_each_2"]["inputs"]["name"] == "b"
+    assert actions["Filter_For_each_2"]["runAfter"] == {"Append_For_each_1": ["Succeeded"]}
+
+
+def test_nested_string_append_is_not_collected_and_is_pinned() -> None:
+    branch = {"type": "If", "expression": {}, "actions": {"Append": _append("AppendToStringVariable", "report")}}
+    loop = _loop({"Check": branch})
+
+    _, _, finding = _rewrite(loop)
+
+    assert finding.order_sensitive and not finding.collectable and finding.pinned
+    assert loop["runtimeConfiguration"] == {"concurrency": {"repetitions": 1}}
+    assert loop["actions"]["Check"]["actions"]["Append"]["type"] == "AppendToStringVariable"
+
+
+def test_collect_is_skipped_when_action_names_are_taken() -> None:
+    loop = _text_loop()
+
+    _, _, finding = _rewrite(loop, Filter_For_each={"runAfter": {}, "type": "Compose", "inputs": 1})
+
+    assert not finding.collected and finding.pinned
+    assert "action names already in use: Filter_For_each" in finding.reasons
+    assert loop["actions"]["Append_Ok"]["type"] == "AppendToStringVariable"
+
+
+def test_uncollectable_string_append_loop_is_parallel_with_allow_reorder() -> None:
+    branch = {"type": "If", "expression": {}, "actions": {"Append": _append("AppendToStringVariable", "report")}}
+    loop = _loop({"Check": branch})
+
+    _, _, finding = _rewrite(loop, allow_reorder=True)
+
+    assert finding.order_sensitive and finding.safe and finding.rewritten and not finding.collected
+
+
+def test_sequential_string_append_loop_is_kept() -> None:
+    loop = _text_loop()
+    loop["operationOptions"] = "Sequential"
+
+    _, _, finding = _rewrite(loop)
+
+    assert finding.collectable and not finding.collected and not finding.pinned and not finding.rewritten
+    assert loop["actions"]["Append_Ok"]["type"] == "AppendToStringVariable"
+
+
+@pytest.mark.parametrize(
+    "loop",
+    [
+        _loop({"Append": _append("AppendToArrayVariable", "ids")}, repetitions=1),
+        _loop({"Append": _append("AppendToArrayVariable", "ids")}, operationOptions="Sequential"),
+    ],
+    ids=["repetitions", "operationOptions"],
+)
+def test_explicitly_sequential_loop_is_kept(loop: Dict[str, Any]) -> None:
+    master, _, finding = _rewrite(loop)
+
+    assert finding.safe and finding.mode == SEQUENTIAL and not finding.rewritten
+    assert loop.get("runtimeConfiguration", {}).get("concurrency", {}).get("repetitions", 1) == 1
+    assert master["parameters"] == {}
+
+
+def test_explicitly_sequential_loop_is_rewritten_with_allow_reorder() -> None:
+    loop = _loop({"Append": _append("AppendToArrayVariable", "ids")}, repetitions=1, operationOptions="Sequential")
+
+    _, _, finding = _rewrite(loop, allow_reorder=True)
+
+    assert finding.rewritten
+    assert "operationOptions" not in loop
+    assert loop["runtimeConfiguration"]["concurrency"]["repetitions"] == f"[parameters('{CONCURRENCY_PARAMETER}')]"
+
+
+def test_explicitly_parallel_loop_is_kept() -> None:
+    loop = _loop({"Append": _append("AppendToArrayVariable", "ids")}, repetitions=5)
+
+    _, _, finding = _rewrite(loop, allow_reorder=True)
+
+    assert finding.mode == PARALLEL and finding.repetitions == 5 and not finding.rewritten
+    assert loop["runtimeConfiguration"]["concurrency"]["repetitions"] == 5
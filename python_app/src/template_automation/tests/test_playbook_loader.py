@@ -0,0 +1,50 @@
+"""
+Playbook lookup (`core/playbook_loader.py`) against one discovery pass.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from template_automation.core.playbook_loader import discover_playbooks, find_playbook, playbook_files
+
+
+def _write(directory: Path, *names: str) -> None:
+    for name in names:
+        (directory / name).write_text("{}", encoding="utf-8")
+
+
+def test_lookup_matches_the_disk_probe(tmp_path: Path) -> None:
+    _write(tmp_path, "Cliente_A.json", "B.json")
+    files = playbook_files(tmp_path)
+
+    for name in ("A", "B", "C"):
+        assert find_playbook(tmp_path, name, files=files) == find_playbook(tmp_path, name)
+
+
+def test_lookup_follows_a_case_insensitive_filesystem(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    _write(tmp_path, "cliente_playbook.json")
+    files = playbook_files(tmp_path)
+    probed = []
+
+    def is_file(path: Path) -> bool:
+        # Sistema de ficheros sin distinción de mayúsculas (Windows, macOS)
+        probed.append(path.name)
+        return any(p.name.casefold() == path.name.casefold() for p in path.parent.iterdir())
+
+    monkeypatch.setattr(Path, "is_file", is_file)
+
+    assert find_playbook(tmp_path, "Playbook", files=files) == tmp_path / "Cliente_Playbook.json"
+    assert find_playbook(tmp_path, "Other", files=files) is None
+    # Solo se sondea el candidato que coincide sin distinguir mayúsculas
+    assert probed == ["Cliente_Playbook.json"]
+
+
+def test_discover_playbooks_returns_entries(tmp_path: Path) -> None:
+    _write(tmp_path, "A.json")
+
+    (entry,) = discover_playbooks(tmp_path)
+
+    assert entry.path == tmp_path / "A.json" and entry.depth == 0 and entry.size == 2
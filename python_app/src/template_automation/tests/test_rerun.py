@@ -0,0 +1,62 @@
+"""
+Rebuilding a pack in the batch layout (`-m <I>/output/deploy.json -i <I>
+-o <I>/output`) reads the master written by the previous build. Every pass
+that modifies the master must give the same result when run again.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+
+from template_automation.core.diff import find_master
+from template_automation.core.integrity import check_pack
+from template_automation.core.retry import RetryProfile
+from template_automation.core.transformer import run_automation
+
+INTEGRATIONS = ["Sophos", "CrowdStrike", "AD"]
+
+FLAGS: Dict[str, Dict[str, Any]] = {
+    "default": {},
+    "shared_connections": {"shared_connections": True},
+    "foreach_concurrency": {"foreach_concurrency": 20},
+    "foreach_allow_reorder": {"foreach_concurrency": 20, "foreach_allow_reorder": True},
+    "auth_cache_ttl": {"auth_cache_ttl": 1500},
+    "retry_profile": {"retry_profile": RetryProfile()},
+    "parallel_branches": {"parallel_branches": True},
+    "hoist_threshold": {"hoist_threshold": 200},
+    "minify": {"minify": True, "compact": True},
+    "all": {
+        "shared_connections": True,
+        "foreach_concurrency": 20,
+        "auth_cache_ttl": 1500,
+        "retry_profile": RetryProfile(),
+        "parallel_branches": True,
+        "minify": True,
+    },
+}
+
+
+def _snapshot(directory: Path) -> Dict[str, bytes]:
+    return {path.name: path.read_bytes() for path in sorted(directory.glob("*.json"))}
+
+
+def _build(folder: Path, options: Dict[str, Any]) -> Dict[str, bytes]:
+    output = folder / "output"
+    run_automation(find_master(output), folder, output, **options)
+    issues = check_pack(output)
+    assert not issues, [f"{i.source} {i.path} [{i.code}] {i.message}" for i in issues]
+    return _snapshot(output)
+
+
+@pytest.mark.parametrize("name", INTEGRATIONS)
+@pytest.mark.parametrize("flag", sorted(FLAGS))
+def test_rebuild_is_idempotent(integration, name: str, flag: str) -> None:
+    folder = integration(name)
+
+    first = _build(folder, FLAGS[flag])
+    second = _build(folder, FLAGS[flag])
+
+    assert second == first
@@ -0,0 +1,84 @@
+"""
+Pack retry/timeout profile (`core/retry.py`) on small hand-written definitions.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from template_automation.config import DEFAULT_ACTION_SECONDS
+from template_automation.core.diff import DEPLOYMENT_TYPE
+from template_automation.core.document import PlaybookDocument, WORKFLOW_TYPE
+from template_automation.core.latency import parse_duration
+from template_automation.core.retry import (
+    PACK_SUFFIX,
+    TIMEOUT_PARAMETER,
+    RetryProfile,
+    normalize_request_policies,
+)
+
+
+def _http(**extra: Any) -> Dict[str, Any]:
+    return {"runAfter": {}, "type": "Http", "inputs": {"method": "POST", "uri": "https://example.com"}, **extra}
+
+
+def _normalize(actions: Dict[str, Any]):
+    doc = PlaybookDocument({
+        "resources": [{"type": WORKFLOW_TYPE, "name": "p", "properties": {"definition": {"actions": actions}}}]
+    })
+    master = {"parameters": {}, "resources": [{"type": DEPLOYMENT_TYPE, "name": "Playbook", "properties": {}}]}
+    report = normalize_request_policies(master, [("Playbook", doc, "Playbook.json")], RetryProfile())
+    return master, report
+
+
+def test_default_timeout_is_the_platform_one() -> None:
+    actions = {"Call": _http()}
+
+    master, report = _normalize(actions)
+
+    assert actions["Call"]["limit"] == {"timeout": f"[parameters('{TIMEOUT_PARAMETER}')]"}
+    default = master["parameters"][TIMEOUT_PARAMETER + PACK_SUFFIX]["defaultValue"]
+    assert parse_duration(default) == DEFAULT_ACTION_SECONDS
+    assert report.changed[0].timeout
+
+
+def test_request_watched_on_timed_out_keeps_the_platform_timeout() -> None:
+    actions = {
+        "Call": _http(),
+        "On_Timeout": {"runAfter": {"Call": ["Failed", "TimedOut"]}, "type": "Compose", "inputs": "@body('Call')"},
+    }
+
+    _, report = _normalize(actions)
+
+    assert "limit" not in actions["Call"]
+    assert "retryPolicy" in actions["Call"]["inputs"]
+    assert report.timeout_handled == 1
+    assert [change.timeout for change in report.changed] == [False]
+
+
+def test_request_watched_from_a_nested_scope_keeps_the_platform_timeout() -> None:
+    actions = {
+        "Try": {"runAfter": {}, "type": "Scope", "actions": {"Call": _http()}},
+        "Catch": {"runAfter": {"Try": ["Succeeded"]}, "type": "Scope", "actions": {
+            "Handler": {"runAfter": {}, "type": "Compose", "inputs": 1},
+        }},
+    }
+    actions["Try"]["actions"]["Log"] = {"runAfter": {"Call": ["TimedOut"]}, "type": "Compose", "inputs": 1}
+
+    _, report = _normalize(actions)
+
+    assert "limit" not in actions["Try"]["actions"]["Call"]
+    assert report.timeout_handled == 1
+
+
+def test_declared_policy_and_timeout_are_kept() -> None:
+    declared = _http(limit={"timeout": "PT5M"})
+    declared["inputs"]["retryPolicy"] = {"type": "none"}
+    actions = {"Call": declared}
+
+    master, report = _normalize(actions)
+
+    assert declared["limit"] == {"timeout": "PT5M"}
+    assert declared["inputs"]["retryPolicy"] == {"type": "none"}
+    assert report.declared == 1 and not report.changed
+    assert master["parameters"] == {}
@@ -3,12 +3,13 @@ from __future__ import annotations
 
 import json
 import os
-import re
+import sys
 from pathlib import Path
 from typing import Any, Dict, List, Tuple
 
-
-RE_DEPLOY = re.compile(r"deploy", re.IGNORECASE)  # deploy.json, Deploy_Sophos.json, etc.
+# Índice de repositorio compartido con template_automation (utils/repo_index.py)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "python_app" / "src" / "template_automation" / "src"))
+from template_automation.utils.repo_index import RepoIndex  # noqa: E402
 
 
 def _repo_root() -> Path:
@@ -23,21 +24,15 @@ def _raw_uri(owner: str, repo: str, branch: str, rel_path: str) -> str:
     return f"https://raw.githubusercontent.com/{owner}/{repo}/{branch}/{rel_path}"
 
 
-def _find_deploy_templates(repo_root: Path) -> List[Path]:
+def _find_deploy_templates(index: RepoIndex) -> List[Path]:
     """
     NUEVA ESTRUCTURA:
       <Integración>/output/deploy.json  (o cualquier *deploy*.json dentro de output)
 
     Solo consideramos deploys cuya carpeta padre sea exactamente 'output'.
+    Se consultan en el índice del repositorio en lugar de recorrer el árbol.
     """
-    out: List[Path] = []
-    for p in repo_root.rglob("*.json"):
-        if not RE_DEPLOY.search(p.name):
-            continue
-        if p.parent.name != "output":
-            continue
-        out.append(p)
-    return sorted(out)
+    return index.paths(index.deploy_files())
 
 
 def _load_json(path: Path) -> Dict[str, Any]:
@@ -54,6 +49,7 @@ def _update_deploy_file(
     owner: str,
     repo: str,
     branch: str,
+    index: RepoIndex,
 ) -> Tuple[bool, List[str]]:
     """
     Actualiza properties.templateLink.uri de cada Microsoft.Resources/deployments
@@ -106,7 +102,7 @@ def _update_deploy_file(
 
         target: Path | None = None
         for c in candidates:
-            if c.is_file():
+            if index.is_file(c):
                 target = c
                 break
 
@@ -125,6 +121,7 @@ def _update_deploy_file(
 
     if changed:
         _save_json(deploy_path, data)
+        index.update_file(deploy_path)
 
     return changed, changes
 
@@ -140,16 +137,19 @@ def main() -> int:
         print("ERROR: faltan env vars. Requiere: GITHUB_OWNER, GITHUB_REPO, GITHUB_BRANCH")
         return 0  # no rompas el workflow
 
-    deploys = _find_deploy_templates(repo_root)
+    index = RepoIndex.open(repo_root)
+
+    deploys = _find_deploy_templates(index)
     if not deploys:
         print("No se encontraron deploy templates dentro de carpetas 'output/'.")
+        index.save()
         return 0
 
     any_changed = False
     all_changes: List[str] = []
 
     for d in deploys:
-        changed, changes = _update_deploy_file(d, repo_root, owner, repo, branch)
+        changed, changes = _update_deploy_file(d, repo_root, owner, repo, branch, index)
         if changed:
             any_changed = True
             all_changes.extend(changes)
@@ -161,6 +161,7 @@ def main() -> int:
     else:
         print("No hubo cambios de URIs.")
 
+    index.save()
     return 0
 
 
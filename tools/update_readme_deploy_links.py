@@ -1,24 +1,23 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
+import hashlib
+import json
 import os
 import re
+import sys
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 from urllib.parse import quote
 
+# Índice de repositorio compartido con template_automation (utils/repo_index.py)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "python_app" / "src" / "template_automation" / "src"))
+from template_automation.utils.repo_index import RepoIndex  # noqa: E402
+
 
 RE_DEPLOY_JSON = re.compile(r"^.*deploy.*\.json$", flags=re.IGNORECASE)
 RE_HTML_TABLE = re.compile(r"<table>.*?</table>", flags=re.IGNORECASE | re.DOTALL)
 
-IGNORE_DIRS = {
-    ".git",
-    ".github",
-    "tools",
-    "__pycache__",
-    "python_app",
-}
-
 DISPLAY_NAMES: Dict[str, str] = {
     "Sophos": "Sophos",
     "CrowdStrike": "CrowdStrike",
@@ -28,14 +27,19 @@ DISPLAY_NAMES: Dict[str, str] = {
 PYAPP_BEGIN = "<!-- BEGIN python_app/README.md -->"
 PYAPP_END = "<!-- END python_app/README.md -->"
 
+# Manifest junto al README: integración -> listado de output/ + deploy + hash de la fila
+MANIFEST_NAME = ".readme_deploy_manifest.json"
+MANIFEST_VERSION = 1
 
-def _is_integration_dir(p: Path) -> bool:
-    return (
-        p.is_dir()
-        and p.name not in IGNORE_DIRS
-        and not p.name.startswith(".")
-        and (p / "output").is_dir()
-    )
+TABLE_HEADER: List[str] = [
+    "<table>",
+    "  <tr>",
+    "    <th>Integración</th>",
+    "    <th>Deploy</th>",
+    "    <th>Contenido</th>",
+    "  </tr>",
+    "",
+]
 
 
 def _find_deploy_file(files: List[Path]) -> Optional[Path]:
@@ -65,71 +69,212 @@ def _azure_deploy_link(raw_url: str) -> str:
     return f"https://portal.azure.com/#create/Microsoft.Template/uri/{quote(raw_url, safe='')}"
 
 
-def build_table(owner: str, repo: str, branch: str, root: Path) -> str:
-    integration_dirs = sorted(
-        [d for d in root.iterdir() if _is_integration_dir(d)],
-        key=lambda p: p.name.lower(),
+def _row_begin(name: str) -> str:
+    return f"<!-- BEGIN integration:{name} -->"
+
+
+def _row_end(name: str) -> str:
+    return f"<!-- END integration:{name} -->"
+
+
+def _scan_integrations(index: RepoIndex) -> Dict[str, Dict[str, Any]]:
+    """
+    Devuelve, por integración (orden alfabético), el listado de su carpeta output/:
+      { "<Integración>": {"files": [...ordenados...], "deploy": "<deploy>.json" | None} }
+
+    El listado sale del índice del repositorio; las integraciones sin JSON en
+    output/ no aparecen.
+    """
+    entries: Dict[str, Dict[str, Any]] = {}
+    for name in index.integrations():
+        json_files = index.paths(index.output_files(name))
+
+        deploy = _find_deploy_file(json_files)
+        ordered = _sort_files(json_files, deploy)
+
+        entries[name] = {
+            "files": [f.name for f in ordered],
+            "deploy": deploy.name if deploy else None,
+        }
+
+    return entries
+
+
+def _entry_hash(name: str, entry: Dict[str, Any], source: str) -> str:
+    payload = json.dumps(
+        {
+            "name": name,
+            "display": DISPLAY_NAMES.get(name, name.replace("_", " ")),
+            "files": entry["files"],
+            "deploy": entry["deploy"],
+            "source": source,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
     )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
-    rows: List[str] = [
-        "<table>",
+
+def _render_row(owner: str, repo: str, branch: str, name: str, entry: Dict[str, Any]) -> str:
+    """
+    Genera el bloque <tr> de una integración, delimitado por sus marcadores
+    BEGIN/END para poder sustituirlo después sin tocar el resto de la tabla.
+    """
+    display_name = DISPLAY_NAMES.get(name, name.replace("_", " "))
+    deploy = entry["deploy"]
+
+    if deploy:
+        raw_url = _raw_github_url(
+            owner, repo, branch, f"{name}/output/{deploy}"
+        )
+        deploy_cell = (
+            f'      <a href="{_azure_deploy_link(raw_url)}">\n'
+            f'        <img src="./Button.png" alt="Deploy to Azure" width="140px" />\n'
+            f"      </a>"
+        )
+    else:
+        deploy_cell = "      <i>No deploy.json</i>"
+
+    content_lines = []
+    for file_name in entry["files"]:
+        rel = f"./{name}/output/{file_name}"
+        content_lines.append(f'      • <a href="{rel}">{file_name}</a><br>')
+
+    lines = [
+        f"  {_row_begin(name)}",
         "  <tr>",
-        "    <th>Integración</th>",
-        "    <th>Deploy</th>",
-        "    <th>Contenido</th>",
+        f"    <td><b>{display_name}</b></td>",
+        "    <td>",
+        deploy_cell,
+        "    </td>",
+        "    <td>",
+        "\n".join(content_lines).rstrip("<br>"),
+        "    </td>",
         "  </tr>",
+        f"  {_row_end(name)}",
         "",
     ]
+    return "\n".join(lines) + "\n"
+
+
+def build_table(
+    owner: str,
+    repo: str,
+    branch: str,
+    root: Path,
+    index: Optional[RepoIndex] = None,
+) -> str:
+    entries = _scan_integrations(index or RepoIndex.open(root))
+
+    rows: List[str] = list(TABLE_HEADER)
+    table = "\n".join(rows) + "\n"
 
-    for d in integration_dirs:
-        output_dir = d / "output"
-        json_files = [
-            p for p in output_dir.iterdir()
-            if p.is_file() and p.suffix.lower() == ".json"
-        ]
+    for name, entry in entries.items():
+        table += _render_row(owner, repo, branch, name, entry)
 
-        if not json_files:
+    return table + "</table>\n"
+
+
+# ---------------------------------------------------------------------------
+# Manifest
+# ---------------------------------------------------------------------------
+def _load_manifest(path: Path, source: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Carga las integraciones del manifest. Si no existe, está corrupto, es de otra
+    versión o se generó para otro owner/repo/branch, devuelve {} (todo se regenera).
+    """
+    if not path.is_file():
+        return {}
+
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(data, dict):
+        return {}
+    if data.get("version") != MANIFEST_VERSION or data.get("source") != source:
+        return {}
+
+    integrations = data.get("integrations")
+    if not isinstance(integrations, dict):
+        return {}
+
+    return integrations
+
+
+def _save_manifest(path: Path, source: str, entries: Dict[str, Dict[str, Any]]) -> None:
+    data = {
+        "version": MANIFEST_VERSION,
+        "source": source,
+        "integrations": entries,
+    }
+    path.write_text(json.dumps(data, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+
+
+# ---------------------------------------------------------------------------
+# Splice por integración
+# ---------------------------------------------------------------------------
+def _block_pattern(name: str) -> re.Pattern:
+    return re.compile(
+        r"^[ \t]*" + re.escape(_row_begin(name)) + r".*?" + re.escape(_row_end(name)) + r"\n\n?",
+        flags=re.DOTALL | re.MULTILINE,
+    )
+
+
+def _splice_rows(
+    text: str,
+    owner: str,
+    repo: str,
+    branch: str,
+    current: Dict[str, Dict[str, Any]],
+    previous: Dict[str, Dict[str, Any]],
+) -> Optional[str]:
+    """
+    Sustituye en `text` solo las filas de las integraciones cuyo hash ha cambiado,
+    inserta las nuevas en su posición alfabética y elimina las que ya no existen.
+
+    Devuelve None si el README no tiene los marcadores esperados (hay que
+    regenerar la tabla completa).
+    """
+    table = RE_HTML_TABLE.search(text)
+    if not table:
+        return None
+
+    for name in previous:
+        if _row_begin(name) not in text:
+            return None
+
+    for name in previous:
+        if name not in current:
+            text = _block_pattern(name).sub("", text, count=1)
+
+    names = list(current.keys())
+    for idx, name in enumerate(names):
+        entry = current[name]
+        if previous.get(name, {}).get("hash") == entry["hash"]:
             continue
 
-        deploy = _find_deploy_file(json_files)
-        ordered = _sort_files(json_files, deploy)
+        block = _render_row(owner, repo, branch, name, entry)
+        pattern = _block_pattern(name)
 
-        display_name = DISPLAY_NAMES.get(d.name, d.name.replace("_", " "))
-
-        if deploy:
-            raw_url = _raw_github_url(
-                owner, repo, branch, f"{d.name}/output/{deploy.name}"
-            )
-            deploy_cell = (
-                f'      <a href="{_azure_deploy_link(raw_url)}">\n'
-                f'        <img src="./Button.png" alt="Deploy to Azure" width="140px" />\n'
-                f"      </a>"
-            )
-        else:
-            deploy_cell = "      <i>No deploy.json</i>"
-
-        content_lines = []
-        for f in ordered:
-            rel = f"./{d.name}/output/{f.name}"
-            content_lines.append(f'      • <a href="{rel}">{f.name}</a><br>')
-
-        rows.extend(
-            [
-                "  <tr>",
-                f"    <td><b>{display_name}</b></td>",
-                "    <td>",
-                deploy_cell,
-                "    </td>",
-                "    <td>",
-                "\n".join(content_lines).rstrip("<br>"),
-                "    </td>",
-                "  </tr>",
-                "",
-            ]
-        )
+        if pattern.search(text):
+            text = pattern.sub(lambda _m: block, text, count=1)
+            continue
+
+        # Nueva integración: antes de la siguiente fila existente o antes de </table>
+        insert_at = -1
+        for following in names[idx + 1:]:
+            marker_pos = text.find(_row_begin(following))
+            if marker_pos != -1:
+                insert_at = text.rfind("\n", 0, marker_pos) + 1
+                break
+        if insert_at == -1:
+            insert_at = RE_HTML_TABLE.search(text).end() - len("</table>")
 
-    rows.append("</table>")
-    return "\n".join(rows) + "\n"
+        text = text[:insert_at] + block + text[insert_at:]
+
+    return text
 
 
 def update_readme(readme_path: Path, new_table: str):
@@ -182,6 +327,53 @@ def append_python_app_readme(root_readme: Path, python_app_readme: Path) -> None
         print("Sección 'Python App' sin cambios")
 
 
+def sync_readme_table(
+    readme_path: Path,
+    owner: str,
+    repo: str,
+    branch: str,
+    root: Path,
+    index: Optional[RepoIndex] = None,
+) -> None:
+    """
+    Actualiza la tabla de deploys de forma incremental usando el manifest
+    que vive junto al README:
+
+      - Si el listado de ninguna integración ha cambiado, termina tras comparar
+        el manifest (sin reescribir el README).
+      - Si hay cambios, regenera solo los <tr> afectados y los sustituye por sus
+        marcadores BEGIN/END integration:<nombre>.
+      - Si el README aún no tiene marcadores, regenera la tabla completa.
+    """
+    manifest_path = readme_path.parent / MANIFEST_NAME
+    source = f"{owner}/{repo}@{branch}"
+
+    index = index or RepoIndex.open(root)
+    current = _scan_integrations(index)
+    for name, entry in current.items():
+        entry["hash"] = _entry_hash(name, entry, source)
+
+    previous = _load_manifest(manifest_path, source)
+
+    text = readme_path.read_text(encoding="utf-8")
+
+    if previous == current and all(_row_begin(name) in text for name in current):
+        print("README.md sin cambios (manifest al día)")
+        return
+
+    new_text = _splice_rows(text, owner, repo, branch, current, previous) if previous else None
+
+    if new_text is None:
+        update_readme(readme_path, build_table(owner, repo, branch, root, index))
+    elif new_text != text:
+        readme_path.write_text(new_text, encoding="utf-8")
+        print("README.md actualizado")
+    else:
+        print("README.md sin cambios")
+
+    _save_manifest(manifest_path, source, current)
+
+
 def main() -> int:
     branch = os.getenv("GITHUB_BRANCH")
     owner = os.getenv("GITHUB_OWNER")
@@ -195,8 +387,9 @@ def main() -> int:
     if not readme.exists():
         return 0
 
-    table = build_table(owner, repo, branch, Path("."))
-    update_readme(readme, table)
+    index = RepoIndex.open(Path("."))
+    sync_readme_table(readme, owner, repo, branch, Path("."), index)
+    index.save()
 
     # ✅ Al final: append del README dentro de python_app
     append_python_app_readme(readme, Path("python_app/README.md"))